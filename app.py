@@ -1,312 +1,237 @@
 import os
-import subprocess
-import whisper
+import time
 from pathlib import Path
 import streamlit as st
-from openai import OpenAI
-from config import OPENAI_API_KEY
-import tempfile
-
-# =========================
-# CONFIGURAÇÕES PADRÃO
-# =========================
-PASTA_TRANSCRITOS_PADRAO = "videos_transcritos"
-PASTA_TRANSLITERADOS_PADRAO = "videos_transliterados"
-
-# Cliente OpenAI
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-# Prompt para transliteração
-PROMPT_TEMPLATE = """
-Tarefa:
-Você é um assistente especialista em transformar transcrições de vídeos em uma documentação clara, organizada e objetiva, adequada para ser usada em um sistema de IA baseado em RAG.
-
-Entrada:
-Você receberá uma transcrição de vídeo, que pode conter informalidades, repetições ou interrupções típicas da fala natural.
-
-Objetivo:
-Sua tarefa é transliterar essa transcrição em um conteúdo documental, bem estruturado, com tópicos claros, subtítulos quando necessário e sem linguagem coloquial. A ideia é manter toda a informação essencial passada no vídeo, mas no formato de um texto técnico ou explicativo, semelhante a um artigo, manual ou documentação de conhecimento.
-
-Instruções específicas:
-- Organize o conteúdo em tópicos, subtópicos e parágrafos coerentes.
-- Elimine vícios de linguagem e repetições.
-- Conserve o sentido original da fala, mas com clareza e concisão.
-- Quando possível, use bullet points, enumerações ou tabelas para facilitar a leitura.
-- Não invente informações não presentes na transcrição.
-
-Formato de saída:
-Uma documentação clara, didática e adequada para indexação e consulta por uma IA via RAG.
-
-Agora, aqui está a transcrição para ser processada:
-
-{}
-"""
+import shutil
+from modelos import registro, PASTA_INT8, PRECISAO_FP32, PRECISAO_INT8
+from audio import FORMATO_MP3, FORMATO_NPY, FORMATO_MEMORIA
+from registro_tarefas import (
+    obter_registro, ETAPA_TRANSCRICAO, ETAPA_TRANSLITERACAO, STATUS_CONCLUIDA, STATUS_FALHOU, STATUS_EM_ANDAMENTO
+)
+from transcricao import EXTENSOES_AUDIO, listar_audios
+from cascata import LIMITES_CASCATA_PADRAO
+from transcricao_lote import LOTE_MAXIMO
+from cache_resultados import obter_cache, PASTA_CACHE_PADRAO, TIPO_TRANSCRICAO, TIPO_TRANSLITERACAO
+from indice_documentos import obter_indice
+from busca import buscar as buscar_conteudo, ORIGEM_TRANSLITERADO, ORIGEM_TRANSCRICAO
+from transliteracao_lote import resumo_lote
+from vigia import EXTENSOES_VIDEO
+from metricas import Agregador, PERFIL_CPROFILE, PERFIL_TORCH
+from pipeline import (
+    PASTA_TRANSCRITOS_PADRAO, PASTA_TRANSLITERADOS_PADRAO, MODELOS_WHISPER, criar_pastas, importar_transcricoes_existentes
+)
+from pipeline import listar_videos_pasta as listar_videos
+import trabalhos
+from trabalhos import (
+    VAGAS_PADRAO, TRABALHADORES_PADRAO, RECURSO_CPU, RECURSO_GPU, RECURSO_API,
+    STATUS_NA_FILA, STATUS_EXECUTANDO, STATUS_CONCLUIDO, STATUS_FALHOU as TRABALHO_FALHOU, STATUS_CANCELADO,
+    pasta_envio
+)
 
 # =========================
 # FUNÇÕES AUXILIARES
 # =========================
 
-def criar_pastas(pasta_transcritos, pasta_transliterados):
-    """Cria as pastas necessárias"""
-    os.makedirs(pasta_transcritos, exist_ok=True)
-    os.makedirs(pasta_transliterados, exist_ok=True)
-
-def salvar_audio_temporario(uploaded_file):
-    """Salva o arquivo de áudio em um local temporário"""
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp_file:
-        tmp_file.write(uploaded_file.getvalue())
-        return tmp_file.name
+TAMANHO_BLOCO_UPLOAD = 8 * 1024 * 1024
+# O painel de trabalhos se redesenha sozinho neste intervalo (segundos)
+INTERVALO_PAINEL = 2
+
+ICONES_TRABALHO = {
+    STATUS_NA_FILA: "⏳",
+    STATUS_EXECUTANDO: "⚙️",
+    STATUS_CONCLUIDO: "✅",
+    TRABALHO_FALHOU: "❌",
+    STATUS_CANCELADO: "⏹️",
+}
+
+def salvar_upload(uploaded_file, pasta_destino: str, nome: str):
+    """Copia o upload para o disco em blocos, mantendo a extensão original"""
+    sufixo = Path(uploaded_file.name).suffix.lower() or ".bin"
+    caminho = os.path.join(pasta_destino, f"{nome}{sufixo}")
+    # getvalue() criaria mais uma cópia inteira do arquivo em memória
+    uploaded_file.seek(0)
+    with open(caminho, "wb") as arquivo:
+        shutil.copyfileobj(uploaded_file, arquivo, TAMANHO_BLOCO_UPLOAD)
+    return caminho
 
 def listar_videos_pasta(pasta_videos):
     """Lista todos os arquivos de vídeo em uma pasta"""
-    extensoes_video = ['.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm', '.m4v', '.3gp']
-    videos = []
-    
-    if not os.path.exists(pasta_videos):
-        return videos
-    
     try:
-        for arquivo in os.listdir(pasta_videos):
-            if any(arquivo.lower().endswith(ext) for ext in extensoes_video):
-                videos.append(arquivo)
+        return listar_videos(pasta_videos)
     except PermissionError:
         st.error(f"❌ Sem permissão para acessar a pasta: {pasta_videos}")
-    
-    return sorted(videos)
-
-def extrair_audio_video(caminho_video, pasta_destino):
-    """Extrai o áudio de um arquivo de vídeo usando ffmpeg"""
-    nome_arquivo = Path(caminho_video).stem
-    caminho_audio = os.path.join(pasta_destino, f"{nome_arquivo}.mp3")
-    
-    # Se o áudio já existe, pular
-    if os.path.exists(caminho_audio):
-        return caminho_audio
-    
-    try:
-        # Usar ffmpeg para extrair áudio
-        subprocess.run([
-            'ffmpeg', '-i', caminho_video,
-            '-vn', '-acodec', 'mp3', '-ab', '192k',
-            '-ar', '44100', '-y', caminho_audio
-        ], check=True, capture_output=True)
-        
-        return caminho_audio
-    except subprocess.CalledProcessError as e:
-        st.error(f"❌ Erro ao extrair áudio de {Path(caminho_video).name}: {e}")
-        return None
-    except FileNotFoundError:
-        st.error("❌ FFmpeg não encontrado. Instale o FFmpeg para extrair áudio dos vídeos.")
-        return None
-
-# =========================
-# FUNÇÕES PRINCIPAIS
-# =========================
+        return []
+
+@st.cache_resource
+def obter_motor(concorrencia: int = 4, requisicoes_por_minuto: int = 500, tokens_por_minuto: int = 30000,
+                pasta_cache: str = None, tokens_por_bloco: int = 0, sobreposicao: int = 200):
+    """Motor de transliteração compartilhado entre reexecuções, sessões e trabalhos em segundo plano"""
+    return trabalhos.obter_motor(concorrencia, requisicoes_por_minuto, tokens_por_minuto, pasta_cache, tokens_por_bloco, sobreposicao)
+
+@st.cache_resource
+def obter_executor(pasta_transcritos: str):
+    """Executor de trabalhos do processo: sobrevive a reexecuções e é o mesmo para todas as sessões"""
+    return trabalhos.obter_executor(pasta_transcritos)
+
+@st.cache_resource
+def obter_agregador():
+    """Agregador de métricas que lê o JSONL de forma incremental entre reexecuções"""
+    return Agregador()
+
+def enviar_trabalho(executor, tipo: str, parametros: dict, titulo: str):
+    """Enfileira o trabalho; o andamento aparece no painel de trabalhos"""
+    identificador = executor.enviar(tipo, parametros, titulo=titulo)
+    st.success(f"📨 Trabalho #{identificador} enfileirado: {titulo}. Acompanhe em 🧵 Trabalhos, abaixo.")
+    return identificador
+
+def mostrar_resultado_upload(resultado: dict, identificador: int):
+    """Transcrição e transliteração de um upload concluído"""
+    for rotulo, chave in (("📄 Transcrição", "transcricao"), ("🔄 Transliteração", "transliteracao")):
+        caminho = resultado.get(chave)
+        if caminho and os.path.exists(caminho):
+            with open(caminho, "r", encoding="utf-8") as f:
+                texto = f.read()
+            st.text_area(f"{rotulo}:", texto, height=200, disabled=True, key=f"{chave}_{identificador}")
+            st.download_button(f"⬇️ {os.path.basename(caminho)}", texto, file_name=os.path.basename(caminho),
+                               key=f"baixar_{chave}_{identificador}")
+
+def mostrar_etapas(metricas):
+    """Uma coluna por etapa da esteira: concluídos, fila, itens por minuto e ocupação"""
+    colunas = st.columns(len(metricas))
+    for coluna, metrica in zip(colunas, metricas):
+        with coluna:
+            st.metric(
+                metrica["etapa"],
+                f"{metrica['concluidos']} ok / {metrica['erros']} erro(s)",
+                help=f"{metrica['item_atual'] or 'ocioso'}"
+            )
+            st.caption(
+                f"Fila: {metrica['fila']} • {metrica['por_minuto']:.1f}/min • "
+                f"ocupação {metrica['ocupacao'] * 100:.0f}%"
+            )
 
-def baixar_audios_canal(canal_url: str, pasta_transcritos: str):
-    """Baixa todos os áudios de um canal"""
-    st.info("🔽 Baixando áudios do canal...")
-    subprocess.run([
-        "yt-dlp",
-        "-x", "--audio-format", "mp3",
-        "-o", f"{pasta_transcritos}/%(title)s.%(ext)s",
-        canal_url
-    ])
-    st.success("✅ Download do canal concluído!")
-
-def baixar_video_unico(video_url: str, pasta_transcritos: str):
-    """Baixa o áudio de um vídeo específico"""
-    st.info("🔽 Baixando áudio do vídeo...")
-    subprocess.run([
-        "yt-dlp",
-        "-x", "--audio-format", "mp3",
-        "-o", f"{pasta_transcritos}/%(title)s.%(ext)s",
-        video_url
-    ])
-    st.success("✅ Download do vídeo concluído!")
-
-def processar_videos_pasta(pasta_videos, pasta_transcritos, pasta_transliterados, modelo_whisper, videos_selecionados=None):
-    """Processa vídeos de uma pasta local"""
-    videos = listar_videos_pasta(pasta_videos)
+def mostrar_trabalhos(executor, limite: int = 20):
+    """Fila de trabalhos com progresso, prévia, histórico e botões de cancelar e repetir"""
+    fila = executor.fila
+    contagem = fila.contar()
+    estado_vagas = executor.vagas.estado()
+    st.caption(
+        f"⏳ {contagem[STATUS_NA_FILA]} na fila • ⚙️ {contagem[STATUS_EXECUTANDO]} executando • "
+        f"✅ {contagem[STATUS_CONCLUIDO]} • ❌ {contagem[TRABALHO_FALHOU]} • ⏹️ {contagem[STATUS_CANCELADO]} — vagas: "
+        + ", ".join(
+            f"{recurso} {estado['ocupadas']}/{estado['limite']}" + (f" ({estado['esperando']} esperando)" if estado["esperando"] else "")
+            for recurso, estado in estado_vagas.items()
+        )
+    )
     
-    if not videos:
-        st.warning("📁 Nenhum vídeo encontrado na pasta especificada.")
+    lista = fila.listar(limite=limite)
+    if not lista:
+        st.info("ℹ️ Nenhum trabalho enviado ainda.")
         return
     
-    # Se não especificou vídeos, processar todos
-    if videos_selecionados is None:
-        videos_selecionados = videos
-    
-    st.info(f"🎬 Processando {len(videos_selecionados)} vídeo(s)...")
-    
-    # Carregar modelo Whisper uma vez
-    st.info("🧠 Carregando modelo Whisper...")
-    model = whisper.load_model(modelo_whisper)
-    
-    videos_processados = 0
-    videos_com_erro = []
-    
-    for video in videos_selecionados:
-        if video not in videos:
-            continue
-            
-        st.write(f"🎥 Processando: {video}")
-        caminho_video = os.path.join(pasta_videos, video)
-        nome_base = Path(video).stem
-        
-        try:
-            # 1. Extrair áudio
-            st.write("🔊 Extraindo áudio...")
-            caminho_audio = extrair_audio_video(caminho_video, pasta_transcritos)
-            
-            if not caminho_audio:
-                videos_com_erro.append(video)
-                continue
-            
-            # 2. Transcrever
-            caminho_transcricao = os.path.join(pasta_transcritos, f"{nome_base}.txt")
-            
-            if not os.path.exists(caminho_transcricao):
-                st.write("📄 Transcrevendo...")
-                result = model.transcribe(caminho_audio, language="pt")
-                
-                with open(caminho_transcricao, "w", encoding="utf-8") as f:
-                    f.write(result["text"])
-            else:
-                st.write("⏭️ Transcrição já existe, pulando...")
-            
-            # 3. Transliterar
-            caminho_transliteracao = os.path.join(pasta_transliterados, f"{nome_base}-Transliterado.txt")
-            
-            if not os.path.exists(caminho_transliteracao):
-                st.write("🔄 Transliterando...")
-                
-                with open(caminho_transcricao, "r", encoding="utf-8") as f:
-                    conteudo = f.read()
-                
-                resultado = transliterar_transcricao(conteudo)
-                
-                with open(caminho_transliteracao, "w", encoding="utf-8") as f:
-                    f.write(resultado)
-            else:
-                st.write("⏭️ Transliteração já existe, pulando...")
-            
-            videos_processados += 1
-            st.success(f"✅ {video} processado com sucesso!")
-            
-        except Exception as e:
-            st.error(f"❌ Erro ao processar {video}: {str(e)}")
-            videos_com_erro.append(video)
-    
-    # Resumo final
-    st.success(f"🎉 Processamento concluído!")
-    st.info(f"✅ Vídeos processados com sucesso: {videos_processados}")
-    
-    if videos_com_erro:
-        st.warning(f"⚠️ Vídeos com erro: {len(videos_com_erro)}")
-        with st.expander("Ver vídeos com erro"):
-            for video in videos_com_erro:
-                st.write(f"• {video}")
-
-def transcrever_audios(pasta_transcritos: str, modelo: str = "small"):
-    """Transcreve todos os áudios na pasta"""
-    st.info("🧠 Carregando modelo Whisper...")
-    model = whisper.load_model(modelo)
-
-    st.info("📄 Iniciando transcrição...")
-    arquivos_processados = 0
-    
-    for audio_file in Path(pasta_transcritos).glob("*.mp3"):
-        txt_path = audio_file.with_suffix(".txt")
-        if txt_path.exists():
-            st.write(f"⏭️ Pulando (já transcrito): {audio_file.name}")
-            continue
-
-        st.write(f"🔊 Transcrevendo: {audio_file.name}")
-        result = model.transcribe(str(audio_file), language="pt")
-
-        with open(txt_path, "w", encoding="utf-8") as f:
-            f.write(result["text"])
-        
-        arquivos_processados += 1
-
-    if arquivos_processados > 0:
-        st.success(f"✅ Transcrição finalizada! ({arquivos_processados} arquivos processados)")
-    else:
-        st.info("ℹ️ Nenhum arquivo novo para transcrever.")
-
-def transcrever_audio_unico(caminho_audio: str, modelo: str = "small"):
-    """Transcreve um único arquivo de áudio"""
-    st.info("🧠 Carregando modelo Whisper...")
-    model = whisper.load_model(modelo)
-    
-    st.info("📄 Iniciando transcrição...")
-    result = model.transcribe(caminho_audio, language="pt")
-    
-    st.success("✅ Transcrição concluída!")
-    return result["text"]
-
-def transliterar_transcricao(conteudo: str):
-    """Translita uma transcrição usando OpenAI"""
-    response = client.chat.completions.create(
-        model="gpt-4o",
-        messages=[{"role": "user", "content": PROMPT_TEMPLATE.format(conteudo)}],
-        temperature=0.6
-    )
-    return response.choices[0].message.content
-
-def executar_transliteracao(pasta_transcritos: str, pasta_transliterados: str):
-    """Executa a transliteração de todos os arquivos transcritos"""
-    st.info("🔄 Iniciando transliteração...")
-    arquivos_processados = 0
-    
-    for nome_arquivo in os.listdir(pasta_transcritos):
-        if nome_arquivo.endswith(".txt") and not nome_arquivo.endswith("-Transliterado.txt"):
-            caminho_arquivo = os.path.join(pasta_transcritos, nome_arquivo)
-            
-            # Verificar se já foi transliterado
-            nome_saida = nome_arquivo.replace(".txt", "-Transliterado.txt")
-            caminho_saida = os.path.join(pasta_transliterados, nome_saida)
-            
-            if os.path.exists(caminho_saida):
-                st.write(f"⏭️ Pulando (já transliterado): {nome_arquivo}")
-                continue
+    for trabalho in lista:
+        identificador = trabalho["id"]
+        status = trabalho["status"]
+        ativo = status in (STATUS_NA_FILA, STATUS_EXECUTANDO)
+        rotulo = f"{ICONES_TRABALHO[status]} #{identificador} {trabalho['titulo']} — {status}"
+        if status == STATUS_EXECUTANDO:
+            rotulo += f" ({trabalho['progresso'] * 100:.0f}%)"
+        with st.expander(rotulo, expanded=status == STATUS_EXECUTANDO):
+            if status == STATUS_EXECUTANDO or trabalho["progresso"]:
+                st.progress(trabalho["progresso"], text=trabalho["mensagem"] or "")
+            if trabalho["etapas"]:
+                mostrar_etapas(trabalho["etapas"])
+            if trabalho["erro"]:
+                st.error(f"❌ {trabalho['erro']}")
+            if status == STATUS_EXECUTANDO and trabalho["previa"]:
+                st.text("…" + trabalho["previa"][-600:])
+            if trabalho["historico"]:
+                st.text("\n".join(trabalho["historico"][-12:]))
+            if status == STATUS_CONCLUIDO and trabalho["tipo"] == "upload" and trabalho["resultado"]:
+                mostrar_resultado_upload(trabalho["resultado"], identificador)
             
-            with open(caminho_arquivo, "r", encoding="utf-8") as f:
-                conteudo = f.read()
-
-            st.write(f"📝 Transliterando: {nome_arquivo}")
-            resultado = transliterar_transcricao(conteudo)
-
-            with open(caminho_saida, "w", encoding="utf-8") as f_out:
-                f_out.write(resultado)
-
-            st.success(f"✅ Salvo: {nome_saida}")
-            arquivos_processados += 1
-    
-    if arquivos_processados > 0:
-        st.success(f"🎉 Transliteração concluída! ({arquivos_processados} arquivos processados)")
+            if ativo:
+                if trabalho["parametros"].get("vigiar"):
+                    texto_cancelar = "⏹️ Parar vigia"
+                else:
+                    texto_cancelar = "🛑 Cancelar"
+                if st.button(texto_cancelar, key=f"cancelar_trabalho_{identificador}"):
+                    fila.cancelar(identificador)
+                    st.info("⏹️ Cancelamento pedido; o trabalho para no próximo passo.")
+            elif status in (TRABALHO_FALHOU, STATUS_CANCELADO):
+                if st.button("🔁 Tentar novamente", key=f"repetir_trabalho_{identificador}"):
+                    executor.repetir(identificador)
+                    st.info("🔁 Trabalho devolvido à fila.")
+    
+    if st.button("🧹 Limpar trabalhos terminados", key="limpar_trabalhos"):
+        removidos = fila.remover_terminados()
+        st.info(f"🧹 {removidos} trabalho(s) removido(s)")
+
+def painel_trabalhos(executor):
+    """Mostra o painel atualizando sozinho (st.fragment) sem reexecutar o app inteiro"""
+    if hasattr(st, "fragment"):
+        st.fragment(run_every=INTERVALO_PAINEL)(mostrar_trabalhos)(executor)
     else:
-        st.info("ℹ️ Nenhum arquivo novo para transliterar.")
+        mostrar_trabalhos(executor)
+        if st.button("🔄 Atualizar trabalhos"):
+            st.rerun()
 
-def mostrar_arquivos_transliterados(pasta_transliterados: str):
-    """Mostra os arquivos transliterados disponíveis"""
+def mostrar_arquivos_transliterados(pasta_transliterados: str, por_pagina: int = 20):
+    """Mostra os arquivos transliterados disponíveis, paginados a partir do índice de metadados"""
     if not os.path.exists(pasta_transliterados):
         st.warning("📁 Pasta de transliterados não encontrada.")
         return
     
-    arquivos = [arq for arq in os.listdir(pasta_transliterados) if arq.endswith("-Transliterado.txt")]
+    indice = obter_indice(pasta_transliterados)
+    indice.atualizar()
     
-    if not arquivos:
+    if not indice.totais()["documentos"]:
         st.info("📄 Nenhum arquivo transliterado encontrado.")
         return
     
     st.subheader("📁 Arquivos transliterados disponíveis:")
-    for arq in arquivos:
-        with open(os.path.join(pasta_transliterados, arq), "r", encoding="utf-8") as f:
-            conteudo = f.read()
-        with st.expander(f"📄 {arq}"):
-            st.text_area("Conteúdo:", conteudo, height=300, disabled=True)
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        filtro = st.text_input("🔎 Filtrar por nome:", key="filtro_transliterados")
+    total = indice.contar(filtro)
+    paginas = max(1, (total + por_pagina - 1) // por_pagina)
+    with col2:
+        pagina = st.number_input(f"Página (de {paginas}):", min_value=1, max_value=paginas, value=1, key="pagina_transliterados")
+    st.caption(f"{total} documento(s)")
+    
+    for documento in indice.pagina(pagina, por_pagina, filtro):
+        with st.expander(f"📄 {documento['nome']} · {documento['palavras']} palavras · {documento['tamanho'] / 1024:.1f} KB"):
+            st.caption(documento["previa"])
+            # O conteúdo completo só é lido quando o usuário pede
+            if st.checkbox("📖 Mostrar conteúdo completo", key=f"abrir_{documento['nome']}"):
+                st.text_area("Conteúdo:", indice.ler(documento["nome"]), height=300, disabled=True)
+
+def mostrar_busca(pasta_transcritos: str, pasta_transliterados: str, limite: int = 20):
+    """Busca por relevância (BM25) no conteúdo das transliterações e transcrições"""
+    st.subheader("🔎 Buscar no conteúdo")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        consulta = st.text_input("Termos:", key="consulta_busca", placeholder="ex.: inteligência artificial")
+    with col2:
+        origens = {"Todos": None, "Transliterados": ORIGEM_TRANSLITERADO, "Transcrições": ORIGEM_TRANSCRICAO}
+        origem = origens[st.selectbox("Origem:", list(origens), key="origem_busca")]
+    if not consulta.strip():
+        return
+    
+    inicio = time.perf_counter()
+    resultados = buscar_conteudo(consulta, pasta_transcritos, pasta_transliterados, limite, origem)
+    st.caption(f"{len(resultados)} resultado(s) em {(time.perf_counter() - inicio) * 1000:.0f} ms")
+    if not resultados:
+        st.info("🔍 Nenhum documento contém esses termos.")
+    
+    for posicao, resultado in enumerate(resultados):
+        icone = "🔄" if resultado["origem"] == ORIGEM_TRANSLITERADO else "📄"
+        with st.expander(f"{icone} {resultado['nome']} · relevância {resultado['pontuacao']:.2f}"):
+            if resultado["trecho"]:
+                st.caption(resultado["trecho"])
+            if st.checkbox("📖 Mostrar conteúdo completo", key=f"busca_{posicao}_{resultado['origem']}_{resultado['nome']}"):
+                with open(resultado["caminho"], "r", encoding="utf-8", errors="replace") as f:
+                    st.text_area("Conteúdo:", f.read(), height=300, disabled=True)
 
 # =========================
 # STREAMLIT APP
@@ -333,14 +258,234 @@ with st.sidebar:
     
     modelo_whisper = st.selectbox(
         "🧠 Modelo Whisper", 
-        ["tiny", "base", "small", "medium", "large"], 
+        MODELOS_WHISPER, 
         index=2,
         help="Modelo mais pesado = melhor qualidade, mas mais lento"
     )
 
+    with st.expander("🏎️ Motor de inferência"):
+        precisao_whisper = st.selectbox(
+            "Precisão:",
+            [None, PRECISAO_FP32, PRECISAO_INT8],
+            format_func=lambda p: {
+                None: "Automática (fp16 na GPU, fp32 na CPU)",
+                PRECISAO_FP32: "fp32",
+                PRECISAO_INT8: "int8 (quantização dinâmica, CPU)",
+            }[p],
+            help="int8 reduz a memória e acelera medium/large na CPU, com pequena perda de precisão"
+        )
+        threads_whisper = st.number_input(
+            "Threads do torch:",
+            min_value=0,
+            max_value=os.cpu_count() or 1,
+            value=0,
+            help="0 = padrão do torch; no modo com processos, é o número de threads de cada processo"
+        )
+        guardar_int8 = st.checkbox(
+            "Guardar o modelo já quantizado",
+            value=True,
+            help=f"Evita repetir a quantização a cada carregamento (em {PASTA_INT8})"
+        )
+
+    with st.expander("🔄 Limites da API OpenAI"):
+        concorrencia_api = st.number_input("Chamadas simultâneas:", min_value=1, value=4)
+        requisicoes_por_minuto = st.number_input("Requisições por minuto:", min_value=1, value=500)
+        tokens_por_minuto = st.number_input("Tokens por minuto:", min_value=1000, value=30000, step=1000)
+        tokens_por_bloco = st.number_input(
+            "Tokens por bloco:",
+            min_value=0,
+            value=12000,
+            step=1000,
+            help="Transcrições maiores são divididas em blocos transliterados em paralelo e depois consolidados (0 = nunca dividir)"
+        )
+        sobreposicao_blocos = st.number_input("Sobreposição entre blocos (tokens):", min_value=0, value=200, step=50)
+        usar_batch_api = st.checkbox(
+            "📦 Canal completo pela Batch API",
+            value=False,
+            help="Envia todas as transcrições pendentes num lote offline: metade do preço, resultado em até 24 h. "
+                 "O andamento sobrevive a reinícios do app"
+        )
+
+    with st.expander("♻️ Cache de resultados"):
+        usar_cache = st.checkbox(
+            "Reaproveitar resultados pelo conteúdo",
+            value=True,
+            help="Transcrições por hash do áudio + modelo + idioma; transliterações por hash da transcrição + prompt + modelo + temperatura"
+        )
+        limite_cache_mb = st.number_input("Tamanho máximo do cache (MB):", min_value=0, value=1024, step=256)
+    pasta_cache = PASTA_CACHE_PADRAO if usar_cache else None
+
+    formato_audio = st.selectbox(
+        "🔊 Áudio extraído dos vídeos:",
+        [FORMATO_MP3, FORMATO_NPY, FORMATO_MEMORIA],
+        format_func=lambda f: {
+            FORMATO_MP3: "MP3 (192 kbps)",
+            FORMATO_NPY: "PCM 16 kHz em .npy (sem recodificação)",
+            FORMATO_MEMORIA: "PCM 16 kHz só em memória",
+        }[f],
+        help="PCM vai direto do ffmpeg para o Whisper, sem codificar e decodificar MP3"
+    )
+
+    transcricao_em_janelas = st.checkbox(
+        "📡 Transcrever em janelas com checkpoint",
+        value=False,
+        help="Mostra os segmentos conforme saem, guarda os tempos num diário .segmentos.jsonl e retoma do último checkpoint após uma queda"
+    )
+    usar_vad = st.checkbox(
+        "🔇 Pular silêncio e música (VAD)",
+        value=False,
+        help="Detecta as regiões de fala antes do Whisper e transcreve só elas; os tempos são mapeados de volta ao áudio original"
+    )
+    with st.expander("🪜 Cascata de modelos"):
+        usar_cascata = st.checkbox(
+            "Refazer só os trechos incertos com um modelo maior",
+            value=False,
+            help="O modelo escolhido acima transcreve tudo; os segmentos com baixa confiança são retranscritos pelo "
+                 "modelo maior e encaixados no lugar (não se aplica às janelas com checkpoint nem ao modo em lote)"
+        )
+        modelos_maiores = MODELOS_WHISPER[MODELOS_WHISPER.index(modelo_whisper) + 1:] or [modelo_whisper]
+        modelo_cascata = st.selectbox("Modelo maior:", modelos_maiores, index=len(modelos_maiores) - 1)
+        limite_logprob = st.number_input(
+            "avg_logprob mínimo:", max_value=0.0, value=LIMITES_CASCATA_PADRAO["logprob"], step=0.1,
+            help="Segmentos abaixo disto são refeitos"
+        )
+        limite_compressao = st.number_input(
+            "compression_ratio máximo:", min_value=1.0, value=LIMITES_CASCATA_PADRAO["compressao"], step=0.1,
+            help="Valores altos indicam texto repetido (alucinação)"
+        )
+        limite_sem_fala = st.slider(
+            "no_speech_prob máximo:", min_value=0.0, max_value=1.0, value=LIMITES_CASCATA_PADRAO["sem_fala"], step=0.05
+        )
+
+    opcoes_transcricao = {
+        "idioma": "pt",
+        "pasta_cache": pasta_cache,
+        "em_janelas": transcricao_em_janelas,
+        "vad": usar_vad,
+    }
+    if usar_cascata and modelo_cascata != modelo_whisper:
+        opcoes_transcricao["cascata"] = modelo_cascata
+        opcoes_transcricao["limites_cascata"] = {
+            "logprob": limite_logprob, "compressao": limite_compressao, "sem_fala": limite_sem_fala
+        }
+
+    processos_transcricao = st.number_input(
+        "⚡ Processos de transcrição:",
+        min_value=0,
+        value=1,
+        help="1 = sequencial, 0 = automático (núcleos e RAM do modelo), N = número fixo de processos"
+    )
+
+    with st.expander("📦 Transcrição em lote"):
+        transcricao_em_lote = st.checkbox(
+            "Decodificar vários clipes curtos juntos",
+            value=False,
+            help="Empilha as janelas de 30 s de vários arquivos num só lote para o Whisper; "
+                 "clipes acima de 2 minutos, VAD e janelas com checkpoint seguem pelo caminho normal"
+        )
+        tamanho_lote_escolhido = st.number_input(
+            "Janelas por lote:",
+            min_value=0,
+            max_value=LOTE_MAXIMO,
+            value=0,
+            help="0 = automático (metade da memória livre da GPU ou da RAM)"
+        )
+    tamanho_lote = int(tamanho_lote_escolhido) if transcricao_em_lote else None
+
+    with st.expander("🔬 Perfilamento"):
+        item_perfilado = st.text_input(
+            "Perfilar o item:",
+            help="Parte do nome do arquivo; só esse item roda com o profiler (saída em .metricas/perfis)"
+        )
+        tipo_perfil = st.selectbox("Profiler:", [PERFIL_CPROFILE, PERFIL_TORCH])
+
+    with st.expander("🧵 Execução em segundo plano"):
+        st.caption("Os trabalhos rodam fora da página: recarregar o navegador não os interrompe.")
+        trabalhadores_fila = st.number_input(
+            "Trabalhos simultâneos:", min_value=1, max_value=16, value=TRABALHADORES_PADRAO,
+            help="Threads que pegam trabalhos da fila (uploads passam à frente dos canais)"
+        )
+        vagas_cpu = st.number_input("Vagas de CPU (ffmpeg, Whisper sem GPU):", min_value=1, value=VAGAS_PADRAO[RECURSO_CPU])
+        vagas_gpu = st.number_input("Vagas de GPU (Whisper):", min_value=1, value=VAGAS_PADRAO[RECURSO_GPU])
+        vagas_api = st.number_input(
+            "Vagas da API:", min_value=1, value=VAGAS_PADRAO[RECURSO_API],
+            help="Trabalhos transliterando ao mesmo tempo; os limites de taxa acima valem para todos juntos"
+        )
+
+    with st.expander("🧠 Modelos em memória"):
+        limite_atual_mb = int((registro.limite_bytes or 0) / (1024 * 1024))
+        limite_ram_mb = st.number_input(
+            "Limite de RAM para modelos (MB):",
+            min_value=0,
+            value=limite_atual_mb,
+            step=512,
+            help="Modelos menos usados são descarregados quando o limite é excedido (0 = sem limite)"
+        )
+        if limite_ram_mb != limite_atual_mb:
+            registro.definir_limite(limite_ram_mb * 1024 * 1024 or None)
+
+        modelos_residentes = registro.estatisticas()
+        if modelos_residentes:
+            for info in modelos_residentes:
+                st.write(
+                    f"• {info['modelo']} ({info['dispositivo']}/{info['precisao']}): "
+                    f"{info['mb_residentes']:.0f} MB, carregado em {info['tempo_carregamento']:.1f}s, "
+                    f"{info['usos']} uso(s)"
+                )
+        else:
+            st.write("Nenhum modelo carregado.")
+        if registro.despejados:
+            st.caption(f"Modelos descarregados por limite de RAM: {registro.despejados}")
+
 # Criar as pastas com os nomes configurados
 criar_pastas(pasta_transcritos, pasta_transliterados)
 
+motor = obter_motor(
+    int(concorrencia_api),
+    int(requisicoes_por_minuto),
+    int(tokens_por_minuto),
+    pasta_cache,
+    int(tokens_por_bloco),
+    int(sobreposicao_blocos)
+)
+
+executor = obter_executor(pasta_transcritos)
+if executor.trabalhadores != int(trabalhadores_fila):
+    executor.ajustar_trabalhadores(int(trabalhadores_fila))
+executor.vagas.definir({RECURSO_CPU: vagas_cpu, RECURSO_GPU: vagas_gpu, RECURSO_API: vagas_api})
+
+# Tudo o que o trabalho precisa vai junto com ele: a barra lateral pode mudar depois do envio
+parametros_trabalho = {
+    "pasta_transcritos": pasta_transcritos,
+    "pasta_transliterados": pasta_transliterados,
+    "modelo": modelo_whisper,
+    "processos": int(processos_transcricao),
+    "tamanho_lote": tamanho_lote,
+    "opcoes_transcricao": opcoes_transcricao,
+    "formato_audio": formato_audio,
+    "batch_api": usar_batch_api,
+    "motor": {
+        "concorrencia": int(concorrencia_api),
+        "rpm": int(requisicoes_por_minuto),
+        "tpm": int(tokens_por_minuto),
+        "pasta_cache": pasta_cache,
+        "limite_cache_bytes": int(limite_cache_mb) * 1024 * 1024 or None,
+        "tokens_por_bloco": int(tokens_por_bloco),
+        "sobreposicao": int(sobreposicao_blocos),
+    },
+    # Precisão, threads e perfilamento valem para o processo inteiro: o executor
+    # aplica os de cada trabalho quando ele começa
+    "inferencia": {
+        "precisao": precisao_whisper,
+        "threads": int(threads_whisper),
+        "guardar_int8": guardar_int8,
+    },
+    "perfil": {
+        "item": item_perfilado.strip() or None,
+        "tipo": tipo_perfil,
+    },
+}
+
 # Tabs principais
 tab1, tab2, tab3, tab4, tab5 = st.tabs(["🌐 Canal Completo", "🎬 Vídeo Único", "🎵 Upload de Áudio", "📁 Pasta de Vídeos", "📋 Resultados"])
 
@@ -365,22 +510,28 @@ with tab1:
         with col3:
             fazer_transliteracao = st.checkbox("🔄 Transliterar", value=True)
         
+        col1, col2 = st.columns(2)
+        with col1:
+            sincronizacao_incremental = st.checkbox(
+                "♻️ Baixar só vídeos novos",
+                value=True,
+                help="Guarda os IDs já baixados e mantém o áudio no formato original, sem converter para MP3"
+            )
+        with col2:
+            downloads_simultaneos = st.number_input("Downloads simultâneos:", min_value=1, max_value=16, value=4)
+        
         submitted_canal = st.form_submit_button("🚀 Processar Canal Completo", use_container_width=True)
 
     if submitted_canal and canal_url:
-        try:
-            if fazer_download:
-                baixar_audios_canal(canal_url, pasta_transcritos)
-            
-            if fazer_transcricao:
-                transcrever_audios(pasta_transcritos, modelo_whisper)
-            
-            if fazer_transliteracao:
-                executar_transliteracao(pasta_transcritos, pasta_transliterados)
-            
-            st.success("✅ Processo do canal completo finalizado!")
-        except Exception as e:
-            st.error(f"❌ Erro durante o processamento: {str(e)}")
+        enviar_trabalho(executor, "canal", {
+            **parametros_trabalho,
+            "url": canal_url,
+            "baixar": fazer_download,
+            "transcrever": fazer_transcricao,
+            "transliterar": fazer_transliteracao,
+            "incremental": sincronizacao_incremental,
+            "simultaneos": int(downloads_simultaneos),
+        }, f"Canal {canal_url}")
 
 # =========================
 # TAB 2: VÍDEO ÚNICO
@@ -405,19 +556,13 @@ with tab2:
         submitted_video = st.form_submit_button("🚀 Processar Vídeo", use_container_width=True)
 
     if submitted_video and video_url:
-        try:
-            if fazer_download_video:
-                baixar_video_unico(video_url, pasta_transcritos)
-            
-            if fazer_transcricao_video:
-                transcrever_audios(pasta_transcritos, modelo_whisper)
-            
-            if fazer_transliteracao_video:
-                executar_transliteracao(pasta_transcritos, pasta_transliterados)
-            
-            st.success("✅ Processamento do vídeo finalizado!")
-        except Exception as e:
-            st.error(f"❌ Erro durante o processamento: {str(e)}")
+        enviar_trabalho(executor, "video", {
+            **parametros_trabalho,
+            "url": video_url,
+            "baixar": fazer_download_video,
+            "transcrever": fazer_transcricao_video,
+            "transliterar": fazer_transliteracao_video,
+        }, f"Vídeo {video_url}")
 
 # =========================
 # TAB 3: UPLOAD DE ÁUDIO
@@ -425,10 +570,11 @@ with tab2:
 with tab3:
     st.header("🎵 Upload e Processamento de Áudio")
     
+    formatos_upload = sorted({ext.lstrip(".") for ext in EXTENSOES_AUDIO + EXTENSOES_VIDEO} - {"npy"})
     uploaded_file = st.file_uploader(
-        "Escolha um arquivo de áudio",
-        type=['mp3', 'wav', 'm4a', 'flac', 'ogg'],
-        help="Formatos suportados: MP3, WAV, M4A, FLAC, OGG"
+        "Escolha um arquivo de áudio ou vídeo",
+        type=formatos_upload,
+        help=f"Formatos suportados: {', '.join(ext.upper() for ext in formatos_upload)}"
     )
     
     if uploaded_file is not None:
@@ -442,49 +588,15 @@ with tab3:
             )
         
         if st.button("🚀 Processar Áudio Carregado", use_container_width=True):
-            try:
-                # Salvar arquivo temporário
-                caminho_temp = salvar_audio_temporario(uploaded_file)
-                
-                # Transcrever
-                with st.spinner("🔊 Transcrevendo áudio..."):
-                    transcricao = transcrever_audio_unico(caminho_temp, modelo_whisper)
-                
-                # Salvar transcrição
-                nome_transcricao = f"{nome_arquivo}.txt"
-                caminho_transcricao = os.path.join(pasta_transcritos, nome_transcricao)
-                
-                with open(caminho_transcricao, "w", encoding="utf-8") as f:
-                    f.write(transcricao)
-                
-                st.success("✅ Transcrição salva!")
-                
-                # Mostrar prévia da transcrição
-                with st.expander("👀 Prévia da Transcrição"):
-                    st.text_area("Transcrição:", transcricao, height=200, disabled=True)
-                
-                # Transliterar
-                with st.spinner("🔄 Transliterando..."):
-                    transliteracao = transliterar_transcricao(transcricao)
-                
-                # Salvar transliteração
-                nome_transliteracao = f"{nome_arquivo}-Transliterado.txt"
-                caminho_transliteracao = os.path.join(pasta_transliterados, nome_transliteracao)
-                
-                with open(caminho_transliteracao, "w", encoding="utf-8") as f:
-                    f.write(transliteracao)
-                
-                st.success("✅ Transliteração concluída!")
-                
-                # Mostrar resultado final
-                with st.expander("📄 Resultado da Transliteração"):
-                    st.text_area("Transliteração:", transliteracao, height=400, disabled=True)
-                
-                # Limpar arquivo temporário
-                os.unlink(caminho_temp)
-                
-            except Exception as e:
-                st.error(f"❌ Erro durante o processamento: {str(e)}")
+            # O arquivo fica guardado até o trabalho terminar, para que uma repetição o encontre
+            pasta_upload = pasta_envio(pasta_transcritos)
+            caminho_upload = salvar_upload(uploaded_file, pasta_upload, nome_arquivo)
+            enviar_trabalho(executor, "upload", {
+                **parametros_trabalho,
+                "arquivo": caminho_upload,
+                "pasta_envio": pasta_upload,
+                "nome": nome_arquivo,
+            }, f"Upload {uploaded_file.name}")
 
 # =========================
 # TAB 4: PASTA DE VÍDEOS
@@ -534,21 +646,41 @@ with tab4:
         if not os.path.exists(pasta_videos):
             st.error("❌ Pasta não encontrada. Verifique o caminho.")
         else:
-            try:
-                videos_para_processar = None
-                if not processar_todos and 'videos_selecionados' in locals():
-                    videos_para_processar = videos_selecionados
-                
-                processar_videos_pasta(
-                    pasta_videos, 
-                    pasta_transcritos, 
-                    pasta_transliterados, 
-                    modelo_whisper,
-                    videos_para_processar
-                )
-                
-            except Exception as e:
-                st.error(f"❌ Erro durante o processamento: {str(e)}")
+            videos_para_processar = None
+            if not processar_todos and 'videos_selecionados' in locals():
+                videos_para_processar = videos_selecionados
+            
+            enviar_trabalho(executor, "pasta", {
+                **parametros_trabalho,
+                "pasta_videos": pasta_videos,
+                "videos": videos_para_processar,
+            }, f"Pasta {pasta_videos}")
+    
+    st.subheader("👁️ Modo vigia")
+    st.caption("Observa a pasta e processa cada vídeo novo assim que o gravador termina de escrevê-lo.")
+    col1, col2 = st.columns(2)
+    with col1:
+        estabilidade_vigia = st.number_input(
+            "Segundos sem alteração para considerar o arquivo completo:", min_value=0.5, value=2.0, step=0.5
+        )
+    with col2:
+        polling_vigia = st.checkbox(
+            "Usar varredura periódica (pastas de rede)", value=False,
+            help="Compartilhamentos SMB/NFS não geram eventos do sistema de arquivos"
+        )
+    
+    # O vigia é um trabalho que só termina quando é parado no painel de trabalhos
+    if st.button("▶️ Iniciar vigia", use_container_width=True):
+        if not pasta_videos or not os.path.exists(pasta_videos):
+            st.error("❌ Pasta não encontrada. Verifique o caminho.")
+        else:
+            enviar_trabalho(executor, "vigiar", {
+                **parametros_trabalho,
+                "vigiar": True,
+                "pasta_videos": pasta_videos,
+                "estabilidade": estabilidade_vigia,
+                "polling": polling_vigia,
+            }, f"Vigia {pasta_videos}")
     
     # Seção de ajuda
     with st.expander("❓ Ajuda - Formatos de vídeo suportados"):
@@ -581,14 +713,49 @@ with tab5:
     with col1:
         st.subheader("📁 Estatísticas")
         
-        # Contar arquivos
-        transcritos_count = len([f for f in os.listdir(pasta_transcritos) if f.endswith('.txt')]) if os.path.exists(pasta_transcritos) else 0
-        transliterados_count = len([f for f in os.listdir(pasta_transliterados) if f.endswith('.txt')]) if os.path.exists(pasta_transliterados) else 0
-        audios_count = len([f for f in os.listdir(pasta_transcritos) if f.endswith('.mp3')]) if os.path.exists(pasta_transcritos) else 0
+        # Contagens vêm do registro de tarefas (consulta indexada, sem varrer as pastas)
+        registro_tarefas = obter_registro(pasta_transcritos)
+        tarefas_transcricao = registro_tarefas.contar(ETAPA_TRANSCRICAO)
+        tarefas_transliteracao = registro_tarefas.contar(ETAPA_TRANSLITERACAO)
+        audios_count = len(listar_audios(pasta_transcritos))
         
         st.metric("🎵 Áudios baixados", audios_count)
-        st.metric("📄 Arquivos transcritos", transcritos_count)
-        st.metric("🔄 Arquivos transliterados", transliterados_count)
+        st.metric(
+            "📄 Arquivos transcritos", tarefas_transcricao[STATUS_CONCLUIDA],
+            help=f"{tarefas_transcricao[STATUS_EM_ANDAMENTO]} em andamento, {tarefas_transcricao[STATUS_FALHOU]} com falha"
+        )
+        st.metric(
+            "🔄 Arquivos transliterados", tarefas_transliteracao[STATUS_CONCLUIDA],
+            help=f"{tarefas_transliteracao[STATUS_EM_ANDAMENTO]} em andamento, {tarefas_transliteracao[STATUS_FALHOU]} com falha"
+        )
+        totais_documentos = obter_indice(pasta_transliterados).totais()
+        st.metric(
+            "📝 Palavras transliteradas", f"{totais_documentos['palavras']:,}".replace(",", "."),
+            help=f"{totais_documentos['bytes'] / (1024 * 1024):.1f} MB em {totais_documentos['documentos']} documento(s)"
+        )
+        
+        falhas = registro_tarefas.listar(ETAPA_TRANSCRICAO, STATUS_FALHOU) + \
+            registro_tarefas.listar(ETAPA_TRANSLITERACAO, STATUS_FALHOU)
+        if falhas:
+            with st.expander(f"⚠️ {len(falhas)} tarefa(s) com falha"):
+                for item, _, tentativas, _, erro in falhas:
+                    st.write(f"❌ {item} ({tentativas} tentativa(s)): {erro}")
+        
+        if pasta_cache:
+            estatisticas_cache = obter_cache(pasta_cache).estatisticas()
+            cache_transcricao = estatisticas_cache[TIPO_TRANSCRICAO]
+            cache_transliteracao = estatisticas_cache[TIPO_TRANSLITERACAO]
+            st.metric(
+                "♻️ Cache de transcrições (acertos/faltas)",
+                f"{cache_transcricao['acertos']}/{cache_transcricao['faltas']}",
+                help=f"{cache_transcricao['custo_economizado'] / 60:.1f} minutos de Whisper economizados"
+            )
+            st.metric(
+                "♻️ Cache de transliterações (acertos/faltas)",
+                f"{cache_transliteracao['acertos']}/{cache_transliteracao['faltas']}",
+                help=f"{int(cache_transliteracao['custo_economizado'])} tokens da API economizados"
+            )
+            st.caption(f"Cache: {estatisticas_cache['entradas']} entradas, {estatisticas_cache['bytes'] / (1024 * 1024):.1f} MB")
     
     with col2:
         st.subheader("🛠️ Ações")
@@ -596,6 +763,14 @@ with tab5:
         if st.button("🔄 Atualizar estatísticas"):
             st.rerun()
         
+        if st.button("🔁 Tentar novamente as falhas"):
+            obter_registro(pasta_transcritos).reiniciar_falhas()
+            st.rerun()
+        
+        if st.button("📥 Importar transcrições da pasta"):
+            importadas = importar_transcricoes_existentes(pasta_transcritos)
+            st.success(f"✅ {importadas} transcrição(ões) registrada(s)")
+        
         if st.button("🗂️ Abrir pasta de transcritos"):
             if os.path.exists(pasta_transcritos):
                 os.startfile(pasta_transcritos)  # Windows
@@ -604,5 +779,41 @@ with tab5:
             if os.path.exists(pasta_transliterados):
                 os.startfile(pasta_transliterados)  # Windows
     
+    andamento_lote = resumo_lote(pasta_transcritos)
+    if andamento_lote:
+        with st.expander("📦 Lote da Batch API em andamento", expanded=True):
+            contagem = ", ".join(f"{status}: {quantidade}" for status, quantidade in andamento_lote["itens"].items())
+            st.write(f"Fase: {andamento_lote['fase']} — {contagem}")
+            for lote in andamento_lote["lotes"]:
+                st.write(f"• {lote['id'] or 'não enviado'}: {lote['status'] or '-'}, "
+                         f"{lote['concluidas'] or 0}/{lote['total'] or '?'} requisição(ões)")
+            col1, col2 = st.columns(2)
+            with col1:
+                if st.button("📥 Consultar e ingerir resultados"):
+                    enviar_trabalho(executor, "transliterar", {**parametros_trabalho, "batch_api": True}, "Batch API: consultar lote")
+            with col2:
+                if st.button("🛑 Cancelar lote"):
+                    enviar_trabalho(executor, "cancelar_lote", parametros_trabalho, "Batch API: cancelar lote")
+    
+    with st.expander("📈 Métricas por etapa"):
+        agregador = obter_agregador()
+        resumo_metricas = agregador.resumo()
+        if not resumo_metricas:
+            st.info("ℹ️ Nenhum evento registrado ainda.")
+        else:
+            st.dataframe(
+                [{"etapa": etapa, **dados} for etapa, dados in resumo_metricas.items()],
+                use_container_width=True
+            )
+            st.download_button("⬇️ Exportar (Prometheus)", agregador.prometheus(), file_name="pipeline.prom")
+    
+    mostrar_busca(pasta_transcritos, pasta_transliterados)
+    
     # Mostrar arquivos transliterados
-    mostrar_arquivos_transliterados(pasta_transliterados)
\ No newline at end of file
+    mostrar_arquivos_transliterados(pasta_transliterados)
+# =========================
+# TRABALHOS EM SEGUNDO PLANO
+# =========================
+st.divider()
+st.header("🧵 Trabalhos")
+painel_trabalhos(executor)
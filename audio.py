@@ -0,0 +1,106 @@
+import os
+import subprocess
+import threading
+from pathlib import Path
+
+from metricas import medir
+
+# =========================
+# EXTRAÇÃO DE ÁUDIO
+# =========================
+
+# O Whisper sempre trabalha com PCM mono float32 a 16 kHz
+TAXA_AMOSTRAGEM = 16000
+
+FORMATO_MP3 = "mp3"
+FORMATO_NPY = "npy"
+FORMATO_MEMORIA = "memoria"
+
+TAMANHO_LEITURA = 1024 * 1024
+
+
+def decodificar_pcm(caminho: str):
+    """Decodifica qualquer mídia para PCM mono float32 16 kHz direto num array NumPy"""
+    import numpy as np
+
+    processo = subprocess.Popen([
+        'ffmpeg', '-nostdin', '-nostats', '-loglevel', 'error', '-threads', '0', '-i', caminho,
+        '-vn', '-f', 'f32le', '-ac', '1', '-ar', str(TAXA_AMOSTRAGEM), '-'
+    ], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    # O stderr é esvaziado em paralelo: se o buffer do pipe enchesse, o ffmpeg travaria
+    # escrevendo nele enquanto nós esperamos o stdout
+    erros = []
+    leitor_erros = threading.Thread(target=lambda: erros.append(processo.stderr.read()), daemon=True)
+    leitor_erros.start()
+
+    # bytearray permite que o NumPy use o buffer sem cópia e continue gravável
+    buffer = bytearray()
+    while True:
+        bloco = processo.stdout.read(TAMANHO_LEITURA)
+        if not bloco:
+            break
+        buffer += bloco
+    retorno = processo.wait()
+    leitor_erros.join()
+    if retorno != 0:
+        raise subprocess.CalledProcessError(retorno, 'ffmpeg', stderr=b"".join(erros))
+
+    return np.frombuffer(buffer, dtype=np.float32)
+
+
+def carregar_audio(caminho: str):
+    """Abre um .npy com mapeamento em memória; outros formatos seguem como caminho"""
+    if str(caminho).endswith(".npy"):
+        import numpy as np
+        # "c" = copy-on-write: lê sob demanda e o array continua gravável para o torch
+        return np.load(caminho, mmap_mode="c")
+    return str(caminho)
+
+
+def carregar_pcm(audio):
+    """Garante um array PCM 16 kHz a partir de um caminho (qualquer formato) ou array"""
+    if not isinstance(audio, (str, os.PathLike)):
+        return audio
+    if str(audio).endswith(".npy"):
+        return carregar_audio(str(audio))
+    return decodificar_pcm(str(audio))
+
+
+def extrair_audio(caminho_video: str, pasta_destino: str, formato: str = FORMATO_MP3):
+    """Extrai o áudio de um vídeo com ffmpeg, levantando exceção em caso de erro
+
+    - mp3: arquivo MP3 192 kbps (formato original, bom para ouvir depois)
+    - npy: PCM 16 kHz mono já no formato do Whisper, sem recodificação com perdas
+    - memoria: devolve o array PCM sem gravar nada em disco
+    """
+    if formato == FORMATO_MEMORIA:
+        with medir("extracao", arquivo=os.path.basename(caminho_video), formato=formato) as campos:
+            audio = decodificar_pcm(caminho_video)
+            campos["segundos_audio"] = len(audio) / TAXA_AMOSTRAGEM
+        return audio
+
+    nome_arquivo = Path(caminho_video).stem
+    caminho_audio = os.path.join(pasta_destino, f"{nome_arquivo}.{formato}")
+
+    # Se o áudio já existe, pular
+    if os.path.exists(caminho_audio):
+        return caminho_audio
+
+    with medir("extracao", arquivo=os.path.basename(caminho_video), formato=formato) as campos:
+        if formato == FORMATO_NPY:
+            import numpy as np
+            audio = decodificar_pcm(caminho_video)
+            campos["segundos_audio"] = len(audio) / TAXA_AMOSTRAGEM
+            temporario = f"{caminho_audio}.tmp.npy"
+            np.save(temporario, audio)
+            os.replace(temporario, caminho_audio)
+        else:
+            subprocess.run([
+                'ffmpeg', '-i', caminho_video,
+                '-vn', '-acodec', 'mp3', '-ab', '192k',
+                '-ar', '44100', '-y', caminho_audio
+            ], check=True, capture_output=True)
+        campos["bytes"] = os.path.getsize(caminho_audio)
+
+    return caminho_audio
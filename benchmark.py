@@ -0,0 +1,662 @@
+import argparse
+import email.parser
+import email.policy
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from audio import extrair_audio, FORMATO_MP3, FORMATO_NPY, FORMATO_MEMORIA
+from pipeline import MODELOS_WHISPER, PROMPT_TEMPLATE, MODELO_GPT
+from transcricao import duracao_audio
+
+# =========================
+# BENCHMARK DO PIPELINE
+# =========================
+# Roda offline e de forma reproduzível: os vídeos de teste são gerados com o
+# ffmpeg (lavfi) e a API da OpenAI é substituída por um servidor local
+# compatível com latência configurável. O resultado é um JSON que pode ser
+# comparado com o de outra execução (--comparar).
+#
+#   python benchmark.py --duracoes 30 300 --modelos tiny base --saida hoje.json
+#   python benchmark.py --modelos tiny --comparar hoje.json
+#   python benchmark.py --modelos tiny small --clipes 64 --duracao-clipe 8 --palavras
+#   python benchmark.py --modelos medium --int8 --audios /gravacoes --formatos mp3 --palavras
+#   python benchmark.py --modelos --palavras 1500 --batch-api 20
+#   python benchmark.py --modelos --palavras 1500 15000 --tokens-por-segundo 80 --fluxo
+
+TEXTO_FALSO = (
+    "Este é um texto gerado pelo servidor de teste para simular a resposta do modelo "
+    "com tamanho parecido com o de uma documentação real. "
+)
+
+
+# ----- medições -----
+
+def percentil(valores, p: float):
+    """Percentil por interpolação linear (p entre 0 e 100)"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicao = (len(ordenados) - 1) * p / 100
+    base = int(posicao)
+    proximo = min(base + 1, len(ordenados) - 1)
+    return ordenados[base] + (ordenados[proximo] - ordenados[base]) * (posicao - base)
+
+
+def pico_memoria_mb():
+    """Pico de memória residente deste processo e dos filhos (ffmpeg), em MB"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: sem getrusage
+        return None
+    # Linux informa em KB, macOS em bytes
+    escala = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "processo": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / escala,
+        "filhos": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / escala,
+    }
+
+
+def resumir(tempos, duracoes_audio=None):
+    """p50/p95/média de uma etapa; com as durações dos áudios calcula RTF e arquivos/hora"""
+    resumo = {
+        "amostras": len(tempos),
+        "p50_s": percentil(tempos, 50),
+        "p95_s": percentil(tempos, 95),
+        "media_s": sum(tempos) / len(tempos) if tempos else None,
+        "arquivos_por_hora": 3600 * len(tempos) / sum(tempos) if tempos and sum(tempos) else None,
+    }
+    if duracoes_audio:
+        # RTF < 1 = mais rápido que o tempo real
+        resumo["rtf"] = sum(tempos) / sum(duracoes_audio)
+    return resumo
+
+
+def taxa_erro_palavras(referencia: str, hipotese: str):
+    """WER: (substituições + inserções + remoções) / palavras da referência, sem caixa e pontuação"""
+    def palavras(texto):
+        return "".join(c if c.isalnum() or c.isspace() else " " for c in texto.lower()).split()
+
+    ref, hip = palavras(referencia), palavras(hipotese)
+    if not ref:
+        return 0.0 if not hip else 1.0
+    anterior = list(range(len(hip) + 1))
+    for i, palavra in enumerate(ref, 1):
+        atual = [i] + [0] * len(hip)
+        for j, outra in enumerate(hip, 1):
+            atual[j] = min(anterior[j] + 1, atual[j - 1] + 1, anterior[j - 1] + (palavra != outra))
+        anterior = atual
+    return anterior[-1] / len(ref)
+
+
+# ----- fixtures -----
+
+def gerar_video(pasta: str, duracao: float):
+    """Vídeo de teste (barras de cor + tom com ruído) com a duração pedida, reaproveitado entre execuções"""
+    caminho = os.path.join(pasta, f"fixture-{int(duracao)}s.mp4")
+    if os.path.exists(caminho):
+        return caminho
+    subprocess.run([
+        'ffmpeg', '-y', '-nostdin',
+        '-f', 'lavfi', '-i', f'testsrc=size=320x240:rate=15:duration={duracao}',
+        '-f', 'lavfi', '-i', f'sine=frequency=220:sample_rate=44100:duration={duracao}',
+        '-f', 'lavfi', '-i', f'anoisesrc=color=pink:amplitude=0.05:sample_rate=44100:duration={duracao}',
+        '-filter_complex', '[1:a][2:a]amix=inputs=2[a]', '-map', '0:v', '-map', '[a]',
+        '-c:v', 'libx264', '-preset', 'ultrafast', '-c:a', 'aac', '-shortest', caminho
+    ], check=True, capture_output=True)
+    return caminho
+
+
+def gerar_transcricao(palavras: int, semente: int = 0):
+    """Texto falso com o tamanho aproximado de uma transcrição"""
+    gerador = random.Random(semente)
+    vocabulario = TEXTO_FALSO.split()
+    return " ".join(gerador.choice(vocabulario) for _ in range(palavras))
+
+
+# ----- servidor falso da OpenAI -----
+
+class ServidorFalso:
+    """Servidor HTTP local que responde /v1/chat/completions no formato da OpenAI
+
+    Também imita /v1/files e /v1/batches: o lote é processado numa thread,
+    requisição por requisição, com a mesma latência das chamadas síncronas.
+    """
+
+    def __init__(self, latencia: float = 0.5, jitter: float = 0.1, tokens_por_segundo: float = 0.0, semente: int = 0):
+        self.latencia = latencia
+        self.jitter = jitter
+        self.tokens_por_segundo = tokens_por_segundo
+        self.chamadas = 0
+        self.arquivos = {}
+        self.lotes = {}
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self._servidor = None
+
+    def _gerar(self, corpo: dict):
+        """Texto, usage e latência até o primeiro token de uma resposta"""
+        prompt = "".join(m.get("content", "") for m in corpo.get("messages", []))
+        tokens_entrada = max(1, len(prompt) // 4)
+        tokens_saida = max(1, tokens_entrada // 2)
+        with self._lock:
+            self.chamadas += 1
+            numero = self.chamadas
+            espera = self.latencia + self._aleatorio.uniform(0, self.jitter)
+        conteudo = (TEXTO_FALSO * (tokens_saida * 4 // len(TEXTO_FALSO) + 1))[:tokens_saida * 4]
+        usage = {"prompt_tokens": tokens_entrada, "completion_tokens": tokens_saida,
+                 "total_tokens": tokens_entrada + tokens_saida}
+        return f"chatcmpl-teste-{numero}", conteudo, usage, espera
+
+    def _responder(self, corpo: dict):
+        identificador, conteudo, usage, espera = self._gerar(corpo)
+        if self.tokens_por_segundo:
+            espera += usage["completion_tokens"] / self.tokens_por_segundo
+        time.sleep(espera)
+        return {
+            "id": identificador,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": corpo.get("model", MODELO_GPT),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": conteudo}, "finish_reason": "stop"}],
+            "usage": usage,
+        }
+
+    def _responder_em_fluxo(self, corpo: dict):
+        """A mesma resposta em Server-Sent Events; a latência fixa vira o tempo até o primeiro token"""
+        identificador, conteudo, usage, espera = self._gerar(corpo)
+        time.sleep(espera)
+        base = {"id": identificador, "object": "chat.completion.chunk", "created": int(time.time()),
+                "model": corpo.get("model", MODELO_GPT)}
+
+        def evento(dados):
+            return f"data: {json.dumps({**base, **dados})}\n\n".encode("utf-8")
+
+        # Pedaços de ~4 tokens, no ritmo de tokens_por_segundo
+        for inicio in range(0, len(conteudo), 16):
+            if self.tokens_por_segundo:
+                time.sleep(4 / self.tokens_por_segundo)
+            yield evento({"choices": [{"index": 0, "delta": {"content": conteudo[inicio:inicio + 16]},
+                                       "finish_reason": None}]})
+        yield evento({"choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+        if (corpo.get("stream_options") or {}).get("include_usage"):
+            yield evento({"choices": [], "usage": usage})
+        yield b"data: [DONE]\n\n"
+
+    # ----- Files e Batch API -----
+
+    def _guardar_arquivo(self, conteudo: bytes, nome: str, finalidade: str):
+        with self._lock:
+            identificador = f"file-teste-{len(self.arquivos) + 1}"
+            self.arquivos[identificador] = conteudo
+        return {"id": identificador, "object": "file", "bytes": len(conteudo), "created_at": int(time.time()),
+                "filename": nome, "purpose": finalidade, "status": "processed"}
+
+    def _receber_arquivo(self, tipo_conteudo: str, dados: bytes):
+        """Upload multipart do files.create"""
+        mensagem = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+            f"Content-Type: {tipo_conteudo}\r\n\r\n".encode("latin-1") + dados
+        )
+        campos, conteudo, nome = {}, b"", "arquivo.jsonl"
+        for parte in mensagem.iter_parts():
+            if parte.get_param("name", header="content-disposition") == "file":
+                conteudo = parte.get_payload(decode=True)
+                nome = parte.get_filename() or nome
+            else:
+                campos[parte.get_param("name", header="content-disposition")] = parte.get_payload(decode=True).decode()
+        return self._guardar_arquivo(conteudo, nome, campos.get("purpose", "batch"))
+
+    def _criar_lote(self, corpo: dict):
+        linhas = [json.loads(linha) for linha in self.arquivos[corpo["input_file_id"]].decode("utf-8").splitlines() if linha]
+        with self._lock:
+            identificador = f"batch_teste_{len(self.lotes) + 1}"
+            lote = self.lotes[identificador] = {
+                "id": identificador, "object": "batch", "endpoint": corpo["endpoint"], "errors": None,
+                "input_file_id": corpo["input_file_id"], "completion_window": corpo["completion_window"],
+                "status": "in_progress", "output_file_id": None, "error_file_id": None,
+                "created_at": int(time.time()), "metadata": corpo.get("metadata"),
+                "request_counts": {"total": len(linhas), "completed": 0, "failed": 0},
+            }
+        threading.Thread(target=self._processar_lote, args=(lote, linhas), daemon=True).start()
+        return lote
+
+    def _processar_lote(self, lote: dict, linhas):
+        saida = []
+        for linha in linhas:
+            if lote["status"] == "cancelling":
+                break
+            resposta = self._responder(linha["body"])
+            saida.append(json.dumps({
+                "id": f"batch_req_{len(saida) + 1}", "custom_id": linha["custom_id"], "error": None,
+                "response": {"status_code": 200, "request_id": resposta["id"], "body": resposta},
+            }))
+            lote["request_counts"]["completed"] += 1
+        if saida:
+            lote["output_file_id"] = self._guardar_arquivo(
+                ("\n".join(saida) + "\n").encode("utf-8"), f"{lote['id']}_output.jsonl", "batch_output"
+            )["id"]
+        lote["status"] = "cancelled" if lote["status"] == "cancelling" else "completed"
+
+    def _rota(self, metodo: str, caminho: str, tipo_conteudo: str, dados: bytes):
+        """(status, corpo) para uma requisição; corpo bytes é devolvido como arquivo e um gerador, como stream"""
+        partes = caminho.split("?")[0].rstrip("/").split("/")[2:]
+        if metodo == "POST" and partes == ["files"]:
+            return 200, self._receber_arquivo(tipo_conteudo, dados)
+        if metodo == "GET" and len(partes) == 3 and partes[0] == "files" and partes[2] == "content":
+            return 200, self.arquivos[partes[1]]
+        if metodo == "POST" and partes == ["batches"]:
+            return 200, self._criar_lote(json.loads(dados))
+        if metodo == "GET" and partes == ["batches"]:
+            return 200, {"object": "list", "data": list(reversed(self.lotes.values())), "has_more": False}
+        if metodo == "GET" and len(partes) == 2 and partes[0] == "batches":
+            return 200, self.lotes[partes[1]]
+        if metodo == "POST" and len(partes) == 3 and partes[0] == "batches" and partes[2] == "cancel":
+            lote = self.lotes[partes[1]]
+            if lote["status"] == "in_progress":
+                lote["status"] = "cancelling"
+            return 200, lote
+        corpo = json.loads(dados or b"{}")
+        if corpo.get("stream"):
+            return 200, self._responder_em_fluxo(corpo)
+        return 200, self._responder(corpo)
+
+    def iniciar(self):
+        servidor_falso = self
+
+        class Manipulador(BaseHTTPRequestHandler):
+            def _atender(self, metodo: str):
+                tamanho = int(self.headers.get("Content-Length", 0))
+                dados = self.rfile.read(tamanho)
+                try:
+                    status, corpo = servidor_falso._rota(metodo, self.path, self.headers.get("Content-Type", ""), dados)
+                except KeyError:
+                    status, corpo = 404, {"error": {"message": "não encontrado", "type": "invalid_request_error"}}
+                if not isinstance(corpo, (bytes, dict)):
+                    # HTTP/1.0: o fim do stream é o fechamento da conexão
+                    self.send_response(status)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.end_headers()
+                    for pedaco in corpo:
+                        self.wfile.write(pedaco)
+                        self.wfile.flush()
+                    return
+                if isinstance(corpo, bytes):
+                    resposta, tipo = corpo, "application/octet-stream"
+                else:
+                    resposta, tipo = json.dumps(corpo).encode("utf-8"), "application/json"
+                self.send_response(status)
+                self.send_header("Content-Type", tipo)
+                self.send_header("Content-Length", str(len(resposta)))
+                self.end_headers()
+                self.wfile.write(resposta)
+
+            def do_POST(self):
+                self._atender("POST")
+
+            def do_GET(self):
+                self._atender("GET")
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manipulador)
+        threading.Thread(target=self._servidor.serve_forever, name="openai-falso", daemon=True).start()
+        return f"http://127.0.0.1:{self._servidor.server_address[1]}/v1"
+
+    def parar(self):
+        if self._servidor is not None:
+            self._servidor.shutdown()
+
+
+# ----- etapas -----
+
+def medir_extracao(videos, formatos, repeticoes: int):
+    resultados = {}
+    for formato in formatos:
+        tempos, duracoes = [], []
+        for _ in range(repeticoes):
+            for video, duracao in videos:
+                # Pasta nova a cada vez: extrair_audio pula arquivos que já existem
+                with tempfile.TemporaryDirectory() as destino:
+                    inicio = time.perf_counter()
+                    extrair_audio(video, destino, formato)
+                    tempos.append(time.perf_counter() - inicio)
+                duracoes.append(duracao)
+        resultados[formato] = resumir(tempos, duracoes)
+    return resultados
+
+
+def medir_transcricao(videos, modelos, repeticoes: int, idioma: str):
+    from modelos import obter_modelo
+    from transcricao import transcrever_texto
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        # Todos os modelos recebem o mesmo PCM já decodificado, então só o Whisper é medido
+        audios = [(extrair_audio(video, pasta, FORMATO_NPY), duracao) for video, duracao in videos]
+        for modelo in modelos:
+            entrada = obter_modelo(modelo)
+            tempos, duracoes = [], []
+            for _ in range(repeticoes):
+                for audio, duracao in audios:
+                    inicio = time.perf_counter()
+                    transcrever_texto(audio, modelo, idioma)
+                    tempos.append(time.perf_counter() - inicio)
+                    duracoes.append(duracao)
+            resultados[modelo] = {
+                **resumir(tempos, duracoes),
+                "carregamento_s": entrada.tempo_carregamento,
+                "memoria_modelo_mb": entrada.bytes_residentes / (1024 * 1024),
+                "pico_memoria_mb": pico_memoria_mb(),
+            }
+    return resultados
+
+
+def medir_lote(video: str, clipes: int, modelos, tamanho_lote: int, idioma: str):
+    """Mesmos clipes curtos transcritos um a um e em lote entre arquivos"""
+    from modelos import obter_modelo
+    from transcricao import transcrever_arquivo
+    from transcricao_lote import transcrever_em_lote, tamanho_lote_automatico
+
+    resultados = {}
+    with tempfile.TemporaryDirectory() as pasta:
+        origem = extrair_audio(video, pasta, FORMATO_NPY)
+        audios = []
+        for i in range(clipes):
+            destino = os.path.join(pasta, f"clipe-{i:04d}.npy")
+            shutil.copyfile(origem, destino)
+            audios.append(destino)
+
+        for modelo in modelos:
+            entrada = obter_modelo(modelo)
+            lote = tamanho_lote or tamanho_lote_automatico(modelo, str(entrada.model.device))
+
+            inicio = time.perf_counter()
+            for audio in audios:
+                transcrever_arquivo(audio, audio.replace(".npy", ".sequencial.txt"), modelo, idioma)
+            sequencial = time.perf_counter() - inicio
+
+            inicio = time.perf_counter()
+            for _ in transcrever_em_lote([(a, a.replace(".npy", ".lote.txt")) for a in audios], modelo, idioma,
+                                         tamanho_lote=lote):
+                pass
+            em_lote = time.perf_counter() - inicio
+
+            resultados[modelo] = {
+                "clipes": clipes,
+                "tamanho_lote": lote,
+                "sequencial_s": sequencial,
+                "lote_s": em_lote,
+                "arquivos_por_hora_sequencial": 3600 * clipes / sequencial,
+                "arquivos_por_hora_lote": 3600 * clipes / em_lote,
+                "aceleracao": sequencial / em_lote,
+                "pico_memoria_mb": pico_memoria_mb(),
+            }
+    return resultados
+
+
+def medir_precisoes(audios, modelos, idioma: str, threads: int = 0):
+    """Compara o Whisper int8 com o fp32 na CPU: RTF, carregamento, memória e WER tomando o fp32 como referência
+
+    `audios` são pares (caminho, duração). Nos vídeos sintéticos não há fala, então
+    para um WER significativo use gravações reais (--audios).
+    """
+    from modelos import obter_modelo, registro, configurar_inferencia, PRECISAO_FP32, PRECISAO_INT8
+    from audio import carregar_pcm
+
+    configurar_inferencia(threads=threads)
+    pcms = [(carregar_pcm(audio), duracao) for audio, duracao in audios]
+    resultados = {}
+    for modelo in modelos:
+        textos = {}
+        for precisao in (PRECISAO_FP32, PRECISAO_INT8):
+            entrada = obter_modelo(modelo, "cpu", precisao)
+            tempos, duracoes, textos[precisao] = [], [], []
+            for pcm, duracao in pcms:
+                inicio = time.perf_counter()
+                textos[precisao].append(entrada.model.transcribe(pcm, language=idioma, fp16=False)["text"])
+                tempos.append(time.perf_counter() - inicio)
+                duracoes.append(duracao)
+            resultados.setdefault(modelo, {})[precisao] = {
+                **resumir(tempos, duracoes),
+                "carregamento_s": entrada.tempo_carregamento,
+                "memoria_modelo_mb": entrada.bytes_residentes / (1024 * 1024),
+            }
+            # Um modelo por vez na memória, como numa máquina sem folga de RAM
+            registro.limpar()
+
+        fp32, int8 = resultados[modelo][PRECISAO_FP32], resultados[modelo][PRECISAO_INT8]
+        resultados[modelo]["wer_int8_vs_fp32"] = taxa_erro_palavras(
+            " ".join(textos[PRECISAO_FP32]), " ".join(textos[PRECISAO_INT8])
+        )
+        resultados[modelo]["aceleracao_int8"] = fp32["rtf"] / int8["rtf"] if int8["rtf"] else None
+        resultados[modelo]["pico_memoria_mb"] = pico_memoria_mb()
+    return resultados
+
+
+def medir_transliteracao(palavras, repeticoes: int, latencia: float, jitter: float, tokens_por_segundo: float,
+                         concorrencia: int, tokens_por_bloco: int, fluxo: bool = False):
+    from openai import OpenAI
+    from transliteracao import MotorTransliteracao
+
+    servidor = ServidorFalso(latencia, jitter, tokens_por_segundo)
+    url = servidor.iniciar()
+    try:
+        motor = MotorTransliteracao(
+            OpenAI(base_url=url, api_key="benchmark"), PROMPT_TEMPLATE, modelo=MODELO_GPT,
+            concorrencia=concorrencia, requisicoes_por_minuto=100000, tokens_por_minuto=100000000,
+            tokens_por_bloco=tokens_por_bloco
+        )
+        resultados = {}
+        for quantidade in palavras:
+            tempos, chamadas, primeiros = [], [], []
+            for repeticao in range(repeticoes):
+                texto = gerar_transcricao(quantidade, semente=repeticao)
+                inicio = time.perf_counter()
+                # Com stream, o que o usuário espera é o primeiro token do texto final
+                _, relatorio = motor.transliterar_com_relatorio(texto, (lambda trecho: None) if fluxo else None)
+                tempos.append(time.perf_counter() - inicio)
+                chamadas.extend(chamada["tempo"] for chamada in relatorio)
+                if fluxo:
+                    primeiros.append(time.perf_counter() - inicio - relatorio[-1]["tempo"] + relatorio[-1]["primeiro_token"])
+            resultados[f"{quantidade}_palavras"] = {
+                **resumir(tempos),
+                "chamada_p50_s": percentil(chamadas, 50),
+                "chamada_p95_s": percentil(chamadas, 95),
+                "chamadas": len(chamadas),
+            }
+            if fluxo:
+                resultados[f"{quantidade}_palavras"]["primeiro_token_p50_s"] = percentil(primeiros, 50)
+                resultados[f"{quantidade}_palavras"]["primeiro_token_p95_s"] = percentil(primeiros, 95)
+        return resultados
+    finally:
+        servidor.parar()
+
+
+def medir_batch_api(arquivos: int, palavras: int, latencia: float, tokens_por_bloco: int):
+    """Translitera `arquivos` transcrições pela Batch API do servidor falso, retomando no meio
+
+    A primeira instância só envia o lote (como se o app reiniciasse logo depois);
+    uma segunda instância lê o estado do disco, acompanha e ingere. Roda de novo
+    no fim para conferir que a ingestão é idempotente.
+    """
+    from openai import OpenAI
+    from transliteracao import MotorTransliteracao
+    from pipeline import importar_transcricoes_existentes
+    from transliteracao_lote import LoteTransliteracao
+
+    servidor = ServidorFalso(latencia, 0.0)
+    url = servidor.iniciar()
+    try:
+        with tempfile.TemporaryDirectory() as pasta:
+            transcritos = os.path.join(pasta, "transcritos")
+            transliterados = os.path.join(pasta, "transliterados")
+            os.makedirs(transcritos)
+            os.makedirs(transliterados)
+            for indice in range(arquivos):
+                with open(os.path.join(transcritos, f"video-{indice}.txt"), "w", encoding="utf-8") as f:
+                    f.write(gerar_transcricao(palavras, semente=indice))
+            importar_transcricoes_existentes(transcritos)
+
+            motor = MotorTransliteracao(
+                OpenAI(base_url=url, api_key="benchmark"), PROMPT_TEMPLATE, modelo=MODELO_GPT,
+                tokens_por_bloco=tokens_por_bloco
+            )
+            inicio = time.perf_counter()
+            list(LoteTransliteracao(motor, transcritos, transliterados, intervalo=0.2).executar(esperar=False))
+            retomado = LoteTransliteracao(motor, transcritos, transliterados, intervalo=0.2)
+            eventos = list(retomado.executar()) if retomado.em_andamento() else []
+            tempo = time.perf_counter() - inicio
+            repeticao = list(LoteTransliteracao(motor, transcritos, transliterados).executar())
+
+            resultados = [evento for evento in eventos if evento["tipo"] == "resultado"]
+            return {
+                "arquivos": arquivos,
+                "tempo_total_s": tempo,
+                "retomado": bool(eventos) and eventos[0].get("retomado", False),
+                "concluidos": sum(1 for evento in resultados if not evento["erro"]),
+                "erros": sum(1 for evento in resultados if evento["erro"]),
+                "lotes": len(servidor.lotes),
+                "requisicoes": servidor.chamadas,
+                "transliterados": sum(1 for nome in os.listdir(transliterados) if nome.endswith("-Transliterado.txt")),
+                "eventos_repeticao": len(repeticao),
+            }
+    finally:
+        servidor.parar()
+
+
+# ----- relatório -----
+
+def ambiente():
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(__file__) or "."
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    informacoes = {
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "processador": platform.processor(),
+        "nucleos": os.cpu_count(),
+        "commit": commit,
+    }
+    if "torch" in sys.modules:
+        import torch
+        informacoes["torch"] = torch.__version__
+        informacoes["cuda"] = torch.cuda.get_device_name(0) if torch.cuda.is_available() else None
+    return informacoes
+
+
+def comparar(atual: dict, anterior: dict, caminho=()):
+    """Gera (métrica, anterior, atual, variação %) para os números presentes nas duas execuções"""
+    for chave, valor in atual.items():
+        if chave not in anterior or chave in ("ambiente", "configuracao"):
+            continue
+        if isinstance(valor, dict) and isinstance(anterior[chave], dict):
+            yield from comparar(valor, anterior[chave], caminho + (chave,))
+        elif isinstance(valor, (int, float)) and isinstance(anterior[chave], (int, float)) and anterior[chave]:
+            yield ".".join(caminho + (chave,)), anterior[chave], valor, 100 * (valor - anterior[chave]) / anterior[chave]
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Benchmark offline de extração, transcrição e transliteração")
+    parser.add_argument("--duracoes", type=float, nargs="+", default=[30, 120], help="duração dos vídeos de teste (s)")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--formatos", nargs="+", default=[FORMATO_MP3, FORMATO_NPY, FORMATO_MEMORIA],
+                        choices=[FORMATO_MP3, FORMATO_NPY, FORMATO_MEMORIA])
+    parser.add_argument("--modelos", nargs="*", default=MODELOS_WHISPER, choices=MODELOS_WHISPER,
+                        help="modelos Whisper (nenhum = pula a transcrição)")
+    parser.add_argument("--idioma", default="pt")
+    parser.add_argument("--int8", action="store_true", help="compara o Whisper int8 com o fp32 na CPU (velocidade e WER)")
+    parser.add_argument("--audios", help="pasta com gravações reais para a comparação int8 × fp32 (padrão: vídeos de teste)")
+    parser.add_argument("--threads", type=int, default=0, help="threads do torch na comparação int8 (0 = padrão)")
+    parser.add_argument("--clipes", type=int, default=0,
+                        help="quantidade de clipes curtos para comparar a transcrição sequencial e em lote (0 = pula)")
+    parser.add_argument("--duracao-clipe", type=float, default=8, help="duração de cada clipe curto (s)")
+    parser.add_argument("--lote", type=int, default=0, help="janelas por lote (0 = automático)")
+    parser.add_argument("--palavras", type=int, nargs="*", default=[1500, 15000],
+                        help="tamanhos de transcrição para a transliteração (nenhum = pula)")
+    parser.add_argument("--latencia-api", type=float, default=0.5, help="latência fixa do servidor falso (s)")
+    parser.add_argument("--jitter-api", type=float, default=0.1, help="variação aleatória da latência (s)")
+    parser.add_argument("--tokens-por-segundo", type=float, default=0.0, help="velocidade de geração simulada (0 = instantânea)")
+    parser.add_argument("--concorrencia", type=int, default=4)
+    parser.add_argument("--tokens-por-bloco", type=int, default=12000)
+    parser.add_argument("--fluxo", action="store_true", help="transliteração em stream: mede também o tempo até o primeiro token")
+    parser.add_argument("--batch-api", type=int, default=0, metavar="ARQUIVOS",
+                        help="translitera ARQUIVOS transcrições pela Batch API falsa, com retomada no meio")
+    parser.add_argument("--fixtures", default=os.path.join(tempfile.gettempdir(), "benchmark-transcricao"),
+                        help="pasta onde os vídeos de teste são gerados e reaproveitados")
+    parser.add_argument("--saida", help="grava o resultado em JSON neste arquivo (padrão: stdout)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+    os.makedirs(args.fixtures, exist_ok=True)
+
+    print("🎬 Gerando vídeos de teste...", file=sys.stderr)
+    videos = []
+    for duracao in args.duracoes:
+        video = gerar_video(args.fixtures, duracao)
+        videos.append((video, duracao_audio(video)))
+
+    resultado = {"configuracao": vars(args), "ambiente": None}
+    print("🔊 Medindo extração...", file=sys.stderr)
+    resultado["extracao"] = medir_extracao(videos, args.formatos, args.repeticoes)
+    if args.modelos:
+        print("📄 Medindo transcrição...", file=sys.stderr)
+        resultado["transcricao"] = medir_transcricao(videos, args.modelos, args.repeticoes, args.idioma)
+    if args.modelos and args.int8:
+        print("🏎️ Comparando int8 com fp32...", file=sys.stderr)
+        if args.audios:
+            from transcricao import listar_audios
+            audios = [(str(audio), duracao_audio(str(audio))) for audio in listar_audios(args.audios)]
+        else:
+            audios = videos
+        resultado["precisoes"] = medir_precisoes(audios, args.modelos, args.idioma, args.threads)
+    if args.modelos and args.clipes:
+        print("📦 Comparando transcrição sequencial e em lote...", file=sys.stderr)
+        resultado["transcricao_lote"] = medir_lote(
+            gerar_video(args.fixtures, args.duracao_clipe), args.clipes, args.modelos, args.lote, args.idioma
+        )
+    if args.palavras:
+        print("🔄 Medindo transliteração...", file=sys.stderr)
+        resultado["transliteracao"] = medir_transliteracao(
+            args.palavras, args.repeticoes, args.latencia_api, args.jitter_api, args.tokens_por_segundo,
+            args.concorrencia, args.tokens_por_bloco, args.fluxo
+        )
+    if args.batch_api:
+        print("📦 Medindo transliteração pela Batch API...", file=sys.stderr)
+        resultado["batch_api"] = medir_batch_api(
+            args.batch_api, args.palavras[0] if args.palavras else 1500, args.latencia_api, args.tokens_por_bloco
+        )
+    resultado["pico_memoria_mb"] = pico_memoria_mb()
+    resultado["ambiente"] = ambiente()
+
+    texto = json.dumps(resultado, ensure_ascii=False, indent=2)
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            f.write(texto)
+    else:
+        print(texto)
+
+    if args.comparar:
+        with open(args.comparar, "r", encoding="utf-8") as f:
+            anterior = json.load(f)
+        for metrica, antes, depois, variacao in comparar(resultado, anterior):
+            print(f"{metrica}: {antes:.4g} → {depois:.4g} ({variacao:+.1f}%)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
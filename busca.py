@@ -0,0 +1,393 @@
+import hashlib
+import heapq
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from indice_documentos import SUFIXO_TRANSLITERADO
+from metricas import medir
+
+# =========================
+# BUSCA NO CONTEÚDO (BM25)
+# =========================
+# Índice invertido em SQLite sobre as transliterações e as transcrições:
+# para cada radical, em quais documentos ele aparece e quantas vezes. A
+# consulta lê só as listas dos termos pesquisados e pontua com BM25; os
+# comprimentos dos documentos ficam em memória, então uma busca em dezenas
+# de milhares de documentos leva milissegundos.
+#
+# atualizar() reindexa só o que mudou: mtime e tamanho iguais pulam o
+# arquivo sem abri-lo; se mudaram mas o hash do conteúdo é o mesmo, só os
+# metadados são atualizados.
+#
+# O texto é quebrado em palavras, em minúsculas, sem stopwords do português
+# e reduzido ao radical (versão enxuta do RSLP) sem acentos, de modo que
+# "transcrições", "transcrição" e "transcricao" caem no mesmo termo.
+
+ARQUIVO_BUSCA = ".indice-busca.sqlite3"
+
+ORIGEM_TRANSLITERADO = "transliterado"
+ORIGEM_TRANSCRICAO = "transcricao"
+
+# Parâmetros usuais do BM25
+K1 = 1.2
+B = 0.75
+
+# Documentos indexados entre um commit e outro na primeira indexação
+DOCUMENTOS_POR_COMMIT = 200
+# buscar() varre as pastas de novo no máximo com esta frequência
+INTERVALO_ATUALIZACAO = 30.0
+# Termos em mais desta fração dos documentos não escolhem candidatos (veja buscar)
+FRACAO_COMUM = 0.5
+CARACTERES_TRECHO = 240
+
+PADRAO_PALAVRA = re.compile(r"\w+")
+
+_STOPWORDS = """
+a à ao aos aquela aquelas aquele aqueles aquilo as às até com como da das de dela delas dele deles depois do dos
+e é ela elas ele eles em entre era eram essa essas esse esses esta está estão estas este estes eu foi foram há
+isso isto já lhe lhes mais mas me mesmo meu meus minha minhas muito na nas nem no nos nós nossa nossas nosso
+nossos num numa não o os ou para pela pelas pelo pelos por qual quando que quem se sem ser será seu seus só
+sua suas são também te tem têm tu tua tuas um uma umas uns você vocês vos
+""".split()
+
+
+def _sem_acentos(texto: str):
+    return "".join(c for c in unicodedata.normalize("NFD", texto) if unicodedata.category(c) != "Mn")
+
+
+# Com e sem acento: quem digita "nao" na busca também não quer o termo
+STOPWORDS = frozenset(_STOPWORDS) | frozenset(_sem_acentos(palavra) for palavra in _STOPWORDS)
+
+# (sufixo, substituição, tamanho mínimo do radical), já sem acentos; em cada passo vale a primeira que casar
+_PLURAL = [
+    ("oes", "ao", 1), ("aes", "ao", 1), ("ais", "al", 1), ("eis", "el", 2), ("ois", "ol", 2), ("les", "l", 2),
+    ("res", "r", 2), ("zes", "z", 2), ("ns", "m", 1), ("s", "", 2),
+]
+_ADVERBIO = [("mente", "", 4)]
+_FEMININO = [
+    ("ona", "ao", 3), ("ora", "or", 3), ("inha", "inho", 3), ("esa", "es", 3), ("osa", "oso", 3), ("ica", "ico", 3),
+    ("ada", "ado", 2), ("ida", "ido", 3), ("ima", "imo", 3), ("iva", "ivo", 3), ("eira", "eiro", 3),
+]
+_AUMENTATIVO = [("issimo", "", 3), ("errimo", "", 3), ("zinho", "", 2), ("inho", "", 3), ("zao", "", 2)]
+_SUBSTANTIVO = [
+    ("izacao", "", 4), ("amento", "", 3), ("imento", "", 3), ("mento", "", 5), ("ividade", "", 3), ("idade", "", 4),
+    ("acao", "", 3), ("cao", "", 3), ("agem", "", 3), ("ismo", "", 3), ("ista", "", 4), ("avel", "", 2),
+    ("ivel", "", 3), ("ancia", "", 3), ("encia", "", 3), ("ador", "", 3), ("edor", "", 3), ("idor", "", 4),
+    ("eiro", "", 3), ("ante", "", 2), ("ente", "", 4), ("oso", "", 3), ("ico", "", 4), ("ivo", "", 4),
+    ("ario", "", 3), ("ura", "", 4), ("eza", "", 3),
+]
+_VERBO = [
+    ("ariamos", "", 2), ("eriamos", "", 3), ("iriamos", "", 3), ("assemos", "", 2), ("essemos", "", 2),
+    ("issemos", "", 3), ("aremos", "", 2), ("eremos", "", 2), ("iremos", "", 3), ("avamos", "", 2),
+    ("iamos", "", 3), ("ando", "", 2), ("endo", "", 3), ("indo", "", 3), ("ondo", "", 3), ("aram", "", 2),
+    ("eram", "", 3), ("iram", "", 3), ("avam", "", 2), ("arem", "", 2), ("erem", "", 3), ("irem", "", 3),
+    ("asse", "", 2), ("esse", "", 3), ("isse", "", 3), ("aria", "", 2), ("eria", "", 3), ("iria", "", 3),
+    ("ado", "", 2), ("ido", "", 3), ("ava", "", 2), ("amos", "", 2), ("emos", "", 3), ("imos", "", 3),
+    ("ar", "", 2), ("er", "", 2), ("ir", "", 3), ("ou", "", 3), ("am", "", 2), ("em", "", 2), ("ei", "", 3),
+    ("eu", "", 3), ("iu", "", 3),
+]
+
+
+def _aplicar(palavra: str, regras):
+    """Aplica a primeira regra cujo sufixo casa; devolve (palavra, mudou)"""
+    for sufixo, substituicao, minimo in regras:
+        if palavra.endswith(sufixo) and len(palavra) - len(sufixo) >= minimo:
+            return palavra[:-len(sufixo)] + substituicao, True
+    return palavra, False
+
+
+@lru_cache(maxsize=200_000)
+def radical(palavra: str):
+    """Radical de uma palavra em minúsculas, na ordem do RSLP: plural, advérbio, feminino,
+    aumentativo, sufixo nominal ou verbal e, se nada casou, a vogal final"""
+    palavra = _sem_acentos(palavra)
+    if len(palavra) <= 3 or palavra.isdigit():
+        return palavra
+    if palavra.endswith("s") and not palavra.endswith("ss"):
+        palavra, _ = _aplicar(palavra, _PLURAL)
+    for regras in (_ADVERBIO, _FEMININO, _AUMENTATIVO):
+        palavra, _ = _aplicar(palavra, regras)
+    palavra, mudou = _aplicar(palavra, _SUBSTANTIVO)
+    if not mudou:
+        palavra, mudou = _aplicar(palavra, _VERBO)
+    if not mudou and len(palavra) > 3 and palavra[-1] in "aeo":
+        palavra = palavra[:-1]
+    return palavra
+
+
+def termos(texto: str):
+    """Radicais das palavras do texto, na ordem, sem stopwords"""
+    return [
+        radical(palavra) for palavra in (p.lower() for p in PADRAO_PALAVRA.findall(texto))
+        if palavra not in STOPWORDS and len(palavra) > 1
+    ]
+
+
+def _trecho(texto: str, procurados: set):
+    """Pedaço do texto em volta da primeira palavra pesquisada"""
+    for encontrado in PADRAO_PALAVRA.finditer(texto):
+        palavra = encontrado.group().lower()
+        if palavra not in STOPWORDS and radical(palavra) in procurados:
+            inicio = max(0, encontrado.start() - CARACTERES_TRECHO // 3)
+            trecho = " ".join(texto[inicio:inicio + CARACTERES_TRECHO].split())
+            return ("…" if inicio else "") + trecho + ("…" if inicio + CARACTERES_TRECHO < len(texto) else "")
+    return " ".join(texto[:CARACTERES_TRECHO].split())
+
+
+class IndiceBusca:
+    """Índice invertido das transliterações e transcrições, gravado na pasta de transliterados"""
+
+    def __init__(self, pasta_transcritos: str, pasta_transliterados: str):
+        os.makedirs(pasta_transliterados, exist_ok=True)
+        self.fontes = {
+            ORIGEM_TRANSLITERADO: (pasta_transliterados, lambda nome: nome.endswith(SUFIXO_TRANSLITERADO)),
+            ORIGEM_TRANSCRICAO: (
+                pasta_transcritos, lambda nome: nome.endswith(".txt") and not nome.endswith(SUFIXO_TRANSLITERADO)
+            ),
+        }
+        self.atualizado_em = None
+        self._documentos = None
+        self._versao = None
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(
+            os.path.join(pasta_transliterados, ARQUIVO_BUSCA), timeout=30, check_same_thread=False
+        )
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.execute("PRAGMA synchronous=NORMAL")
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                id INTEGER PRIMARY KEY,
+                origem TEXT NOT NULL,
+                nome TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                hash TEXT NOT NULL,
+                comprimento INTEGER NOT NULL,
+                UNIQUE (origem, nome)
+            );
+            CREATE TABLE IF NOT EXISTS termos (
+                id INTEGER PRIMARY KEY,
+                termo TEXT NOT NULL UNIQUE,
+                df INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS postagens (
+                termo INTEGER NOT NULL,
+                documento INTEGER NOT NULL,
+                frequencia INTEGER NOT NULL,
+                PRIMARY KEY (termo, documento)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS idx_postagens_documento ON postagens (documento);
+        """)
+        self._conexao.commit()
+
+    # ----- indexação -----
+
+    def _remover(self, documento: int):
+        self._conexao.execute(
+            "UPDATE termos SET df = df - 1 WHERE id IN (SELECT termo FROM postagens WHERE documento = ?)", (documento,)
+        )
+        self._conexao.execute("DELETE FROM postagens WHERE documento = ?", (documento,))
+        self._conexao.execute("DELETE FROM documentos WHERE id = ?", (documento,))
+
+    def _indexar(self, origem: str, nome: str, info, texto: str, resumo: str):
+        frequencias = Counter(termos(texto))
+        documento = self._conexao.execute(
+            "INSERT INTO documentos (origem, nome, tamanho, mtime, hash, comprimento) VALUES (?, ?, ?, ?, ?, ?)",
+            (origem, nome, info.st_size, info.st_mtime, resumo, sum(frequencias.values()))
+        ).lastrowid
+        self._conexao.executemany(
+            "INSERT INTO termos (termo, df) VALUES (?, 1) ON CONFLICT (termo) DO UPDATE SET df = df + 1",
+            [(termo,) for termo in frequencias]
+        )
+        lista = list(frequencias)
+        identificadores = {}
+        # O SQLite limita o número de parâmetros por consulta
+        for inicio in range(0, len(lista), 500):
+            parte = lista[inicio:inicio + 500]
+            identificadores.update(self._conexao.execute(
+                f"SELECT termo, id FROM termos WHERE termo IN ({', '.join('?' * len(parte))})", parte
+            ).fetchall())
+        self._conexao.executemany(
+            "INSERT INTO postagens (termo, documento, frequencia) VALUES (?, ?, ?)",
+            [(identificadores[termo], documento, frequencia) for termo, frequencia in frequencias.items()]
+        )
+
+    def atualizar(self):
+        """Sincroniza com as pastas lendo só o que mudou; retorna (novos, alterados, removidos)"""
+        novos = alterados = 0
+        with self._lock, medir("indexacao") as campos:
+            conhecidos = {
+                (origem, nome): (documento, tamanho, mtime, resumo)
+                for documento, origem, nome, tamanho, mtime, resumo in self._conexao.execute(
+                    "SELECT id, origem, nome, tamanho, mtime, hash FROM documentos"
+                )
+            }
+            for origem, (pasta, aceitar) in self.fontes.items():
+                if not os.path.isdir(pasta):
+                    continue
+                for entrada in os.scandir(pasta):
+                    if not aceitar(entrada.name) or not entrada.is_file():
+                        continue
+                    anterior = conhecidos.pop((origem, entrada.name), None)
+                    try:
+                        info = entrada.stat()
+                        if anterior is not None and anterior[1:3] == (info.st_size, info.st_mtime):
+                            continue
+                        with open(entrada.path, "r", encoding="utf-8", errors="replace") as f:
+                            texto = f.read()
+                    except FileNotFoundError:
+                        # Apagado ou renomeado durante a varredura: sai do índice como os demais removidos
+                        if anterior is not None:
+                            conhecidos[(origem, entrada.name)] = anterior
+                        continue
+                    resumo = hashlib.sha1(texto.encode("utf-8")).hexdigest()
+                    if anterior is not None and anterior[3] == resumo:
+                        # Só tocado (cópia, restauração): mesmo conteúdo, nada a reindexar
+                        self._conexao.execute(
+                            "UPDATE documentos SET tamanho = ?, mtime = ? WHERE id = ?",
+                            (info.st_size, info.st_mtime, anterior[0])
+                        )
+                        continue
+                    if anterior is None:
+                        novos += 1
+                    else:
+                        alterados += 1
+                        self._remover(anterior[0])
+                    self._indexar(origem, entrada.name, info, texto, resumo)
+                    if (novos + alterados) % DOCUMENTOS_POR_COMMIT == 0:
+                        self._conexao.commit()
+
+            for documento, _, _, _ in conhecidos.values():
+                self._remover(documento)
+            if novos or alterados or conhecidos:
+                self._conexao.execute("DELETE FROM termos WHERE df <= 0")
+                self._documentos = None
+            self._conexao.commit()
+            campos.update(novos=novos, alterados=alterados, removidos=len(conhecidos))
+        self.atualizado_em = time.monotonic()
+        return novos, alterados, len(conhecidos)
+
+    # ----- consultas -----
+
+    def _carregar_documentos(self):
+        """{id: (normalização BM25, origem, nome)}, lido uma vez por versão do índice
+
+        A normalização K1 * (1 - B + B * comprimento / média) só muda quando o índice muda,
+        então é calculada aqui e não a cada postagem pontuada.
+        """
+        # data_version muda quando outra conexão (outro processo, como o cli.py buscar) grava
+        # no arquivo; as gravações desta conexão já limpam o cache em atualizar()
+        versao = self._conexao.execute("PRAGMA data_version").fetchone()[0]
+        if self._documentos is None or versao != self._versao:
+            self._versao = versao
+            linhas = self._conexao.execute("SELECT id, comprimento, origem, nome FROM documentos").fetchall()
+            media = (sum(linha[1] for linha in linhas) / len(linhas) if linhas else 0.0) or 1.0
+            self._documentos = {
+                documento: (K1 * (1 - B + B * comprimento / media), origem, nome)
+                for documento, comprimento, origem, nome in linhas
+            }
+        return self._documentos
+
+    def totais(self):
+        with self._lock:
+            documentos, termos_distintos = self._conexao.execute(
+                "SELECT (SELECT COUNT(*) FROM documentos), (SELECT COUNT(*) FROM termos)"
+            ).fetchone()
+        return {"documentos": documentos, "termos": termos_distintos}
+
+    def buscar(self, consulta: str, limite: int = 10, origem: str = None, trechos: bool = True):
+        """Os `limite` documentos mais relevantes para a consulta (BM25)
+
+        Devolve [{origem, nome, caminho, pontuacao, trecho}], do mais para o menos relevante.
+        """
+        procurados = set(termos(consulta))
+        if not procurados:
+            return []
+        pontuacoes = defaultdict(float)
+        with self._lock, medir("busca", termos=len(procurados)) as campos:
+            documentos = self._carregar_documentos()
+            total = len(documentos)
+            encontrados = []
+            for termo in procurados:
+                linha = self._conexao.execute("SELECT id, df FROM termos WHERE termo = ?", (termo,)).fetchone()
+                if linha is not None and linha[1] > 0:
+                    encontrados.append((linha[0], linha[1], math.log(1 + (total - linha[1] + 0.5) / (linha[1] + 0.5))))
+            # Termos presentes em mais de FRACAO_COMUM dos documentos quase não discriminam e
+            # carregam a maior parte das postagens: se houver termos seletivos na consulta, eles
+            # escolhem os candidatos e os comuns só pontuam esses candidatos. Se os candidatos não
+            # chegarem a `limite`, os comuns são lidos inteiros (o BM25 completo, com OU entre termos)
+            seletivos = [termo for termo in encontrados if termo[1] <= total * FRACAO_COMUM] or encontrados
+            comuns = [termo for termo in encontrados if termo not in seletivos]
+
+            def pontuar(linhas, idf):
+                for documento, frequencia in linhas:
+                    dados = documentos.get(documento)
+                    # Documento gravado por outra conexão depois da leitura do cache
+                    if dados is None:
+                        continue
+                    normalizacao, origem_documento, _ = dados
+                    if origem is None or origem_documento == origem:
+                        pontuacoes[documento] += idf * frequencia * (K1 + 1) / (frequencia + normalizacao)
+
+            for identificador, _, idf in seletivos:
+                pontuar(self._conexao.execute(
+                    "SELECT documento, frequencia FROM postagens WHERE termo = ?", (identificador,)
+                ).fetchall(), idf)
+            candidatos = list(pontuacoes) if len(pontuacoes) >= limite else None
+            for identificador, _, idf in comuns:
+                if candidatos is None:
+                    pontuar(self._conexao.execute(
+                        "SELECT documento, frequencia FROM postagens WHERE termo = ?", (identificador,)
+                    ).fetchall(), idf)
+                    continue
+                for inicio in range(0, len(candidatos), 500):
+                    bloco = candidatos[inicio:inicio + 500]
+                    pontuar(self._conexao.execute(
+                        f"SELECT documento, frequencia FROM postagens WHERE termo = ? AND documento IN ({','.join('?' * len(bloco))})",
+                        (identificador, *bloco),
+                    ).fetchall(), idf)
+            melhores = heapq.nlargest(limite, pontuacoes.items(), key=lambda par: par[1])
+            campos["candidatos"] = len(pontuacoes)
+
+        resultados = []
+        for documento, pontuacao in melhores:
+            _, origem_documento, nome = documentos[documento]
+            caminho = os.path.join(self.fontes[origem_documento][0], nome)
+            resultado = {"origem": origem_documento, "nome": nome, "caminho": caminho, "pontuacao": pontuacao, "trecho": None}
+            if trechos:
+                try:
+                    with open(caminho, "r", encoding="utf-8", errors="replace") as f:
+                        resultado["trecho"] = _trecho(f.read(), procurados)
+                except OSError:
+                    pass
+            resultados.append(resultado)
+        return resultados
+
+
+_indices = {}
+_lock_indices = threading.Lock()
+
+
+def obter_indice_busca(pasta_transcritos: str, pasta_transliterados: str):
+    """Uma instância por par de pastas e por processo"""
+    chave = (os.path.abspath(pasta_transcritos), os.path.abspath(pasta_transliterados))
+    with _lock_indices:
+        indice = _indices.get(chave)
+        if indice is None:
+            indice = _indices[chave] = IndiceBusca(pasta_transcritos, pasta_transliterados)
+        return indice
+
+
+def buscar(consulta: str, pasta_transcritos: str, pasta_transliterados: str, limite: int = 10, origem: str = None):
+    """Busca no conteúdo, atualizando o índice antes se a última varredura tiver mais de INTERVALO_ATUALIZACAO s"""
+    indice = obter_indice_busca(pasta_transcritos, pasta_transliterados)
+    if indice.atualizado_em is None or time.monotonic() - indice.atualizado_em > INTERVALO_ATUALIZACAO:
+        indice.atualizar()
+    return indice.buscar(consulta, limite, origem)
@@ -0,0 +1,208 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+# =========================
+# CACHE ENDEREÇADO POR CONTEÚDO
+# =========================
+# Transcrições são indexadas por hash do áudio + modelo Whisper + idioma e
+# transliterações por hash da transcrição + hash do prompt + modelo + temperatura.
+# Assim um arquivo renomeado reaproveita o resultado e uma mudança no prompt
+# nunca devolve uma saída antiga.
+
+PASTA_CACHE_PADRAO = os.environ.get("CACHE_RESULTADOS_DIR", ".cache_resultados")
+LIMITE_CACHE_PADRAO_MB = 1024
+
+TIPO_TRANSCRICAO = "transcricao"
+TIPO_TRANSLITERACAO = "transliteracao"
+
+TAMANHO_BLOCO_HASH = 1024 * 1024
+
+
+def hash_texto(texto: str):
+    """SHA-256 de um texto"""
+    return hashlib.sha256(texto.encode("utf-8")).hexdigest()
+
+
+def hash_arquivo(caminho: str):
+    """SHA-256 do conteúdo de um arquivo, lido em blocos"""
+    h = hashlib.sha256()
+    with open(caminho, "rb") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO_HASH), b""):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+class CacheResultados:
+    """Cache em disco com índice SQLite, despejo LRU por tamanho e contadores de acerto"""
+
+    def __init__(self, pasta: str = PASTA_CACHE_PADRAO, limite_bytes: int = LIMITE_CACHE_PADRAO_MB * 1024 * 1024):
+        self.pasta = pasta
+        self.limite_bytes = limite_bytes
+        os.makedirs(pasta, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(os.path.join(pasta, "indice.sqlite3"), timeout=30, check_same_thread=False)
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS entradas (
+                chave TEXT PRIMARY KEY,
+                tipo TEXT NOT NULL,
+                tamanho INTEGER NOT NULL,
+                custo REAL NOT NULL,
+                criado_em REAL NOT NULL,
+                acessado_em REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_entradas_acesso ON entradas (acessado_em);
+            CREATE TABLE IF NOT EXISTS contadores (
+                tipo TEXT PRIMARY KEY,
+                acertos INTEGER NOT NULL DEFAULT 0,
+                faltas INTEGER NOT NULL DEFAULT 0,
+                custo_economizado REAL NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS hashes_arquivos (
+                caminho TEXT PRIMARY KEY,
+                tamanho INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                hash TEXT NOT NULL
+            );
+        """)
+        self._conexao.commit()
+
+    # ----- chaves -----
+
+    def hash_arquivo(self, caminho: str):
+        """Hash do arquivo, reaproveitado enquanto tamanho e mtime não mudarem"""
+        caminho = os.path.abspath(caminho)
+        info = os.stat(caminho)
+        with self._lock:
+            linha = self._conexao.execute(
+                "SELECT hash FROM hashes_arquivos WHERE caminho = ? AND tamanho = ? AND mtime = ?",
+                (caminho, info.st_size, info.st_mtime)
+            ).fetchone()
+        if linha:
+            return linha[0]
+
+        h = hash_arquivo(caminho)
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO hashes_arquivos VALUES (?, ?, ?, ?)",
+                (caminho, info.st_size, info.st_mtime, h)
+            )
+            self._conexao.commit()
+        return h
+
+    def chave_transcricao(self, audio, modelo: str, idioma: str):
+        """`audio` pode ser um caminho ou um array PCM já decodificado"""
+        if isinstance(audio, (str, os.PathLike)):
+            hash_audio = self.hash_arquivo(audio)
+        else:
+            hash_audio = hashlib.sha256(memoryview(audio).cast("B")).hexdigest()
+        return hash_texto(f"{TIPO_TRANSCRICAO}|{hash_audio}|{modelo}|{idioma}")
+
+    @staticmethod
+    def chave_transliteracao(conteudo: str, prompt: str, modelo: str, temperatura: float):
+        return hash_texto(f"{TIPO_TRANSLITERACAO}|{hash_texto(conteudo)}|{hash_texto(prompt)}|{modelo}|{temperatura}")
+
+    # ----- leitura e escrita -----
+
+    def _caminho(self, chave: str):
+        return os.path.join(self.pasta, chave[:2], f"{chave}.txt")
+
+    def _contar(self, tipo: str, acerto: bool, custo: float = 0.0):
+        self._conexao.execute("INSERT OR IGNORE INTO contadores (tipo) VALUES (?)", (tipo,))
+        if acerto:
+            self._conexao.execute(
+                "UPDATE contadores SET acertos = acertos + 1, custo_economizado = custo_economizado + ? WHERE tipo = ?",
+                (custo, tipo)
+            )
+        else:
+            self._conexao.execute("UPDATE contadores SET faltas = faltas + 1 WHERE tipo = ?", (tipo,))
+
+    def obter(self, tipo: str, chave: str):
+        """Retorna o texto em cache ou None, atualizando os contadores"""
+        with self._lock:
+            linha = self._conexao.execute("SELECT custo FROM entradas WHERE chave = ?", (chave,)).fetchone()
+            texto = None
+            if linha:
+                try:
+                    with open(self._caminho(chave), "r", encoding="utf-8") as f:
+                        texto = f.read()
+                except OSError:
+                    self._conexao.execute("DELETE FROM entradas WHERE chave = ?", (chave,))
+
+            if texto is None:
+                self._contar(tipo, False)
+            else:
+                self._contar(tipo, True, linha[0])
+                self._conexao.execute("UPDATE entradas SET acessado_em = ? WHERE chave = ?", (time.time(), chave))
+            self._conexao.commit()
+            return texto
+
+    def guardar(self, tipo: str, chave: str, texto: str, custo: float = 0.0):
+        """Guarda um resultado; `custo` é o que um acerto futuro economiza (segundos ou tokens)"""
+        caminho = self._caminho(chave)
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        temporario = f"{caminho}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporario, caminho)
+
+        agora = time.time()
+        with self._lock:
+            self._conexao.execute(
+                "INSERT OR REPLACE INTO entradas VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, tipo, os.path.getsize(caminho), custo, agora, agora)
+            )
+            self._despejar()
+            self._conexao.commit()
+
+    def _despejar(self):
+        """Remove as entradas acessadas há mais tempo até caber no limite (chamar com lock)"""
+        if not self.limite_bytes:
+            return
+        total = self._conexao.execute("SELECT COALESCE(SUM(tamanho), 0) FROM entradas").fetchone()[0]
+        if total <= self.limite_bytes:
+            return
+        for chave, tamanho in self._conexao.execute(
+            "SELECT chave, tamanho FROM entradas ORDER BY acessado_em"
+        ).fetchall():
+            if total <= self.limite_bytes:
+                break
+            try:
+                os.remove(self._caminho(chave))
+            except OSError:
+                pass
+            self._conexao.execute("DELETE FROM entradas WHERE chave = ?", (chave,))
+            total -= tamanho
+
+    # ----- estatísticas -----
+
+    def estatisticas(self):
+        """Acertos, faltas e custo economizado por tipo, além do tamanho ocupado"""
+        with self._lock:
+            contadores = {
+                tipo: {"acertos": acertos, "faltas": faltas, "custo_economizado": custo}
+                for tipo, acertos, faltas, custo in self._conexao.execute(
+                    "SELECT tipo, acertos, faltas, custo_economizado FROM contadores"
+                )
+            }
+            entradas, tamanho = self._conexao.execute(
+                "SELECT COUNT(*), COALESCE(SUM(tamanho), 0) FROM entradas"
+            ).fetchone()
+        for tipo in (TIPO_TRANSCRICAO, TIPO_TRANSLITERACAO):
+            contadores.setdefault(tipo, {"acertos": 0, "faltas": 0, "custo_economizado": 0.0})
+        contadores["entradas"] = entradas
+        contadores["bytes"] = tamanho
+        return contadores
+
+
+_caches = {}
+
+
+def obter_cache(pasta: str = PASTA_CACHE_PADRAO):
+    """Uma instância por pasta e por processo"""
+    cache = _caches.get(pasta)
+    if cache is None:
+        cache = _caches[pasta] = CacheResultados(pasta)
+    return cache
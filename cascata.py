@@ -0,0 +1,163 @@
+import time
+
+from modelos import usar_modelo
+from audio import TAXA_AMOSTRAGEM
+from metricas import medir
+
+# =========================
+# CASCATA DE MODELOS POR CONFIANÇA
+# =========================
+# Um modelo rápido transcreve o áudio inteiro. Os segmentos em que ele mostra
+# pouca confiança (avg_logprob baixo, compression_ratio alto = texto repetido,
+# no_speech_prob alto = talvez nem seja fala) são retranscritos por um modelo
+# maior e o texto novo substitui o antigo no mesmo lugar. Segmentos incertos
+# vizinhos viram uma única região, com uma pequena margem de áudio, para o
+# modelo maior ter contexto.
+
+# Limites mais rígidos que os do fallback do Whisper (-1.0, 2.4, 0.6)
+LIMITES_CASCATA_PADRAO = {
+    "logprob": -0.7,
+    "compressao": 2.2,
+    "sem_fala": 0.5,
+}
+
+MARGEM_SEGUNDOS = 0.3
+# Regiões incertas separadas por menos que isto são retranscritas juntas
+INTERVALO_JUNTAR_SEGUNDOS = 1.0
+
+# Velocidade relativa dos modelos (tabela do Whisper), usada para estimar o custo
+# de transcrever tudo com o modelo maior quando quase nada foi escalado
+VELOCIDADE_RELATIVA = {
+    "tiny": 10,
+    "base": 7,
+    "small": 4,
+    "medium": 2,
+    "large": 1,
+}
+
+# Abaixo disto o tempo medido do modelo maior é ruído demais para extrapolar
+MINIMO_ESCALADO_SEGUNDOS = 5.0
+
+
+def motivo_incerteza(segmento: dict, limites: dict):
+    """Por que o segmento deve ser escalado (ou None se está confiável)"""
+    if segmento.get("avg_logprob", 0.0) < limites["logprob"]:
+        return "logprob"
+    if segmento.get("compression_ratio", 0.0) > limites["compressao"]:
+        return "compressao"
+    if segmento.get("no_speech_prob", 0.0) > limites["sem_fala"]:
+        return "sem_fala"
+    return None
+
+
+def regioes_incertas(segmentos, limites: dict, duracao_total: float):
+    """Agrupa os segmentos incertos em regiões [(primeiro, ultimo, inicio_s, fim_s)]"""
+    regioes = []
+    for indice, segmento in enumerate(segmentos):
+        if motivo_incerteza(segmento, limites) is None:
+            continue
+        inicio = max(0.0, segmento["start"] - MARGEM_SEGUNDOS)
+        fim = min(duracao_total, segmento["end"] + MARGEM_SEGUNDOS)
+        if regioes and inicio - regioes[-1][3] < INTERVALO_JUNTAR_SEGUNDOS:
+            primeiro, _, inicio_anterior, _ = regioes[-1]
+            # Os segmentos confiáveis entre os dois incertos entram na mesma região
+            regioes[-1] = (primeiro, indice, inicio_anterior, fim)
+        else:
+            regioes.append((indice, indice, inicio, fim))
+    return regioes
+
+
+def refinar(result: dict, audio, modelo_rapido: str, modelo_preciso: str, idioma: str = "pt",
+            limites: dict = None, tempo_rapido: float = 0.0):
+    """Retranscreve com o modelo preciso as regiões incertas de `result` e devolve (texto, estatísticas)
+
+    `result` é a saída do model.transcribe do modelo rápido sobre o mesmo `audio`
+    (PCM 16 kHz), com os tempos na linha do tempo desse áudio.
+    """
+    limites = {**LIMITES_CASCATA_PADRAO, **(limites or {})}
+    segmentos = result["segments"]
+    duracao_total = len(audio) / TAXA_AMOSTRAGEM
+    regioes = regioes_incertas(segmentos, limites, duracao_total)
+
+    motivos = {"logprob": 0, "compressao": 0, "sem_fala": 0}
+    for segmento in segmentos:
+        motivo = motivo_incerteza(segmento, limites)
+        if motivo:
+            motivos[motivo] += 1
+
+    textos = [segmento["text"].strip() for segmento in segmentos]
+    substituidos = set()
+    tempo_preciso = 0.0
+    duracao_escalada = 0.0
+    if regioes:
+        with usar_modelo(modelo_preciso) as entrada:
+            for primeiro, ultimo, inicio, fim in regioes:
+                trecho = audio[int(inicio * TAXA_AMOSTRAGEM):int(fim * TAXA_AMOSTRAGEM)]
+                # O texto confiável logo antes da região orienta vocabulário e pontuação
+                anteriores = [t for indice, t in enumerate(textos[:primeiro]) if t and indice not in substituidos]
+                contexto = " ".join(anteriores[-3:])[-200:] or None
+                comeco = time.perf_counter()
+                with medir("cascata_regiao", modelo=modelo_preciso, segundos_audio=fim - inicio):
+                    refeito = entrada.model.transcribe(
+                        trecho, language=idioma, condition_on_previous_text=False, initial_prompt=contexto,
+                        **entrada.opcoes_transcricao
+                    )
+                tempo_preciso += time.perf_counter() - comeco
+                duracao_escalada += fim - inicio
+                textos[primeiro] = refeito["text"].strip()
+                substituidos.update(range(primeiro + 1, ultimo + 1))
+
+    texto = " ".join(t for indice, t in enumerate(textos) if t and indice not in substituidos)
+    return texto, _estatisticas(
+        modelo_rapido, modelo_preciso, segmentos, motivos, regioes, duracao_total, duracao_escalada,
+        tempo_rapido, tempo_preciso
+    )
+
+
+def _estatisticas(modelo_rapido, modelo_preciso, segmentos, motivos, regioes, duracao_total, duracao_escalada,
+                  tempo_rapido, tempo_preciso):
+    """Fração escalada e economia estimada em relação a usar só o modelo preciso"""
+    if duracao_escalada >= MINIMO_ESCALADO_SEGUNDOS:
+        por_segundo = tempo_preciso / duracao_escalada
+    else:
+        proporcao = VELOCIDADE_RELATIVA.get(modelo_rapido, 1) / VELOCIDADE_RELATIVA.get(modelo_preciso, 1)
+        por_segundo = (tempo_rapido / duracao_total if duracao_total else 0.0) * proporcao
+    so_preciso = por_segundo * duracao_total
+    tempo_cascata = tempo_rapido + tempo_preciso
+    return {
+        "modelo_rapido": modelo_rapido,
+        "modelo_preciso": modelo_preciso,
+        "segmentos": len(segmentos),
+        "segmentos_escalados": sum(motivos.values()),
+        "motivos": motivos,
+        "regioes": len(regioes),
+        "duracao_total": duracao_total,
+        "duracao_escalada": duracao_escalada,
+        "fracao_escalada": duracao_escalada / duracao_total if duracao_total else 0.0,
+        "tempo_rapido": tempo_rapido,
+        "tempo_preciso": tempo_preciso,
+        "tempo_so_preciso_estimado": so_preciso,
+        "economia_s": so_preciso - tempo_cascata,
+        "economia_percentual": 100.0 * (1 - tempo_cascata / so_preciso) if so_preciso else 0.0,
+    }
+
+
+def somar_estatisticas(lista):
+    """Junta as estatísticas de vários arquivos para o resumo de uma execução"""
+    lista = [e for e in lista if e]
+    if not lista:
+        return None
+    duracao_total = sum(e["duracao_total"] for e in lista)
+    so_preciso = sum(e["tempo_so_preciso_estimado"] for e in lista)
+    tempo_cascata = sum(e["tempo_rapido"] + e["tempo_preciso"] for e in lista)
+    return {
+        "arquivos": len(lista),
+        "segmentos": sum(e["segmentos"] for e in lista),
+        "segmentos_escalados": sum(e["segmentos_escalados"] for e in lista),
+        "duracao_total": duracao_total,
+        "duracao_escalada": sum(e["duracao_escalada"] for e in lista),
+        "fracao_escalada": sum(e["duracao_escalada"] for e in lista) / duracao_total if duracao_total else 0.0,
+        "tempo_so_preciso_estimado": so_preciso,
+        "economia_s": so_preciso - tempo_cascata,
+        "economia_percentual": 100.0 * (1 - tempo_cascata / so_preciso) if so_preciso else 0.0,
+    }
@@ -0,0 +1,449 @@
+import time
+
+_INICIO_IMPORTACAO = time.perf_counter()
+
+import argparse
+import json
+import os
+import sys
+
+from audio import extrair_audio, FORMATO_MP3, FORMATO_NPY, FORMATO_MEMORIA
+from modelos import configurar_inferencia, PRECISAO_FP32, PRECISAO_FP16, PRECISAO_INT8
+from cascata import somar_estatisticas, LIMITES_CASCATA_PADRAO
+from metricas import Agregador, configurar_perfil, servir_prometheus, PERFIL_CPROFILE, PERFIL_TORCH
+from pipeline import (
+    PASTA_TRANSCRITOS_PADRAO, PASTA_TRANSLITERADOS_PADRAO, MODELOS_WHISPER, criar_pastas, criar_motor, listar_videos_pasta,
+    item_video, montar_esteira, transcrever_pares, transcrever_pasta, transliterar_pendentes,
+    transliterar_pela_batch_api, resumo
+)
+from busca import obter_indice_busca, ORIGEM_TRANSLITERADO, ORIGEM_TRANSCRICAO
+from trabalhos import (
+    ExecutorTrabalhos, FilaTrabalhos, ARQUIVO_FILA, TRABALHADORES_PADRAO, VAGAS_PADRAO, RECURSO_CPU, RECURSO_GPU, RECURSO_API
+)
+
+# Tempo para importar o pipeline; torch/whisper/openai não devem entrar aqui
+TEMPO_IMPORTACAO = time.perf_counter() - _INICIO_IMPORTACAO
+
+MODULOS_PESADOS = ("torch", "whisper", "openai", "streamlit", "numpy", "tiktoken", "yt_dlp", "watchdog")
+
+# =========================
+# LINHA DE COMANDO
+# =========================
+# Uso sem interface, por exemplo a partir do cron:
+#   python cli.py canal https://www.youtube.com/@canal
+#   python cli.py pasta /gravacoes --vigiar
+#   python cli.py transliterar --batch --sem-esperar
+#   python cli.py status --json
+#   python cli.py executor --ate-esvaziar
+#   python cli.py buscar "inteligência artificial" --limite 5
+
+
+def medir_inicializacao():
+    """Tempo de importação e quais módulos pesados já estão carregados"""
+    return {
+        "importacao_s": round(TEMPO_IMPORTACAO, 4),
+        "modulos_pesados": [nome for nome in MODULOS_PESADOS if nome in sys.modules],
+    }
+
+
+def opcoes_transcricao(args):
+    opcoes = {
+        "idioma": args.idioma,
+        "pasta_cache": args.cache,
+        "em_janelas": args.janelas,
+        "vad": args.vad,
+    }
+    if args.cascata:
+        opcoes["cascata"] = args.cascata
+        opcoes["limites_cascata"] = {
+            "logprob": args.limite_logprob, "compressao": args.limite_compressao, "sem_fala": args.limite_sem_fala
+        }
+    return opcoes
+
+
+def motor(args):
+    return criar_motor(args.concorrencia, args.rpm, args.tpm, args.cache, args.tokens_por_bloco, args.sobreposicao)
+
+
+def descrever_cascata(estatisticas):
+    return (
+        f"🪜 {100 * estatisticas['fracao_escalada']:.0f}% do áudio escalado "
+        f"({estatisticas['segmentos_escalados']}/{estatisticas['segmentos']} segmentos), "
+        f"economia estimada {estatisticas['economia_s']:.0f}s ({estatisticas['economia_percentual']:.0f}%)"
+    )
+
+
+def mostrar_eventos(eventos, verbo: str):
+    """Imprime os eventos do pipeline e devolve (processados, erros)"""
+    processados = erros = 0
+    cascatas = []
+    for evento in eventos:
+        if evento["tipo"] == "pulado":
+            print(f"⏭️ Pulando ({evento['motivo']}): {evento['arquivo']}")
+        elif evento["tipo"] == "inicio" and evento.get("lote"):
+            acao = "Retomando" if evento["retomado"] else "Enviando"
+            print(f"📦 {acao} {evento['total']} arquivo(s) pela Batch API em {evento['trabalhadores']} lote(s)...")
+        elif evento["tipo"] == "inicio":
+            print(f"{verbo} {evento['total']} arquivo(s) com {evento['trabalhadores']} trabalhador(es)...")
+        elif evento["tipo"] == "lote":
+            print(f"📦 Lote {evento['id']} ({evento['fase']}): {evento['status']}, "
+                  f"{evento['concluidas']}/{evento['total']} requisição(ões)")
+        elif evento["erro"]:
+            erros += 1
+            print(f"❌ {evento.get('arquivo') or evento.get('origem')}: {evento['erro']}", file=sys.stderr)
+        else:
+            processados += 1
+            print(f"✅ {evento.get('arquivo') or os.path.basename(evento['destino'])} ({evento['tempo']:.1f}s)")
+            if evento.get("cascata"):
+                print(f"   {descrever_cascata(evento['cascata'])}")
+                cascatas.append(evento["cascata"])
+    if len(cascatas) > 1:
+        print(f"Total: {descrever_cascata(somar_estatisticas(cascatas))}")
+    return processados, erros
+
+
+# ----- comandos -----
+
+def baixar(args, url: str):
+    from sincronizacao import listar_novos, baixar_em_paralelo, caminho_historico
+
+    arquivo_historico = caminho_historico(args.transcritos)
+    print("🔎 Listando vídeos...")
+    novos = listar_novos(url, arquivo_historico)
+    erros = 0
+    if not novos:
+        print("ℹ️ Nenhum vídeo novo.")
+    else:
+        print(f"🔽 Baixando {len(novos)} vídeo(s), {args.simultaneos} por vez...")
+        for tipo, _, titulo, detalhe in baixar_em_paralelo(novos, args.transcritos, arquivo_historico, args.simultaneos):
+            if tipo == "concluido":
+                print(f"✅ {titulo}")
+            elif tipo == "erro":
+                erros += 1
+                print(f"❌ {titulo}: {detalhe}", file=sys.stderr)
+    if args.so_baixar:
+        return 1 if erros else 0
+
+    _, erros_transcricao = mostrar_eventos(
+        transcrever_pasta(args.transcritos, args.modelo, args.processos, tamanho_lote=args.lote, **opcoes_transcricao(args)),
+        "📄 Transcrevendo"
+    )
+    _, erros_transliteracao = mostrar_eventos(
+        transliterar_pendentes(args.transcritos, args.transliterados, motor(args)), "🔄 Transliterando"
+    )
+    return 1 if erros or erros_transcricao or erros_transliteracao else 0
+
+
+def comando_canal(args):
+    return baixar(args, args.url)
+
+
+def comando_video(args):
+    return baixar(args, args.url)
+
+
+def comando_pasta(args):
+    esteira = montar_esteira(args.transcritos, args.modelo, motor(args), opcoes_transcricao(args), formato_audio=args.formato)
+
+    vigia = None
+    erros = 0
+    if args.vigiar:
+        from vigia import VigiaPasta
+
+        vigia = VigiaPasta(args.pasta, estabilidade=args.estabilidade, usar_polling=args.polling)
+        vigia.iniciar()
+        itens = (
+            item_video(caminho, args.transcritos, args.transliterados, recebido_em=detectado_em)
+            for caminho, detectado_em, _ in vigia.itens()
+        )
+        print(f"👁️ Vigiando {args.pasta} (Ctrl+C para parar)")
+    else:
+        itens = [
+            item_video(os.path.join(args.pasta, video), args.transcritos, args.transliterados)
+            for video in listar_videos_pasta(args.pasta)
+        ]
+        print(f"🎬 Processando {len(itens)} vídeo(s)...")
+        if args.processos != 1 or args.lote is not None:
+            # Pool ou lote: todos os áudios precisam existir antes; a esteira depois só translitera
+            formato = FORMATO_NPY if args.formato == FORMATO_MEMORIA else args.formato
+            pares, extraidos = [], []
+            for item in itens:
+                try:
+                    pares.append((extrair_audio(item["video"], args.transcritos, formato), item["transcricao"]))
+                except Exception as e:
+                    # Um vídeo corrompido não derruba a pasta inteira
+                    erros += 1
+                    print(f"❌ Extração falhou para {item['nome']}: {e}", file=sys.stderr)
+                else:
+                    extraidos.append(item)
+            itens = extraidos
+            mostrar_eventos(
+                transcrever_pares(pares, args.modelo, args.processos, tamanho_lote=args.lote, **opcoes_transcricao(args)),
+                "📄 Transcrevendo"
+            )
+
+    esteira.iniciar(itens)
+    try:
+        while True:
+            ativa = esteira.ativa()
+            for tipo, etapa, nome, erro in esteira.proximos_eventos():
+                if tipo == "erro":
+                    erros += 1
+                    print(f"❌ {etapa} falhou para {nome}: {erro}", file=sys.stderr)
+                elif etapa == esteira.etapas[0].nome and esteira.latencias:
+                    print(f"{etapa} concluída: {nome} (chegada → início {esteira.latencias[-1]:.1f}s)")
+                else:
+                    print(f"{etapa} concluída: {nome}")
+            if not ativa:
+                break
+            time.sleep(0.5)
+    except KeyboardInterrupt:
+        print("⏹️ Parando...")
+        esteira.cancelar()
+    finally:
+        if vigia is not None:
+            vigia.parar()
+
+    latencia = esteira.latencia()
+    if latencia:
+        print(f"⏱️ Chegada → início: mediana {latencia['mediana']:.1f}s, máxima {latencia['maxima']:.1f}s")
+    resumo_cascata = somar_estatisticas([item.get("cascata") for item in esteira.resultados])
+    if resumo_cascata:
+        print(descrever_cascata(resumo_cascata))
+    print(f"🎉 {len(esteira.resultados)} vídeo(s) processado(s), {erros} erro(s)")
+    return 1 if erros else 0
+
+
+def comando_transliterar(args):
+    if args.batch:
+        eventos = transliterar_pela_batch_api(
+            args.transcritos, args.transliterados, motor(args), not args.sem_esperar, args.intervalo
+        )
+    else:
+        eventos = transliterar_pendentes(args.transcritos, args.transliterados, motor(args))
+    _, erros = mostrar_eventos(eventos, "🔄 Transliterando")
+    return 1 if erros else 0
+
+
+def comando_metricas(args):
+    agregador = Agregador()
+    if args.arquivo:
+        agregador.gravar_prometheus(args.arquivo)
+    if args.servir:
+        servir_prometheus(args.servir, agregador, args.endereco)
+        print(f"📈 Servindo http://{args.endereco}:{args.servir}/metrics (Ctrl+C para parar)", file=sys.stderr)
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            return 0
+    if not args.arquivo:
+        print(agregador.prometheus(), end="")
+    return 0
+
+
+def comando_trabalhos(args):
+    fila = FilaTrabalhos(os.path.join(args.transcritos, ARQUIVO_FILA))
+    if args.cancelar:
+        fila.cancelar(args.cancelar)
+    if args.repetir:
+        fila.repetir(args.repetir)
+    if args.limpar:
+        print(f"🧹 {fila.remover_terminados()} trabalho(s) removido(s)")
+    lista = fila.listar(limite=args.limite)
+    if args.json:
+        print(json.dumps(lista, ensure_ascii=False))
+        return 0
+    if not lista:
+        print("ℹ️ Nenhum trabalho na fila.")
+    for trabalho in lista:
+        print(f"#{trabalho['id']} [{trabalho['status']}] prioridade {trabalho['prioridade']} • {trabalho['titulo']} "
+              f"• {trabalho['progresso'] * 100:.0f}% {trabalho['mensagem'] or ''}".rstrip())
+        if trabalho["erro"]:
+            print(f"   ❌ {trabalho['erro']}")
+    return 0
+
+
+def comando_buscar(args):
+    indice = obter_indice_busca(args.transcritos, args.transliterados)
+    if not args.sem_atualizar:
+        novos, alterados, removidos = indice.atualizar()
+        if novos or alterados or removidos:
+            print(f"🗂️ Índice: {novos} novo(s), {alterados} alterado(s), {removidos} removido(s)", file=sys.stderr)
+    inicio = time.perf_counter()
+    resultados = indice.buscar(args.consulta, args.limite, args.origem)
+    duracao = (time.perf_counter() - inicio) * 1000
+    if args.json:
+        print(json.dumps(resultados, ensure_ascii=False))
+        return 0
+    print(f"🔎 {len(resultados)} resultado(s) em {duracao:.1f} ms", file=sys.stderr)
+    for posicao, resultado in enumerate(resultados, 1):
+        print(f"{posicao}. [{resultado['origem']}] {resultado['caminho']} • relevância {resultado['pontuacao']:.2f}")
+        if resultado["trecho"]:
+            print(f"   {resultado['trecho']}")
+    return 0
+
+
+def comando_executor(args):
+    vagas = {RECURSO_CPU: args.vagas_cpu, RECURSO_GPU: args.vagas_gpu, RECURSO_API: args.vagas_api}
+    executor = ExecutorTrabalhos(args.transcritos, args.trabalhadores, vagas).iniciar()
+    print(f"🧵 Executando a fila de {args.transcritos} com {args.trabalhadores} trabalhador(es) (Ctrl+C para parar)")
+    vistos = {}
+    try:
+        while True:
+            time.sleep(1.0)
+            for trabalho in executor.fila.listar():
+                if vistos.get(trabalho["id"]) != trabalho["status"]:
+                    vistos[trabalho["id"]] = trabalho["status"]
+                    print(f"#{trabalho['id']} {trabalho['titulo']}: {trabalho['status']}"
+                          + (f" ({trabalho['erro']})" if trabalho["erro"] else ""))
+            if args.ate_esvaziar and executor.ocioso():
+                break
+    except KeyboardInterrupt:
+        # Os trabalhos interrompidos voltam para a fila e recomeçam na próxima execução
+        print("⏹️ Parando...")
+    finally:
+        executor.parar(aguardar=30)
+    return 0
+
+
+def comando_status(args):
+    dados = resumo(args.transcritos, args.transliterados)
+    dados["inicializacao"] = medir_inicializacao()
+    if args.json:
+        print(json.dumps(dados, ensure_ascii=False))
+        return 0
+
+    print(f"🎵 Áudios: {dados['audios']}")
+    for etapa in ("transcricao", "transliteracao"):
+        contagem = ", ".join(f"{status}: {quantidade}" for status, quantidade in dados[etapa].items())
+        print(f"📋 {etapa}: {contagem}")
+    if dados["documentos"]:
+        print(f"📝 {dados['documentos']['documentos']} documento(s), {dados['documentos']['palavras']} palavras")
+    if dados["lote_openai"]:
+        contagem = ", ".join(f"{status}: {quantidade}" for status, quantidade in dados["lote_openai"]["itens"].items())
+        print(f"📦 Batch API ({dados['lote_openai']['fase']}): {contagem}")
+        for lote in dados["lote_openai"]["lotes"]:
+            print(f"   {lote['id'] or 'não enviado'}: {lote['status'] or '-'} {lote['concluidas'] or 0}/{lote['total'] or '?'}")
+    return 0
+
+
+# ----- argumentos -----
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description="Transcrição e transliteração de vídeos sem a interface Streamlit")
+    parser.add_argument("--transcritos", default=PASTA_TRANSCRITOS_PADRAO, help="pasta dos áudios e transcrições")
+    parser.add_argument("--transliterados", default=PASTA_TRANSLITERADOS_PADRAO, help="pasta das transliterações")
+    parser.add_argument("--tempo-importacao", action="store_true",
+                        help="imprime (em stderr) o tempo de importação e os módulos pesados carregados")
+    parser.add_argument("--perfilar", metavar="ITEM", help="roda o profiler só no item cujo nome contém ITEM")
+    parser.add_argument("--tipo-perfil", default=PERFIL_CPROFILE, choices=[PERFIL_CPROFILE, PERFIL_TORCH])
+    parser.add_argument("--precisao", choices=[PRECISAO_FP32, PRECISAO_FP16, PRECISAO_INT8],
+                        help="precisão do Whisper (padrão: fp16 na GPU, fp32 na CPU; int8 = quantizado na CPU)")
+    parser.add_argument("--threads", type=int, default=0, help="threads do torch por processo (0 = padrão)")
+    parser.add_argument("--sem-cache-int8", action="store_true", help="não guardar o checkpoint quantizado em disco")
+    parser.add_argument("--metricas-porta", type=int, help="expõe /metrics nesta porta enquanto o comando roda")
+
+    processamento = argparse.ArgumentParser(add_help=False)
+    processamento.add_argument("--modelo", default="small", choices=MODELOS_WHISPER)
+    processamento.add_argument("--idioma", default="pt")
+    processamento.add_argument("--processos", type=int, default=1, help="1 = sequencial, 0 = automático")
+    processamento.add_argument("--lote", type=int, metavar="N",
+                               help="decodifica janelas de vários clipes curtos juntas (0 = tamanho pela memória livre)")
+    processamento.add_argument("--cascata", metavar="MODELO", choices=MODELOS_WHISPER,
+                               help="refaz com este modelo maior só os segmentos incertos")
+    processamento.add_argument("--limite-logprob", type=float, default=LIMITES_CASCATA_PADRAO["logprob"])
+    processamento.add_argument("--limite-compressao", type=float, default=LIMITES_CASCATA_PADRAO["compressao"])
+    processamento.add_argument("--limite-sem-fala", type=float, default=LIMITES_CASCATA_PADRAO["sem_fala"])
+    processamento.add_argument("--cache", default=None, help="pasta do cache de resultados (desligado se omitido)")
+    processamento.add_argument("--vad", action="store_true", help="pular silêncio e música antes do Whisper")
+    processamento.add_argument("--janelas", action="store_true", help="transcrever em janelas com checkpoints")
+    processamento.add_argument("--formato", default=FORMATO_MP3, choices=[FORMATO_MP3, FORMATO_NPY, FORMATO_MEMORIA])
+    processamento.add_argument("--concorrencia", type=int, default=4, help="chamadas simultâneas à API")
+    processamento.add_argument("--rpm", type=int, default=500, help="requisições por minuto")
+    processamento.add_argument("--tpm", type=int, default=30000, help="tokens por minuto")
+    processamento.add_argument("--tokens-por-bloco", type=int, default=12000, help="0 = sem divisão")
+    processamento.add_argument("--sobreposicao", type=int, default=200)
+
+    download = argparse.ArgumentParser(add_help=False)
+    download.add_argument("url")
+    download.add_argument("--simultaneos", type=int, default=4, help="downloads simultâneos")
+    download.add_argument("--so-baixar", action="store_true", help="não transcrever nem transliterar")
+
+    comandos = parser.add_subparsers(dest="comando", required=True)
+    comandos.add_parser("canal", parents=[download, processamento],
+                        help="baixa os vídeos novos do canal e processa").set_defaults(funcao=comando_canal)
+    comandos.add_parser("video", parents=[download, processamento],
+                        help="baixa um vídeo e processa").set_defaults(funcao=comando_video)
+
+    pasta = comandos.add_parser("pasta", parents=[processamento], help="processa os vídeos de uma pasta local")
+    pasta.add_argument("pasta")
+    pasta.add_argument("--vigiar", action="store_true", help="continua processando os vídeos que chegarem")
+    pasta.add_argument("--estabilidade", type=float, default=2.0,
+                       help="segundos sem alteração para considerar o arquivo completo")
+    pasta.add_argument("--polling", action="store_true", help="varredura periódica (pastas de rede)")
+    pasta.set_defaults(funcao=comando_pasta)
+
+    transliterar = comandos.add_parser("transliterar", parents=[processamento],
+                                       help="translitera as transcrições pendentes")
+    transliterar.add_argument("--batch", action="store_true",
+                              help="envia tudo pela Batch API da OpenAI (mais barato, até 24 h); retoma o lote em andamento")
+    transliterar.add_argument("--sem-esperar", action="store_true",
+                              help="com --batch: envia/consulta/ingere uma vez e sai (para rodar pelo cron)")
+    transliterar.add_argument("--intervalo", type=float, default=30.0, help="com --batch: segundos entre consultas")
+    transliterar.set_defaults(funcao=comando_transliterar)
+
+    metricas = comandos.add_parser("metricas", help="exporta as métricas por etapa no formato do Prometheus")
+    metricas.add_argument("--arquivo", help="grava em arquivo (textfile collector do node_exporter)")
+    metricas.add_argument("--servir", type=int, metavar="PORTA", help="serve /metrics nesta porta")
+    metricas.add_argument("--endereco", default="127.0.0.1")
+    metricas.set_defaults(funcao=comando_metricas)
+
+    trabalhos = comandos.add_parser("trabalhos", help="lista os trabalhos enviados pelo app (e cancela ou repete)")
+    trabalhos.add_argument("--cancelar", type=int, metavar="ID")
+    trabalhos.add_argument("--repetir", type=int, metavar="ID", help="devolve à fila um trabalho que falhou ou foi cancelado")
+    trabalhos.add_argument("--limpar", action="store_true", help="remove os trabalhos terminados")
+    trabalhos.add_argument("--limite", type=int, default=50)
+    trabalhos.add_argument("--json", action="store_true")
+    trabalhos.set_defaults(funcao=comando_trabalhos)
+
+    executor = comandos.add_parser("executor", help="executa a fila de trabalhos sem a interface")
+    executor.add_argument("--trabalhadores", type=int, default=TRABALHADORES_PADRAO)
+    executor.add_argument("--vagas-cpu", type=int, default=VAGAS_PADRAO[RECURSO_CPU])
+    executor.add_argument("--vagas-gpu", type=int, default=VAGAS_PADRAO[RECURSO_GPU])
+    executor.add_argument("--vagas-api", type=int, default=VAGAS_PADRAO[RECURSO_API])
+    executor.add_argument("--ate-esvaziar", action="store_true", help="sai quando a fila acabar")
+    executor.set_defaults(funcao=comando_executor)
+
+    buscar = comandos.add_parser("buscar", help="busca por relevância no conteúdo transcrito e transliterado")
+    buscar.add_argument("consulta")
+    buscar.add_argument("--limite", type=int, default=10)
+    buscar.add_argument("--origem", choices=[ORIGEM_TRANSLITERADO, ORIGEM_TRANSCRICAO])
+    buscar.add_argument("--sem-atualizar", action="store_true", help="não varre as pastas antes de buscar")
+    buscar.add_argument("--json", action="store_true")
+    buscar.set_defaults(funcao=comando_buscar)
+
+    status = comandos.add_parser("status", help="mostra o andamento sem carregar modelos")
+    status.add_argument("--json", action="store_true")
+    status.set_defaults(funcao=comando_status)
+    return parser
+
+
+def main(argv=None):
+    parser = criar_parser()
+    args = parser.parse_args(argv)
+    if getattr(args, "vigiar", False) and (args.processos != 1 or args.lote is not None):
+        # Vigiando, cada vídeo segue sozinho pela esteira: não há pool nem lote para montar
+        parser.error("--processos e --lote não se aplicam com --vigiar")
+    if args.tempo_importacao:
+        print(json.dumps(medir_inicializacao()), file=sys.stderr)
+    criar_pastas(args.transcritos, args.transliterados)
+    configurar_perfil(args.perfilar, args.tipo_perfil)
+    configurar_inferencia(args.precisao, args.threads, not args.sem_cache_int8)
+    if args.metricas_porta:
+        servir_prometheus(args.metricas_porta)
+    return args.funcao(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,148 @@
+import queue
+import threading
+import time
+
+# =========================
+# ESTEIRA DE ETAPAS
+# =========================
+# Cada etapa roda em sua própria thread e se comunica com a seguinte por uma
+# fila limitada. Assim a extração do vídeo N+1 e a transliteração do vídeo N-1
+# acontecem enquanto o vídeo N é transcrito, e uma etapa rápida fica bloqueada
+# (back-pressure) em vez de acumular itens na memória.
+
+_FIM = object()
+
+
+class Etapa:
+    """Uma etapa da esteira e suas métricas"""
+
+    def __init__(self, nome: str, funcao):
+        self.nome = nome
+        self.funcao = funcao
+        self.entrada = None
+        self.concluidos = 0
+        self.erros = 0
+        self.tempo_ocupado = 0.0
+        self.iniciada_em = None
+        self.item_atual = None
+
+    def metricas(self):
+        decorrido = time.monotonic() - self.iniciada_em if self.iniciada_em else 0.0
+        return {
+            "etapa": self.nome,
+            "fila": self.entrada.qsize() if self.entrada is not None else 0,
+            "concluidos": self.concluidos,
+            "erros": self.erros,
+            "por_minuto": self.concluidos * 60.0 / decorrido if decorrido > 0 else 0.0,
+            "ocupacao": self.tempo_ocupado / decorrido if decorrido > 0 else 0.0,
+            "item_atual": self.item_atual,
+        }
+
+
+class Esteira:
+    """Encadeia etapas `funcao(item) -> item` com filas limitadas entre elas
+
+    Um item que falha em uma etapa é registrado em `eventos` e não segue adiante.
+    Se o item trouxer "recebido_em" (time.time()), a espera até a primeira etapa
+    começar a processá-lo entra em `latencias`.
+    """
+
+    def __init__(self, etapas, capacidade: int = 2):
+        self.etapas = [Etapa(nome, funcao) for nome, funcao in etapas]
+        for etapa in self.etapas:
+            etapa.entrada = queue.Queue(maxsize=max(1, capacidade))
+        self.eventos = queue.Queue()
+        self.historico = []
+        self.resultados = []
+        self.latencias = []
+        self._threads = []
+        self._cancelada = threading.Event()
+
+    def _executar_etapa(self, indice: int):
+        etapa = self.etapas[indice]
+        seguinte = self.etapas[indice + 1].entrada if indice + 1 < len(self.etapas) else None
+        etapa.iniciada_em = time.monotonic()
+
+        while True:
+            item = etapa.entrada.get()
+            if item is _FIM:
+                if seguinte is not None:
+                    seguinte.put(_FIM)
+                return
+            if self._cancelada.is_set():
+                continue
+
+            if indice == 0 and item.get("recebido_em") is not None:
+                self.latencias.append(time.time() - item["recebido_em"])
+            etapa.item_atual = item.get("nome")
+            inicio = time.monotonic()
+            try:
+                item = etapa.funcao(item)
+            except Exception as e:
+                etapa.erros += 1
+                self.eventos.put(("erro", etapa.nome, item.get("nome"), str(e)))
+                continue
+            finally:
+                etapa.tempo_ocupado += time.monotonic() - inicio
+                etapa.item_atual = None
+
+            etapa.concluidos += 1
+            self.eventos.put(("concluido", etapa.nome, item.get("nome"), None))
+            if seguinte is not None:
+                seguinte.put(item)
+            else:
+                self.resultados.append(item)
+
+    def iniciar(self, itens):
+        """Dispara as threads das etapas e alimenta a primeira fila"""
+        for indice, etapa in enumerate(self.etapas):
+            thread = threading.Thread(target=self._executar_etapa, args=(indice,), name=f"esteira-{etapa.nome}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+        def alimentar():
+            for item in itens:
+                if self._cancelada.is_set():
+                    break
+                self.etapas[0].entrada.put(item)
+            self.etapas[0].entrada.put(_FIM)
+
+        alimentador = threading.Thread(target=alimentar, name="esteira-entrada", daemon=True)
+        alimentador.start()
+        self._threads.append(alimentador)
+
+    def cancelar(self):
+        """Descarta os itens ainda não processados"""
+        self._cancelada.set()
+
+    def ativa(self):
+        return any(thread.is_alive() for thread in self._threads)
+
+    def aguardar(self, timeout: float = None):
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def proximos_eventos(self):
+        """Esvazia a fila de eventos (chamar da thread da interface)"""
+        eventos = []
+        while True:
+            try:
+                eventos.append(self.eventos.get_nowait())
+            except queue.Empty:
+                self.historico.extend(eventos)
+                return eventos
+
+    def metricas(self):
+        return [etapa.metricas() for etapa in self.etapas]
+
+    def latencia(self):
+        """Resumo da espera entre a chegada de um item e o início do processamento"""
+        if not self.latencias:
+            return None
+        ordenadas = sorted(self.latencias)
+        return {
+            "quantidade": len(ordenadas),
+            "mediana": ordenadas[len(ordenadas) // 2],
+            "maxima": ordenadas[-1],
+            "ultima": self.latencias[-1],
+        }
@@ -0,0 +1,152 @@
+import os
+import sqlite3
+import threading
+
+# =========================
+# ÍNDICE DE DOCUMENTOS
+# =========================
+# Guarda nome, tamanho, mtime, contagem de palavras e o início de cada
+# documento gerado. Só arquivos novos ou com mtime/tamanho diferentes são
+# lidos de novo, então a aba de resultados lista milhares de documentos sem
+# abrir nenhum deles; o conteúdo completo é carregado sob demanda.
+
+ARQUIVO_INDICE = ".indice-documentos.sqlite3"
+SUFIXO_TRANSLITERADO = "-Transliterado.txt"
+
+LINHAS_PREVIA = 3
+CARACTERES_PREVIA = 300
+TAMANHO_LEITURA = 1024 * 1024
+
+
+def _resumir(caminho: str):
+    """Conta as palavras e pega as primeiras linhas lendo o arquivo em blocos"""
+    palavras = 0
+    linhas = []
+    resto = ""
+    with open(caminho, "r", encoding="utf-8", errors="replace") as f:
+        for bloco in iter(lambda: f.read(TAMANHO_LEITURA), ""):
+            bloco = resto + bloco
+            # Uma palavra pode ter sido cortada no fim do bloco
+            corte = max(bloco.rfind(" "), bloco.rfind("\n"))
+            if corte == -1:
+                resto = bloco
+                continue
+            bloco, resto = bloco[:corte], bloco[corte:]
+            palavras += len(bloco.split())
+            if len(linhas) < LINHAS_PREVIA:
+                linhas.extend(l.strip() for l in bloco.splitlines() if l.strip())
+    palavras += len(resto.split())
+    if len(linhas) < LINHAS_PREVIA:
+        linhas.extend(l.strip() for l in resto.splitlines() if l.strip())
+    return palavras, "\n".join(linhas[:LINHAS_PREVIA])[:CARACTERES_PREVIA]
+
+
+class IndiceDocumentos:
+    """Índice SQLite dos documentos de uma pasta, invalidado por mtime"""
+
+    def __init__(self, pasta: str, sufixo: str = SUFIXO_TRANSLITERADO):
+        self.pasta = pasta
+        self.sufixo = sufixo
+        self._lock = threading.Lock()
+        os.makedirs(pasta, exist_ok=True)
+        self._conexao = sqlite3.connect(os.path.join(pasta, ARQUIVO_INDICE), timeout=30, check_same_thread=False)
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS documentos (
+                nome TEXT PRIMARY KEY,
+                tamanho INTEGER NOT NULL,
+                mtime REAL NOT NULL,
+                palavras INTEGER NOT NULL,
+                previa TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_documentos_mtime ON documentos (mtime);
+        """)
+        self._conexao.commit()
+
+    def _gravar(self, nome: str, info):
+        palavras, previa = _resumir(os.path.join(self.pasta, nome))
+        self._conexao.execute(
+            "INSERT OR REPLACE INTO documentos VALUES (?, ?, ?, ?, ?)",
+            (nome, info.st_size, info.st_mtime, palavras, previa)
+        )
+
+    def atualizar(self):
+        """Sincroniza com a pasta lendo só o que mudou; retorna (novos, alterados, removidos)"""
+        novos = alterados = 0
+        with self._lock:
+            conhecidos = {
+                nome: (tamanho, mtime)
+                for nome, tamanho, mtime in self._conexao.execute("SELECT nome, tamanho, mtime FROM documentos")
+            }
+            for entrada in os.scandir(self.pasta):
+                if not entrada.name.endswith(self.sufixo) or not entrada.is_file():
+                    continue
+                anterior = conhecidos.pop(entrada.name, None)
+                try:
+                    info = entrada.stat()
+                    if anterior == (info.st_size, info.st_mtime):
+                        continue
+                    self._gravar(entrada.name, info)
+                except FileNotFoundError:
+                    # Apagado ou renomeado durante a varredura: sai do índice como os demais removidos
+                    if anterior is not None:
+                        conhecidos[entrada.name] = anterior
+                    continue
+                if anterior is None:
+                    novos += 1
+                else:
+                    alterados += 1
+
+            self._conexao.executemany("DELETE FROM documentos WHERE nome = ?", [(nome,) for nome in conhecidos])
+            self._conexao.commit()
+        return novos, alterados, len(conhecidos)
+
+    def registrar(self, caminho: str):
+        """Atualiza um único documento recém-gravado, sem varrer a pasta"""
+        with self._lock:
+            self._gravar(os.path.basename(caminho), os.stat(caminho))
+            self._conexao.commit()
+
+    def totais(self):
+        """Quantidade de documentos, palavras e bytes"""
+        with self._lock:
+            documentos, palavras, tamanho = self._conexao.execute(
+                "SELECT COUNT(*), COALESCE(SUM(palavras), 0), COALESCE(SUM(tamanho), 0) FROM documentos"
+            ).fetchone()
+        return {"documentos": documentos, "palavras": palavras, "bytes": tamanho}
+
+    def contar(self, filtro: str = ""):
+        with self._lock:
+            return self._conexao.execute(
+                "SELECT COUNT(*) FROM documentos WHERE nome LIKE ?", (f"%{filtro}%",)
+            ).fetchone()[0]
+
+    def pagina(self, numero: int, por_pagina: int = 20, filtro: str = "", recentes_primeiro: bool = True):
+        """Metadados de uma página: [{nome, tamanho, mtime, palavras, previa}]"""
+        ordem = "mtime DESC" if recentes_primeiro else "nome"
+        with self._lock:
+            cursor = self._conexao.execute(
+                f"SELECT nome, tamanho, mtime, palavras, previa FROM documentos WHERE nome LIKE ? "
+                f"ORDER BY {ordem} LIMIT ? OFFSET ?",
+                (f"%{filtro}%", por_pagina, max(0, numero - 1) * por_pagina)
+            )
+            colunas = [coluna[0] for coluna in cursor.description]
+            return [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+
+    def ler(self, nome: str):
+        """Conteúdo completo de um documento (só quando o usuário pede)"""
+        with open(os.path.join(self.pasta, nome), "r", encoding="utf-8") as f:
+            return f.read()
+
+
+_indices = {}
+_lock_indices = threading.Lock()
+
+
+def obter_indice(pasta: str):
+    """Uma instância por pasta e por processo"""
+    chave = os.path.abspath(pasta)
+    with _lock_indices:
+        indice = _indices.get(chave)
+        if indice is None:
+            indice = _indices[chave] = IndiceDocumentos(pasta)
+        return indice
@@ -0,0 +1,243 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================
+# MÉTRICAS POR ETAPA
+# =========================
+# Cada etapa (download, extração, carregamento do modelo, transcrição,
+# chamada ao GPT, gravação de arquivo) grava um evento JSONL com duração e
+# campos próprios. O arquivo é a fonte da verdade: processos do pool também
+# escrevem nele, e a exportação no formato de texto do Prometheus agrega o
+# que foi anexado desde a última leitura.
+
+PASTA_METRICAS = os.environ.get("METRICAS_DIR", ".metricas")
+ARQUIVO_EVENTOS = "eventos.jsonl"
+
+# Limites dos buckets do histograma de duração (segundos)
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800, float("inf"))
+
+# Campos numéricos somados como contadores no Prometheus
+CAMPOS_SOMADOS = ("segundos_audio", "tokens_entrada", "tokens_saida", "bytes", "segundos_escalados", "segundos_economizados")
+
+_lock = threading.Lock()
+_desligado = os.environ.get("METRICAS_DESLIGADAS") == "1"
+
+
+def caminho_eventos(pasta: str = None):
+    return os.path.join(pasta or PASTA_METRICAS, ARQUIVO_EVENTOS)
+
+
+def registrar(etapa: str, duracao: float, erro: str = None, **campos):
+    """Anexa um evento ao JSONL (uma linha por evento, segura entre processos)"""
+    if _desligado:
+        return
+    evento = {"ts": time.time(), "etapa": etapa, "duracao": round(duracao, 6), "pid": os.getpid(), **campos}
+    if erro:
+        evento["erro"] = erro
+    linha = json.dumps(evento, ensure_ascii=False) + "\n"
+    caminho = caminho_eventos()
+    with _lock:
+        os.makedirs(os.path.dirname(caminho), exist_ok=True)
+        # Uma escrita O_APPEND por linha não se mistura com a de outro processo
+        descritor = os.open(caminho, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(descritor, linha.encode("utf-8"))
+        finally:
+            os.close(descritor)
+
+
+@contextmanager
+def medir(etapa: str, **campos):
+    """Mede o bloco e registra o evento; campos podem ser acrescentados no dicionário devolvido"""
+    inicio = time.perf_counter()
+    try:
+        yield campos
+    except Exception as e:
+        registrar(etapa, time.perf_counter() - inicio, erro=str(e), **campos)
+        raise
+    registrar(etapa, time.perf_counter() - inicio, **campos)
+
+
+# =========================
+# AGREGAÇÃO E EXPORTAÇÃO
+# =========================
+
+class Agregador:
+    """Lê o JSONL de forma incremental e mantém contadores e histogramas por etapa"""
+
+    def __init__(self, caminho: str = None):
+        self.caminho = caminho or caminho_eventos()
+        self.posicao = 0
+        self.etapas = {}
+        self._lock = threading.Lock()
+
+    def atualizar(self):
+        if not os.path.exists(self.caminho):
+            return
+        with self._lock, open(self.caminho, "rb") as f:
+            if os.path.getsize(self.caminho) < self.posicao:
+                # Arquivo truncado ou rotacionado: recomeça
+                self.posicao = 0
+                self.etapas = {}
+            f.seek(self.posicao)
+            for linha in f:
+                if not linha.endswith(b"\n"):
+                    # Linha ainda sendo escrita; fica para a próxima leitura
+                    break
+                self.posicao += len(linha)
+                try:
+                    self._somar(json.loads(linha))
+                except ValueError:
+                    continue
+
+    def _somar(self, evento):
+        etapa = self.etapas.setdefault(evento["etapa"], {
+            "quantidade": 0, "erros": 0, "soma": 0.0, "maximo": 0.0,
+            "buckets": [0] * len(BUCKETS), "somas": dict.fromkeys(CAMPOS_SOMADOS, 0),
+        })
+        duracao = evento.get("duracao", 0.0)
+        etapa["quantidade"] += 1
+        etapa["erros"] += 1 if evento.get("erro") else 0
+        etapa["soma"] += duracao
+        etapa["maximo"] = max(etapa["maximo"], duracao)
+        for i, limite in enumerate(BUCKETS):
+            if duracao <= limite:
+                etapa["buckets"][i] += 1
+        for campo in CAMPOS_SOMADOS:
+            valor = evento.get(campo)
+            if isinstance(valor, (int, float)):
+                etapa["somas"][campo] += valor
+
+    def resumo(self):
+        """{etapa: {quantidade, erros, media, maximo, segundos_audio, tokens...}}"""
+        self.atualizar()
+        with self._lock:
+            return {
+                nome: {
+                    "quantidade": dados["quantidade"],
+                    "erros": dados["erros"],
+                    "media": dados["soma"] / dados["quantidade"] if dados["quantidade"] else 0.0,
+                    "maximo": dados["maximo"],
+                    **dados["somas"],
+                }
+                for nome, dados in sorted(self.etapas.items())
+            }
+
+    def prometheus(self):
+        """Texto no formato de exposição do Prometheus"""
+        self.atualizar()
+        linhas = [
+            "# HELP pipeline_etapa_duracao_segundos Duração de cada etapa do pipeline",
+            "# TYPE pipeline_etapa_duracao_segundos histogram",
+        ]
+        with self._lock:
+            etapas = sorted(self.etapas.items())
+            for nome, dados in etapas:
+                for limite, quantidade in zip(BUCKETS, dados["buckets"]):
+                    le = "+Inf" if limite == float("inf") else repr(limite)
+                    linhas.append(f'pipeline_etapa_duracao_segundos_bucket{{etapa="{nome}",le="{le}"}} {quantidade}')
+                linhas.append(f'pipeline_etapa_duracao_segundos_sum{{etapa="{nome}"}} {dados["soma"]}')
+                linhas.append(f'pipeline_etapa_duracao_segundos_count{{etapa="{nome}"}} {dados["quantidade"]}')
+
+            linhas += ["# HELP pipeline_etapa_erros_total Eventos com erro", "# TYPE pipeline_etapa_erros_total counter"]
+            linhas += [f'pipeline_etapa_erros_total{{etapa="{nome}"}} {dados["erros"]}' for nome, dados in etapas]
+
+            for campo in CAMPOS_SOMADOS:
+                metrica = f"pipeline_{campo}_total"
+                valores = [(nome, dados["somas"][campo]) for nome, dados in etapas if dados["somas"][campo]]
+                if valores:
+                    linhas += [f"# TYPE {metrica} counter"]
+                    linhas += [f'{metrica}{{etapa="{nome}"}} {valor}' for nome, valor in valores]
+        return "\n".join(linhas) + "\n"
+
+    def gravar_prometheus(self, caminho: str):
+        """Grava o texto para o textfile collector do node_exporter (troca atômica)"""
+        temporario = f"{caminho}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(self.prometheus())
+        os.replace(temporario, caminho)
+
+
+def servir_prometheus(porta: int, agregador: Agregador = None, endereco: str = "127.0.0.1"):
+    """Sobe um endpoint /metrics numa thread e devolve o servidor"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    agregador = agregador or Agregador()
+
+    class Manipulador(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.rstrip("/") != "/metrics":
+                self.send_error(404)
+                return
+            corpo = agregador.prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+        def log_message(self, *args):
+            pass
+
+    servidor = ThreadingHTTPServer((endereco, porta), Manipulador)
+    threading.Thread(target=servidor.serve_forever, name="metricas-http", daemon=True).start()
+    return servidor
+
+
+# =========================
+# PERFILAMENTO SOB DEMANDA
+# =========================
+# Liga o cProfile (ou o profiler do torch) para um único item, escolhido pelo
+# nome. A escolha fica em variáveis de ambiente para valer também nos
+# processos do pool.
+
+PERFIL_CPROFILE = "cprofile"
+PERFIL_TORCH = "torch"
+
+
+def configurar_perfil(item: str = None, tipo: str = PERFIL_CPROFILE):
+    """Define qual item será perfilado (None desliga)"""
+    if item:
+        os.environ["PERFILAR_ITEM"] = item
+        os.environ["PERFILAR_TIPO"] = tipo
+    else:
+        os.environ.pop("PERFILAR_ITEM", None)
+        os.environ.pop("PERFILAR_TIPO", None)
+
+
+@contextmanager
+def perfilar(item: str):
+    """Perfila o bloco se `item` contiver o nome configurado; grava em .metricas/perfis"""
+    alvo = os.environ.get("PERFILAR_ITEM")
+    if not alvo or alvo not in str(item):
+        yield None
+        return
+
+    pasta = os.path.join(PASTA_METRICAS, "perfis")
+    os.makedirs(pasta, exist_ok=True)
+    base = os.path.join(pasta, f"{os.path.basename(str(item))}-{time.strftime('%Y%m%d-%H%M%S')}")
+
+    if os.environ.get("PERFILAR_TIPO") == PERFIL_TORCH:
+        from torch.profiler import profile, ProfilerActivity
+        import torch
+
+        atividades = [ProfilerActivity.CPU] + ([ProfilerActivity.CUDA] if torch.cuda.is_available() else [])
+        with profile(activities=atividades, record_shapes=True) as perfil:
+            yield perfil
+        # Abre no chrome://tracing ou no Perfetto
+        perfil.export_chrome_trace(f"{base}.json")
+        return
+
+    import cProfile
+
+    perfil = cProfile.Profile()
+    perfil.enable()
+    try:
+        yield perfil
+    finally:
+        perfil.disable()
+        # Abre com snakeviz ou python -m pstats
+        perfil.dump_stats(f"{base}.prof")
@@ -0,0 +1,325 @@
+import gc
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from metricas import medir
+
+# =========================
+# REGISTRO DE MODELOS WHISPER
+# =========================
+# O Streamlit reexecuta o app.py a cada interação, mas os módulos importados
+# continuam em sys.modules. Por isso o registro vive aqui, no nível do módulo,
+# e é compartilhado por todas as reexecuções e sessões do mesmo processo.
+
+LIMITE_RAM_PADRAO_MB = int(os.environ.get("WHISPER_LIMITE_RAM_MB", "0")) or None
+
+
+def memoria_total_bytes():
+    """Retorna a memória física total da máquina (ou None se indisponível)"""
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def dispositivo_padrao():
+    """Retorna 'cuda' se houver GPU disponível, senão 'cpu'"""
+    import torch
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def precisao_configurada():
+    """Precisão escolhida pelo usuário (configurar_inferencia) ou None para automático"""
+    return os.environ.get("WHISPER_PRECISAO") or None
+
+
+def precisao_padrao(dispositivo: str):
+    """fp16 só faz sentido na GPU; na CPU o Whisper roda em fp32, ou int8 se configurado"""
+    configurada = precisao_configurada()
+    if configurada in (PRECISAO_FP32, PRECISAO_INT8):
+        return configurada
+    return PRECISAO_FP16 if dispositivo == "cuda" else PRECISAO_FP32
+
+
+def tamanho_residente(model):
+    """Calcula quantos bytes os pesos do modelo ocupam (inclusive os quantizados)"""
+    total = 0
+    tensores = list(model.parameters()) + list(model.buffers())
+    # Os pesos int8 ficam empacotados fora de parameters(); o state_dict os expõe
+    for valor in model.state_dict().values():
+        if isinstance(valor, tuple):
+            tensores.extend(t for t in valor if hasattr(t, "element_size"))
+        elif getattr(valor, "is_quantized", False):
+            tensores.append(valor)
+    for tensor in tensores:
+        total += tensor.numel() * tensor.element_size()
+    return total
+
+
+# =========================
+# MOTOR DE INFERÊNCIA
+# =========================
+# Sem GPU, medium e large em fp32 são lentos demais. A precisão int8 aplica a
+# quantização dinâmica do torch às camadas lineares (pesos em int8, ativações
+# quantizadas a cada chamada), o que reduz a memória e acelera a CPU. Todas as
+# precisões passam pela mesma interface: obter_modelo devolve um
+# ModeloCarregado com model.transcribe e as opções certas.
+#
+# A escolha fica em variáveis de ambiente para valer também nos processos do pool.
+
+PRECISAO_FP32 = "fp32"
+PRECISAO_FP16 = "fp16"
+PRECISAO_INT8 = "int8"
+PRECISOES = (PRECISAO_FP32, PRECISAO_FP16, PRECISAO_INT8)
+
+# Checkpoints já quantizados, para não repetir a quantização a cada carregamento
+PASTA_INT8 = os.environ.get("WHISPER_INT8_DIR", os.path.join(os.path.expanduser("~"), ".cache", "whisper-int8"))
+
+
+def configurar_inferencia(precisao: str = None, threads: int = 0, guardar_int8: bool = True):
+    """Define a precisão padrão (None = automático), as threads do torch (0 = padrão) e o cache int8"""
+    for variavel, valor in (
+        ("WHISPER_PRECISAO", precisao),
+        ("WHISPER_THREADS", str(threads) if threads else None),
+        ("WHISPER_INT8_CACHE", None if guardar_int8 else "0"),
+    ):
+        if valor:
+            os.environ[variavel] = valor
+        else:
+            os.environ.pop(variavel, None)
+    aplicar_threads()
+
+
+def aplicar_threads():
+    """Aplica WHISPER_THREADS ao torch (só se ele já foi importado ou o número mudou)"""
+    threads = int(os.environ.get("WHISPER_THREADS", "0"))
+    if not threads or "torch" not in sys.modules:
+        return
+    import torch
+    if torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+
+
+def _trocar_linear(modulo):
+    """O Whisper usa uma subclasse de nn.Linear, e quantize_dynamic só troca o tipo exato"""
+    import torch.nn as nn
+
+    for nome, filho in modulo.named_children():
+        if isinstance(filho, nn.Linear) and type(filho) is not nn.Linear:
+            simples = nn.Linear(filho.in_features, filho.out_features, bias=filho.bias is not None)
+            simples.weight = filho.weight
+            simples.bias = filho.bias
+            setattr(modulo, nome, simples)
+        else:
+            _trocar_linear(filho)
+    return modulo
+
+
+def _quantizar(model):
+    import torch
+    return torch.quantization.quantize_dynamic(_trocar_linear(model), {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def carregar_int8(nome: str, pasta: str = PASTA_INT8):
+    """Carrega o Whisper com as camadas lineares em int8, usando o checkpoint quantizado se existir"""
+    from dataclasses import asdict
+    import torch
+    import whisper
+    from whisper.model import ModelDimensions, Whisper
+
+    caminho = os.path.join(pasta, f"{nome}-int8.pt") if pasta else None
+    if caminho and os.path.exists(caminho):
+        salvo = torch.load(caminho, map_location="cpu", weights_only=False)
+        # O esqueleto precisa ter a mesma estrutura quantizada para receber o estado
+        model = _quantizar(Whisper(ModelDimensions(**salvo["dimensoes"])))
+        model.load_state_dict(salvo["estado"])
+        alinhamento = getattr(whisper, "_ALIGNMENT_HEADS", {}).get(nome)
+        if alinhamento:
+            model.set_alignment_heads(alinhamento)
+    else:
+        model = _quantizar(whisper.load_model(nome, device="cpu"))
+        if caminho:
+            os.makedirs(pasta, exist_ok=True)
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            torch.save({"dimensoes": asdict(model.dims), "estado": model.state_dict()}, temporario)
+            os.replace(temporario, caminho)
+    return model.eval()
+
+
+class ModeloCarregado:
+    """Entrada do registro: o modelo e os dados de carregamento"""
+
+    def __init__(self, chave, model, tempo_carregamento, bytes_residentes):
+        self.chave = chave
+        self.model = model
+        self.tempo_carregamento = tempo_carregamento
+        self.bytes_residentes = bytes_residentes
+        self.carregado_em = time.time()
+        self.usos = 0
+        # Quantos usar() estão com o modelo agora: em uso ele não é despejado
+        self.em_uso = 0
+
+    @property
+    def opcoes_transcricao(self):
+        """Opções a repassar para model.transcribe conforme a precisão"""
+        return {"fp16": self.chave[2] == PRECISAO_FP16}
+
+
+class RegistroModelos:
+    """Mantém modelos Whisper carregados, com despejo LRU por limite de RAM"""
+
+    def __init__(self, limite_bytes=None):
+        if limite_bytes is None and LIMITE_RAM_PADRAO_MB:
+            limite_bytes = LIMITE_RAM_PADRAO_MB * 1024 * 1024
+        if limite_bytes is None:
+            total = memoria_total_bytes()
+            limite_bytes = total // 2 if total else None
+        self.limite_bytes = limite_bytes
+        self._entradas = OrderedDict()
+        self._lock = threading.Lock()
+        self._locks_carregamento = {}
+        self.despejados = 0
+
+    def _lock_da_chave(self, chave):
+        with self._lock:
+            return self._locks_carregamento.setdefault(chave, threading.Lock())
+
+    def obter(self, nome: str, dispositivo: str = None, precisao: str = None):
+        """Retorna o ModeloCarregado, carregando-o apenas se necessário"""
+        return self._obter(nome, dispositivo, precisao, reservar=False)
+
+    @contextmanager
+    def usar(self, nome: str, dispositivo: str = None, precisao: str = None):
+        """Como obter, mas o modelo não é despejado enquanto o bloco roda"""
+        entrada = self._obter(nome, dispositivo, precisao, reservar=True)
+        try:
+            yield entrada
+        finally:
+            with self._lock:
+                entrada.em_uso -= 1
+                # O que ficou acima do limite enquanto ele estava em uso sai agora
+                self._despejar()
+
+    def _obter(self, nome: str, dispositivo: str, precisao: str, reservar: bool):
+        dispositivo = dispositivo or dispositivo_padrao()
+        precisao = precisao or precisao_padrao(dispositivo)
+        if precisao == PRECISAO_INT8:
+            # A quantização dinâmica do torch só tem kernels para CPU
+            dispositivo = "cpu"
+        chave = (nome, dispositivo, precisao)
+        aplicar_threads()
+
+        with self._lock:
+            entrada = self._entradas.get(chave)
+            if entrada is not None:
+                self._entradas.move_to_end(chave)
+                entrada.usos += 1
+                entrada.em_uso += reservar
+                return entrada
+
+        # Um lock por chave evita que duas sessões carreguem o mesmo modelo
+        with self._lock_da_chave(chave):
+            with self._lock:
+                entrada = self._entradas.get(chave)
+                if entrada is not None:
+                    self._entradas.move_to_end(chave)
+                    entrada.usos += 1
+                    entrada.em_uso += reservar
+                    return entrada
+
+            model, tempo, residentes = self._carregar(nome, dispositivo, precisao)
+            entrada = ModeloCarregado(chave, model, tempo, residentes)
+            entrada.usos = 1
+            entrada.em_uso = int(reservar)
+            with self._lock:
+                self._entradas[chave] = entrada
+                self._despejar(manter=chave)
+            return entrada
+
+    def _carregar(self, nome: str, dispositivo: str, precisao: str):
+        """Carrega os pesos; devolve (modelo, segundos, bytes residentes)"""
+        import whisper
+        inicio = time.perf_counter()
+        with medir("carregamento_modelo", modelo=nome, dispositivo=dispositivo, precisao=precisao) as campos:
+            if precisao == PRECISAO_INT8:
+                guardar = os.environ.get("WHISPER_INT8_CACHE") != "0"
+                campos["checkpoint_int8"] = guardar and os.path.exists(os.path.join(PASTA_INT8, f"{nome}-int8.pt"))
+                model = carregar_int8(nome, PASTA_INT8 if guardar else None)
+            else:
+                model = whisper.load_model(nome, device=dispositivo)
+            campos["bytes"] = tamanho_residente(model)
+        return model, time.perf_counter() - inicio, campos["bytes"]
+
+    def _despejar(self, manter=None):
+        """Remove os modelos menos usados até caber no limite (chamar com lock)
+
+        Modelos em uso e o recém-carregado (`manter`) ficam, mesmo que o limite continue estourado.
+        """
+        if not self.limite_bytes:
+            return
+        removidos = False
+        for chave in list(self._entradas):
+            if self.bytes_totais() <= self.limite_bytes or len(self._entradas) == 1:
+                break
+            if chave == manter or self._entradas[chave].em_uso:
+                continue
+            del self._entradas[chave]
+            self.despejados += 1
+            removidos = True
+        if removidos:
+            gc.collect()
+            try:
+                import torch
+                if torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except ImportError:
+                pass
+
+    def bytes_totais(self):
+        """Soma da memória ocupada pelos modelos residentes"""
+        return sum(e.bytes_residentes for e in self._entradas.values())
+
+    def definir_limite(self, limite_bytes):
+        """Altera o limite de RAM e despeja modelos se necessário"""
+        with self._lock:
+            self.limite_bytes = limite_bytes
+            self._despejar()
+
+    def limpar(self):
+        """Descarrega todos os modelos"""
+        with self._lock:
+            self._entradas.clear()
+        gc.collect()
+
+    def estatisticas(self):
+        """Lista os modelos residentes, do mais recente para o mais antigo"""
+        with self._lock:
+            entradas = list(self._entradas.values())
+        return [
+            {
+                "modelo": e.chave[0],
+                "dispositivo": e.chave[1],
+                "precisao": e.chave[2],
+                "tempo_carregamento": e.tempo_carregamento,
+                "mb_residentes": e.bytes_residentes / (1024 * 1024),
+                "usos": e.usos,
+            }
+            for e in reversed(entradas)
+        ]
+
+
+registro = RegistroModelos()
+
+
+def obter_modelo(nome: str, dispositivo: str = None, precisao: str = None):
+    """Atalho para o registro global do processo"""
+    return registro.obter(nome, dispositivo, precisao)
+
+
+def usar_modelo(nome: str, dispositivo: str = None, precisao: str = None):
+    """Atalho para registro.usar: o modelo fica protegido do despejo durante o bloco"""
+    return registro.usar(nome, dispositivo, precisao)
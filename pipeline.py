@@ -0,0 +1,367 @@
+import os
+from contextlib import nullcontext
+from pathlib import Path
+
+from audio import extrair_audio, FORMATO_MP3, FORMATO_MEMORIA
+from esteira import Esteira
+from registro_tarefas import (
+    obter_registro, identificador_trabalhador, ETAPA_EXTRACAO, ETAPA_TRANSCRICAO, ETAPA_TRANSLITERACAO, STATUS_CONCLUIDA
+)
+from cache_resultados import obter_cache
+from indice_documentos import obter_indice
+from metricas import perfilar
+from transcricao import listar_audios, transcrever_arquivo, transcrever_em_janelas, transcrever_em_paralelo, numero_trabalhadores
+from transcricao_lote import transcrever_em_lote
+from transliteracao import ArquivoParcial
+from transliteracao_lote import LoteTransliteracao, resumo_lote
+from vigia import EXTENSOES_VIDEO
+
+# =========================
+# PIPELINE SEM INTERFACE
+# =========================
+# Funções usadas tanto pelo app Streamlit quanto pela linha de comando
+# (cli.py). Nada aqui importa streamlit, torch, whisper ou openai no topo:
+# os modelos são carregados só quando uma etapa realmente precisa deles.
+# As funções longas são geradores de eventos ({"tipo": ...}) para que cada
+# interface mostre o progresso do seu jeito.
+
+PASTA_TRANSCRITOS_PADRAO = "videos_transcritos"
+PASTA_TRANSLITERADOS_PADRAO = "videos_transliterados"
+
+MODELOS_WHISPER = ["tiny", "base", "small", "medium", "large"]
+MODELO_GPT = "gpt-4o"
+
+# Prompt para transliteração
+PROMPT_TEMPLATE = """
+Tarefa:
+Você é um assistente especialista em transformar transcrições de vídeos em uma documentação clara, organizada e objetiva, adequada para ser usada em um sistema de IA baseado em RAG.
+
+Entrada:
+Você receberá uma transcrição de vídeo, que pode conter informalidades, repetições ou interrupções típicas da fala natural.
+
+Objetivo:
+Sua tarefa é transliterar essa transcrição em um conteúdo documental, bem estruturado, com tópicos claros, subtítulos quando necessário e sem linguagem coloquial. A ideia é manter toda a informação essencial passada no vídeo, mas no formato de um texto técnico ou explicativo, semelhante a um artigo, manual ou documentação de conhecimento.
+
+Instruções específicas:
+- Organize o conteúdo em tópicos, subtópicos e parágrafos coerentes.
+- Elimine vícios de linguagem e repetições.
+- Conserve o sentido original da fala, mas com clareza e concisão.
+- Quando possível, use bullet points, enumerações ou tabelas para facilitar a leitura.
+- Não invente informações não presentes na transcrição.
+
+Formato de saída:
+Uma documentação clara, didática e adequada para indexação e consulta por uma IA via RAG.
+
+Agora, aqui está a transcrição para ser processada:
+
+{}
+"""
+
+
+def criar_pastas(pasta_transcritos, pasta_transliterados):
+    """Cria as pastas necessárias"""
+    os.makedirs(pasta_transcritos, exist_ok=True)
+    os.makedirs(pasta_transliterados, exist_ok=True)
+
+
+def criar_cliente():
+    """Cliente OpenAI (importa o SDK só quando alguém vai transliterar)"""
+    from openai import OpenAI
+    try:
+        from config import OPENAI_API_KEY
+    except ImportError:
+        OPENAI_API_KEY = os.environ.get("OPENAI_API_KEY")
+    return OpenAI(api_key=OPENAI_API_KEY)
+
+
+def criar_motor(concorrencia: int = 4, requisicoes_por_minuto: int = 500, tokens_por_minuto: int = 30000,
+                pasta_cache: str = None, tokens_por_bloco: int = 0, sobreposicao: int = 200):
+    """Motor de transliteração com o prompt e o modelo padrão do projeto"""
+    from transliteracao import MotorTransliteracao
+
+    return MotorTransliteracao(
+        criar_cliente(),
+        PROMPT_TEMPLATE,
+        modelo=MODELO_GPT,
+        temperatura=0.6,
+        concorrencia=concorrencia,
+        requisicoes_por_minuto=requisicoes_por_minuto,
+        tokens_por_minuto=tokens_por_minuto,
+        cache=obter_cache(pasta_cache) if pasta_cache else None,
+        tokens_por_bloco=tokens_por_bloco,
+        sobreposicao=sobreposicao
+    )
+
+
+def listar_videos_pasta(pasta_videos):
+    """Lista todos os arquivos de vídeo em uma pasta (PermissionError sobe para quem chamou)"""
+    if not os.path.exists(pasta_videos):
+        return []
+    return sorted(arquivo for arquivo in os.listdir(pasta_videos) if arquivo.lower().endswith(EXTENSOES_VIDEO))
+
+
+def importar_transcricoes_existentes(pasta_transcritos: str):
+    """Registra no ledger as transcrições .txt da pasta que ainda não estão nele"""
+    registro_tarefas = obter_registro(pasta_transcritos)
+    importadas = 0
+    for entrada in os.scandir(pasta_transcritos):
+        if entrada.name.endswith(".txt") and not entrada.name.endswith("-Transliterado.txt"):
+            item = Path(entrada.name).stem
+            if registro_tarefas.obter(item, ETAPA_TRANSCRICAO) is None:
+                registro_tarefas.importar(item, ETAPA_TRANSCRICAO, entrada.path)
+                importadas += 1
+    return importadas
+
+
+# =========================
+# TRANSCRIÇÃO
+# =========================
+
+def transcrever_pares(pares, modelo: str = "small", processos: int = 1, ao_segmento=None, tamanho_lote: int = None,
+                      **opcoes):
+    """Transcreve pares (áudio, txt) consultando o registro de tarefas
+
+    Gera {"tipo": "pulado", "arquivo", "motivo"}, um {"tipo": "inicio", "total",
+    "trabalhadores"} e um {"tipo": "resultado", ...} por arquivo (mesmos campos
+    de transcrever_arquivo). Com processos != 1 usa o pool de processos (0 = automático).
+    Com `tamanho_lote` definido (0 = automático) decodifica as janelas de vários
+    arquivos juntas; nesse modo VAD e janelas com checkpoint não se aplicam.
+    `ao_segmento(arquivo, segmento)` recebe os segmentos do modo em janelas.
+    """
+    pendentes = []
+    itens = {}
+    # O id é guardado: o finally pode rodar em outra thread (gerador fechado pelo coletor de lixo)
+    trabalhador = identificador_trabalhador()
+    for audio, txt in pares:
+        audio, txt = str(audio), str(txt)
+        registro_tarefas = obter_registro(os.path.dirname(txt) or ".")
+        item = Path(audio).stem
+        if not registro_tarefas.precisa_processar(item, ETAPA_TRANSCRICAO, txt):
+            yield {"tipo": "pulado", "arquivo": os.path.basename(audio), "motivo": "já transcrito ou sem tentativas restantes"}
+        elif not registro_tarefas.reivindicar(item, ETAPA_TRANSCRICAO, modelo, audio, txt, trabalhador):
+            yield {"tipo": "pulado", "arquivo": os.path.basename(audio), "motivo": "em andamento em outro trabalhador"}
+        else:
+            pendentes.append((audio, txt))
+            itens[os.path.basename(audio)] = (registro_tarefas, item)
+    if not pendentes:
+        return
+
+    if tamanho_lote is not None:
+        yield {"tipo": "inicio", "total": len(pendentes), "trabalhadores": 1}
+        resultados = transcrever_em_lote(
+            pendentes, modelo, opcoes.get("idioma", "pt"), opcoes.get("pasta_cache"), tamanho_lote
+        )
+    elif processos != 1:
+        trabalhadores = processos or numero_trabalhadores(modelo, len(pendentes), opcoes.get("cascata"))
+        yield {"tipo": "inicio", "total": len(pendentes), "trabalhadores": trabalhadores}
+        resultados = transcrever_em_paralelo(pendentes, modelo, trabalhadores, **opcoes)
+    else:
+        yield {"tipo": "inicio", "total": len(pendentes), "trabalhadores": 1}
+        resultados = (_transcrever_um(audio, txt, modelo, ao_segmento, opcoes) for audio, txt in pendentes)
+
+    try:
+        for resultado in resultados:
+            registro_tarefas, item = itens.pop(resultado["arquivo"])
+            if resultado["erro"]:
+                registro_tarefas.falhar(item, ETAPA_TRANSCRICAO, resultado["erro"], trabalhador)
+            else:
+                registro_tarefas.concluir(item, ETAPA_TRANSCRICAO, duracao=resultado["tempo"], trabalhador=trabalhador)
+            yield {"tipo": "resultado", **resultado}
+    finally:
+        # Interrompido no meio (trabalho cancelado): o que não terminou volta a ficar pendente
+        for registro_tarefas, item in itens.values():
+            registro_tarefas.liberar(item, ETAPA_TRANSCRICAO, trabalhador)
+
+
+def _transcrever_um(audio: str, txt: str, modelo: str, ao_segmento, opcoes: dict):
+    """Transcrição sequencial de um arquivo, com o erro no resultado em vez de exceção"""
+    if opcoes.get("em_janelas"):
+        # A cascata não se aplica às janelas com checkpoint
+        opcoes_janelas = {
+            chave: valor for chave, valor in opcoes.items() if chave not in ("em_janelas", "cascata", "limites_cascata")
+        }
+        resultado = {"arquivo": os.path.basename(audio), "tempo": 0.0, "cache": False, "vad": None, "cascata": None, "erro": None}
+        try:
+            for segmento in transcrever_em_janelas(audio, txt, modelo, **opcoes_janelas):
+                if ao_segmento is not None:
+                    ao_segmento(resultado["arquivo"], segmento)
+        except Exception as e:
+            resultado["erro"] = str(e)
+        return resultado
+    try:
+        return transcrever_arquivo(audio, txt, modelo, **opcoes)
+    except Exception as e:
+        return {"arquivo": os.path.basename(audio), "tempo": 0.0, "cache": False, "vad": None, "cascata": None, "erro": str(e)}
+
+
+def transcrever_pasta(pasta_transcritos: str, modelo: str = "small", processos: int = 1, ao_segmento=None,
+                     tamanho_lote: int = None, **opcoes):
+    """Transcreve os áudios da pasta que ainda não foram transcritos (eventos de transcrever_pares)"""
+    pares = [(audio, audio.with_suffix(".txt")) for audio in listar_audios(pasta_transcritos)]
+    yield from transcrever_pares(pares, modelo, processos, ao_segmento, tamanho_lote, **opcoes)
+
+
+# =========================
+# TRANSLITERAÇÃO
+# =========================
+
+def transliterar_pendentes(pasta_transcritos: str, pasta_transliterados: str, motor):
+    """Translitera as transcrições concluídas que ainda não foram transliteradas
+
+    Gera os mesmos tipos de evento de transcrever_pares; os resultados têm os
+    campos de MotorTransliteracao.processar_lote.
+    """
+    registro_tarefas = obter_registro(pasta_transcritos)
+
+    # Na primeira execução, importa as transcrições geradas antes do registro existir
+    if not any(registro_tarefas.contar(ETAPA_TRANSCRICAO).values()):
+        importar_transcricoes_existentes(pasta_transcritos)
+
+    tarefas = []
+    itens = {}
+    trabalhador = identificador_trabalhador()
+    for item, caminho_arquivo in registro_tarefas.prontos_para(ETAPA_TRANSLITERACAO, ETAPA_TRANSCRICAO):
+        caminho_saida = os.path.join(pasta_transliterados, f"{item}-Transliterado.txt")
+        if not registro_tarefas.precisa_processar(item, ETAPA_TRANSLITERACAO, caminho_saida):
+            yield {"tipo": "pulado", "arquivo": item, "motivo": "já transliterado ou sem tentativas restantes"}
+            continue
+        if not registro_tarefas.reivindicar(item, ETAPA_TRANSLITERACAO, motor.modelo, caminho_arquivo, caminho_saida,
+                                            trabalhador):
+            yield {"tipo": "pulado", "arquivo": item, "motivo": "em andamento em outro trabalhador"}
+            continue
+        tarefas.append((caminho_arquivo, caminho_saida))
+        itens[caminho_saida] = item
+
+    if not tarefas:
+        return
+
+    yield {"tipo": "inicio", "total": len(tarefas), "trabalhadores": motor.concorrencia}
+    try:
+        for resultado in motor.processar_lote(tarefas):
+            item = itens.pop(resultado["destino"])
+            if resultado["erro"]:
+                registro_tarefas.falhar(item, ETAPA_TRANSLITERACAO, resultado["erro"], trabalhador)
+            else:
+                registro_tarefas.concluir(item, ETAPA_TRANSLITERACAO, duracao=resultado["tempo"], trabalhador=trabalhador)
+                obter_indice(pasta_transliterados).registrar(resultado["destino"])
+            yield {"tipo": "resultado", **resultado}
+    finally:
+        for item in itens.values():
+            registro_tarefas.liberar(item, ETAPA_TRANSLITERACAO, trabalhador)
+
+
+def transliterar_pela_batch_api(pasta_transcritos: str, pasta_transliterados: str, motor, esperar: bool = True,
+                                intervalo: float = 30.0):
+    """Translitera as transcrições pendentes pela Batch API da OpenAI (ou retoma o lote em andamento)
+
+    Gera os eventos de transliterar_pendentes e, além deles, {"tipo": "lote", ...}
+    a cada mudança de status de um lote. Com esperar=False faz uma rodada e retorna.
+    """
+    registro_tarefas = obter_registro(pasta_transcritos)
+    if not any(registro_tarefas.contar(ETAPA_TRANSCRICAO).values()):
+        importar_transcricoes_existentes(pasta_transcritos)
+
+    lote = LoteTransliteracao(motor, pasta_transcritos, pasta_transliterados, intervalo)
+    yield from lote.executar(esperar)
+
+
+# =========================
+# ESTEIRA DE VÍDEOS
+# =========================
+
+def item_video(caminho_video: str, pasta_transcritos: str, pasta_transliterados: str, recebido_em: float = None):
+    """Item da esteira para um vídeo"""
+    nome = Path(caminho_video).stem
+    return {
+        "nome": os.path.basename(caminho_video),
+        "item": nome,
+        "video": caminho_video,
+        "transcricao": os.path.join(pasta_transcritos, f"{nome}.txt"),
+        "transliteracao": os.path.join(pasta_transliterados, f"{nome}-Transliterado.txt"),
+        "recebido_em": recebido_em,
+    }
+
+
+def montar_esteira(pasta_transcritos, modelo_whisper, motor, opcoes_transcricao=None, capacidade_fila=2,
+                   formato_audio=FORMATO_MP3, ao_token=None, vaga=None):
+    """Esteira extração → transcrição → transliteração (cada etapa em sua thread)
+
+    `ao_token(item, trecho)` recebe o texto da transliteração conforme é gerado
+    (chamado da thread da etapa). `vaga(etapa)` devolve um gerenciador de contexto
+    que segura o recurso da etapa enquanto um item é processado.
+    """
+    opcoes_transcricao = opcoes_transcricao or {}
+    registro_tarefas = obter_registro(pasta_transcritos)
+    vaga = vaga or (lambda etapa: nullcontext())
+
+    def etapa_extracao(item):
+        # Sem nada a transcrever, não há por que decodificar o áudio
+        item["transcrever"] = registro_tarefas.precisa_processar(item["item"], ETAPA_TRANSCRICAO, item["transcricao"])
+        if formato_audio == FORMATO_MEMORIA and not item["transcrever"]:
+            item["audio"] = None
+        else:
+            with vaga(ETAPA_EXTRACAO):
+                item["audio"] = extrair_audio(item["video"], pasta_transcritos, formato_audio)
+        return item
+
+    def etapa_transcricao(item):
+        if not item["transcrever"]:
+            item["audio"] = None
+            return item
+        # A vaga vem antes da reivindicação: esperar por ela não conta como tarefa em andamento
+        with vaga(ETAPA_TRANSCRICAO):
+            if registro_tarefas.reivindicar(item["item"], ETAPA_TRANSCRICAO, modelo_whisper, item["video"], item["transcricao"]):
+                with registro_tarefas.executando(item["item"], ETAPA_TRANSCRICAO):
+                    resultado = transcrever_arquivo(item["audio"], item["transcricao"], modelo_whisper, **opcoes_transcricao)
+                item["vad"] = resultado["vad"]
+                item["cascata"] = resultado["cascata"]
+        # Libera o PCM em memória antes de seguir para a transliteração
+        item["audio"] = None
+        return item
+
+    def transcricao_concluida(item):
+        tarefa = registro_tarefas.obter(item["item"], ETAPA_TRANSCRICAO)
+        return tarefa is not None and tarefa["status"] == STATUS_CONCLUIDA and os.path.exists(item["transcricao"])
+
+    def etapa_transliteracao(item):
+        # Transcrição que falhou ou está com outro trabalhador: o item segue sem ser tocado
+        if not transcricao_concluida(item):
+            return item
+        if not registro_tarefas.precisa_processar(item["item"], ETAPA_TRANSLITERACAO, item["transliteracao"]):
+            return item
+        with vaga(ETAPA_TRANSLITERACAO):
+            if not registro_tarefas.reivindicar(item["item"], ETAPA_TRANSLITERACAO, motor.modelo, item["transcricao"], item["transliteracao"]):
+                return item
+            with registro_tarefas.executando(item["item"], ETAPA_TRANSLITERACAO):
+                with open(item["transcricao"], "r", encoding="utf-8") as f:
+                    conteudo = f.read()
+                with perfilar(item["transliteracao"]), ArquivoParcial(item["transliteracao"]) as arquivo:
+                    def receber(trecho):
+                        arquivo.escrever(trecho)
+                        if ao_token is not None:
+                            ao_token(item, trecho)
+
+                    motor.transliterar_com_relatorio(conteudo, receber)
+        return item
+
+    return Esteira([
+        ("🔊 Extração", etapa_extracao),
+        ("📄 Transcrição", etapa_transcricao),
+        ("🔄 Transliteração", etapa_transliteracao),
+    ], capacidade=capacidade_fila)
+
+
+# =========================
+# STATUS
+# =========================
+
+def resumo(pasta_transcritos: str, pasta_transliterados: str):
+    """Contagens do registro de tarefas e do índice de documentos (sem carregar modelos)"""
+    registro_tarefas = obter_registro(pasta_transcritos)
+    return {
+        "audios": len(listar_audios(pasta_transcritos)),
+        ETAPA_TRANSCRICAO: registro_tarefas.contar(ETAPA_TRANSCRICAO),
+        ETAPA_TRANSLITERACAO: registro_tarefas.contar(ETAPA_TRANSLITERACAO),
+        "documentos": obter_indice(pasta_transliterados).totais() if os.path.isdir(pasta_transliterados) else None,
+        "lote_openai": resumo_lote(pasta_transcritos),
+    }
@@ -0,0 +1,272 @@
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+# =========================
+# REGISTRO DE TAREFAS (LEDGER)
+# =========================
+# Uma linha por item de mídia e por etapa, com status, tentativas, duração,
+# modelo e caminhos. Substitui as checagens de os.path.exists/os.listdir e
+# permite que vários processos dividam o trabalho: reivindicar() é atômico
+# (BEGIN IMMEDIATE), então dois trabalhadores nunca pegam a mesma tarefa.
+
+ARQUIVO_REGISTRO = ".tarefas.sqlite3"
+
+ETAPA_DOWNLOAD = "download"
+ETAPA_EXTRACAO = "extracao"
+ETAPA_TRANSCRICAO = "transcricao"
+ETAPA_TRANSLITERACAO = "transliteracao"
+
+STATUS_PENDENTE = "pendente"
+STATUS_EM_ANDAMENTO = "em_andamento"
+STATUS_CONCLUIDA = "concluida"
+STATUS_FALHOU = "falhou"
+
+MAXIMO_TENTATIVAS = 3
+# Uma tarefa "em andamento" sem atualização há mais que isso é considerada abandonada
+EXPIRACAO_SEGUNDOS = 6 * 60 * 60
+
+
+def identificador_trabalhador():
+    return f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+
+
+class RegistroTarefas:
+    """Registro persistente de tarefas em SQLite"""
+
+    def __init__(self, caminho: str, maximo_tentativas: int = MAXIMO_TENTATIVAS,
+                 expiracao_segundos: float = EXPIRACAO_SEGUNDOS):
+        self.caminho = caminho
+        self.maximo_tentativas = maximo_tentativas
+        self.expiracao_segundos = expiracao_segundos
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS tarefas (
+                item TEXT NOT NULL,
+                etapa TEXT NOT NULL,
+                status TEXT NOT NULL,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                trabalhador TEXT,
+                modelo TEXT,
+                entrada TEXT,
+                saida TEXT,
+                duracao REAL,
+                erro TEXT,
+                iniciada_em REAL,
+                atualizada_em REAL NOT NULL,
+                PRIMARY KEY (item, etapa)
+            );
+            CREATE INDEX IF NOT EXISTS idx_tarefas_etapa_status ON tarefas (etapa, status);
+        """)
+
+    def _executar(self, sql: str, parametros=()):
+        with self._lock:
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    def _alterar(self, sql: str, parametros=()):
+        """Executa um UPDATE e diz se alguma linha mudou"""
+        with self._lock:
+            return self._conexao.execute(sql, parametros).rowcount > 0
+
+    # ----- consultas -----
+
+    def obter(self, item: str, etapa: str):
+        """Retorna a linha da tarefa como dicionário (ou None)"""
+        with self._lock:
+            cursor = self._conexao.execute("SELECT * FROM tarefas WHERE item = ? AND etapa = ?", (item, etapa))
+            linha = cursor.fetchone()
+            if linha is None:
+                return None
+            return dict(zip([coluna[0] for coluna in cursor.description], linha))
+
+    def precisa_processar(self, item: str, etapa: str, saida: str = None):
+        """Indica se a etapa ainda precisa rodar para o item
+
+        Saídas que já existem em disco mas não estão no registro (geradas antes
+        dele existir) são importadas como concluídas. Uma tarefa concluída cuja
+        saída sumiu é considerada obsoleta e volta a ficar pendente.
+        """
+        tarefa = self.obter(item, etapa)
+        if tarefa is None:
+            if saida and os.path.exists(saida):
+                self.importar(item, etapa, saida)
+                return False
+            return True
+
+        if tarefa["status"] == STATUS_CONCLUIDA:
+            if saida and not os.path.exists(saida):
+                self._executar(
+                    "UPDATE tarefas SET status = ?, atualizada_em = ? WHERE item = ? AND etapa = ?",
+                    (STATUS_PENDENTE, time.time(), item, etapa)
+                )
+                return True
+            return False
+        if tarefa["status"] == STATUS_FALHOU:
+            return tarefa["tentativas"] < self.maximo_tentativas
+        if tarefa["status"] == STATUS_EM_ANDAMENTO:
+            return time.time() - tarefa["atualizada_em"] > self.expiracao_segundos
+        return True
+
+    def contar(self, etapa: str = None):
+        """Quantidade de tarefas por status (consulta indexada)"""
+        if etapa is None:
+            linhas = self._executar("SELECT status, COUNT(*) FROM tarefas GROUP BY status")
+        else:
+            linhas = self._executar("SELECT status, COUNT(*) FROM tarefas WHERE etapa = ? GROUP BY status", (etapa,))
+        contagem = {STATUS_PENDENTE: 0, STATUS_EM_ANDAMENTO: 0, STATUS_CONCLUIDA: 0, STATUS_FALHOU: 0}
+        contagem.update(dict(linhas))
+        return contagem
+
+    def listar(self, etapa: str, status: str = None):
+        """Lista (item, status, tentativas, saida, erro) de uma etapa"""
+        if status is None:
+            return self._executar(
+                "SELECT item, status, tentativas, saida, erro FROM tarefas WHERE etapa = ? ORDER BY item", (etapa,)
+            )
+        return self._executar(
+            "SELECT item, status, tentativas, saida, erro FROM tarefas WHERE etapa = ? AND status = ? ORDER BY item",
+            (etapa, status)
+        )
+
+    def prontos_para(self, etapa: str, etapa_anterior: str):
+        """Itens com a etapa anterior concluída e esta ainda não concluída: [(item, saida_anterior)]"""
+        return self._executar("""
+            SELECT anterior.item, anterior.saida
+            FROM tarefas AS anterior
+            LEFT JOIN tarefas AS atual ON atual.item = anterior.item AND atual.etapa = ?
+            WHERE anterior.etapa = ? AND anterior.status = ?
+              AND (atual.status IS NULL OR atual.status != ?)
+            ORDER BY anterior.item
+        """, (etapa, etapa_anterior, STATUS_CONCLUIDA, STATUS_CONCLUIDA))
+
+    # ----- transições -----
+
+    def reivindicar(self, item: str, etapa: str, modelo: str = None, entrada: str = None, saida: str = None,
+                    trabalhador: str = None):
+        """Marca a tarefa como em andamento se ninguém mais estiver com ela; retorna True se conseguiu"""
+        agora = time.time()
+        trabalhador = trabalhador or identificador_trabalhador()
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                linha = self._conexao.execute(
+                    "SELECT status, tentativas, atualizada_em FROM tarefas WHERE item = ? AND etapa = ?",
+                    (item, etapa)
+                ).fetchone()
+                if linha is not None:
+                    status, tentativas, atualizada_em = linha
+                    ocupada = status == STATUS_EM_ANDAMENTO and agora - atualizada_em <= self.expiracao_segundos
+                    esgotada = status == STATUS_FALHOU and tentativas >= self.maximo_tentativas
+                    if status == STATUS_CONCLUIDA or ocupada or esgotada:
+                        self._conexao.execute("COMMIT")
+                        return False
+
+                self._conexao.execute("""
+                    INSERT INTO tarefas (item, etapa, status, tentativas, trabalhador, modelo, entrada, saida,
+                                         iniciada_em, atualizada_em)
+                    VALUES (?, ?, ?, 1, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT (item, etapa) DO UPDATE SET
+                        status = excluded.status,
+                        tentativas = tarefas.tentativas + 1,
+                        trabalhador = excluded.trabalhador,
+                        modelo = COALESCE(excluded.modelo, tarefas.modelo),
+                        entrada = COALESCE(excluded.entrada, tarefas.entrada),
+                        saida = COALESCE(excluded.saida, tarefas.saida),
+                        erro = NULL,
+                        iniciada_em = excluded.iniciada_em,
+                        atualizada_em = excluded.atualizada_em
+                """, (item, etapa, STATUS_EM_ANDAMENTO, trabalhador, modelo, entrada, saida, agora, agora))
+                self._conexao.execute("COMMIT")
+                return True
+            except Exception:
+                self._conexao.execute("ROLLBACK")
+                raise
+
+    def renovar(self, item: str, etapa: str):
+        """Mantém viva uma tarefa longa em andamento para que não seja considerada abandonada"""
+        self._executar(
+            "UPDATE tarefas SET atualizada_em = ? WHERE item = ? AND etapa = ? AND status = ?",
+            (time.time(), item, etapa, STATUS_EM_ANDAMENTO)
+        )
+
+    # liberar, concluir e falhar só valem para quem ainda está com a tarefa: se ela
+    # expirou e outro trabalhador a reivindicou, o antigo não mexe mais nela (retornam False)
+
+    def liberar(self, item: str, etapa: str, trabalhador: str = None):
+        """Devolve uma tarefa reivindicada que não chegou a rodar (trabalho cancelado), sem gastar a tentativa"""
+        return self._alterar(
+            "UPDATE tarefas SET status = ?, tentativas = MAX(tentativas - 1, 0), atualizada_em = ? "
+            "WHERE item = ? AND etapa = ? AND status = ? AND trabalhador = ?",
+            (STATUS_PENDENTE, time.time(), item, etapa, STATUS_EM_ANDAMENTO, trabalhador or identificador_trabalhador())
+        )
+
+    def concluir(self, item: str, etapa: str, saida: str = None, duracao: float = None, trabalhador: str = None):
+        agora = time.time()
+        return self._alterar("""
+            UPDATE tarefas SET status = ?, saida = COALESCE(?, saida), erro = NULL,
+                duracao = COALESCE(?, ? - iniciada_em), atualizada_em = ?
+            WHERE item = ? AND etapa = ? AND status = ? AND trabalhador = ?
+        """, (STATUS_CONCLUIDA, saida, duracao, agora, agora, item, etapa, STATUS_EM_ANDAMENTO,
+              trabalhador or identificador_trabalhador()))
+
+    @contextmanager
+    def executando(self, item: str, etapa: str, saida: str = None, trabalhador: str = None):
+        """Conclui a tarefa (já reivindicada) ao sair do bloco, ou a marca como falha se houver exceção"""
+        inicio = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.falhar(item, etapa, str(e), trabalhador)
+            raise
+        self.concluir(item, etapa, saida, time.perf_counter() - inicio, trabalhador)
+
+    def falhar(self, item: str, etapa: str, erro: str, trabalhador: str = None):
+        agora = time.time()
+        return self._alterar("""
+            UPDATE tarefas SET status = ?, erro = ?, duracao = ? - iniciada_em, atualizada_em = ?
+            WHERE item = ? AND etapa = ? AND status = ? AND trabalhador = ?
+        """, (STATUS_FALHOU, erro, agora, agora, item, etapa, STATUS_EM_ANDAMENTO,
+              trabalhador or identificador_trabalhador()))
+
+    def importar(self, item: str, etapa: str, saida: str, entrada: str = None, modelo: str = None):
+        """Registra como concluída uma saída que já existe (ou acabou de ser gravada fora do registro)"""
+        agora = time.time()
+        self._executar("""
+            INSERT INTO tarefas (item, etapa, status, tentativas, modelo, entrada, saida, atualizada_em)
+            VALUES (?, ?, ?, 0, ?, ?, ?, ?)
+            ON CONFLICT (item, etapa) DO UPDATE SET
+                status = excluded.status, saida = excluded.saida, erro = NULL,
+                modelo = COALESCE(excluded.modelo, tarefas.modelo),
+                entrada = COALESCE(excluded.entrada, tarefas.entrada),
+                atualizada_em = excluded.atualizada_em
+        """, (item, etapa, STATUS_CONCLUIDA, modelo, entrada, saida, agora))
+
+    def reiniciar_falhas(self, etapa: str = None):
+        """Zera as tentativas das tarefas que falharam para que rodem de novo"""
+        if etapa is None:
+            self._executar("UPDATE tarefas SET status = ?, tentativas = 0 WHERE status = ?", (STATUS_PENDENTE, STATUS_FALHOU))
+        else:
+            self._executar(
+                "UPDATE tarefas SET status = ?, tentativas = 0 WHERE status = ? AND etapa = ?",
+                (STATUS_PENDENTE, STATUS_FALHOU, etapa)
+            )
+
+
+_registros = {}
+_lock_registros = threading.Lock()
+
+
+def obter_registro(pasta: str):
+    """Registro da pasta de trabalho (um arquivo .tarefas.sqlite3 por pasta de transcritos)"""
+    caminho = os.path.abspath(os.path.join(pasta, ARQUIVO_REGISTRO))
+    with _lock_registros:
+        registro = _registros.get(caminho)
+        if registro is None:
+            os.makedirs(pasta, exist_ok=True)
+            registro = _registros[caminho] = RegistroTarefas(caminho)
+        return registro
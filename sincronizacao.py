@@ -0,0 +1,143 @@
+import os
+import queue
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from metricas import registrar
+
+# =========================
+# SINCRONIZAÇÃO INCREMENTAL DE CANAL
+# =========================
+# O histórico usa o mesmo formato do --download-archive do yt-dlp
+# ("<extrator> <id>" por linha), então pode ser compartilhado com a CLI.
+
+ARQUIVO_HISTORICO = ".historico-downloads.txt"
+
+
+def caminho_historico(pasta_destino: str):
+    return os.path.join(pasta_destino, ARQUIVO_HISTORICO)
+
+
+def ler_historico(arquivo_historico: str):
+    """Retorna o conjunto de chaves "<extrator> <id>" já baixadas"""
+    if not os.path.exists(arquivo_historico):
+        return set()
+    with open(arquivo_historico, "r", encoding="utf-8") as f:
+        return {linha.strip() for linha in f if linha.strip()}
+
+
+def _chave_historico(entrada):
+    extrator = (entrada.get("ie_key") or entrada.get("extractor_key") or "youtube").lower()
+    return f"{extrator} {entrada['id']}"
+
+
+def _achatar(info):
+    """Percorre abas e playlists aninhadas do canal devolvendo só os vídeos"""
+    for entrada in info.get("entries") or []:
+        if not entrada:
+            continue
+        if entrada.get("_type") == "playlist" or entrada.get("entries"):
+            yield from _achatar(entrada)
+        elif entrada.get("id"):
+            yield entrada
+
+
+def listar_novos(canal_url: str, arquivo_historico: str):
+    """Lista (sem baixar) os vídeos do canal que ainda não estão no histórico"""
+    import yt_dlp
+
+    opcoes = {
+        "extract_flat": "in_playlist",
+        "skip_download": True,
+        "quiet": True,
+        "no_warnings": True,
+    }
+    with yt_dlp.YoutubeDL(opcoes) as ydl:
+        info = ydl.extract_info(canal_url, download=False)
+
+    if info.get("_type") not in ("playlist", "multi_video"):
+        entradas = [info]
+    else:
+        entradas = list(_achatar(info))
+
+    historico = ler_historico(arquivo_historico)
+    novos = []
+    vistos = set()
+    for entrada in entradas:
+        chave = _chave_historico(entrada)
+        if chave in historico or chave in vistos:
+            continue
+        vistos.add(chave)
+        novos.append(entrada)
+    return novos
+
+
+def _baixar_item(entrada, pasta_destino: str, arquivo_historico: str, eventos):
+    """Baixa um item; sempre termina com um evento "concluido" ou "erro" (baixar_em_paralelo conta com isso)"""
+    identificador = titulo = None
+    ultima_fracao = [-1.0]
+    baixados = [0]
+
+    def gancho_progresso(estado):
+        if estado["status"] == "finished":
+            baixados[0] += estado.get("total_bytes") or estado.get("downloaded_bytes") or 0
+        if estado["status"] != "downloading":
+            return
+        total = estado.get("total_bytes") or estado.get("total_bytes_estimate")
+        fracao = estado.get("downloaded_bytes", 0) / total if total else None
+        # O yt-dlp chama o gancho a cada bloco; repassa só avanços de 1% ou mais
+        if fracao is None or fracao - ultima_fracao[0] >= 0.01:
+            ultima_fracao[0] = fracao if fracao is not None else ultima_fracao[0]
+            eventos.put(("progresso", identificador, titulo, fracao))
+
+    inicio = time.perf_counter()
+    try:
+        import yt_dlp
+
+        identificador = entrada["id"]
+        titulo = entrada.get("title") or identificador
+        opcoes = {
+            # Mantém o contêiner nativo (m4a/webm/opus): o Whisper decodifica qualquer um
+            "format": "bestaudio/best",
+            "outtmpl": os.path.join(pasta_destino, "%(title)s.%(ext)s"),
+            "download_archive": arquivo_historico,
+            "progress_hooks": [gancho_progresso],
+            "quiet": True,
+            "no_warnings": True,
+            "noprogress": True,
+        }
+        url = entrada.get("webpage_url") or entrada.get("url") or identificador
+        with yt_dlp.YoutubeDL(opcoes) as ydl:
+            codigo = ydl.download([url])
+        if codigo:
+            raise RuntimeError(f"yt-dlp terminou com código {codigo}")
+        registrar("download", time.perf_counter() - inicio, id=identificador, bytes=baixados[0])
+        eventos.put(("concluido", identificador, titulo, None))
+    except Exception as e:
+        # O evento vem antes da métrica: sem ele o laço de baixar_em_paralelo esperaria para sempre
+        eventos.put(("erro", identificador, titulo, str(e)))
+        registrar("download", time.perf_counter() - inicio, erro=str(e), id=identificador, bytes=baixados[0])
+
+
+def baixar_em_paralelo(entradas, pasta_destino: str, arquivo_historico: str, downloads_simultaneos: int = 4):
+    """Baixa os itens em paralelo, gerando eventos (tipo, id, título, detalhe)
+
+    tipo é "progresso" (detalhe = fração baixada ou None), "concluido" ou "erro".
+    """
+    eventos = queue.Queue()
+    restantes = len(entradas)
+    if not restantes:
+        return
+
+    executor = ThreadPoolExecutor(max_workers=max(1, downloads_simultaneos))
+    for entrada in entradas:
+        executor.submit(_baixar_item, entrada, pasta_destino, arquivo_historico, eventos)
+
+    try:
+        while restantes:
+            evento = eventos.get()
+            if evento[0] != "progresso":
+                restantes -= 1
+            yield evento
+    finally:
+        executor.shutdown(wait=restantes == 0, cancel_futures=True)
@@ -0,0 +1,18 @@
+import os
+import sys
+
+# Os módulos ficam soltos na raiz do repositório, ao lado do app.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Os testes não gravam eventos em .metricas (lido na importação de metricas)
+os.environ.setdefault("METRICAS_DESLIGADAS", "1")
+
+import pytest
+
+
+@pytest.fixture
+def tokens_por_palavra(monkeypatch):
+    """Conta uma palavra por token: o tiktoken baixa o vocabulário na primeira chamada"""
+    import transliteracao
+
+    monkeypatch.setattr(transliteracao, "contar_tokens", lambda texto, modelo="gpt-4o": len(texto.split()))
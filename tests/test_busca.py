@@ -0,0 +1,130 @@
+import os
+
+import pytest
+
+from busca import IndiceBusca, radical, termos, ORIGEM_TRANSLITERADO, ORIGEM_TRANSCRICAO
+
+
+@pytest.mark.parametrize("variantes", [
+    ("transcrição", "transcrições", "transcricao", "TRANSCRIÇÃO"),
+    ("documento", "documentos"),
+    ("rápido", "rápidas", "rapidamente"),
+    ("inteligência", "inteligente"),
+    ("cantar", "cantando", "cantou"),
+    ("casa", "casas"),
+])
+def test_variantes_caem_no_mesmo_radical(variantes):
+    assert len({radical(palavra.lower()) for palavra in variantes}) == 1
+
+
+@pytest.mark.parametrize("primeira, segunda", [("documento", "mercado"), ("cantar", "contar"), ("rápido", "rapaz")])
+def test_radicais_distintos_continuam_distintos(primeira, segunda):
+    assert radical(primeira) != radical(segunda)
+
+
+def test_termos_remove_stopwords_e_normaliza():
+    assert termos("O menino e a menina foram às escolas") == [radical("menino"), radical("menina"), radical("escolas")]
+    assert termos("de da do que não nao") == []
+
+
+def _escrever(pasta, nome, texto):
+    with open(os.path.join(pasta, nome), "w", encoding="utf-8") as f:
+        f.write(texto)
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    transcritos = tmp_path / "transcritos"
+    transliterados = tmp_path / "transliterados"
+    transcritos.mkdir()
+    transliterados.mkdir()
+    # Termos comuns a todos para que "algoritmo" e "mercado" sejam os seletivos
+    comum = " aula video canal " * 5
+    _escrever(transliterados, "a-Transliterado.txt", "O algoritmo de busca ordena os algoritmos." + comum)
+    _escrever(transliterados, "b-Transliterado.txt", "Um algoritmo aparece uma vez em texto bem mais longo." + comum * 4)
+    _escrever(transliterados, "c-Transliterado.txt", "Falamos do mercado financeiro." + comum)
+    _escrever(transcritos, "a.txt", "o algoritmo na transcrição bruta" + comum)
+    _escrever(transcritos, "a-Transliterado.txt", "cópia fora do lugar, não é transcrição")
+    return str(transcritos), str(transliterados)
+
+
+def test_buscar_ordena_por_relevancia(pastas):
+    indice = IndiceBusca(*pastas)
+    assert indice.atualizar() == (4, 0, 0)
+    resultados = indice.buscar("algoritmos")
+    nomes = [(resultado["origem"], resultado["nome"]) for resultado in resultados]
+    assert nomes[0] == (ORIGEM_TRANSLITERADO, "a-Transliterado.txt")
+    assert set(nomes) == {
+        (ORIGEM_TRANSLITERADO, "a-Transliterado.txt"),
+        (ORIGEM_TRANSLITERADO, "b-Transliterado.txt"),
+        (ORIGEM_TRANSCRICAO, "a.txt"),
+    }
+    pontuacoes = [resultado["pontuacao"] for resultado in resultados]
+    assert pontuacoes == sorted(pontuacoes, reverse=True)
+    assert "algoritmo" in resultados[0]["trecho"].lower()
+
+
+def test_buscar_filtra_origem_e_limite(pastas):
+    indice = IndiceBusca(*pastas)
+    indice.atualizar()
+    resultados = indice.buscar("algoritmo", origem=ORIGEM_TRANSCRICAO)
+    assert [resultado["nome"] for resultado in resultados] == ["a.txt"]
+    assert len(indice.buscar("algoritmo", limite=1)) == 1
+    assert indice.buscar("inexistente") == []
+    assert indice.buscar("de o a") == []
+
+
+def test_termo_comum_completa_os_resultados(pastas):
+    indice = IndiceBusca(*pastas)
+    indice.atualizar()
+    # "aula" está em todos os documentos; "mercado" só no c, que vem primeiro e sozinho não enche o limite
+    assert len(indice.buscar("aula")) == 4
+    resultados = indice.buscar("mercado aula")
+    assert resultados[0]["nome"] == "c-Transliterado.txt"
+    assert len(resultados) == 4
+    assert resultados[0]["pontuacao"] > indice.buscar("mercado")[0]["pontuacao"]
+
+
+def test_termo_comum_so_pontua_candidatos_quando_o_limite_ja_foi_atingido(pastas):
+    indice = IndiceBusca(*pastas)
+    indice.atualizar()
+    resultados = indice.buscar("mercado aula", limite=1)
+    assert [resultado["nome"] for resultado in resultados] == ["c-Transliterado.txt"]
+    assert resultados[0]["pontuacao"] == pytest.approx(indice.buscar("mercado aula")[0]["pontuacao"])
+
+
+def test_indice_atualizado_por_outra_conexao(pastas):
+    transcritos, transliterados = pastas
+    app = IndiceBusca(transcritos, transliterados)
+    app.atualizar()
+    assert app.buscar("algoritmo")
+
+    # Outro processo (por exemplo o cli.py buscar) grava no mesmo arquivo
+    _escrever(transliterados, "d-Transliterado.txt", "algoritmo novo sobre mercado")
+    assert IndiceBusca(transcritos, transliterados).atualizar() == (1, 0, 0)
+
+    assert app.atualizar() == (0, 0, 0)
+    assert "d-Transliterado.txt" in {resultado["nome"] for resultado in app.buscar("algoritmo mercado")}
+
+
+def test_atualizar_incremental(pastas):
+    transcritos, transliterados = pastas
+    indice = IndiceBusca(transcritos, transliterados)
+    indice.atualizar()
+
+    # Só tocado: mesmo conteúdo, nada a reindexar
+    os.utime(os.path.join(transliterados, "c-Transliterado.txt"), (1, 1))
+    assert indice.atualizar() == (0, 0, 0)
+
+    _escrever(transliterados, "c-Transliterado.txt", "Agora fala de algoritmo.")
+    os.utime(os.path.join(transliterados, "c-Transliterado.txt"), (2, 2))
+    os.remove(os.path.join(transcritos, "a.txt"))
+    _escrever(transliterados, "d-Transliterado.txt", "mercado de trabalho")
+    assert indice.atualizar() == (1, 1, 1)
+
+    assert [resultado["nome"] for resultado in indice.buscar("mercado")] == ["d-Transliterado.txt"]
+    assert ORIGEM_TRANSCRICAO not in {resultado["origem"] for resultado in indice.buscar("algoritmo")}
+    assert indice.totais()["documentos"] == 4
+
+    # Um índice novo sobre o mesmo arquivo não tem nada a refazer
+    assert IndiceBusca(transcritos, transliterados).atualizar() == (0, 0, 0)
@@ -0,0 +1,97 @@
+import os
+
+import pytest
+
+import cache_resultados
+from cache_resultados import CacheResultados, TIPO_TRANSCRICAO, TIPO_TRANSLITERACAO
+
+
+class Relogio:
+    """Substitui o módulo time no cache_resultados: cada leitura avança um segundo"""
+
+    def __init__(self):
+        self.agora = 1000.0
+
+    def time(self):
+        self.agora += 1
+        return self.agora
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_resultados, "time", Relogio())
+    return CacheResultados(str(tmp_path / "cache"), limite_bytes=None)
+
+
+@pytest.fixture
+def audio(tmp_path):
+    caminho = tmp_path / "aula.mp3"
+    caminho.write_bytes(b"\x00\x01" * 1000)
+    return str(caminho)
+
+
+def test_acerto_devolve_o_texto_e_conta(cache, audio):
+    chave = cache.chave_transcricao(audio, "small", "pt")
+    assert cache.obter(TIPO_TRANSCRICAO, chave) is None
+    cache.guardar(TIPO_TRANSCRICAO, chave, "olá mundo", custo=12.5)
+    assert cache.obter(TIPO_TRANSCRICAO, chave) == "olá mundo"
+
+    estatisticas = cache.estatisticas()
+    assert estatisticas[TIPO_TRANSCRICAO] == {"acertos": 1, "faltas": 1, "custo_economizado": 12.5}
+    assert estatisticas["entradas"] == 1
+
+
+def test_mesmo_conteudo_com_outro_nome_acerta(cache, audio, tmp_path):
+    cache.guardar(TIPO_TRANSCRICAO, cache.chave_transcricao(audio, "small", "pt"), "texto")
+    copia = tmp_path / "renomeado.mp3"
+    copia.write_bytes(open(audio, "rb").read())
+    assert cache.obter(TIPO_TRANSCRICAO, cache.chave_transcricao(str(copia), "small", "pt")) == "texto"
+
+
+@pytest.mark.parametrize("modelo, idioma", [("medium", "pt"), ("small", "en"), ("small+vad", "pt"), ("small+int8", "pt")])
+def test_outra_opcao_de_transcricao_erra(cache, audio, modelo, idioma):
+    cache.guardar(TIPO_TRANSCRICAO, cache.chave_transcricao(audio, "small", "pt"), "texto")
+    assert cache.obter(TIPO_TRANSCRICAO, cache.chave_transcricao(audio, modelo, idioma)) is None
+
+
+def test_audio_alterado_erra(cache, audio):
+    cache.guardar(TIPO_TRANSCRICAO, cache.chave_transcricao(audio, "small", "pt"), "texto")
+    with open(audio, "ab") as f:
+        f.write(b"\x02")
+    os.utime(audio, (1, 1))
+    assert cache.obter(TIPO_TRANSCRICAO, cache.chave_transcricao(audio, "small", "pt")) is None
+
+
+@pytest.mark.parametrize("alteracao", [
+    {"conteudo": "outra transcrição"},
+    {"prompt": "outro prompt {}"},
+    {"modelo": "gpt-4o"},
+    {"temperatura": 0.7},
+])
+def test_outra_opcao_de_transliteracao_erra(cache, alteracao):
+    opcoes = {"conteudo": "transcrição", "prompt": "prompt {}", "modelo": "gpt-4o-mini", "temperatura": 0.3}
+    cache.guardar(TIPO_TRANSLITERACAO, CacheResultados.chave_transliteracao(**opcoes), "documento")
+    assert cache.obter(TIPO_TRANSLITERACAO, CacheResultados.chave_transliteracao(**opcoes)) == "documento"
+    assert cache.obter(TIPO_TRANSLITERACAO, CacheResultados.chave_transliteracao(**{**opcoes, **alteracao})) is None
+
+
+def test_despeja_o_acessado_ha_mais_tempo(cache):
+    cache.limite_bytes = 250
+    for nome in ("a", "b"):
+        cache.guardar(TIPO_TRANSLITERACAO, nome * 64, nome * 100)
+    # O "a" é lido de novo, então o "b" passa a ser o mais antigo
+    assert cache.obter(TIPO_TRANSLITERACAO, "a" * 64) == "a" * 100
+    cache.guardar(TIPO_TRANSLITERACAO, "c" * 64, "c" * 100)
+
+    assert cache.obter(TIPO_TRANSLITERACAO, "b" * 64) is None
+    assert not os.path.exists(cache._caminho("b" * 64))
+    assert cache.obter(TIPO_TRANSLITERACAO, "a" * 64) == "a" * 100
+    assert cache.obter(TIPO_TRANSLITERACAO, "c" * 64) == "c" * 100
+    assert cache.estatisticas()["bytes"] == 200
+
+
+def test_arquivo_apagado_por_fora_vira_falta(cache):
+    cache.guardar(TIPO_TRANSLITERACAO, "d" * 64, "documento")
+    os.remove(cache._caminho("d" * 64))
+    assert cache.obter(TIPO_TRANSLITERACAO, "d" * 64) is None
+    assert cache.estatisticas()["entradas"] == 0
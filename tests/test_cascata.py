@@ -0,0 +1,114 @@
+from contextlib import contextmanager
+
+import pytest
+
+import cascata
+from cascata import LIMITES_CASCATA_PADRAO, motivo_incerteza, regioes_incertas, refinar, somar_estatisticas
+
+TAXA = 10  # amostras por segundo, para o áudio de teste caber numa lista
+
+
+def _segmento(inicio, fim, texto, logprob=-0.2, compressao=1.5, sem_fala=0.1):
+    return {"start": inicio, "end": fim, "text": f" {texto}", "avg_logprob": logprob,
+            "compression_ratio": compressao, "no_speech_prob": sem_fala}
+
+
+@pytest.mark.parametrize("campos, motivo", [
+    ({}, None),
+    ({"logprob": -1.2}, "logprob"),
+    ({"compressao": 3.0}, "compressao"),
+    ({"sem_fala": 0.9}, "sem_fala"),
+    ({"logprob": -1.2, "sem_fala": 0.9}, "logprob"),
+])
+def test_motivo_incerteza(campos, motivo):
+    assert motivo_incerteza(_segmento(0, 1, "x", **campos), LIMITES_CASCATA_PADRAO) == motivo
+
+
+def test_regioes_juntam_incertos_proximos_com_margem():
+    segmentos = [
+        _segmento(0.0, 2.0, "a", logprob=-1.0),    # 0: incerto no começo, margem presa em 0
+        _segmento(2.0, 2.5, "b"),                  # 1: confiável entre dois incertos próximos
+        _segmento(2.5, 4.0, "c", compressao=3.0),  # 2
+        _segmento(4.0, 10.0, "d"),
+        _segmento(10.0, 11.0, "e", sem_fala=0.9),  # 4: longe do anterior, margem presa no fim
+    ]
+    assert regioes_incertas(segmentos, LIMITES_CASCATA_PADRAO, 11.2) == [
+        (0, 2, 0.0, 4.3),
+        (4, 4, 9.7, 11.2),
+    ]
+    assert regioes_incertas(segmentos[1:2] + segmentos[3:4], LIMITES_CASCATA_PADRAO, 11.2) == []
+
+
+class Chamadas(list):
+    """Chamadas ao transcribe do modelo preciso, com os nomes dos modelos reservados em `usados`"""
+
+    def __init__(self):
+        super().__init__()
+        self.usados = []
+
+
+@pytest.fixture
+def preciso(monkeypatch):
+    """Modelo preciso falso: devolve o trecho que recebeu (em segundos) como texto"""
+    chamadas = Chamadas()
+
+    class Modelo:
+        def transcribe(self, trecho, **opcoes):
+            chamadas.append({"inicio": trecho[0] / TAXA, "fim": (trecho[-1] + 1) / TAXA, **opcoes})
+            return {"text": f" PRECISO {trecho[0] / TAXA:.1f}-{(trecho[-1] + 1) / TAXA:.1f} "}
+
+    class Entrada:
+        model = Modelo()
+        opcoes_transcricao = {"fp16": False}
+
+    @contextmanager
+    def usar_modelo(nome):
+        chamadas.usados.append(nome)
+        yield Entrada()
+
+    monkeypatch.setattr(cascata, "TAXA_AMOSTRAGEM", TAXA)
+    monkeypatch.setattr(cascata, "usar_modelo", usar_modelo)
+    return chamadas
+
+
+def test_refinar_troca_so_as_regioes_incertas(preciso):
+    audio = list(range(20 * TAXA))  # cada amostra guarda o próprio índice
+    result = {"segments": [
+        _segmento(0.0, 3.0, "um"),
+        _segmento(3.0, 5.0, "dois"),
+        _segmento(5.0, 6.0, "tres", logprob=-1.5),
+        _segmento(6.0, 6.5, "quatro"),
+        _segmento(6.5, 8.0, "cinco", compressao=2.8),
+        _segmento(8.0, 20.0, "seis"),
+    ]}
+    texto, estatisticas = refinar(result, audio, "base", "large", "pt", tempo_rapido=2.0)
+
+    # tres..cinco viram uma região só, com margem de 0.3 s de cada lado
+    assert texto == "um dois PRECISO 4.7-8.3 seis"
+    assert len(preciso) == 1
+    assert (preciso[0]["inicio"], preciso[0]["fim"]) == (4.7, 8.3)
+    assert preciso[0]["language"] == "pt"
+    assert preciso[0]["initial_prompt"] == "um dois"
+    assert preciso[0]["condition_on_previous_text"] is False
+    assert preciso.usados == ["large"]
+
+    assert estatisticas["segmentos"] == 6
+    assert estatisticas["segmentos_escalados"] == 2
+    assert estatisticas["motivos"] == {"logprob": 1, "compressao": 1, "sem_fala": 0}
+    assert estatisticas["regioes"] == 1
+    assert estatisticas["duracao_escalada"] == pytest.approx(3.6)
+    assert estatisticas["fracao_escalada"] == pytest.approx(3.6 / 20)
+
+
+def test_refinar_sem_incertos_nao_carrega_o_modelo_preciso(preciso):
+    result = {"segments": [_segmento(0.0, 4.0, "tudo"), _segmento(4.0, 5.0, "certo")]}
+    texto, estatisticas = refinar(result, list(range(5 * TAXA)), "small", "large", tempo_rapido=1.0)
+    assert texto == "tudo certo"
+    assert preciso == [] and preciso.usados == []
+    assert estatisticas["fracao_escalada"] == 0.0
+    # Só o modelo rápido: economia estimada pela velocidade relativa (small 4x o large)
+    assert estatisticas["tempo_so_preciso_estimado"] == pytest.approx(4.0)
+    assert estatisticas["economia_s"] == pytest.approx(3.0)
+
+    total = somar_estatisticas([estatisticas, None, estatisticas])
+    assert total["duracao_total"] == pytest.approx(10.0)
@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+import indice_documentos
+from indice_documentos import IndiceDocumentos, _resumir
+
+TEXTOS = [
+    "um dois três quatro cinco seis sete oito nove dez",
+    "linha um\nlinha dois\n\nlinha   três com   espaços\n",
+    "palavralongasemespaconenhum outra",
+    "  espaços no começo e no fim  ",
+    "tabulação\tentre\tpalavras e quebra\r\nno estilo windows",
+    "acentuação: ação, coração, pão — e travessões",
+    "",
+]
+
+
+@pytest.mark.parametrize("tamanho", [1, 2, 3, 5, 7, 64])
+@pytest.mark.parametrize("texto", TEXTOS)
+def test_resumir_conta_palavras_cortadas_entre_blocos(tmp_path, monkeypatch, texto, tamanho):
+    caminho = tmp_path / "doc-Transliterado.txt"
+    caminho.write_bytes(texto.encode("utf-8"))
+    monkeypatch.setattr(indice_documentos, "TAMANHO_LEITURA", tamanho)
+    palavras, _ = _resumir(str(caminho))
+    assert palavras == len(texto.split())
+
+
+def test_resumir_previa_pula_linhas_vazias(tmp_path):
+    caminho = tmp_path / "doc-Transliterado.txt"
+    caminho.write_text("\n\nprimeira\n\n  segunda  \n", encoding="utf-8")
+    assert _resumir(str(caminho)) == (2, "primeira\nsegunda")
+
+
+def _escrever(pasta, nome, texto):
+    with open(os.path.join(pasta, nome), "w", encoding="utf-8") as f:
+        f.write(texto)
+
+
+def test_atualizar_so_le_o_que_mudou(tmp_path):
+    pasta = str(tmp_path)
+    _escrever(pasta, "a-Transliterado.txt", "um dois")
+    _escrever(pasta, "b-Transliterado.txt", "um dois três")
+    _escrever(pasta, "ignorado.txt", "não é transliteração")
+    indice = IndiceDocumentos(pasta)
+    assert indice.atualizar() == (2, 0, 0)
+    assert indice.atualizar() == (0, 0, 0)
+
+    _escrever(pasta, "a-Transliterado.txt", "um dois três quatro")
+    os.utime(os.path.join(pasta, "a-Transliterado.txt"), (1, 1))
+    os.remove(os.path.join(pasta, "b-Transliterado.txt"))
+    assert indice.atualizar() == (0, 1, 1)
+    assert indice.totais()["palavras"] == 4
+
+
+def test_atualizar_pula_arquivo_que_some_durante_a_varredura(tmp_path, monkeypatch):
+    pasta = str(tmp_path)
+    _escrever(pasta, "a-Transliterado.txt", "um")
+    _escrever(pasta, "b-Transliterado.txt", "um dois")
+    indice = IndiceDocumentos(pasta)
+    indice.atualizar()
+
+    resumir = indice_documentos._resumir
+
+    def apagado(caminho):
+        if caminho.endswith("b-Transliterado.txt"):
+            raise FileNotFoundError(caminho)
+        return resumir(caminho)
+
+    monkeypatch.setattr(indice_documentos, "_resumir", apagado)
+    for nome in ("a-Transliterado.txt", "b-Transliterado.txt"):
+        os.utime(os.path.join(pasta, nome), (1, 1))
+    _escrever(pasta, "c-Transliterado.txt", "um dois três")
+    assert indice.atualizar() == (1, 1, 1)
+    assert indice.totais()["documentos"] == 2
@@ -0,0 +1,97 @@
+import threading
+
+import pytest
+
+from modelos import RegistroModelos, PRECISAO_FP32
+
+MB = 1024 * 1024
+TAMANHOS = {"tiny": 100 * MB, "base": 200 * MB, "small": 500 * MB}
+
+
+@pytest.fixture
+def registro():
+    registro = RegistroModelos(limite_bytes=700 * MB)
+    registro.carregados = []
+
+    def carregar(nome, dispositivo, precisao):
+        registro.carregados.append(nome)
+        return object(), 0.0, TAMANHOS[nome]
+
+    registro._carregar = carregar
+    return registro
+
+
+def _residentes(registro):
+    return [info["modelo"] for info in registro.estatisticas()]
+
+
+def test_modelo_residente_nao_e_carregado_de_novo(registro):
+    primeira = registro.obter("tiny", "cpu", PRECISAO_FP32)
+    assert registro.obter("tiny", "cpu", PRECISAO_FP32) is primeira
+    assert registro.carregados == ["tiny"]
+    assert registro.estatisticas()[0]["usos"] == 2
+
+
+def test_despeja_o_menos_usado_recentemente(registro):
+    registro.obter("tiny", "cpu", PRECISAO_FP32)
+    registro.obter("base", "cpu", PRECISAO_FP32)
+    registro.obter("tiny", "cpu", PRECISAO_FP32)
+    # 100 + 200 + 500 passa de 700: sai o base, usado há mais tempo
+    registro.obter("small", "cpu", PRECISAO_FP32)
+    assert _residentes(registro) == ["small", "tiny"]
+    assert registro.despejados == 1
+
+
+def test_limite_menor_despeja_ate_caber_mas_mantem_um(registro):
+    for nome in ("tiny", "base", "small"):
+        registro.obter(nome, "cpu", PRECISAO_FP32)
+    registro.definir_limite(300 * MB)
+    assert _residentes(registro) == ["small"]
+    registro.definir_limite(None)
+    registro.obter("tiny", "cpu", PRECISAO_FP32)
+    assert _residentes(registro) == ["tiny", "small"]
+
+
+def test_modelo_em_uso_nao_e_despejado(registro):
+    with registro.usar("base", "cpu", PRECISAO_FP32) as entrada:
+        registro.obter("tiny", "cpu", PRECISAO_FP32)
+        registro.obter("small", "cpu", PRECISAO_FP32)
+        # O base é o mais antigo, mas está transcrevendo: sai o tiny no lugar dele
+        assert _residentes(registro) == ["small", "base"]
+        assert entrada.em_uso == 1
+    assert entrada.em_uso == 0
+    assert _residentes(registro) == ["small", "base"]
+
+
+def test_excesso_sai_quando_o_modelo_deixa_de_ser_usado(registro):
+    registro.definir_limite(600 * MB)
+    with registro.usar("base", "cpu", PRECISAO_FP32):
+        with registro.usar("small", "cpu", PRECISAO_FP32):
+            # 700 MB em uso: acima do limite, mas nenhum dos dois pode sair
+            assert _residentes(registro) == ["small", "base"]
+        # O small saiu do bloco; o base continua em uso
+        assert _residentes(registro) == ["base"]
+    assert _residentes(registro) == ["base"]
+
+
+def test_carregamento_concorrente_do_mesmo_modelo_acontece_uma_vez(registro):
+    carregar = registro._carregar
+    barreira = threading.Barrier(4)
+
+    def lento(nome, dispositivo, precisao):
+        threading.Event().wait(0.05)
+        return carregar(nome, dispositivo, precisao)
+
+    registro._carregar = lento
+
+    def obter():
+        barreira.wait()
+        registro.obter("base", "cpu", PRECISAO_FP32)
+
+    threads = [threading.Thread(target=obter) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert registro.carregados == ["base"]
+    assert registro.estatisticas()[0]["usos"] == 4
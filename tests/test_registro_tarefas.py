@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from registro_tarefas import (
+    RegistroTarefas, ETAPA_TRANSCRICAO, STATUS_PENDENTE, STATUS_EM_ANDAMENTO, STATUS_CONCLUIDA, STATUS_FALHOU
+)
+
+
+@pytest.fixture
+def caminho(tmp_path):
+    return str(tmp_path / "tarefas.sqlite3")
+
+
+def test_reivindicar_e_exclusivo(caminho):
+    registro = RegistroTarefas(caminho)
+    assert registro.reivindicar("video", ETAPA_TRANSCRICAO, trabalhador="a")
+    assert not registro.reivindicar("video", ETAPA_TRANSCRICAO, trabalhador="b")
+    tarefa = registro.obter("video", ETAPA_TRANSCRICAO)
+    assert tarefa["status"] == STATUS_EM_ANDAMENTO
+    assert tarefa["trabalhador"] == "a"
+
+
+def test_concluida_nao_e_reivindicada_de_novo(caminho, tmp_path):
+    registro = RegistroTarefas(caminho)
+    saida = tmp_path / "video.txt"
+    saida.write_text("texto", encoding="utf-8")
+    registro.reivindicar("video", ETAPA_TRANSCRICAO)
+    registro.concluir("video", ETAPA_TRANSCRICAO, str(saida))
+    assert not registro.reivindicar("video", ETAPA_TRANSCRICAO)
+    assert not registro.precisa_processar("video", ETAPA_TRANSCRICAO, str(saida))
+
+
+def test_concluida_sem_saida_volta_a_pendente(caminho, tmp_path):
+    registro = RegistroTarefas(caminho)
+    registro.reivindicar("video", ETAPA_TRANSCRICAO)
+    registro.concluir("video", ETAPA_TRANSCRICAO, str(tmp_path / "sumiu.txt"))
+    assert registro.precisa_processar("video", ETAPA_TRANSCRICAO, str(tmp_path / "sumiu.txt"))
+    assert registro.obter("video", ETAPA_TRANSCRICAO)["status"] == STATUS_PENDENTE
+
+
+def test_falhas_esgotam_as_tentativas(caminho):
+    registro = RegistroTarefas(caminho, maximo_tentativas=2)
+    for _ in range(2):
+        assert registro.reivindicar("video", ETAPA_TRANSCRICAO)
+        registro.falhar("video", ETAPA_TRANSCRICAO, "erro")
+    assert not registro.reivindicar("video", ETAPA_TRANSCRICAO)
+    assert not registro.precisa_processar("video", ETAPA_TRANSCRICAO)
+    tarefa = registro.obter("video", ETAPA_TRANSCRICAO)
+    assert (tarefa["status"], tarefa["tentativas"], tarefa["erro"]) == (STATUS_FALHOU, 2, "erro")
+
+    registro.reiniciar_falhas()
+    assert registro.reivindicar("video", ETAPA_TRANSCRICAO)
+
+
+def test_em_andamento_abandonada_pode_ser_retomada(caminho):
+    registro = RegistroTarefas(caminho, expiracao_segundos=0.05)
+    assert registro.reivindicar("video", ETAPA_TRANSCRICAO, trabalhador="a")
+    assert not registro.reivindicar("video", ETAPA_TRANSCRICAO, trabalhador="b")
+    time.sleep(0.1)
+    assert registro.reivindicar("video", ETAPA_TRANSCRICAO, trabalhador="b")
+    assert registro.obter("video", ETAPA_TRANSCRICAO)["trabalhador"] == "b"
+
+
+def test_trabalhador_expirado_nao_conclui_nem_falha_a_tarefa_retomada(caminho):
+    registro = RegistroTarefas(caminho, expiracao_segundos=0.05)
+    assert registro.reivindicar("video", ETAPA_TRANSCRICAO, trabalhador="a")
+    time.sleep(0.1)
+    assert registro.reivindicar("video", ETAPA_TRANSCRICAO, trabalhador="b")
+
+    assert not registro.concluir("video", ETAPA_TRANSCRICAO, trabalhador="a")
+    assert not registro.falhar("video", ETAPA_TRANSCRICAO, "erro atrasado", trabalhador="a")
+    assert not registro.liberar("video", ETAPA_TRANSCRICAO, trabalhador="a")
+    tarefa = registro.obter("video", ETAPA_TRANSCRICAO)
+    assert (tarefa["status"], tarefa["trabalhador"], tarefa["erro"]) == (STATUS_EM_ANDAMENTO, "b", None)
+
+    assert registro.concluir("video", ETAPA_TRANSCRICAO, trabalhador="b")
+    assert registro.obter("video", ETAPA_TRANSCRICAO)["status"] == STATUS_CONCLUIDA
+    # Concluída não volta a falhar por um resultado repetido
+    assert not registro.falhar("video", ETAPA_TRANSCRICAO, "erro", trabalhador="b")
+
+
+def test_liberar_devolve_sem_gastar_tentativa(caminho):
+    registro = RegistroTarefas(caminho)
+    registro.reivindicar("video", ETAPA_TRANSCRICAO)
+    registro.liberar("video", ETAPA_TRANSCRICAO)
+    tarefa = registro.obter("video", ETAPA_TRANSCRICAO)
+    assert (tarefa["status"], tarefa["tentativas"]) == (STATUS_PENDENTE, 0)
+    assert registro.reivindicar("video", ETAPA_TRANSCRICAO)
+
+
+def test_saida_existente_e_importada(caminho, tmp_path):
+    registro = RegistroTarefas(caminho)
+    saida = tmp_path / "antigo.txt"
+    saida.write_text("texto", encoding="utf-8")
+    assert not registro.precisa_processar("antigo", ETAPA_TRANSCRICAO, str(saida))
+    assert registro.obter("antigo", ETAPA_TRANSCRICAO)["status"] == STATUS_CONCLUIDA
+
+
+def test_um_vencedor_entre_conexoes_concorrentes(caminho):
+    # Uma instância por thread, como processos diferentes abrindo o mesmo arquivo
+    RegistroTarefas(caminho)
+    registros = [RegistroTarefas(caminho) for _ in range(8)]
+    barreira = threading.Barrier(len(registros))
+    vencedores = []
+
+    def disputar(indice):
+        barreira.wait()
+        if registros[indice].reivindicar("video", ETAPA_TRANSCRICAO, trabalhador=str(indice)):
+            vencedores.append(indice)
+
+    threads = [threading.Thread(target=disputar, args=(indice,)) for indice in range(len(registros))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(vencedores) == 1
+    assert registros[0].obter("video", ETAPA_TRANSCRICAO)["trabalhador"] == str(vencedores[0])
@@ -0,0 +1,194 @@
+import os
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import trabalhos
+from trabalhos import ConfiguracaoProcesso, TrabalhoCancelado, _configuracao
+
+FP32 = {"inferencia": {"precisao": "fp32", "threads": 0, "guardar_int8": True}}
+INT8 = {"inferencia": {"precisao": "int8", "threads": 2, "guardar_int8": True}}
+
+
+def test_configuracao_vazia_fica_a_do_processo():
+    assert _configuracao({"modelo": "base", "perfil": None}) == {}
+    assert _configuracao({**FP32, "modelo": "base"}) == FP32
+
+
+def test_mesma_configuracao_roda_junto_e_aplica_uma_vez():
+    aplicadas = []
+    configuracao = ConfiguracaoProcesso(aplicadas.append)
+    with configuracao.usar(FP32):
+        with configuracao.usar(dict(FP32)):
+            assert configuracao.ativos == 2
+    assert aplicadas == [FP32]
+
+
+def test_outra_configuracao_espera_os_que_estao_rodando():
+    aplicadas = []
+    configuracao = ConfiguracaoProcesso(aplicadas.append)
+    entrou = threading.Event()
+
+    def outro():
+        with configuracao.usar(INT8):
+            entrou.set()
+
+    with configuracao.usar(FP32):
+        thread = threading.Thread(target=outro)
+        thread.start()
+        assert not entrou.wait(0.2)
+        assert aplicadas == [FP32]
+    thread.join(5)
+    assert entrou.is_set()
+    assert aplicadas == [FP32, INT8]
+
+
+def test_quem_espera_barra_novos_trabalhos_da_configuracao_atual():
+    configuracao = ConfiguracaoProcesso(lambda _: None)
+    ordem = []
+
+    def rodar(pedida, nome):
+        with configuracao.usar(pedida):
+            ordem.append(nome)
+
+    with configuracao.usar(FP32):
+        int8 = threading.Thread(target=rodar, args=(INT8, "int8"))
+        int8.start()
+        while not configuracao._esperando:
+            threading.Event().wait(0.01)
+        fp32 = threading.Thread(target=rodar, args=(FP32, "fp32"))
+        fp32.start()
+        fp32.join(0.2)
+        assert fp32.is_alive()
+    int8.join(5)
+    fp32.join(5)
+    assert ordem == ["int8", "fp32"]
+
+
+def test_espera_cancelada():
+    configuracao = ConfiguracaoProcesso(lambda _: None)
+    with configuracao.usar(FP32):
+        with pytest.raises(TrabalhoCancelado):
+            with configuracao.usar(INT8, cancelado=lambda: True):
+                pass
+        assert not configuracao._esperando
+
+
+class ContextoFalso:
+    def __init__(self):
+        self.historico = []
+
+    def anotar(self, linha):
+        self.historico.append(linha)
+
+    def verificar(self):
+        pass
+
+    @contextmanager
+    def vaga(self, recurso, quantidade=1):
+        yield quantidade
+
+
+def test_pasta_segue_quando_uma_extracao_falha(tmp_path, monkeypatch):
+    import audio
+    import pipeline
+
+    for nome in ("a.mp4", "corrompido.mp4", "c.mp4"):
+        (tmp_path / nome).write_bytes(b"")
+
+    def extrair(video, pasta, formato):
+        if "corrompido" in video:
+            raise RuntimeError("moov atom not found")
+        return video + ".npy"
+
+    transcritos = []
+    iniciados = []
+
+    def transcrever(pares, *args, **kwargs):
+        transcritos.extend(audio for audio, _ in pares)
+        yield from ()
+
+    class Esteira:
+        def iniciar(self, itens):
+            iniciados.extend(item["nome"] for item in itens)
+
+    monkeypatch.setattr(audio, "extrair_audio", extrair)
+    monkeypatch.setattr(pipeline, "transcrever_pares", transcrever)
+    monkeypatch.setattr(trabalhos, "recurso_whisper", lambda: trabalhos.RECURSO_CPU)
+    monkeypatch.setattr(trabalhos, "_esteira", lambda contexto, parametros: Esteira())
+    monkeypatch.setattr(trabalhos, "_acompanhar_esteira", lambda contexto, esteira, total: {"processados": total, "erros": 0})
+
+    contexto = ContextoFalso()
+    resultado = trabalhos.trabalho_pasta(contexto, {
+        "pasta_videos": str(tmp_path), "pasta_transcritos": str(tmp_path / "t"), "pasta_transliterados": str(tmp_path / "l"),
+        "modelo": "base", "processos": 2, "formato_audio": "npy",
+    })
+    assert resultado == {"processados": 2, "erros": 1}
+    assert iniciados == ["a.mp4", "c.mp4"]
+    assert [os.path.basename(audio) for audio in transcritos] == ["a.mp4.npy", "c.mp4.npy"]
+    assert any("corrompido.mp4" in linha and "moov" in linha for linha in contexto.historico)
+
+
+def test_esteira_grava_as_metricas_por_etapa_no_trabalho(tmp_path, monkeypatch):
+    import sqlite3
+
+    from esteira import Esteira
+
+    monkeypatch.setattr(trabalhos.time, "sleep", lambda segundos: None)
+    caminho = str(tmp_path / "fila.db")
+    # Fila criada antes da coluna de etapas
+    with sqlite3.connect(caminho) as conexao:
+        conexao.execute("""
+            CREATE TABLE trabalhos (id INTEGER PRIMARY KEY AUTOINCREMENT, tipo TEXT NOT NULL, titulo TEXT,
+                parametros TEXT NOT NULL, prioridade INTEGER NOT NULL, status TEXT NOT NULL,
+                progresso REAL NOT NULL DEFAULT 0, mensagem TEXT, historico TEXT NOT NULL DEFAULT '[]', previa TEXT,
+                resultado TEXT, erro TEXT, tentativas INTEGER NOT NULL DEFAULT 0, cancelar INTEGER NOT NULL DEFAULT 0,
+                dono TEXT, criado_em REAL NOT NULL, iniciado_em REAL, terminado_em REAL, batimento_em REAL)
+        """)
+    fila = trabalhos.FilaTrabalhos(caminho)
+    identificador = fila.enfileirar("pasta", {}, 1)
+
+    class Executor:
+        def __init__(self):
+            self.fila = fila
+
+        def parando(self):
+            return False
+
+    contexto = trabalhos.Contexto(Executor(), fila.obter(identificador))
+    esteira = Esteira([("Extração", lambda item: item), ("Transcrição", lambda item: item)])
+    esteira.iniciar([{"nome": "a.mp4"}, {"nome": "b.mp4"}])
+    assert trabalhos._acompanhar_esteira(contexto, esteira, 2) == {"processados": 2, "erros": 0}
+    contexto.descarregar()
+
+    etapas = fila.obter(identificador)["etapas"]
+    assert [metrica["etapa"] for metrica in etapas] == ["Extração", "Transcrição"]
+    for metrica in etapas:
+        assert metrica["concluidos"] == 2 and metrica["fila"] == 0
+        assert metrica["por_minuto"] > 0 and 0 <= metrica["ocupacao"] <= 1
+
+    fila.terminar(identificador, trabalhos.STATUS_FALHOU, erro="x")
+    fila.repetir(identificador)
+    assert fila.obter(identificador)["etapas"] is None
+
+
+def test_limpar_envios_apaga_so_os_parados_sem_trabalho_ativo(tmp_path):
+    fila = trabalhos.FilaTrabalhos(str(tmp_path / "fila.db"))
+    raiz = tmp_path / trabalhos.PASTA_ENVIOS
+    pastas = {}
+    for nome in ("orfa_antiga", "falhou_antiga", "na_fila_antiga", "recente"):
+        pastas[nome] = raiz / nome
+        pastas[nome].mkdir(parents=True)
+        (pastas[nome] / "aula.mp4").write_bytes(b"video")
+        if nome != "recente":
+            os.utime(pastas[nome], (1, 1))
+
+    falhou = fila.enfileirar("upload", {"pasta_envio": str(pastas["falhou_antiga"])}, 0)
+    fila.reivindicar("teste")
+    fila.terminar(falhou, trabalhos.STATUS_FALHOU, erro="ffmpeg")
+    fila.enfileirar("upload", {"pasta_envio": str(pastas["na_fila_antiga"])}, 0)
+
+    assert fila.limpar_envios(str(raiz)) == 2
+    assert sorted(os.listdir(raiz)) == ["na_fila_antiga", "recente"]
+    assert fila.limpar_envios(str(tmp_path / "inexistente")) == 0
@@ -0,0 +1,117 @@
+import json
+from contextlib import contextmanager
+
+import pytest
+
+import transcricao
+from cache_resultados import obter_cache, TIPO_TRANSCRICAO
+from transcricao import caminho_diario, ler_diario, transcrever_em_janelas
+
+TAXA = 10  # amostras por segundo, para o áudio de teste caber numa lista
+
+
+class ModeloFalso:
+    """Devolve um segmento por janela e lembra em que segundo cada janela começou"""
+
+    def __init__(self):
+        self.janelas = []
+
+    def transcribe(self, trecho, **opcoes):
+        inicio = trecho[0] / TAXA
+        self.janelas.append(inicio)
+        return {"segments": [{"start": 0.0, "end": len(trecho) / TAXA, "text": f" janela {int(inicio)} "}]}
+
+
+class EntradaFalsa:
+    def __init__(self):
+        self.model = ModeloFalso()
+        self.opcoes_transcricao = {}
+
+
+@pytest.fixture
+def modelo(tmp_path, monkeypatch):
+    entrada = EntradaFalsa()
+
+    @contextmanager
+    def usar_modelo(nome):
+        yield entrada
+
+    monkeypatch.delenv("WHISPER_PRECISAO", raising=False)
+    monkeypatch.setattr(transcricao, "TAXA_AMOSTRAGEM", TAXA)
+    monkeypatch.setattr(transcricao, "usar_modelo", usar_modelo)
+    # Cada amostra guarda o próprio índice: o modelo falso descobre onde a janela começa
+    monkeypatch.setattr(transcricao, "carregar_pcm", lambda caminho: list(range(70 * TAXA)))
+    return entrada.model
+
+
+@pytest.fixture
+def arquivos(tmp_path):
+    audio = tmp_path / "aula.npy"
+    audio.write_bytes(b"pcm")
+    return str(audio), str(tmp_path / "aula.txt")
+
+
+def _escrever_diario(caminho_txt, linhas):
+    with open(caminho_diario(caminho_txt), "w", encoding="utf-8") as f:
+        for linha in linhas:
+            f.write(linha if isinstance(linha, str) else json.dumps(linha) + "\n")
+
+
+def test_ler_diario_descarta_o_que_veio_depois_da_ultima_janela(arquivos):
+    _, txt = arquivos
+    _escrever_diario(txt, [
+        {"tipo": "segmento", "inicio": 0.0, "fim": 12.0, "texto": "um"},
+        {"tipo": "segmento", "inicio": 12.0, "fim": 28.0, "texto": "dois"},
+        {"tipo": "janela", "fim": 28.0},
+        {"tipo": "segmento", "inicio": 28.0, "fim": 50.0, "texto": "sem janela confirmada"},
+        '{"tipo": "janela", "fi',
+    ])
+    segmentos, retomar_em, terminado = ler_diario(caminho_diario(txt))
+    assert [segmento["texto"] for segmento in segmentos] == ["um", "dois"]
+    assert (retomar_em, terminado) == (28.0, False)
+
+
+def test_ler_diario_inexistente(arquivos):
+    assert ler_diario(caminho_diario(arquivos[1])) == ([], 0.0, False)
+
+
+def test_retoma_do_ultimo_checkpoint(modelo, arquivos):
+    audio, txt = arquivos
+    _escrever_diario(txt, [
+        {"tipo": "segmento", "inicio": 0.0, "fim": 30.0, "texto": "janela 0"},
+        {"tipo": "janela", "fim": 30.0},
+        {"tipo": "segmento", "inicio": 30.0, "fim": 45.0, "texto": "perdido na queda"},
+    ])
+    textos = [segmento["texto"] for segmento in transcrever_em_janelas(audio, txt, "base")]
+
+    assert modelo.janelas == [30.0, 60.0]
+    assert textos == ["janela 0", "janela 30", "janela 60"]
+    with open(txt, encoding="utf-8") as f:
+        assert f.read() == "janela 0 janela 30 janela 60"
+    segmentos, retomar_em, terminado = ler_diario(caminho_diario(txt))
+    assert [segmento["texto"] for segmento in segmentos] == textos
+    assert (retomar_em, terminado) == (70.0, True)
+
+    # Terminado: uma nova chamada só relê o diário
+    assert [segmento["texto"] for segmento in transcrever_em_janelas(audio, txt, "base")] == textos
+    assert modelo.janelas == [30.0, 60.0]
+
+
+def test_cache_evita_transcrever_de_novo(modelo, arquivos, tmp_path):
+    audio, txt = arquivos
+    pasta_cache = str(tmp_path / "cache")
+    list(transcrever_em_janelas(audio, txt, "base", pasta_cache=pasta_cache))
+    assert modelo.janelas == [0.0, 30.0, 60.0]
+
+    # O mesmo áudio em outro lugar, sem diário: vem do cache sem chamar o modelo
+    outro_txt = str(tmp_path / "copia.txt")
+    segmentos = list(transcrever_em_janelas(audio, outro_txt, "base", pasta_cache=pasta_cache))
+    assert modelo.janelas == [0.0, 30.0, 60.0]
+    assert [segmento["texto"] for segmento in segmentos] == ["janela 0 janela 30 janela 60"]
+    with open(outro_txt, encoding="utf-8") as f:
+        assert f.read() == "janela 0 janela 30 janela 60"
+    assert obter_cache(pasta_cache).estatisticas()[TIPO_TRANSCRICAO]["acertos"] == 1
+
+    # Outro modelo não acerta
+    list(transcrever_em_janelas(audio, str(tmp_path / "outro.txt"), "small", pasta_cache=pasta_cache))
+    assert len(modelo.janelas) == 6
@@ -0,0 +1,181 @@
+from types import SimpleNamespace
+
+import pytest
+
+import transliteracao
+from transliteracao import BaldeTokens, MotorTransliteracao
+
+
+class Relogio:
+    """Substitui o módulo time no transliteracao: sleep só avança o relógio"""
+
+    def __init__(self):
+        self.agora = 1000.0
+        self.esperas = []
+
+    def monotonic(self):
+        return self.agora
+
+    def sleep(self, segundos):
+        self.esperas.append(segundos)
+        self.agora += segundos
+
+
+@pytest.fixture
+def relogio(monkeypatch):
+    relogio = Relogio()
+    monkeypatch.setattr(transliteracao, "time", relogio)
+    return relogio
+
+
+def test_balde_cheio_atende_sem_esperar(relogio):
+    balde = BaldeTokens(60)
+    for _ in range(60):
+        balde.consumir(1)
+    assert relogio.esperas == []
+    assert balde.disponivel == pytest.approx(0)
+
+
+def test_balde_vazio_espera_a_reposicao(relogio):
+    balde = BaldeTokens(60)  # uma unidade por segundo
+    balde.consumir(60)
+    balde.consumir(1)
+    assert sum(relogio.esperas) == pytest.approx(1.0)
+    balde.consumir(30)
+    assert sum(relogio.esperas) == pytest.approx(31.0)
+
+
+def test_reposicao_proporcional_ao_tempo(relogio):
+    balde = BaldeTokens(600)
+    balde.consumir(600)
+    relogio.agora += 30
+    balde._repor()
+    assert balde.disponivel == pytest.approx(300)
+    relogio.agora += 3600
+    balde._repor()
+    assert balde.disponivel == pytest.approx(600)
+
+
+def test_pedido_maior_que_o_balde_fica_limitado(relogio):
+    balde = BaldeTokens(100)
+    balde.consumir(1000)
+    assert relogio.esperas == []
+    assert balde.disponivel == pytest.approx(0)
+
+
+def test_devolver_nao_passa_da_capacidade(relogio):
+    balde = BaldeTokens(100)
+    balde.consumir(80)
+    balde.devolver(30)
+    assert balde.disponivel == pytest.approx(50)
+    balde.devolver(500)
+    assert balde.disponivel == pytest.approx(100)
+
+
+class ClienteFalso:
+    """Cliente da OpenAI que levanta os erros da lista antes de responder com `total_tokens`"""
+
+    def __init__(self, total_tokens, erros=()):
+        self.total_tokens = total_tokens
+        self.erros = list(erros)
+        self.chamadas = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.criar))
+
+    def with_options(self, **opcoes):
+        return self
+
+    def criar(self, **parametros):
+        self.chamadas += 1
+        if self.erros:
+            raise self.erros.pop(0)
+        usage = SimpleNamespace(total_tokens=self.total_tokens, prompt_tokens=self.total_tokens, completion_tokens=0)
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="ok"))], usage=usage)
+
+
+def _motor(cliente, tokens_por_minuto=100):
+    return MotorTransliteracao(cliente, "{}", tokens_por_minuto=tokens_por_minuto, tentativas=3, espera_base=0)
+
+
+class ErroTemporario(Exception):
+    pass
+
+
+def test_estimativa_maior_que_o_balde_devolve_so_o_reservado(relogio, tokens_por_palavra):
+    motor = _motor(ClienteFalso(total_tokens=30))
+    # 80 palavras: estimativa de 160 tokens, limitada aos 100 do balde
+    motor._chamar([{"role": "user", "content": " ".join(["palavra"] * 80)}])
+    assert motor.balde_tokens.disponivel == pytest.approx(70)
+
+
+def test_tentativas_que_falham_devolvem_a_reserva(relogio, tokens_por_palavra, monkeypatch):
+    monkeypatch.setattr(transliteracao, "_erro_temporario", lambda erro: isinstance(erro, ErroTemporario))
+    cliente = ClienteFalso(total_tokens=10, erros=[ErroTemporario("429"), ErroTemporario("503")])
+    motor = _motor(cliente)
+    texto, usage, _ = motor._chamar([{"role": "user", "content": " ".join(["palavra"] * 10)}])
+    assert (texto, cliente.chamadas) == ("ok", 3)
+    # Só a última tentativa (estimativa de 20, 10 usados) ficou no balde
+    assert motor.balde_tokens.disponivel == pytest.approx(90)
+
+
+def test_erro_definitivo_devolve_a_reserva(relogio, tokens_por_palavra, monkeypatch):
+    monkeypatch.setattr(transliteracao, "_erro_temporario", lambda erro: isinstance(erro, ErroTemporario))
+    motor = _motor(ClienteFalso(total_tokens=10, erros=[ValueError("prompt inválido")]))
+    with pytest.raises(ValueError):
+        motor._chamar([{"role": "user", "content": " ".join(["palavra"] * 10)}])
+    assert motor.balde_tokens.disponivel == pytest.approx(100)
+
+
+def _frases(quantidade, palavras=lambda i: 3 + i % 5):
+    """Frases numeradas (a primeira palavra identifica a frase) de tamanhos variados"""
+    return [f"f{i} " + " ".join(["palavra"] * palavras(i)) + "." for i in range(quantidade)]
+
+
+def _ids(bloco):
+    return [palavra for palavra in bloco.split() if palavra.startswith("f")]
+
+
+@pytest.mark.parametrize("tokens_por_bloco", [5, 12, 30, 1000])
+def test_blocos_cabem_no_orcamento_e_nao_perdem_nem_repetem_texto(tokens_por_palavra, tokens_por_bloco):
+    frases = _frases(40)
+    texto = " ".join(frases)
+    blocos = transliteracao.dividir_em_blocos(texto, tokens_por_bloco)
+    assert all(len(bloco.split()) <= tokens_por_bloco for bloco in blocos)
+    assert " ".join(blocos).split() == texto.split()
+    if tokens_por_bloco == 1000:
+        assert blocos == [texto]
+
+
+def test_blocos_cortam_em_fim_de_frase(tokens_por_palavra):
+    texto = "Primeira frase aqui. Segunda frase! Terceira frase?\nQuarta linha sem ponto\nQuinta… e fim."
+    blocos = transliteracao.dividir_em_blocos(texto, 6)
+    assert blocos == ["Primeira frase aqui. Segunda frase!", "Terceira frase? Quarta linha sem ponto", "Quinta… e fim."]
+
+
+def test_frase_maior_que_o_bloco_e_cortada_por_palavras(tokens_por_palavra):
+    texto = " ".join(f"p{i}" for i in range(50))
+    blocos = transliteracao.dividir_em_blocos(texto, 8)
+    assert all(len(bloco.split()) <= 8 for bloco in blocos)
+    assert " ".join(blocos).split() == texto.split()
+
+
+@pytest.mark.parametrize("sobreposicao", [0, 4, 10])
+def test_sobreposicao_repete_so_o_final_do_bloco_anterior(tokens_por_palavra, sobreposicao):
+    frases = _frases(30)
+    blocos = transliteracao.dividir_em_blocos(" ".join(frases), 20, sobreposicao)
+    assert all(len(bloco.split()) <= 20 for bloco in blocos)
+
+    anteriores = []
+    vistas = []
+    for bloco in blocos:
+        ids = _ids(bloco)
+        repetidas = [i for i in ids if i in anteriores]
+        # O que se repete é um começo do bloco igual ao final do anterior, dentro da sobreposição
+        assert repetidas == ids[:len(repetidas)]
+        assert repetidas == anteriores[len(anteriores) - len(repetidas):]
+        assert sum(len(frases[int(i[1:])].split()) for i in repetidas) <= sobreposicao
+        vistas += ids[len(repetidas):]
+        anteriores = ids
+    # Todas as frases, em ordem, cada uma fora da sobreposição exatamente uma vez
+    assert vistas == [f"f{i}" for i in range(len(frases))]
+    if sobreposicao >= 4:
+        assert any(_ids(a)[-1] == _ids(b)[0] for a, b in zip(blocos, blocos[1:]))
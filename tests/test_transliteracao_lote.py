@@ -0,0 +1,139 @@
+import os
+import shutil
+import time
+
+import pytest
+
+pytest.importorskip("openai")
+
+from openai import OpenAI
+
+import benchmark
+import transliteracao_lote
+from pipeline import importar_transcricoes_existentes
+from registro_tarefas import obter_registro, ETAPA_TRANSLITERACAO, STATUS_CONCLUIDA, STATUS_PENDENTE
+from transliteracao import MotorTransliteracao
+from transliteracao_lote import LoteTransliteracao, ARQUIVO_ESTADO
+
+
+@pytest.fixture
+def servidor():
+    servidor = benchmark.ServidorFalso(0.1, 0.0)
+    servidor.url = servidor.iniciar()
+    yield servidor
+    servidor.parar()
+
+
+@pytest.fixture
+def pastas(tmp_path):
+    transcritos = tmp_path / "transcritos"
+    transliterados = tmp_path / "transliterados"
+    transcritos.mkdir()
+    transliterados.mkdir()
+    for indice, palavras in enumerate((20, 120, 40)):
+        (transcritos / f"video-{indice}.txt").write_text(
+            benchmark.gerar_transcricao(palavras, semente=indice), encoding="utf-8"
+        )
+    importar_transcricoes_existentes(str(transcritos))
+    return str(transcritos), str(transliterados)
+
+
+@pytest.fixture
+def escritas(monkeypatch):
+    """Quantas vezes cada documento foi gravado"""
+    contagem = {}
+    concluir = LoteTransliteracao._concluir
+
+    def contar(self, item, dados, texto, guardar_cache=True):
+        contagem[item] = contagem.get(item, 0) + 1
+        return concluir(self, item, dados, texto, guardar_cache)
+
+    monkeypatch.setattr(LoteTransliteracao, "_concluir", contar)
+    return contagem
+
+
+def _motor(servidor, tokens_por_bloco=0):
+    return MotorTransliteracao(
+        OpenAI(base_url=servidor.url, api_key="teste"), benchmark.PROMPT_TEMPLATE, modelo=benchmark.MODELO_GPT,
+        tokens_por_bloco=tokens_por_bloco, sobreposicao=0
+    )
+
+
+def _rodadas(motor, transcritos, transliterados, ate=lambda: False):
+    """Uma instância nova por rodada, como o app ou o cron reiniciando entre elas"""
+    eventos = []
+    limite = time.monotonic() + 30
+    while time.monotonic() < limite:
+        eventos += LoteTransliteracao(motor, transcritos, transliterados).executar(esperar=False)
+        if ate() or not os.path.exists(os.path.join(transcritos, ARQUIVO_ESTADO)):
+            return eventos
+        time.sleep(0.05)
+    raise AssertionError("o lote não terminou")
+
+
+def test_lote_retomado_grava_cada_documento_uma_vez(servidor, pastas, escritas, tokens_por_palavra):
+    transcritos, transliterados = pastas
+    motor = _motor(servidor, tokens_por_bloco=50)
+
+    eventos = _rodadas(motor, transcritos, transliterados)
+    resultados = [evento for evento in eventos if evento["tipo"] == "resultado"]
+    assert sorted(os.path.basename(evento["destino"]) for evento in resultados) == [
+        "video-0-Transliterado.txt", "video-1-Transliterado.txt", "video-2-Transliterado.txt"
+    ]
+    assert not any(evento["erro"] for evento in resultados)
+    assert escritas == {"video-0": 1, "video-1": 1, "video-2": 1}
+    # Documentos e, depois dos blocos do video-1, a consolidação
+    assert {lote["metadata"]["fase"] for lote in servidor.lotes.values()} == {"documentos", "consolidacao"}
+    registro = obter_registro(transcritos)
+    assert registro.contar(ETAPA_TRANSLITERACAO)[STATUS_CONCLUIDA] == 3
+
+    # Rodar de novo não envia nem grava nada
+    lotes = len(servidor.lotes)
+    repeticao = list(LoteTransliteracao(motor, transcritos, transliterados).executar())
+    assert repeticao == []
+    assert len(servidor.lotes) == lotes
+    assert escritas == {"video-0": 1, "video-1": 1, "video-2": 1}
+
+
+def test_ingestao_repetida_depois_de_queda_nao_regrava(servidor, pastas, escritas):
+    transcritos, transliterados = pastas
+    motor = _motor(servidor)
+    estado = os.path.join(transcritos, ARQUIVO_ESTADO)
+
+    # Envia e espera o servidor terminar, sem ingerir
+    list(LoteTransliteracao(motor, transcritos, transliterados).executar(esperar=False))
+    limite = time.monotonic() + 30
+    while any(lote["status"] != "completed" for lote in servidor.lotes.values()):
+        assert time.monotonic() < limite
+        time.sleep(0.05)
+    shutil.copy(estado, estado + ".antes")
+
+    _rodadas(motor, transcritos, transliterados)
+    assert escritas == {"video-0": 1, "video-1": 1, "video-2": 1}
+
+    # Queda antes de gravar o estado depois da ingestão: o estado antigo volta e tudo é reingerido
+    shutil.copy(estado + ".antes", estado)
+    eventos = _rodadas(motor, transcritos, transliterados)
+    assert not [evento for evento in eventos if evento["tipo"] == "resultado"]
+    assert escritas == {"video-0": 1, "video-1": 1, "video-2": 1}
+    assert obter_registro(transcritos).contar(ETAPA_TRANSLITERACAO)[STATUS_CONCLUIDA] == 3
+
+
+def test_preparacao_interrompida_devolve_as_reivindicacoes(servidor, pastas, monkeypatch):
+    transcritos, transliterados = pastas
+    registro = obter_registro(transcritos)
+    # O primeiro item já está com outro trabalhador: a preparação gera um "pulado" e para ali
+    assert registro.reivindicar("video-0", ETAPA_TRANSLITERACAO, trabalhador="outro")
+    monkeypatch.setattr(
+        registro, "prontos_para",
+        lambda etapa, anterior: [(item, os.path.join(transcritos, f"{item}.txt")) for item in ("video-1", "video-0", "video-2")]
+    )
+
+    eventos = LoteTransliteracao(_motor(servidor), transcritos, transliterados).executar(esperar=False)
+    assert next(eventos)["tipo"] == "pulado"
+    assert registro.obter("video-1", ETAPA_TRANSLITERACAO)["trabalhador"] == transliteracao_lote.TRABALHADOR
+    eventos.close()
+
+    assert registro.obter("video-1", ETAPA_TRANSLITERACAO)["status"] == STATUS_PENDENTE
+    assert registro.obter("video-2", ETAPA_TRANSLITERACAO) is None
+    assert not os.path.exists(os.path.join(transcritos, ARQUIVO_ESTADO))
@@ -0,0 +1,76 @@
+import pytest
+
+from vad import detectar_fala, mapear_tempo, transcrever_fala
+
+TAXA = 16000
+# (início, fim) do tom em segundos, dentro de 6.5 s de áudio
+TONS = [(1.0, 3.0), (4.5, 5.5)]
+DURACAO = 6.5
+
+
+def test_mapear_tempo_volta_para_a_linha_do_tempo_original():
+    # 5 s de fala a partir de 10 s e mais 2 s a partir de 30 s
+    mapa = [(0.0, 10.0, 5.0), (5.0, 30.0, 2.0)]
+    assert mapear_tempo(0.0, mapa) == 10.0
+    assert mapear_tempo(4.0, mapa) == 14.0
+    assert mapear_tempo(5.0, mapa) == 30.0
+    assert mapear_tempo(6.5, mapa) == 31.5
+    # Depois do fim do último trecho fica presa ao fim dele
+    assert mapear_tempo(9.0, mapa) == 32.0
+    assert mapear_tempo(3.0, []) == 3.0
+
+
+@pytest.fixture
+def np():
+    return pytest.importorskip("numpy")
+
+
+@pytest.fixture
+def audio(np):
+    """Tom com harmônicos (espectro concentrado, como voz) entre trechos de ruído baixo"""
+    tempo = np.arange(int(DURACAO * TAXA)) / TAXA
+    sinal = np.random.default_rng(0).normal(0, 1e-4, len(tempo))
+    for inicio, fim in TONS:
+        trecho = (tempo >= inicio) & (tempo < fim)
+        for harmonico, amplitude in ((220, 0.3), (440, 0.15), (660, 0.05)):
+            sinal[trecho] += amplitude * np.sin(2 * np.pi * harmonico * tempo[trecho])
+    return sinal.astype(np.float32)
+
+
+def test_detecta_o_tom_e_ignora_o_silencio(audio):
+    regioes = detectar_fala(audio, TAXA, folga=0.3)
+    assert len(regioes) == len(TONS)
+    for (inicio, fim), (tom_inicio, tom_fim) in zip(regioes, TONS):
+        assert inicio == pytest.approx(tom_inicio - 0.3, abs=0.05)
+        assert fim == pytest.approx(tom_fim + 0.3, abs=0.05)
+
+
+def test_ruido_sozinho_nao_e_fala(np):
+    ruido = np.random.default_rng(1).normal(0, 0.1, 3 * TAXA).astype(np.float32)
+    assert detectar_fala(ruido, TAXA) == []
+    assert detectar_fala(np.zeros(10, dtype=np.float32), TAXA) == []
+
+
+def test_transcrever_fala_remapeia_os_segmentos(audio):
+    class Modelo:
+        def transcribe(self, trecho, **opcoes):
+            self.segundos = len(trecho) / TAXA
+            # Um segmento no começo de cada região do áudio concatenado
+            primeira = TONS[0][1] - TONS[0][0] + 0.6
+            return {"text": "a b", "segments": [
+                {"start": 0.0, "end": 1.0, "text": "a"},
+                {"start": primeira + 0.1, "end": primeira + 0.5, "text": "b"},
+            ]}
+
+    modelo = Modelo()
+    result, estatisticas = transcrever_fala(modelo, audio, {"language": "pt"}, TAXA)
+    assert modelo.segundos == pytest.approx(estatisticas["duracao_fala"])
+    assert estatisticas["regioes"] == 2
+    fala = sum(fim - inicio + 0.6 for inicio, fim in TONS)
+    assert estatisticas["duracao_fala"] == pytest.approx(fala, abs=0.1)
+    assert estatisticas["percentual_pulado"] == pytest.approx(100 * (1 - fala / DURACAO), abs=2)
+
+    primeiro, segundo = result["segments"]
+    assert primeiro["start"] == pytest.approx(TONS[0][0] - 0.3, abs=0.05)
+    assert segundo["start"] == pytest.approx(TONS[1][0] - 0.3 + 0.1, abs=0.1)
+    assert segundo["end"] == pytest.approx(TONS[1][0] - 0.3 + 0.5, abs=0.1)
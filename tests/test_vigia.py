@@ -0,0 +1,90 @@
+import os
+import queue
+import threading
+import time
+
+import pytest
+
+import vigia
+from vigia import VigiaPasta
+
+ESTABILIDADE = 0.3
+
+
+@pytest.fixture
+def vigiado(tmp_path, monkeypatch):
+    """Vigia sem watchdog: os eventos são as chamadas a marcar() feitas pelo teste"""
+    monkeypatch.setattr(vigia, "INTERVALO_VERIFICACAO", 0.02)
+    vigiado = VigiaPasta(str(tmp_path), estabilidade=ESTABILIDADE)
+    vigiado._verificador = threading.Thread(target=vigiado._verificar, daemon=True)
+    vigiado._verificador.start()
+    yield vigiado
+    vigiado.parar()
+    vigiado._verificador.join(5)
+
+
+def _entregues(vigiado, espera=ESTABILIDADE * 3):
+    caminhos = []
+    limite = time.monotonic() + espera
+    while time.monotonic() < limite:
+        try:
+            caminhos.append(vigiado.prontos.get(timeout=0.05)[0])
+        except queue.Empty:
+            pass
+    return caminhos
+
+
+def test_arquivo_sendo_gravado_e_entregue_uma_vez_depois_de_parar(vigiado, tmp_path):
+    caminho = str(tmp_path / "gravacao.mp4")
+    with open(caminho, "wb") as f:
+        # Cada pedaço gera vários eventos, como "modified" e "closed" do watchdog
+        for _ in range(8):
+            f.write(b"x" * 1024)
+            f.flush()
+            for _ in range(3):
+                vigiado.marcar(caminho)
+            time.sleep(ESTABILIDADE / 3)
+            assert vigiado.prontos.empty()
+    vigiado.marcar(caminho)
+
+    inicio = time.monotonic()
+    assert _entregues(vigiado) == [caminho]
+    assert time.monotonic() - inicio >= ESTABILIDADE
+    assert vigiado.entregues == 1
+    assert vigiado.pendentes() == []
+
+
+def test_evento_tardio_sem_mudanca_nao_reenvia(vigiado, tmp_path):
+    caminho = str(tmp_path / "aula.mkv")
+    with open(caminho, "wb") as f:
+        f.write(b"video")
+    vigiado.marcar(caminho)
+    assert _entregues(vigiado) == [caminho]
+
+    # Antivírus ou indexador tocando o arquivo: mesmo tamanho e mtime
+    vigiado.marcar(caminho)
+    vigiado.marcar(caminho)
+    assert _entregues(vigiado) == []
+
+    # Conteúdo novo é outro vídeo
+    with open(caminho, "ab") as f:
+        f.write(b" mais")
+    os.utime(caminho, (1, 1))
+    vigiado.marcar(caminho)
+    assert _entregues(vigiado) == [caminho]
+    assert vigiado.entregues == 2
+
+
+def test_ignora_vazios_apagados_e_outras_extensoes(vigiado, tmp_path):
+    vazio = tmp_path / "vazio.mp4"
+    vazio.touch()
+    apagado = tmp_path / "apagado.mp4"
+    apagado.write_bytes(b"video")
+    texto = tmp_path / "notas.txt"
+    texto.write_text("não é vídeo", encoding="utf-8")
+    for caminho in (vazio, apagado, texto):
+        vigiado.marcar(str(caminho))
+    apagado.unlink()
+
+    assert _entregues(vigiado) == []
+    assert vigiado.pendentes() == [str(vazio)]
@@ -0,0 +1,1113 @@
+import itertools
+import json
+import os
+import shutil
+import socket
+import sqlite3
+import subprocess
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from registro_tarefas import obter_registro, ETAPA_EXTRACAO, ETAPA_TRANSCRICAO, ETAPA_TRANSLITERACAO
+
+# =========================
+# EXECUTOR DE TRABALHOS EM SEGUNDO PLANO
+# =========================
+# O Streamlit roda o script de novo a cada clique, e um refresh do navegador
+# interrompe o que estava rodando dentro dele. Aqui a interface só enfileira
+# trabalhos (canal, vídeo, upload, pasta, vigia, transliteração) numa fila
+# SQLite e consulta o andamento; threads do próprio processo executam.
+#
+# - A fila sobrevive a reinícios: um trabalho "executando" sem batimento há
+#   mais de ABANDONO_SEGUNDOS volta para a fila e recomeça (o registro de
+#   tarefas faz o pipeline pular o que já estava pronto).
+# - Menor prioridade roda primeiro: um upload interativo passa à frente de
+#   uma sincronização de canal, tanto na fila quanto na espera por uma vaga.
+# - Vagas limitam quantos trabalhos usam cada recurso ao mesmo tempo (CPU,
+#   GPU, API), independentemente de quantas threads de trabalho existem.
+# - Cancelar é cooperativo: o trabalho para no próximo evento do pipeline,
+#   e as tarefas reivindicadas que não terminaram voltam a ficar pendentes.
+
+ARQUIVO_FILA = ".trabalhos.sqlite3"
+# Uploads ficam aqui até o trabalho terminar, para que uma repetição os encontre
+PASTA_ENVIOS = ".envios"
+# Upload de trabalho que falhou ou foi cancelado: depois disso não dá mais para repetir
+RETENCAO_ENVIOS_SEGUNDOS = 7 * 24 * 3600
+INTERVALO_LIMPEZA_ENVIOS = 3600
+
+STATUS_NA_FILA = "na_fila"
+STATUS_EXECUTANDO = "executando"
+STATUS_CONCLUIDO = "concluido"
+STATUS_FALHOU = "falhou"
+STATUS_CANCELADO = "cancelado"
+STATUS_TERMINADOS = (STATUS_CONCLUIDO, STATUS_FALHOU, STATUS_CANCELADO)
+
+PRIORIDADE_INTERATIVA = 0
+PRIORIDADE_NORMAL = 10
+PRIORIDADE_LOTE = 20
+
+RECURSO_CPU = "cpu"
+RECURSO_GPU = "gpu"
+RECURSO_API = "api"
+
+VAGAS_PADRAO = {
+    RECURSO_CPU: max(1, (os.cpu_count() or 2) // 2),
+    RECURSO_GPU: 1,
+    RECURSO_API: 2,
+}
+
+TRABALHADORES_PADRAO = 4
+BATIMENTO_SEGUNDOS = 10
+ABANDONO_SEGUNDOS = 60
+# Espera entre consultas à fila quando não há trabalho (enviar() acorda antes)
+INTERVALO_CONSULTA = 2.0
+# Intervalo mínimo entre gravações de progresso de um mesmo trabalho
+INTERVALO_GRAVACAO = 0.5
+LINHAS_HISTORICO = 200
+TAMANHO_PREVIA = 4000
+
+
+class TrabalhoCancelado(Exception):
+    """Levantada dentro do trabalho quando alguém pede o cancelamento"""
+
+
+# =========================
+# VAGAS POR RECURSO
+# =========================
+
+class Vagas:
+    """Semáforos por recurso em que quem tem menor prioridade é atendido primeiro"""
+
+    def __init__(self, limites: dict = None):
+        self.limites = {**VAGAS_PADRAO, **(limites or {})}
+        self.ocupadas = {recurso: 0 for recurso in self.limites}
+        self._espera = []
+        self._ordem = itertools.count()
+        self._condicao = threading.Condition()
+
+    def definir(self, limites: dict):
+        """Muda os limites; vale para as próximas ocupações"""
+        with self._condicao:
+            for recurso, limite in limites.items():
+                self.limites[recurso] = max(1, int(limite))
+                self.ocupadas.setdefault(recurso, 0)
+            self._condicao.notify_all()
+
+    def _minha_vez(self, senha, quantidade: int):
+        recurso = senha[2]
+        primeira = min((s for s in self._espera if s[2] == recurso), default=None)
+        return primeira == senha and self.ocupadas[recurso] + min(quantidade, self.limites[recurso]) <= self.limites[recurso]
+
+    @contextmanager
+    def ocupar(self, recurso: str, prioridade: int = PRIORIDADE_NORMAL, cancelado=None, quantidade: int = 1):
+        """Segura `quantidade` vagas do recurso durante o bloco; `cancelado()` interrompe a espera
+
+        Pedidos acima do limite ficam com o limite. O bloco recebe quantas vagas foram
+        concedidas (um pool de processos deve usar esse número de processos).
+        """
+        senha = (prioridade, next(self._ordem), recurso)
+        with self._condicao:
+            self.limites.setdefault(recurso, 1)
+            self.ocupadas.setdefault(recurso, 0)
+            self._espera.append(senha)
+            try:
+                while not self._minha_vez(senha, quantidade):
+                    if cancelado is not None and cancelado():
+                        raise TrabalhoCancelado(f"cancelado esperando vaga de {recurso}")
+                    self._condicao.wait(1.0)
+                concedidas = max(1, min(quantidade, self.limites[recurso]))
+                self.ocupadas[recurso] += concedidas
+            finally:
+                self._espera.remove(senha)
+                self._condicao.notify_all()
+        try:
+            yield concedidas
+        finally:
+            with self._condicao:
+                self.ocupadas[recurso] -= concedidas
+                self._condicao.notify_all()
+
+    def estado(self):
+        with self._condicao:
+            return {
+                recurso: {
+                    "limite": limite,
+                    "ocupadas": self.ocupadas.get(recurso, 0),
+                    "esperando": sum(1 for s in self._espera if s[2] == recurso),
+                }
+                for recurso, limite in self.limites.items()
+            }
+
+
+# =========================
+# CONFIGURAÇÃO DO PROCESSO
+# =========================
+# Precisão e threads do Whisper, quantização int8 e perfilamento são variáveis
+# de ambiente: valem para o processo inteiro, para os processos filhos do pool
+# e entram na chave do cache de transcrições. Cada trabalho leva a sua e o
+# executor a aplica antes de rodá-lo; trabalhos com a mesma configuração rodam
+# juntos, e um trabalho com outra espera os que estão rodando terminarem.
+
+def aplicar_configuracao(configuracao: dict):
+    from modelos import configurar_inferencia
+    from metricas import configurar_perfil, PERFIL_CPROFILE
+
+    inferencia = configuracao.get("inferencia") or {}
+    configurar_inferencia(inferencia.get("precisao"), inferencia.get("threads", 0), inferencia.get("guardar_int8", True))
+    perfil = configuracao.get("perfil") or {}
+    configurar_perfil(perfil.get("item"), perfil.get("tipo", PERFIL_CPROFILE))
+
+
+class ConfiguracaoProcesso:
+    """Deixa rodar ao mesmo tempo só trabalhos com a mesma configuração global"""
+
+    def __init__(self, aplicar=aplicar_configuracao):
+        self.aplicar = aplicar
+        self.atual = None
+        self.ativos = 0
+        self._esperando = []
+        self._condicao = threading.Condition()
+
+    @staticmethod
+    def _chave(configuracao: dict):
+        return json.dumps(configuracao, sort_keys=True)
+
+    def _pode_entrar(self, chave: str):
+        if not self.ativos:
+            return not self._esperando or self._esperando[0] == chave
+        # Quem espera por outra configuração barra novos trabalhos com a atual (sem inanição)
+        return self.atual == chave and all(outra == chave for outra in self._esperando)
+
+    @contextmanager
+    def usar(self, configuracao: dict, cancelado=None):
+        chave = self._chave(configuracao)
+        with self._condicao:
+            self._esperando.append(chave)
+            try:
+                while not self._pode_entrar(chave):
+                    if cancelado is not None and cancelado():
+                        raise TrabalhoCancelado("cancelado esperando outra configuração terminar")
+                    self._condicao.wait(1.0)
+                if self.atual != chave:
+                    self.aplicar(configuracao)
+                    self.atual = chave
+                self.ativos += 1
+            finally:
+                self._esperando.remove(chave)
+                self._condicao.notify_all()
+        try:
+            yield
+        finally:
+            with self._condicao:
+                self.ativos -= 1
+                self._condicao.notify_all()
+
+
+# =========================
+# FILA PERSISTENTE
+# =========================
+
+class FilaTrabalhos:
+    """Fila de trabalhos em SQLite (mesmo esquema de conexão do registro de tarefas)"""
+
+    def __init__(self, caminho: str):
+        self.caminho = caminho
+        self._lock = threading.Lock()
+        self._conexao = sqlite3.connect(caminho, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conexao.execute("PRAGMA journal_mode=WAL")
+        self._conexao.executescript("""
+            CREATE TABLE IF NOT EXISTS trabalhos (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                tipo TEXT NOT NULL,
+                titulo TEXT,
+                parametros TEXT NOT NULL,
+                prioridade INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                progresso REAL NOT NULL DEFAULT 0,
+                mensagem TEXT,
+                historico TEXT NOT NULL DEFAULT '[]',
+                previa TEXT,
+                etapas TEXT,
+                resultado TEXT,
+                erro TEXT,
+                tentativas INTEGER NOT NULL DEFAULT 0,
+                cancelar INTEGER NOT NULL DEFAULT 0,
+                dono TEXT,
+                criado_em REAL NOT NULL,
+                iniciado_em REAL,
+                terminado_em REAL,
+                batimento_em REAL
+            );
+            CREATE INDEX IF NOT EXISTS idx_trabalhos_status ON trabalhos (status, prioridade, id);
+        """)
+        # Filas criadas antes das métricas por etapa
+        colunas = {linha[1] for linha in self._conexao.execute("PRAGMA table_info(trabalhos)")}
+        if "etapas" not in colunas:
+            self._conexao.execute("ALTER TABLE trabalhos ADD COLUMN etapas TEXT")
+
+    def _executar(self, sql: str, parametros=()):
+        with self._lock:
+            return self._conexao.execute(sql, parametros).fetchall()
+
+    def _linhas(self, sql: str, parametros=()):
+        with self._lock:
+            cursor = self._conexao.execute(sql, parametros)
+            colunas = [coluna[0] for coluna in cursor.description]
+            linhas = [dict(zip(colunas, linha)) for linha in cursor.fetchall()]
+        for linha in linhas:
+            linha["parametros"] = json.loads(linha["parametros"])
+            linha["historico"] = json.loads(linha["historico"])
+            linha["etapas"] = json.loads(linha["etapas"]) if linha["etapas"] else None
+            linha["resultado"] = json.loads(linha["resultado"]) if linha["resultado"] else None
+        return linhas
+
+    # ----- consultas -----
+
+    def obter(self, identificador: int):
+        linhas = self._linhas("SELECT * FROM trabalhos WHERE id = ?", (identificador,))
+        return linhas[0] if linhas else None
+
+    def listar(self, status=None, limite: int = 50):
+        """Trabalhos ativos primeiro (por prioridade), depois os terminados mais recentes"""
+        filtro, parametros = "", ()
+        if status is not None:
+            status = [status] if isinstance(status, str) else list(status)
+            filtro = f"WHERE status IN ({', '.join('?' * len(status))})"
+            parametros = tuple(status)
+        return self._linhas(f"""
+            SELECT * FROM trabalhos {filtro}
+            ORDER BY status NOT IN ('{STATUS_EXECUTANDO}', '{STATUS_NA_FILA}'), status != '{STATUS_EXECUTANDO}',
+                     CASE WHEN status IN ('{STATUS_EXECUTANDO}', '{STATUS_NA_FILA}') THEN prioridade ELSE 0 END,
+                     COALESCE(terminado_em, 0) DESC, id
+            LIMIT ?
+        """, parametros + (limite,))
+
+    def contar(self):
+        contagem = {status: 0 for status in (STATUS_NA_FILA, STATUS_EXECUTANDO) + STATUS_TERMINADOS}
+        contagem.update(dict(self._executar("SELECT status, COUNT(*) FROM trabalhos GROUP BY status")))
+        return contagem
+
+    def cancelamento_pedido(self, identificador: int):
+        linha = self._executar("SELECT cancelar FROM trabalhos WHERE id = ?", (identificador,))
+        return bool(linha and linha[0][0])
+
+    # ----- transições -----
+
+    def enfileirar(self, tipo: str, parametros: dict, prioridade: int, titulo: str = None):
+        with self._lock:
+            cursor = self._conexao.execute("""
+                INSERT INTO trabalhos (tipo, titulo, parametros, prioridade, status, criado_em)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (tipo, titulo or tipo, json.dumps(parametros, ensure_ascii=False), prioridade, STATUS_NA_FILA, time.time()))
+            return cursor.lastrowid
+
+    def reivindicar(self, dono: str):
+        """Pega o trabalho de menor prioridade na fila (atômico entre processos) ou None"""
+        agora = time.time()
+        with self._lock:
+            self._conexao.execute("BEGIN IMMEDIATE")
+            try:
+                linha = self._conexao.execute(
+                    "SELECT id FROM trabalhos WHERE status = ? ORDER BY prioridade, id LIMIT 1", (STATUS_NA_FILA,)
+                ).fetchone()
+                if linha is not None:
+                    self._conexao.execute("""
+                        UPDATE trabalhos SET status = ?, dono = ?, tentativas = tentativas + 1, erro = NULL,
+                            iniciado_em = ?, batimento_em = ?, terminado_em = NULL
+                        WHERE id = ?
+                    """, (STATUS_EXECUTANDO, dono, agora, agora, linha[0]))
+                self._conexao.execute("COMMIT")
+            except Exception:
+                self._conexao.execute("ROLLBACK")
+                raise
+        return self.obter(linha[0]) if linha is not None else None
+
+    def atualizar(self, identificador: int, progresso: float = None, mensagem: str = None, historico=None,
+                  previa: str = None, etapas=None):
+        self._executar("""
+            UPDATE trabalhos SET progresso = COALESCE(?, progresso), mensagem = COALESCE(?, mensagem),
+                historico = COALESCE(?, historico), previa = COALESCE(?, previa), etapas = COALESCE(?, etapas),
+                batimento_em = ?
+            WHERE id = ?
+        """, (progresso, mensagem, json.dumps(historico[-LINHAS_HISTORICO:], ensure_ascii=False) if historico is not None else None,
+              previa, json.dumps(etapas, ensure_ascii=False) if etapas is not None else None, time.time(), identificador))
+
+    def bater(self, dono: str):
+        """Batimento dos trabalhos em execução deste dono (prova de que o processo está vivo)"""
+        self._executar(
+            "UPDATE trabalhos SET batimento_em = ? WHERE dono = ? AND status = ?", (time.time(), dono, STATUS_EXECUTANDO)
+        )
+
+    def terminar(self, identificador: int, status: str, resultado=None, erro: str = None):
+        self._executar("""
+            UPDATE trabalhos SET status = ?, resultado = ?, erro = ?, terminado_em = ?,
+                progresso = CASE WHEN ? = ? THEN 1.0 ELSE progresso END
+            WHERE id = ?
+        """, (status, json.dumps(resultado, ensure_ascii=False) if resultado is not None else None, erro, time.time(),
+              status, STATUS_CONCLUIDO, identificador))
+
+    def devolver(self, identificador: int):
+        """Põe de volta na fila um trabalho interrompido porque o processo está saindo"""
+        self._executar(
+            "UPDATE trabalhos SET status = ?, dono = NULL, mensagem = ? WHERE id = ? AND status = ?",
+            (STATUS_NA_FILA, "interrompido pelo fim do processo", identificador, STATUS_EXECUTANDO)
+        )
+
+    def cancelar(self, identificador: int):
+        """Cancela na hora se ainda está na fila; se está executando, pede para o trabalho parar"""
+        agora = time.time()
+        self._executar(
+            "UPDATE trabalhos SET status = ?, cancelar = 1, terminado_em = ? WHERE id = ? AND status = ?",
+            (STATUS_CANCELADO, agora, identificador, STATUS_NA_FILA)
+        )
+        self._executar(
+            "UPDATE trabalhos SET cancelar = 1 WHERE id = ? AND status = ?", (identificador, STATUS_EXECUTANDO)
+        )
+
+    def repetir(self, identificador: int):
+        """Devolve à fila um trabalho que falhou ou foi cancelado"""
+        self._executar("""
+            UPDATE trabalhos SET status = ?, cancelar = 0, erro = NULL, resultado = NULL, progresso = 0,
+                mensagem = NULL, previa = NULL, etapas = NULL, dono = NULL, terminado_em = NULL
+            WHERE id = ? AND status IN (?, ?)
+        """, (STATUS_NA_FILA, identificador, STATUS_FALHOU, STATUS_CANCELADO))
+
+    def recuperar_abandonados(self, limite_segundos: float = ABANDONO_SEGUNDOS):
+        """Trabalhos cujo processo parou voltam para a fila (ou terminam, se já iam ser cancelados)"""
+        limite = time.time() - limite_segundos
+        with self._lock:
+            cancelados = self._conexao.execute(
+                "UPDATE trabalhos SET status = ?, terminado_em = ? WHERE status = ? AND batimento_em < ? AND cancelar = 1",
+                (STATUS_CANCELADO, time.time(), STATUS_EXECUTANDO, limite)
+            ).rowcount
+            retomados = self._conexao.execute(
+                "UPDATE trabalhos SET status = ?, dono = NULL, mensagem = ? WHERE status = ? AND batimento_em < ?",
+                (STATUS_NA_FILA, "retomado após o processo anterior parar", STATUS_EXECUTANDO, limite)
+            ).rowcount
+        return retomados + cancelados
+
+    def remover_terminados(self, anteriores_a: float = None):
+        """Apaga os trabalhos terminados (e os uploads guardados para eles)"""
+        anteriores_a = anteriores_a or time.time()
+        removidos = self._linhas(
+            f"SELECT * FROM trabalhos WHERE status IN ({', '.join('?' * len(STATUS_TERMINADOS))}) AND terminado_em <= ?",
+            STATUS_TERMINADOS + (anteriores_a,)
+        )
+        for trabalho in removidos:
+            if trabalho["parametros"].get("pasta_envio"):
+                shutil.rmtree(trabalho["parametros"]["pasta_envio"], ignore_errors=True)
+            self._executar("DELETE FROM trabalhos WHERE id = ?", (trabalho["id"],))
+        return len(removidos)
+
+    def limpar_envios(self, raiz: str, retencao_segundos: float = RETENCAO_ENVIOS_SEGUNDOS):
+        """Apaga os uploads parados há mais de `retencao_segundos` que nenhum trabalho ativo usa
+
+        Cobre os trabalhos que falharam ou foram cancelados e nunca foram limpos, e as
+        pastas que ficaram sem trabalho (app fechado no meio do envio).
+        """
+        if not os.path.isdir(raiz):
+            return 0
+        ativos = {
+            os.path.abspath(trabalho["parametros"]["pasta_envio"])
+            for trabalho in self._linhas(
+                "SELECT * FROM trabalhos WHERE status IN (?, ?)", (STATUS_NA_FILA, STATUS_EXECUTANDO)
+            )
+            if trabalho["parametros"].get("pasta_envio")
+        }
+        limite = time.time() - retencao_segundos
+        removidos = 0
+        for nome in os.listdir(raiz):
+            caminho = os.path.join(raiz, nome)
+            try:
+                parado = os.path.getmtime(caminho) < limite
+            except OSError:
+                continue
+            if parado and os.path.abspath(caminho) not in ativos:
+                shutil.rmtree(caminho, ignore_errors=True)
+                removidos += 1
+        return removidos
+
+
+# =========================
+# CONTEXTO DE UM TRABALHO
+# =========================
+
+class Contexto:
+    """O que a função de um trabalho usa para relatar andamento e respeitar cancelamento e vagas"""
+
+    def __init__(self, executor, trabalho: dict):
+        self.executor = executor
+        self.fila = executor.fila
+        self.id = trabalho["id"]
+        self.prioridade = trabalho["prioridade"]
+        self.historico = list(trabalho["historico"])
+        self._pendente = {}
+        self._gravado_em = 0.0
+        self._consultado_em = 0.0
+        self._cancelado = False
+        self._lock = threading.Lock()
+
+    def _gravar(self, forcar: bool = False):
+        with self._lock:
+            if not forcar and time.monotonic() - self._gravado_em < INTERVALO_GRAVACAO:
+                return
+            pendente, self._pendente = self._pendente, {}
+            self._gravado_em = time.monotonic()
+        if pendente:
+            self.fila.atualizar(self.id, **pendente)
+
+    def progresso(self, fracao: float = None, mensagem: str = None):
+        with self._lock:
+            if fracao is not None:
+                self._pendente["progresso"] = max(0.0, min(1.0, fracao))
+            if mensagem is not None:
+                self._pendente["mensagem"] = mensagem
+        self._gravar()
+
+    def anotar(self, linha: str):
+        """Acrescenta uma linha ao histórico do trabalho (mostrado na interface)"""
+        with self._lock:
+            self.historico.append(linha)
+            self._pendente["historico"] = self.historico
+        self._gravar()
+
+    def previa(self, texto: str):
+        """Texto parcial (transcrição ou transliteração em andamento)"""
+        with self._lock:
+            self._pendente["previa"] = texto[-TAMANHO_PREVIA:]
+        self._gravar()
+
+    def etapas(self, metricas):
+        """Métricas por etapa de uma esteira (concluídos, fila, itens/min, ocupação)"""
+        with self._lock:
+            self._pendente["etapas"] = metricas
+        self._gravar()
+
+    def descarregar(self):
+        self._gravar(forcar=True)
+
+    def cancelado(self):
+        """Consulta (no máximo duas vezes por segundo) se alguém pediu o cancelamento"""
+        if self._cancelado:
+            return True
+        if time.monotonic() - self._consultado_em >= INTERVALO_GRAVACAO:
+            self._consultado_em = time.monotonic()
+            self._cancelado = self.executor.parando() or self.fila.cancelamento_pedido(self.id)
+        return self._cancelado
+
+    def verificar(self):
+        if self.cancelado():
+            raise TrabalhoCancelado("cancelado a pedido do usuário")
+
+    def vaga(self, recurso: str, quantidade: int = 1):
+        return self.executor.vagas.ocupar(recurso, self.prioridade, self.cancelado, quantidade)
+
+
+# =========================
+# EXECUTOR
+# =========================
+
+class ExecutorTrabalhos:
+    """Threads que consomem a fila; as vagas são compartilhadas entre todos os trabalhos do processo"""
+
+    def __init__(self, pasta: str, trabalhadores: int = TRABALHADORES_PADRAO, vagas: dict = None):
+        os.makedirs(pasta, exist_ok=True)
+        self.pasta = pasta
+        self.fila = FilaTrabalhos(os.path.join(pasta, ARQUIVO_FILA))
+        self.vagas = Vagas(vagas)
+        self.configuracao = ConfiguracaoProcesso()
+        self.trabalhadores = max(1, trabalhadores)
+        self.dono = f"{socket.gethostname()}:{os.getpid()}:{id(self):x}"
+        self.em_execucao = {}
+        self._threads = []
+        self._acordar = threading.Event()
+        self._parar = threading.Event()
+        self._envios_limpos_em = 0.0
+
+    def iniciar(self):
+        self.fila.recuperar_abandonados()
+        self._limpar_envios()
+        threading.Thread(target=self._bater, name="trabalhos-batimento", daemon=True).start()
+        self.ajustar_trabalhadores(self.trabalhadores)
+        return self
+
+    def ajustar_trabalhadores(self, trabalhadores: int):
+        """Muda o número de threads; as que sobram saem depois do trabalho atual"""
+        self.trabalhadores = max(1, int(trabalhadores))
+        self._threads = [thread for thread in self._threads if thread.is_alive()]
+        for indice in range(len(self._threads), self.trabalhadores):
+            thread = threading.Thread(target=self._trabalhar, args=(indice,), name=f"trabalhos-{indice}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self._acordar.set()
+
+    def parar(self, aguardar: float = None):
+        self._parar.set()
+        self._acordar.set()
+        for thread in self._threads:
+            thread.join(aguardar)
+
+    def parando(self):
+        return self._parar.is_set()
+
+    def ocioso(self):
+        return not self.em_execucao and not self.fila.contar()[STATUS_NA_FILA]
+
+    def enviar(self, tipo: str, parametros: dict, prioridade: int = None, titulo: str = None):
+        """Enfileira um trabalho e devolve o id"""
+        if tipo not in TIPOS_TRABALHO:
+            raise ValueError(f"tipo de trabalho desconhecido: {tipo}")
+        if prioridade is None:
+            prioridade = TIPOS_TRABALHO[tipo][1]
+        identificador = self.fila.enfileirar(tipo, parametros, prioridade, titulo)
+        self._acordar.set()
+        return identificador
+
+    def repetir(self, identificador: int):
+        """Devolve à fila um trabalho que falhou ou foi cancelado"""
+        self.fila.repetir(identificador)
+        self._acordar.set()
+
+    def _bater(self):
+        while not self._parar.wait(BATIMENTO_SEGUNDOS):
+            self.fila.bater(self.dono)
+            # Um outro processo (app ou cli executor) pode ter morrido com trabalhos na mão
+            if self.fila.recuperar_abandonados():
+                self._acordar.set()
+            if time.monotonic() - self._envios_limpos_em >= INTERVALO_LIMPEZA_ENVIOS:
+                self._limpar_envios()
+
+    def _limpar_envios(self):
+        self._envios_limpos_em = time.monotonic()
+        self.fila.limpar_envios(os.path.join(self.pasta, PASTA_ENVIOS))
+
+    def _trabalhar(self, indice: int):
+        while not self._parar.is_set() and indice < self.trabalhadores:
+            trabalho = self.fila.reivindicar(self.dono)
+            if trabalho is None:
+                self._acordar.wait(INTERVALO_CONSULTA)
+                self._acordar.clear()
+                continue
+            self._executar(trabalho)
+
+    def _executar(self, trabalho: dict):
+        contexto = Contexto(self, trabalho)
+        self.em_execucao[trabalho["id"]] = trabalho["tipo"]
+        try:
+            funcao, _, configurado = TIPOS_TRABALHO[trabalho["tipo"]]
+            parametros = trabalho["parametros"]
+            _aplicar_limite_cache(parametros)
+            configuracao = _configuracao(parametros) if configurado else None
+            if configuracao:
+                with self.configuracao.usar(configuracao, contexto.cancelado):
+                    resultado = funcao(contexto, parametros)
+            else:
+                resultado = funcao(contexto, parametros)
+        except Exception as e:
+            if self._parar.is_set() and not self.fila.cancelamento_pedido(trabalho["id"]):
+                # O processo está saindo: o trabalho volta para a fila e recomeça depois
+                contexto.descarregar()
+                self.fila.devolver(trabalho["id"])
+            elif isinstance(e, TrabalhoCancelado) or contexto.cancelado():
+                contexto.anotar("⏹️ Cancelado")
+                contexto.descarregar()
+                self.fila.terminar(trabalho["id"], STATUS_CANCELADO)
+            else:
+                traceback.print_exc()
+                contexto.anotar(f"❌ {e}")
+                contexto.descarregar()
+                self.fila.terminar(trabalho["id"], STATUS_FALHOU, erro=str(e))
+        else:
+            contexto.descarregar()
+            self.fila.terminar(trabalho["id"], STATUS_CONCLUIDO, resultado)
+        finally:
+            self.em_execucao.pop(trabalho["id"], None)
+
+
+_executores = {}
+_lock_executores = threading.Lock()
+
+
+def obter_executor(pasta: str, trabalhadores: int = TRABALHADORES_PADRAO, vagas: dict = None):
+    """Executor da pasta de trabalho, iniciado na primeira chamada (um por processo e pasta)"""
+    caminho = os.path.abspath(pasta)
+    with _lock_executores:
+        executor = _executores.get(caminho)
+        if executor is None:
+            executor = _executores[caminho] = ExecutorTrabalhos(pasta, trabalhadores, vagas).iniciar()
+        return executor
+
+
+def pasta_envio(pasta_transcritos: str):
+    """Pasta nova para guardar um upload até o trabalho dele terminar"""
+    import tempfile
+
+    raiz = os.path.join(pasta_transcritos, PASTA_ENVIOS)
+    os.makedirs(raiz, exist_ok=True)
+    return tempfile.mkdtemp(prefix="upload-", dir=raiz)
+
+
+# =========================
+# TIPOS DE TRABALHO
+# =========================
+# Cada tipo é uma função (contexto, parametros) -> resultado (JSON). Os
+# parâmetros comuns vêm da barra lateral do app (ou da linha de comando):
+# pasta_transcritos, pasta_transliterados, modelo, processos, tamanho_lote,
+# opcoes_transcricao, formato_audio, motor ({concorrencia, rpm, tpm,
+# pasta_cache, limite_cache_bytes, tokens_por_bloco, sobreposicao}), batch_api,
+# inferencia ({precisao, threads, guardar_int8}) e perfil ({item, tipo}).
+
+TIPOS_TRABALHO = {}
+
+
+def tipo_trabalho(nome: str, prioridade: int = PRIORIDADE_NORMAL, configurado: bool = True):
+    """configurado=False: o trabalho não usa o Whisper nem o profiler e não espera por configuração"""
+    def registrar(funcao):
+        TIPOS_TRABALHO[nome] = (funcao, prioridade, configurado)
+        return funcao
+    return registrar
+
+
+def _configuracao(parametros: dict):
+    """Configuração global que o trabalho pede (vazia: fica a do processo, como no cli.py)"""
+    return {chave: parametros[chave] for chave in ("inferencia", "perfil") if parametros.get(chave) is not None}
+
+
+def _aplicar_limite_cache(parametros: dict):
+    from cache_resultados import obter_cache
+
+    configuracao = parametros.get("motor") or {}
+    if configuracao.get("pasta_cache") and "limite_cache_bytes" in configuracao:
+        obter_cache(configuracao["pasta_cache"]).limite_bytes = configuracao["limite_cache_bytes"]
+
+
+_motores = {}
+_lock_motores = threading.Lock()
+
+
+def obter_motor(concorrencia: int = 4, requisicoes_por_minuto: int = 500, tokens_por_minuto: int = 30000,
+                pasta_cache: str = None, tokens_por_bloco: int = 0, sobreposicao: int = 200):
+    """Motor compartilhado por configuração, para que os limites de taxa valham para todos os trabalhos"""
+    from pipeline import criar_motor
+
+    chave = (concorrencia, requisicoes_por_minuto, tokens_por_minuto, pasta_cache, tokens_por_bloco, sobreposicao)
+    with _lock_motores:
+        if chave not in _motores:
+            _motores[chave] = criar_motor(*chave)
+        return _motores[chave]
+
+
+def _motor(parametros: dict):
+    configuracao = parametros.get("motor") or {}
+    return obter_motor(
+        configuracao.get("concorrencia", 4), configuracao.get("rpm", 500), configuracao.get("tpm", 30000),
+        configuracao.get("pasta_cache"), configuracao.get("tokens_por_bloco", 0), configuracao.get("sobreposicao", 200)
+    )
+
+
+def recurso_whisper():
+    """GPU se o Whisper vai rodar nela; senão CPU (int8 sempre roda na CPU)"""
+    from modelos import dispositivo_padrao, precisao_configurada, PRECISAO_INT8
+
+    if precisao_configurada() != PRECISAO_INT8 and dispositivo_padrao().startswith("cuda"):
+        return RECURSO_GPU
+    return RECURSO_CPU
+
+
+@contextmanager
+def _vaga_whisper(contexto: Contexto, parametros: dict, total_arquivos: int = None):
+    """Uma vaga do Whisper por processo do pool; devolve quantos processos usar
+
+    O lote entre arquivos roda num processo só. Com processos = 0 (automático) o
+    pedido é o que a RAM comporta; o pool nunca passa das vagas concedidas.
+    """
+    from transcricao import numero_trabalhadores
+
+    processos = parametros.get("processos", 1)
+    if parametros.get("tamanho_lote") is not None:
+        with contexto.vaga(recurso_whisper()):
+            yield processos
+        return
+    pedido = processos or numero_trabalhadores(
+        parametros["modelo"], total_arquivos, parametros.get("opcoes_transcricao", {}).get("cascata")
+    )
+    with contexto.vaga(recurso_whisper(), pedido) as concedidas:
+        yield concedidas
+
+
+def _descrever(evento: dict):
+    if evento.get("erro"):
+        return f"❌ {evento.get('arquivo') or os.path.basename(evento.get('origem', ''))}: {evento['erro']}"
+    linha = f"✅ {evento.get('arquivo') or os.path.basename(evento['destino'])} ({evento['tempo']:.1f}s"
+    linha += " ♻️ cache)" if evento.get("cache") else ")"
+    if evento.get("vad"):
+        linha += f" • VAD pulou {evento['vad']['percentual_pulado']:.0f}%"
+    if evento.get("cascata"):
+        linha += f" • cascata refez {100 * evento['cascata']['fracao_escalada']:.0f}%"
+    return linha
+
+
+def _acompanhar(contexto: Contexto, eventos, verbo: str, inicio: float = 0.0, fim: float = 1.0):
+    """Converte os eventos do pipeline em progresso e histórico; devolve (processados, erros)"""
+    total = concluidos = processados = erros = 0
+    try:
+        for evento in eventos:
+            contexto.verificar()
+            if evento["tipo"] == "pulado":
+                contexto.anotar(f"⏭️ {evento['arquivo']}: {evento['motivo']}")
+            elif evento["tipo"] == "inicio":
+                total = evento["total"]
+                acao = "Batch API: " if evento.get("lote") else ""
+                contexto.anotar(f"{verbo} {acao}{total} arquivo(s), {evento['trabalhadores']} em paralelo")
+                contexto.progresso(inicio, f"{verbo} 0/{total}")
+            elif evento["tipo"] == "lote":
+                contexto.anotar(f"📦 Lote {evento['id']} ({evento['fase']}): {evento['status']}, "
+                                f"{evento['concluidas']}/{evento['total']}")
+            else:
+                concluidos += 1
+                erros += bool(evento["erro"])
+                processados += not evento["erro"]
+                contexto.anotar(_descrever(evento))
+                contexto.progresso(inicio + (fim - inicio) * concluidos / max(total, 1), f"{verbo} {concluidos}/{total}")
+    finally:
+        # Fecha o gerador já: os itens reivindicados e não terminados voltam a ficar pendentes
+        eventos.close()
+    return processados, erros
+
+
+def _ao_segmento(contexto: Contexto):
+    linhas = []
+
+    def mostrar(arquivo, segmento):
+        minutos, segundos = divmod(int(segmento["inicio"]), 60)
+        linhas.append(f"[{minutos:02d}:{segundos:02d}] {segmento['texto']}")
+        contexto.previa("\n".join(linhas[-40:]))
+    return mostrar
+
+
+def _transcrever_pasta(contexto: Contexto, parametros: dict, inicio: float, fim: float):
+    from pipeline import transcrever_pasta
+    from transcricao import listar_audios
+
+    with _vaga_whisper(contexto, parametros, len(listar_audios(parametros["pasta_transcritos"]))) as processos:
+        eventos = transcrever_pasta(
+            parametros["pasta_transcritos"], parametros["modelo"], processos, _ao_segmento(contexto),
+            parametros.get("tamanho_lote"), **parametros.get("opcoes_transcricao", {})
+        )
+        return _acompanhar(contexto, eventos, "📄 Transcrevendo", inicio, fim)
+
+
+def _transliterar_pendentes(contexto: Contexto, parametros: dict, inicio: float, fim: float):
+    from pipeline import transliterar_pendentes, transliterar_pela_batch_api
+
+    motor = _motor(parametros)
+    with contexto.vaga(RECURSO_API):
+        if parametros.get("batch_api"):
+            # Uma rodada só: enviar, consultar ou ingerir; o lote pode levar horas
+            eventos = transliterar_pela_batch_api(
+                parametros["pasta_transcritos"], parametros["pasta_transliterados"], motor, esperar=False
+            )
+        else:
+            eventos = transliterar_pendentes(parametros["pasta_transcritos"], parametros["pasta_transliterados"], motor)
+        return _acompanhar(contexto, eventos, "🔄 Transliterando", inicio, fim)
+
+
+def _baixar_com_yt_dlp(contexto: Contexto, url: str, pasta: str):
+    """Baixa e converte para MP3 pelo executável do yt-dlp (download não incremental)"""
+    contexto.anotar(f"🔽 Baixando {url}...")
+    processo = subprocess.Popen([
+        "yt-dlp",
+        "-x", "--audio-format", "mp3",
+        "-o", f"{pasta}/%(title)s.%(ext)s",
+        url
+    ])
+    while processo.poll() is None:
+        if contexto.cancelado():
+            processo.terminate()
+            processo.wait()
+            raise TrabalhoCancelado("cancelado durante o download")
+        time.sleep(0.5)
+    if processo.returncode:
+        contexto.anotar(f"⚠️ yt-dlp terminou com código {processo.returncode}")
+    else:
+        contexto.anotar("✅ Download concluído")
+
+
+def _sincronizar(contexto: Contexto, url: str, pasta: str, simultaneos: int, fim: float):
+    from sincronizacao import listar_novos, baixar_em_paralelo, caminho_historico
+
+    arquivo_historico = caminho_historico(pasta)
+    contexto.progresso(0.0, "🔎 Listando vídeos do canal...")
+    novos = listar_novos(url, arquivo_historico)
+    contexto.verificar()
+    if not novos:
+        contexto.anotar("ℹ️ Nenhum vídeo novo no canal.")
+        return 0, 0
+    contexto.anotar(f"🔽 Baixando {len(novos)} vídeo(s) novo(s), {simultaneos} por vez...")
+    baixados = erros = 0
+    eventos = baixar_em_paralelo(novos, pasta, arquivo_historico, simultaneos)
+    try:
+        for tipo, _, titulo, detalhe in eventos:
+            contexto.verificar()
+            if tipo == "concluido":
+                baixados += 1
+                contexto.anotar(f"✅ {titulo}")
+            elif tipo == "erro":
+                erros += 1
+                contexto.anotar(f"❌ {titulo}: {detalhe}")
+            elif detalhe is not None:
+                contexto.progresso(mensagem=f"🔽 {titulo} ({detalhe * 100:.0f}%)")
+                continue
+            contexto.progresso(fim * (baixados + erros) / len(novos), f"🔽 {baixados + erros}/{len(novos)} baixado(s)")
+    finally:
+        eventos.close()
+    return baixados, erros
+
+
+def _processar_midia(contexto: Contexto, parametros: dict, baixar):
+    """Baixar → transcrever → transliterar, cada fase com sua vaga"""
+    resultado = {}
+    if parametros.get("baixar", True):
+        resultado["download"] = baixar()
+    if parametros.get("transcrever", True):
+        resultado["transcricao"] = _transcrever_pasta(contexto, parametros, 0.3, 0.7)
+    if parametros.get("transliterar", True):
+        resultado["transliteracao"] = _transliterar_pendentes(contexto, parametros, 0.7, 1.0)
+    contexto.progresso(1.0, "✅ Concluído")
+    return resultado
+
+
+@tipo_trabalho("canal", PRIORIDADE_LOTE)
+def trabalho_canal(contexto: Contexto, parametros: dict):
+    def baixar():
+        if parametros.get("incremental", True):
+            return _sincronizar(contexto, parametros["url"], parametros["pasta_transcritos"],
+                                parametros.get("simultaneos", 4), 0.3)
+        _baixar_com_yt_dlp(contexto, parametros["url"], parametros["pasta_transcritos"])
+
+    return _processar_midia(contexto, parametros, baixar)
+
+
+@tipo_trabalho("video")
+def trabalho_video(contexto: Contexto, parametros: dict):
+    # O vídeo avulso só é transliterado na hora (a Batch API é para o canal)
+    return _processar_midia(
+        contexto, {**parametros, "batch_api": False},
+        lambda: _baixar_com_yt_dlp(contexto, parametros["url"], parametros["pasta_transcritos"])
+    )
+
+
+@tipo_trabalho("transliterar")
+def trabalho_transliterar(contexto: Contexto, parametros: dict):
+    return {"transliteracao": _transliterar_pendentes(contexto, parametros, 0.0, 1.0)}
+
+
+@tipo_trabalho("cancelar_lote", PRIORIDADE_INTERATIVA, configurado=False)
+def trabalho_cancelar_lote(contexto: Contexto, parametros: dict):
+    """Cancela o lote da Batch API sem disputar o arquivo de estado com quem o acompanha
+
+    As rodadas da Batch API na fila ou executando recebem o pedido de cancelamento; o
+    cancelamento em si espera a trava do estado, então não se perde no meio de uma rodada.
+    """
+    from transliteracao_lote import LoteTransliteracao
+
+    for trabalho in contexto.fila.listar((STATUS_NA_FILA, STATUS_EXECUTANDO), limite=1000):
+        if trabalho["tipo"] == "transliterar" and trabalho["parametros"].get("batch_api"):
+            contexto.fila.cancelar(trabalho["id"])
+    contexto.anotar("🛑 Cancelando o lote da Batch API...")
+    LoteTransliteracao(_motor(parametros), parametros["pasta_transcritos"], parametros["pasta_transliterados"]).cancelar()
+    return {"cancelado": True}
+
+
+@tipo_trabalho("upload", PRIORIDADE_INTERATIVA)
+def trabalho_upload(contexto: Contexto, parametros: dict):
+    """Transcreve e translitera um arquivo enviado, com o texto parcial na prévia"""
+    from audio import extrair_audio, FORMATO_MP3
+    from transcricao import EXTENSOES_AUDIO, transcrever_arquivo, transcrever_em_janelas
+    from transliteracao import ArquivoParcial
+    from indice_documentos import obter_indice
+
+    nome = parametros["nome"]
+    pasta_transcritos = parametros["pasta_transcritos"]
+    registro_tarefas = obter_registro(pasta_transcritos)
+    caminho_transcricao = os.path.join(pasta_transcritos, f"{nome}.txt")
+    caminho_transliteracao = os.path.join(parametros["pasta_transliterados"], f"{nome}-Transliterado.txt")
+    opcoes = dict(parametros.get("opcoes_transcricao", {}))
+
+    audio = parametros["arquivo"]
+    if not audio.lower().endswith(EXTENSOES_AUDIO):
+        contexto.progresso(0.05, "🔊 Extraindo áudio do vídeo...")
+        with contexto.vaga(RECURSO_CPU):
+            audio = extrair_audio(audio, parametros["pasta_envio"], parametros.get("formato_audio", FORMATO_MP3))
+    contexto.verificar()
+
+    contexto.progresso(0.1, "📄 Transcrevendo...")
+    with contexto.vaga(recurso_whisper()):
+        if opcoes.get("em_janelas"):
+            # Segmento a segmento: dá para cancelar no meio e retomar do checkpoint
+            mostrar = _ao_segmento(contexto)
+            opcoes_janelas = {
+                chave: valor for chave, valor in opcoes.items() if chave not in ("em_janelas", "cascata", "limites_cascata")
+            }
+            for segmento in transcrever_em_janelas(audio, caminho_transcricao, parametros["modelo"], **opcoes_janelas):
+                mostrar(nome, segmento)
+                contexto.verificar()
+        else:
+            transcricao = transcrever_arquivo(audio, caminho_transcricao, parametros["modelo"], **opcoes)
+            contexto.anotar(_descrever({**transcricao, "arquivo": f"{nome}.txt"}))
+    registro_tarefas.importar(nome, ETAPA_TRANSCRICAO, caminho_transcricao, modelo=parametros["modelo"])
+    with open(caminho_transcricao, "r", encoding="utf-8") as f:
+        conteudo = f.read()
+    contexto.previa(conteudo)
+    contexto.verificar()
+
+    if parametros.get("transliterar", True):
+        motor = _motor(parametros)
+        contexto.progresso(0.5, "🔄 Transliterando...")
+        trechos = []
+        with contexto.vaga(RECURSO_API), ArquivoParcial(caminho_transliteracao) as arquivo:
+            def receber(trecho):
+                arquivo.escrever(trecho)
+                trechos.append(trecho)
+                contexto.previa("".join(trechos))
+                contexto.verificar()
+
+            _, relatorio = motor.transliterar_com_relatorio(conteudo, receber)
+        registro_tarefas.importar(
+            nome, ETAPA_TRANSLITERACAO, caminho_transliteracao, caminho_transcricao, motor.modelo
+        )
+        obter_indice(parametros["pasta_transliterados"]).registrar(caminho_transliteracao)
+        if relatorio and relatorio[-1]["primeiro_token"] is not None:
+            contexto.anotar(
+                f"⏱️ Primeiro token em {relatorio[-1]['primeiro_token']:.1f}s, "
+                f"resposta completa em {sum(chamada['tempo'] for chamada in relatorio):.1f}s"
+            )
+
+    # Deu certo: o upload guardado para uma repetição não é mais necessário
+    shutil.rmtree(parametros["pasta_envio"], ignore_errors=True)
+    contexto.progresso(1.0, "✅ Concluído")
+    return {
+        "transcricao": caminho_transcricao,
+        "transliteracao": caminho_transliteracao if parametros.get("transliterar", True) else None,
+    }
+
+
+def _acompanhar_esteira(contexto: Contexto, esteira, total: int = None, vigia=None):
+    """Histórico e progresso de uma esteira até ela terminar (ou o trabalho ser cancelado)"""
+    try:
+        while True:
+            ativa = esteira.ativa()
+            for tipo, etapa, nome, erro in esteira.proximos_eventos():
+                contexto.anotar(f"❌ {etapa} falhou para {nome}: {erro}" if tipo == "erro" else f"{etapa} concluída: {nome}")
+            metricas = esteira.metricas()
+            feitos = metricas[-1]["concluidos"] + sum(metrica["erros"] for metrica in metricas)
+            mensagem = " • ".join(
+                f"{metrica['etapa']}: {metrica['item_atual'] or 'ocioso'} (fila {metrica['fila']})" for metrica in metricas
+            )
+            if vigia is not None:
+                mensagem += f" • 👁️ {vigia.entregues} recebido(s)"
+            contexto.etapas(metricas)
+            contexto.progresso(feitos / total if total else None, mensagem)
+            if not ativa:
+                break
+            if contexto.cancelado():
+                esteira.cancelar()
+                raise TrabalhoCancelado("cancelado a pedido do usuário")
+            time.sleep(0.5)
+    finally:
+        if vigia is not None:
+            vigia.parar()
+    return {"processados": len(esteira.resultados), "erros": sum(metrica["erros"] for metrica in esteira.metricas())}
+
+
+def _esteira(contexto: Contexto, parametros: dict):
+    from pipeline import montar_esteira
+
+    recursos = {ETAPA_EXTRACAO: RECURSO_CPU, ETAPA_TRANSCRICAO: recurso_whisper(), ETAPA_TRANSLITERACAO: RECURSO_API}
+    trechos = {}
+
+    def ao_token(item, trecho):
+        if item["nome"] not in trechos:
+            trechos.clear()
+            trechos[item["nome"]] = []
+        trechos[item["nome"]].append(trecho)
+        contexto.previa(f"🔄 {item['nome']}\n" + "".join(trechos[item["nome"]]))
+
+    return montar_esteira(
+        parametros["pasta_transcritos"], parametros["modelo"], _motor(parametros), parametros.get("opcoes_transcricao"),
+        formato_audio=parametros.get("formato_audio"), ao_token=ao_token,
+        vaga=lambda etapa: contexto.vaga(recursos[etapa])
+    )
+
+
+@tipo_trabalho("pasta")
+def trabalho_pasta(contexto: Contexto, parametros: dict):
+    """Vídeos de uma pasta local pela esteira extração → transcrição → transliteração"""
+    from audio import extrair_audio, FORMATO_NPY, FORMATO_MEMORIA
+    from pipeline import item_video, listar_videos_pasta, transcrever_pares
+
+    pasta_videos = parametros["pasta_videos"]
+    videos = listar_videos_pasta(pasta_videos)
+    if parametros.get("videos") is not None:
+        videos = [video for video in videos if video in parametros["videos"]]
+    if not videos:
+        contexto.anotar("📁 Nenhum vídeo encontrado na pasta especificada.")
+        return {"processados": 0, "erros": 0}
+    itens = [
+        item_video(os.path.join(pasta_videos, video), parametros["pasta_transcritos"], parametros["pasta_transliterados"])
+        for video in videos
+    ]
+    contexto.anotar(f"🎬 Processando {len(itens)} vídeo(s)...")
+
+    falhas_extracao = 0
+    if parametros.get("processos", 1) != 1 or parametros.get("tamanho_lote") is not None:
+        # Pool ou lote: todos os áudios precisam existir antes; a esteira depois só translitera
+        formato = FORMATO_NPY if parametros.get("formato_audio") == FORMATO_MEMORIA else parametros.get("formato_audio")
+        pares, extraidos = [], []
+        with contexto.vaga(RECURSO_CPU):
+            for item in itens:
+                contexto.verificar()
+                try:
+                    audio = extrair_audio(item["video"], parametros["pasta_transcritos"], formato)
+                except Exception as e:
+                    # Um vídeo corrompido não derruba a pasta inteira
+                    contexto.anotar(f"❌ Extração falhou para {item['nome']}: {e}")
+                    falhas_extracao += 1
+                    continue
+                pares.append((audio, item["transcricao"]))
+                extraidos.append(item)
+        itens = extraidos
+        if not itens:
+            return {"processados": 0, "erros": falhas_extracao}
+        with _vaga_whisper(contexto, parametros, len(pares)) as processos:
+            _acompanhar(contexto, transcrever_pares(
+                pares, parametros["modelo"], processos, _ao_segmento(contexto),
+                parametros.get("tamanho_lote"), **parametros.get("opcoes_transcricao", {})
+            ), "📄 Transcrevendo", 0.0, 0.5)
+
+    esteira = _esteira(contexto, parametros)
+    esteira.iniciar(itens)
+    resultado = _acompanhar_esteira(contexto, esteira, len(itens))
+    resultado["erros"] += falhas_extracao
+    return resultado
+
+
+@tipo_trabalho("vigiar")
+def trabalho_vigiar(contexto: Contexto, parametros: dict):
+    """Processa os vídeos que chegam na pasta até o trabalho ser cancelado"""
+    from pipeline import item_video
+    from vigia import VigiaPasta
+
+    vigia = VigiaPasta(parametros["pasta_videos"], estabilidade=parametros.get("estabilidade", 2.0),
+                       usar_polling=parametros.get("polling", False))
+    vigia.iniciar()
+    itens = (
+        item_video(caminho, parametros["pasta_transcritos"], parametros["pasta_transliterados"], recebido_em=detectado_em)
+        for caminho, detectado_em, _ in vigia.itens()
+    )
+    esteira = _esteira(contexto, parametros)
+    esteira.iniciar(itens)
+    contexto.anotar(f"👁️ Vigiando {parametros['pasta_videos']} (cancele o trabalho para parar)")
+    return _acompanhar_esteira(contexto, esteira, vigia=vigia)
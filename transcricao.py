@@ -0,0 +1,416 @@
+import json
+import os
+import subprocess
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+import multiprocessing
+from pathlib import Path
+
+from modelos import obter_modelo, usar_modelo, precisao_configurada, PRECISAO_INT8
+from audio import carregar_audio, carregar_pcm, TAXA_AMOSTRAGEM
+from cache_resultados import obter_cache, TIPO_TRANSCRICAO
+from vad import transcrever_fala
+from cascata import refinar, LIMITES_CASCATA_PADRAO
+from metricas import medir, perfilar, registrar
+
+# =========================
+# TRANSCRIÇÃO
+# =========================
+
+# Extensões que a transcrição em lote reconhece como áudio
+EXTENSOES_AUDIO = (".mp3", ".npy", ".m4a", ".webm", ".opus", ".ogg", ".wav", ".flac")
+
+# RAM aproximada exigida por processo para cada modelo (ver tabela do README)
+MEMORIA_MODELO_GB = {
+    "tiny": 1,
+    "base": 1,
+    "small": 2,
+    "medium": 5,
+    "large": 10,
+}
+
+
+def duracao_audio(caminho_audio: str):
+    """Retorna a duração do áudio em segundos (0 se falhar)
+
+    PCM .npy não tem cabeçalho de contêiner para o ffprobe: a duração sai do
+    shape, lido só do cabeçalho do arquivo mapeado em memória.
+    """
+    if str(caminho_audio).endswith(".npy"):
+        try:
+            import numpy as np
+            return np.load(caminho_audio, mmap_mode="r").shape[0] / TAXA_AMOSTRAGEM
+        except (OSError, ValueError):
+            return 0.0
+    try:
+        saida = subprocess.run([
+            'ffprobe', '-v', 'error',
+            '-show_entries', 'format=duration',
+            '-of', 'default=noprint_wrappers=1:nokey=1',
+            caminho_audio
+        ], check=True, capture_output=True, text=True)
+        return float(saida.stdout.strip())
+    except (subprocess.CalledProcessError, FileNotFoundError, ValueError):
+        return 0.0
+
+
+def listar_audios(pasta: str):
+    """Lista os arquivos de áudio de uma pasta, em ordem alfabética"""
+    if not os.path.isdir(pasta):
+        return []
+    return sorted(
+        Path(entrada.path) for entrada in os.scandir(pasta)
+        if entrada.is_file() and entrada.name.lower().endswith(EXTENSOES_AUDIO)
+    )
+
+
+def _identificador_modelo(modelo: str, vad: bool):
+    """Nome do modelo usado na chave do cache (o VAD e a quantização int8 mudam o resultado)"""
+    if precisao_configurada() == PRECISAO_INT8:
+        modelo = f"{modelo}+int8"
+    return f"{modelo}+vad" if vad else modelo
+
+
+def transcrever_texto(caminho_audio, modelo: str = "small", idioma: str = "pt", pasta_cache: str = None,
+                      vad: bool = False, cascata: str = None, limites_cascata: dict = None):
+    """Transcreve um áudio e retorna (texto, veio_do_cache, estatísticas do VAD ou None)
+
+    `caminho_audio` pode ser um arquivo (inclusive .npy com PCM 16 kHz) ou um
+    array PCM já decodificado. Com `cascata` (nome de um modelo maior) os
+    segmentos incertos são refeitos por ele (ver transcrever_com_cascata).
+    """
+    if cascata:
+        return transcrever_com_cascata(caminho_audio, modelo, cascata, idioma, pasta_cache, vad, limites_cascata)[:3]
+    if isinstance(caminho_audio, Path):
+        caminho_audio = str(caminho_audio)
+    cache = obter_cache(pasta_cache) if pasta_cache else None
+    chave = None
+    if cache is not None:
+        chave = cache.chave_transcricao(caminho_audio, _identificador_modelo(modelo, vad), idioma)
+        texto = cache.obter(TIPO_TRANSCRICAO, chave)
+        if texto is not None:
+            return texto, True, None
+
+    with usar_modelo(modelo) as entrada:
+        inicio = time.perf_counter()
+        estatisticas_vad = None
+        with medir("transcricao", modelo=modelo, vad=vad) as campos:
+            if vad:
+                result, estatisticas_vad = transcrever_fala(
+                    entrada.model, carregar_pcm(caminho_audio), {"language": idioma, **entrada.opcoes_transcricao}
+                )
+                duracao = estatisticas_vad["duracao_total"]
+            else:
+                audio = carregar_audio(caminho_audio) if isinstance(caminho_audio, str) else caminho_audio
+                result = entrada.model.transcribe(audio, language=idioma, **entrada.opcoes_transcricao)
+                # Com um caminho de mp3 o Whisper decodifica sozinho; o fim do último segmento aproxima a duração
+                if isinstance(audio, str):
+                    duracao = result["segments"][-1]["end"] if result["segments"] else 0.0
+                else:
+                    duracao = len(audio) / TAXA_AMOSTRAGEM
+            campos["segundos_audio"] = duracao
+            campos["rtf"] = (time.perf_counter() - inicio) / duracao if duracao else None
+    if cache is not None:
+        cache.guardar(TIPO_TRANSCRICAO, chave, result["text"], time.perf_counter() - inicio)
+    return result["text"], False, estatisticas_vad
+
+
+def transcrever_com_cascata(caminho_audio, modelo: str = "small", modelo_preciso: str = "large", idioma: str = "pt",
+                            pasta_cache: str = None, vad: bool = False, limites: dict = None):
+    """Modelo rápido em tudo e modelo preciso só nos segmentos incertos
+
+    Retorna (texto, veio_do_cache, estatísticas do VAD ou None, estatísticas da
+    cascata ou None); as da cascata trazem a fração escalada e a economia estimada.
+    """
+    if isinstance(caminho_audio, Path):
+        caminho_audio = str(caminho_audio)
+    limites = {**LIMITES_CASCATA_PADRAO, **(limites or {})}
+    cache = obter_cache(pasta_cache) if pasta_cache else None
+    chave = None
+    if cache is not None:
+        # Os limites mudam quais trechos são refeitos, então também entram na chave
+        identificador = f"{modelo}>{modelo_preciso}@{limites['logprob']},{limites['compressao']},{limites['sem_fala']}"
+        chave = cache.chave_transcricao(caminho_audio, _identificador_modelo(identificador, vad), idioma)
+        texto = cache.obter(TIPO_TRANSCRICAO, chave)
+        if texto is not None:
+            return texto, True, None, None
+
+    # As regiões incertas são recortadas do PCM, então o áudio precisa estar decodificado
+    audio = carregar_pcm(caminho_audio)
+    with usar_modelo(modelo) as entrada:
+        inicio = time.perf_counter()
+        estatisticas_vad = None
+        with medir("transcricao", modelo=modelo, vad=vad, cascata=modelo_preciso) as campos:
+            opcoes_modelo = {"language": idioma, **entrada.opcoes_transcricao}
+            if vad:
+                result, estatisticas_vad = transcrever_fala(entrada.model, audio, opcoes_modelo)
+            else:
+                result = entrada.model.transcribe(audio, **opcoes_modelo)
+            texto, estatisticas = refinar(
+                result, audio, modelo, modelo_preciso, idioma, limites, time.perf_counter() - inicio
+            )
+            campos["segundos_audio"] = estatisticas["duracao_total"]
+            campos["rtf"] = (time.perf_counter() - inicio) / estatisticas["duracao_total"] if estatisticas["duracao_total"] else None
+            campos["segundos_escalados"] = estatisticas["duracao_escalada"]
+            campos["segundos_economizados"] = estatisticas["economia_s"]
+    if cache is not None:
+        cache.guardar(TIPO_TRANSCRICAO, chave, texto, time.perf_counter() - inicio)
+    return texto, False, estatisticas_vad, estatisticas
+
+
+def transcrever_arquivo(caminho_audio, caminho_txt: str, modelo: str = "small", idioma: str = "pt",
+                        pasta_cache: str = None, em_janelas: bool = False, vad: bool = False,
+                        cascata: str = None, limites_cascata: dict = None):
+    """Transcreve um arquivo de áudio e salva o texto em caminho_txt
+
+    A cascata não se aplica ao modo em janelas, que grava segmento a segmento.
+    """
+    inicio = time.perf_counter()
+    estatisticas_vad = None
+    estatisticas_cascata = None
+    with perfilar(caminho_txt):
+        if em_janelas:
+            # Consome o gerador; o diário de segmentos e o .txt são gravados por ele
+            do_cache = False
+            for segmento in transcrever_em_janelas(caminho_audio, caminho_txt, modelo, idioma, pasta_cache, vad=vad):
+                do_cache = segmento.get("cache", False)
+        elif cascata:
+            texto, do_cache, estatisticas_vad, estatisticas_cascata = transcrever_com_cascata(
+                caminho_audio, modelo, cascata, idioma, pasta_cache, vad, limites_cascata
+            )
+        else:
+            texto, do_cache, estatisticas_vad = transcrever_texto(caminho_audio, modelo, idioma, pasta_cache, vad)
+
+        if not em_janelas:
+            with medir("escrita", arquivo=os.path.basename(str(caminho_txt))) as campos:
+                with open(caminho_txt, "w", encoding="utf-8") as f:
+                    f.write(texto)
+                    campos["bytes"] = f.tell()
+
+    return {
+        "arquivo": os.path.basename(str(caminho_audio) if isinstance(caminho_audio, (str, Path)) else str(caminho_txt)),
+        "tempo": time.perf_counter() - inicio,
+        "cache": do_cache,
+        "vad": estatisticas_vad,
+        "cascata": estatisticas_cascata,
+        "erro": None,
+    }
+
+# =========================
+# TRANSCRIÇÃO EM JANELAS COM CHECKPOINT
+# =========================
+# O áudio é transcrito em janelas de 30 s. Cada janela grava seus segmentos
+# (com início e fim) num diário JSONL ao lado do .txt e só então um marcador
+# de "janela confirmada". Se o processo cair, a próxima execução descarta o
+# que veio depois do último marcador e recomeça dali.
+
+JANELA_SEGUNDOS = 30
+
+
+def caminho_diario(caminho_txt: str):
+    """Diário de segmentos correspondente a um .txt de transcrição"""
+    return str(Path(caminho_txt).with_suffix(".segmentos.jsonl"))
+
+
+def ler_diario(caminho: str):
+    """Retorna (segmentos confirmados, segundo onde retomar, terminado)"""
+    segmentos = []
+    pendentes = []
+    retomar_em = 0.0
+    terminado = False
+    if not os.path.exists(caminho):
+        return segmentos, retomar_em, terminado
+
+    with open(caminho, "r", encoding="utf-8") as f:
+        for linha in f:
+            try:
+                registro = json.loads(linha)
+            except json.JSONDecodeError:
+                # Linha cortada no meio por uma queda: tudo depois dela é descartado
+                break
+            if registro["tipo"] == "segmento":
+                pendentes.append(registro)
+            elif registro["tipo"] == "janela":
+                segmentos.extend(pendentes)
+                pendentes = []
+                retomar_em = registro["fim"]
+            elif registro["tipo"] == "fim":
+                terminado = True
+    return segmentos, retomar_em, terminado
+
+
+def _anexar(arquivo, registros):
+    for registro in registros:
+        arquivo.write(json.dumps(registro, ensure_ascii=False) + "\n")
+    arquivo.flush()
+    os.fsync(arquivo.fileno())
+
+
+def transcrever_em_janelas(caminho_audio, caminho_txt: str, modelo: str = "small", idioma: str = "pt",
+                           pasta_cache: str = None, janela: float = JANELA_SEGUNDOS, vad: bool = False):
+    """Transcreve em janelas gerando cada segmento {"inicio", "fim", "texto"} assim que sai
+
+    Retoma do último checkpoint do diário, se houver. Ao terminar grava o .txt
+    e mantém o diário com os tempos de cada segmento. Com `vad`, cada janela
+    passa só as regiões de fala para o modelo (e janelas sem fala são puladas).
+    """
+    diario = caminho_diario(caminho_txt)
+    segmentos, posicao, terminado = ler_diario(diario)
+    for segmento in segmentos:
+        yield segmento
+
+    cache = obter_cache(pasta_cache) if pasta_cache else None
+    chave = cache.chave_transcricao(caminho_audio, _identificador_modelo(modelo, vad), idioma) if cache is not None else None
+
+    # Sem nada no diário, o mesmo áudio já transcrito vem inteiro do cache (sem os tempos de cada segmento)
+    texto = cache.obter(TIPO_TRANSCRICAO, chave) if cache is not None and not segmentos and not posicao else None
+    if texto is not None:
+        segmentos = [{"tipo": "segmento", "inicio": 0.0, "fim": None, "texto": texto, "cache": True}]
+        yield segmentos[0]
+    elif not terminado:
+        audio = carregar_pcm(caminho_audio)
+        duracao = len(audio) / TAXA_AMOSTRAGEM
+        inicio_execucao = time.perf_counter()
+
+        # Reescreve o diário só com a parte confirmada, descartando restos da queda
+        with usar_modelo(modelo) as entrada, open(diario, "w", encoding="utf-8") as f:
+            _anexar(f, segmentos)
+            if segmentos or posicao:
+                _anexar(f, [{"tipo": "janela", "fim": posicao}])
+
+            while posicao < duracao:
+                inicio_janela = time.perf_counter()
+                fim_janela = min(posicao + janela, duracao)
+                trecho = audio[int(posicao * TAXA_AMOSTRAGEM):int(fim_janela * TAXA_AMOSTRAGEM)]
+                anterior = segmentos[-1]["texto"] if segmentos else None
+                opcoes_modelo = {
+                    "language": idioma,
+                    "initial_prompt": anterior,
+                    "condition_on_previous_text": False,
+                    **entrada.opcoes_transcricao,
+                }
+                if vad:
+                    result, _ = transcrever_fala(entrada.model, trecho, opcoes_modelo)
+                else:
+                    result = entrada.model.transcribe(trecho, **opcoes_modelo)
+
+                novos = [
+                    {"tipo": "segmento", "inicio": posicao + s["start"], "fim": posicao + s["end"], "texto": s["text"].strip()}
+                    for s in result["segments"] if s["text"].strip()
+                ]
+                # O último segmento pode ter sido cortado pela borda da janela:
+                # descarta-o e recomeça a próxima janela no fim do penúltimo
+                proxima = fim_janela
+                if fim_janela < duracao and len(novos) > 1:
+                    novos.pop()
+                    proxima = max(novos[-1]["fim"], posicao + 1.0)
+
+                _anexar(f, novos + [{"tipo": "janela", "fim": proxima}])
+                tempo_janela = time.perf_counter() - inicio_janela
+                registrar(
+                    "transcricao_janela", tempo_janela, modelo=modelo, vad=vad, segundos_audio=proxima - posicao,
+                    rtf=tempo_janela / (proxima - posicao) if proxima > posicao else None
+                )
+                segmentos.extend(novos)
+                posicao = proxima
+                for segmento in novos:
+                    yield segmento
+
+            _anexar(f, [{"tipo": "fim"}])
+
+        if cache is not None:
+            texto = " ".join(s["texto"] for s in segmentos)
+            cache.guardar(TIPO_TRANSCRICAO, chave, texto, time.perf_counter() - inicio_execucao)
+
+    with open(caminho_txt, "w", encoding="utf-8") as f:
+        f.write(" ".join(s["texto"] for s in segmentos))
+
+# =========================
+# POOL DE PROCESSOS
+# =========================
+
+def memoria_disponivel_bytes():
+    """Memória física disponível no momento (ou None se indisponível)"""
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for linha in f:
+                if linha.startswith("MemAvailable:"):
+                    return int(linha.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def numero_trabalhadores(modelo: str, total_arquivos: int = None, modelo_cascata: str = None):
+    """Escolhe quantos processos usar a partir dos núcleos e da RAM do modelo (e do modelo da cascata)"""
+    nucleos = os.cpu_count() or 1
+    trabalhadores = nucleos
+
+    memoria = memoria_disponivel_bytes()
+    if memoria:
+        por_processo = MEMORIA_MODELO_GB.get(modelo, 2) * 1024 ** 3
+        if modelo_cascata:
+            por_processo += MEMORIA_MODELO_GB.get(modelo_cascata, 2) * 1024 ** 3
+        trabalhadores = min(trabalhadores, memoria // por_processo)
+
+    if total_arquivos is not None:
+        trabalhadores = min(trabalhadores, total_arquivos)
+
+    return max(1, int(trabalhadores))
+
+
+def _inicializar_trabalhador(modelo: str, threads: int):
+    """Executado uma vez por processo: limita threads e carrega o modelo"""
+    import torch
+    torch.set_num_threads(threads)
+    # Evita que obter_modelo volte a aplicar o número de threads do processo principal
+    os.environ["WHISPER_THREADS"] = str(threads)
+    obter_modelo(modelo)
+
+
+def _transcrever_no_trabalhador(caminho_audio: str, caminho_txt: str, modelo: str, opcoes: dict):
+    try:
+        return transcrever_arquivo(caminho_audio, caminho_txt, modelo, **opcoes)
+    except Exception as e:
+        return {"arquivo": os.path.basename(caminho_audio), "tempo": 0.0, "cache": False, "vad": None, "cascata": None, "erro": str(e)}
+
+
+def transcrever_em_paralelo(arquivos, modelo: str = "small", trabalhadores: int = None, **opcoes):
+    """Transcreve vários áudios em processos separados, gerando os resultados conforme terminam
+
+    `arquivos` é uma lista de pares (caminho_audio, caminho_txt). Arquivos com
+    .txt já existente são ignorados, e os mais longos são enviados primeiro
+    para que nenhum processo fique sozinho com um áudio grande no final.
+    As `opcoes` são repassadas para transcrever_arquivo.
+    """
+    pendentes = [(str(a), str(t)) for a, t in arquivos if not os.path.exists(t)]
+    if not pendentes:
+        return
+
+    # Os ffprobe rodam em threads (fora do GIL) para não atrasar o início com um processo por arquivo
+    with ThreadPoolExecutor(max_workers=min(8, len(pendentes))) as sondagem:
+        duracoes = dict(zip(pendentes, sondagem.map(lambda par: duracao_audio(par[0]), pendentes)))
+    pendentes.sort(key=duracoes.get, reverse=True)
+
+    if not trabalhadores:
+        trabalhadores = numero_trabalhadores(modelo, len(pendentes), opcoes.get("cascata"))
+    trabalhadores = max(1, min(trabalhadores, len(pendentes)))
+    threads = int(os.environ.get("WHISPER_THREADS", "0")) or max(1, (os.cpu_count() or 1) // trabalhadores)
+
+    # spawn evita herdar o estado do torch/CUDA do processo do Streamlit
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(
+        max_workers=trabalhadores,
+        mp_context=contexto,
+        initializer=_inicializar_trabalhador,
+        initargs=(modelo, threads),
+    ) as executor:
+        futuros = [
+            executor.submit(_transcrever_no_trabalhador, audio, txt, modelo, opcoes)
+            for audio, txt in pendentes
+        ]
+        for futuro in as_completed(futuros):
+            yield futuro.result()
@@ -0,0 +1,265 @@
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+from modelos import usar_modelo
+from audio import carregar_pcm, TAXA_AMOSTRAGEM
+from cache_resultados import obter_cache, TIPO_TRANSCRICAO
+from transcricao import transcrever_arquivo, duracao_audio, memoria_disponivel_bytes, _identificador_modelo
+from metricas import medir
+
+# =========================
+# TRANSCRIÇÃO EM LOTE ENTRE ARQUIVOS
+# =========================
+# Com muitos clipes curtos, chamar model.transcribe arquivo por arquivo deixa
+# a GPU quase ociosa: cada chamada processa uma única janela de 30 s. Aqui as
+# janelas log-mel de vários arquivos são empilhadas num só tensor e passam
+# juntas pelo encoder e pelo decoder (whisper.decode aceita um lote). O texto
+# de cada janela volta para o arquivo de origem, e o .txt é gravado assim que
+# todas as janelas dele saem do modelo.
+#
+# Diferenças em relação ao caminho sequencial:
+# - as janelas são cortadas a cada 30 s, sem condicionar uma na anterior;
+# - só janelas suspeitas (texto repetitivo ou baixa confiança) são refeitas
+#   com model.transcribe, que tem o fallback de temperatura;
+# - arquivos acima de `duracao_maxima` e o VAD seguem pelo caminho sequencial
+#   (a duração vem do ffprobe ou do cabeçalho do .npy, sem decodificar o áudio).
+
+SEGUNDOS_JANELA = 30
+AMOSTRAS_JANELA = SEGUNDOS_JANELA * TAXA_AMOSTRAGEM
+
+# Clipes até este tamanho entram no lote; os maiores vão para transcrever_arquivo
+DURACAO_MAXIMA_LOTE = 120
+
+LOTE_PADRAO = 8
+LOTE_MAXIMO = 64
+
+# Memória aproximada por janela no lote (ativações do encoder + cache KV do decoder)
+MEMORIA_JANELA_MB = {
+    "tiny": 40,
+    "base": 60,
+    "small": 150,
+    "medium": 300,
+    "large": 500,
+}
+
+# Mesmos limites que o model.transcribe usa para decidir o fallback
+LIMITE_COMPRESSAO = 2.4
+LIMITE_LOGPROB = -1.0
+LIMITE_SEM_FALA = 0.6
+
+
+def tamanho_lote_automatico(modelo: str, dispositivo: str):
+    """Quantas janelas cabem num lote usando metade da memória livre do dispositivo"""
+    livre = None
+    if dispositivo.startswith("cuda"):
+        import torch
+        livre, _ = torch.cuda.mem_get_info()
+    else:
+        livre = memoria_disponivel_bytes()
+    if not livre:
+        return LOTE_PADRAO
+
+    por_janela = MEMORIA_JANELA_MB.get(modelo, 150) * 1024 * 1024
+    return max(1, min(LOTE_MAXIMO, int(livre * 0.5 // por_janela)))
+
+
+def _erro_memoria(erro: Exception):
+    return "out of memory" in str(erro).lower()
+
+
+def _ler_curto(audio: str, duracao_maxima: float):
+    """PCM do áudio, ou None se ele passar de `duracao_maxima` (a duração vem antes de decodificar)"""
+    if duracao_audio(audio) > duracao_maxima:
+        return None
+    pcm = carregar_pcm(audio)
+    # Sem duração conhecida (ffprobe falhou) a conferência fica para depois da decodificação
+    return None if len(pcm) > duracao_maxima * TAXA_AMOSTRAGEM else pcm
+
+
+def _carregar_adiantado(pares, leitores: int, duracao_maxima: float):
+    """Decodifica os áudios em threads (o ffmpeg roda fora do GIL) mantendo poucos à frente
+
+    Gera (audio, txt, pcm, erro) na ordem de `pares`; pcm é None para os longos,
+    que nunca chegam a ser decodificados aqui.
+    """
+    with ThreadPoolExecutor(max_workers=leitores, thread_name_prefix="lote-leitura") as executor:
+        adiantados = deque()
+        for audio, txt in pares:
+            adiantados.append((audio, txt, executor.submit(_ler_curto, audio, duracao_maxima)))
+            if len(adiantados) > leitores * 2:
+                yield _resultado_leitura(adiantados.popleft())
+        while adiantados:
+            yield _resultado_leitura(adiantados.popleft())
+
+
+class _LoteWhisper:
+    """Empilha janelas de vários arquivos e decodifica quando o lote enche"""
+
+    def __init__(self, entrada, modelo: str, idioma: str, tamanho_lote: int, cache=None):
+        self.modelo = modelo
+        self.idioma = idioma
+        self.entrada = entrada
+        self.tamanho_lote = tamanho_lote or tamanho_lote_automatico(modelo, str(self.entrada.model.device))
+        self.cache = cache
+        self.janelas = []
+        self.arquivos = {}
+        self.refeitas = 0
+
+    def adicionar(self, audio: str, txt: str, pcm, chave=None):
+        """Corta o PCM em janelas de 30 s e gera os resultados dos arquivos que ficarem completos"""
+        nome = os.path.basename(audio)
+        quantidade = max(1, -(-len(pcm) // AMOSTRAS_JANELA))
+        self.arquivos[nome] = {
+            "txt": txt, "chave": chave, "textos": [None] * quantidade,
+            "faltam": quantidade, "tempo": 0.0,
+        }
+        for indice in range(quantidade):
+            self.janelas.append((nome, indice, pcm[indice * AMOSTRAS_JANELA:(indice + 1) * AMOSTRAS_JANELA]))
+        while len(self.janelas) >= self.tamanho_lote:
+            yield from self.esvaziar(self.tamanho_lote)
+
+    def esvaziar(self, limite: int = None):
+        """Decodifica as janelas acumuladas (ou só as `limite` primeiras)"""
+        while self.janelas:
+            lote = self.janelas[:limite or len(self.janelas)]
+            del self.janelas[:len(lote)]
+            yield from self._decodificar(lote)
+            if limite:
+                return
+
+    def _decodificar(self, lote):
+        inicio = time.perf_counter()
+        segundos = sum(len(trecho) for _, _, trecho in lote) / TAXA_AMOSTRAGEM
+        with medir("transcricao_lote", modelo=self.modelo, lote=len(lote)) as campos:
+            textos = self._decodificar_janelas([trecho for _, _, trecho in lote])
+            campos["segundos_audio"] = segundos
+            campos["rtf"] = (time.perf_counter() - inicio) / segundos if segundos else None
+        tempo_por_janela = (time.perf_counter() - inicio) / len(lote)
+
+        for (nome, indice, _), texto in zip(lote, textos):
+            arquivo = self.arquivos[nome]
+            arquivo["textos"][indice] = texto
+            arquivo["tempo"] += tempo_por_janela
+            arquivo["faltam"] -= 1
+            if arquivo["faltam"] == 0:
+                yield self._gravar(nome, self.arquivos.pop(nome))
+
+    def _decodificar_janelas(self, trechos):
+        """Um passe do encoder/decoder para todas as janelas; divide o lote se faltar memória"""
+        import numpy as np
+        import torch
+        import whisper
+
+        model = self.entrada.model
+        mel = None
+        try:
+            mel = torch.stack([
+                whisper.log_mel_spectrogram(
+                    whisper.pad_or_trim(np.ascontiguousarray(trecho, dtype=np.float32)),
+                    n_mels=model.dims.n_mels, device=model.device
+                )
+                for trecho in trechos
+            ])
+            opcoes = whisper.DecodingOptions(
+                task="transcribe", language=self.idioma, without_timestamps=True, **self.entrada.opcoes_transcricao
+            )
+            with torch.no_grad():
+                resultados = whisper.decode(model, mel, opcoes)
+        except RuntimeError as e:
+            if not _erro_memoria(e) or len(trechos) == 1:
+                raise
+            mel = None
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+            # Lote grande demais para a memória livre: usa metade daqui em diante
+            self.tamanho_lote = max(1, len(trechos) // 2)
+            meio = len(trechos) // 2
+            return self._decodificar_janelas(trechos[:meio]) + self._decodificar_janelas(trechos[meio:])
+
+        textos = []
+        for trecho, resultado in zip(trechos, resultados):
+            if resultado.no_speech_prob > LIMITE_SEM_FALA and resultado.avg_logprob < LIMITE_LOGPROB:
+                textos.append("")
+            elif resultado.compression_ratio > LIMITE_COMPRESSAO or resultado.avg_logprob < LIMITE_LOGPROB:
+                # Janela duvidosa: refaz sozinha com o fallback de temperatura do transcribe
+                self.refeitas += 1
+                refeita = model.transcribe(
+                    np.ascontiguousarray(trecho, dtype=np.float32), language=self.idioma, **self.entrada.opcoes_transcricao
+                )
+                textos.append(refeita["text"].strip())
+            else:
+                textos.append(resultado.text.strip())
+        return textos
+
+    def _gravar(self, nome: str, arquivo: dict):
+        texto = " ".join(t for t in arquivo["textos"] if t)
+        try:
+            with medir("escrita", arquivo=os.path.basename(arquivo["txt"])) as campos:
+                with open(arquivo["txt"], "w", encoding="utf-8") as f:
+                    f.write(texto)
+                    campos["bytes"] = f.tell()
+        except OSError as e:
+            return {"arquivo": nome, "tempo": arquivo["tempo"], "cache": False, "vad": None, "erro": str(e)}
+        if self.cache is not None and arquivo["chave"]:
+            self.cache.guardar(TIPO_TRANSCRICAO, arquivo["chave"], texto, arquivo["tempo"])
+        return {"arquivo": nome, "tempo": arquivo["tempo"], "cache": False, "vad": None, "erro": None}
+
+
+def transcrever_em_lote(pares, modelo: str = "small", idioma: str = "pt", pasta_cache: str = None,
+                        tamanho_lote: int = 0, duracao_maxima: float = DURACAO_MAXIMA_LOTE, leitores: int = 4):
+    """Transcreve pares (áudio, txt) decodificando janelas de vários arquivos de uma vez
+
+    Gera um resultado por arquivo, com os mesmos campos de transcrever_arquivo,
+    conforme cada um fica completo. `tamanho_lote` = 0 escolhe pelo espaço livre
+    na GPU (ou na RAM); se ainda assim faltar memória, o lote é dividido ao meio.
+    """
+    cache = obter_cache(pasta_cache) if pasta_cache else None
+    # O modelo fica reservado enquanto houver janelas no lote
+    with usar_modelo(modelo) as entrada:
+        lote = _LoteWhisper(entrada, modelo, idioma, tamanho_lote, cache)
+        longos = []
+
+        for audio, txt, pcm, erro in _carregar_adiantado([(str(a), str(t)) for a, t in pares], leitores, duracao_maxima):
+            nome = os.path.basename(audio)
+            if erro:
+                yield {"arquivo": nome, "tempo": 0.0, "cache": False, "vad": None, "erro": erro}
+                continue
+            if pcm is None:
+                longos.append((audio, txt))
+                continue
+
+            chave = None
+            if cache is not None:
+                chave = cache.chave_transcricao(audio, _identificador_modelo(modelo, False), idioma)
+                texto = cache.obter(TIPO_TRANSCRICAO, chave)
+                if texto is not None:
+                    with open(txt, "w", encoding="utf-8") as f:
+                        f.write(texto)
+                    yield {"arquivo": nome, "tempo": 0.0, "cache": True, "vad": None, "erro": None}
+                    continue
+
+            try:
+                yield from lote.adicionar(audio, txt, pcm, chave)
+            except Exception as e:
+                # O lote inteiro falhou: todos os arquivos com janelas nele ficam com o erro
+                yield from _falhar_pendentes(lote, str(e))
+
+        try:
+            yield from lote.esvaziar()
+        except Exception as e:
+            yield from _falhar_pendentes(lote, str(e))
+
+    for audio, txt in longos:
+        try:
+            yield transcrever_arquivo(audio, txt, modelo, idioma, pasta_cache)
+        except Exception as e:
+            yield {"arquivo": os.path.basename(audio), "tempo": 0.0, "cache": False, "vad": None, "erro": str(e)}
+
+
+def _falhar_pendentes(lote: _LoteWhisper, erro: str):
+    for nome in list(lote.arquivos):
+        del lote.arquivos[nome]
+        yield {"arquivo": nome, "tempo": 0.0, "cache": False, "vad": None, "erro": erro}
+    lote.janelas.clear()
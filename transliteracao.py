@@ -0,0 +1,397 @@
+import os
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from cache_resultados import TIPO_TRANSLITERACAO
+from metricas import medir, perfilar, registrar
+
+# =========================
+# CONTAGEM DE TOKENS
+# =========================
+
+_codificadores = {}
+
+
+def contar_tokens(texto: str, modelo: str = "gpt-4o"):
+    """Conta tokens com tiktoken, usando o200k_base se o modelo for desconhecido"""
+    codificador = _codificadores.get(modelo)
+    if codificador is None:
+        import tiktoken
+        try:
+            codificador = tiktoken.encoding_for_model(modelo)
+        except KeyError:
+            codificador = tiktoken.get_encoding("o200k_base")
+        _codificadores[modelo] = codificador
+    return len(codificador.encode(texto))
+
+# =========================
+# DIVISÃO EM BLOCOS
+# =========================
+
+PROMPT_CONSOLIDACAO = """
+Tarefa:
+Você receberá, em ordem, documentações parciais geradas a partir de trechos consecutivos de uma mesma transcrição de vídeo. Trechos vizinhos podem se sobrepor.
+
+Objetivo:
+Consolide as partes em uma única documentação clara, organizada e objetiva, adequada para um sistema de IA baseado em RAG.
+
+Instruções específicas:
+- Una tópicos repetidos entre as partes e elimine redundâncias causadas pela sobreposição.
+- Mantenha a ordem lógica do conteúdo e toda a informação essencial.
+- Não invente informações não presentes nas partes.
+
+Agora, aqui estão as documentações parciais:
+
+{}
+"""
+
+_FIM_DE_FRASE = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def dividir_em_blocos(texto: str, tokens_por_bloco: int, sobreposicao: int = 0, modelo: str = "gpt-4o"):
+    """Divide o texto em blocos de até `tokens_por_bloco` tokens, cortando em fim de frase
+
+    Os últimos `sobreposicao` tokens de frases de um bloco são repetidos no início
+    do seguinte para que o modelo não perca o contexto na fronteira.
+    """
+    frases = []
+    for frase in _FIM_DE_FRASE.split(texto):
+        frase = frase.strip()
+        if not frase:
+            continue
+        tokens = contar_tokens(frase, modelo)
+        if tokens <= tokens_por_bloco:
+            frases.append((frase, tokens))
+            continue
+        # Frase maior que o bloco (transcrição sem pontuação): corta por palavras
+        palavras = frase.split()
+        passo = max(1, len(palavras) * tokens_por_bloco // (tokens + 1))
+        for i in range(0, len(palavras), passo):
+            pedaco = " ".join(palavras[i:i + passo])
+            frases.append((pedaco, contar_tokens(pedaco, modelo)))
+
+    blocos = []
+    atual = []
+    tokens_atual = 0
+    for frase, tokens in frases:
+        if atual and tokens_atual + tokens > tokens_por_bloco:
+            blocos.append(" ".join(f for f, _ in atual))
+            # Mantém o final do bloco anterior como sobreposição
+            repetidas = []
+            tokens_repetidos = 0
+            for f, t in reversed(atual):
+                if tokens_repetidos + t > sobreposicao or tokens_repetidos + t + tokens > tokens_por_bloco:
+                    break
+                repetidas.insert(0, (f, t))
+                tokens_repetidos += t
+            atual = repetidas
+            tokens_atual = tokens_repetidos
+        atual.append((frase, tokens))
+        tokens_atual += tokens
+    if atual:
+        blocos.append(" ".join(f for f, _ in atual))
+    return blocos
+
+# =========================
+# LIMITADOR DE TAXA
+# =========================
+
+class BaldeTokens:
+    """Token bucket que repõe `capacidade` unidades por minuto"""
+
+    def __init__(self, capacidade: float):
+        self.capacidade = float(capacidade)
+        self.disponivel = float(capacidade)
+        self.atualizado = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _repor(self):
+        agora = time.monotonic()
+        self.disponivel = min(
+            self.capacidade,
+            self.disponivel + (agora - self.atualizado) * self.capacidade / 60.0
+        )
+        self.atualizado = agora
+
+    def consumir(self, quantidade: float):
+        """Bloqueia até haver `quantidade` disponível e a consome; devolve o que foi consumido"""
+        # Um pedido maior que o balde nunca caberia; limita à capacidade
+        quantidade = min(float(quantidade), self.capacidade)
+        while True:
+            with self._lock:
+                self._repor()
+                if self.disponivel >= quantidade:
+                    self.disponivel -= quantidade
+                    return quantidade
+                espera = (quantidade - self.disponivel) * 60.0 / self.capacidade
+            time.sleep(espera)
+
+    def devolver(self, quantidade: float):
+        """Devolve unidades reservadas a mais (ex.: estimativa de tokens)"""
+        with self._lock:
+            self.disponivel = min(self.capacidade, self.disponivel + quantidade)
+
+# =========================
+# MOTOR DE TRANSLITERAÇÃO
+# =========================
+
+def _erro_temporario(erro):
+    """Indica se vale a pena tentar de novo (429, 5xx, timeout ou conexão)"""
+    import openai
+    if isinstance(erro, (openai.RateLimitError, openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(erro, openai.APIStatusError):
+        return erro.status_code == 429 or erro.status_code >= 500
+    return False
+
+
+def _espera_sugerida(erro):
+    """Lê o cabeçalho Retry-After da resposta, se houver"""
+    resposta = getattr(erro, "response", None)
+    if resposta is None:
+        return None
+    try:
+        return float(resposta.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class FluxoInterrompido(RuntimeError):
+    """A conexão caiu depois que parte da resposta já foi entregue; não dá para repetir sem duplicar o texto"""
+
+
+class ArquivoParcial:
+    """Grava o texto aos poucos em `<destino>.parcial` e só o renomeia para `destino` quando completo
+
+    Quem lê a pasta nunca vê um documento pela metade: se a chamada falhar,
+    o parcial é apagado e o destino anterior (se houver) fica intacto.
+    """
+
+    def __init__(self, destino: str):
+        self.destino = destino
+        self.temporario = f"{destino}.parcial"
+        self._arquivo = None
+
+    def __enter__(self):
+        self._arquivo = open(self.temporario, "w", encoding="utf-8")
+        return self
+
+    def escrever(self, trecho: str):
+        self._arquivo.write(trecho)
+        # Quem acompanha o .parcial vê o texto enquanto ele chega
+        self._arquivo.flush()
+
+    def __exit__(self, tipo, valor, rastro):
+        if tipo is not None:
+            self._arquivo.close()
+            os.remove(self.temporario)
+            return False
+        with medir("escrita", arquivo=os.path.basename(self.destino)) as campos:
+            campos["bytes"] = self._arquivo.tell()
+            self._arquivo.close()
+            os.replace(self.temporario, self.destino)
+        return False
+
+
+class MotorTransliteracao:
+    """Executa chamadas de transliteração em paralelo respeitando limites de taxa"""
+
+    def __init__(self, client, prompt_template: str, modelo: str = "gpt-4o", temperatura: float = 0.6,
+                 concorrencia: int = 4, requisicoes_por_minuto: int = 500, tokens_por_minuto: int = 30000,
+                 tentativas: int = 5, espera_base: float = 1.0, espera_maxima: float = 60.0, cache=None,
+                 tokens_por_bloco: int = 0, sobreposicao: int = 200, prompt_consolidacao: str = PROMPT_CONSOLIDACAO):
+        # As novas tentativas ficam por conta do motor, não do cliente
+        self.client = client.with_options(max_retries=0)
+        self.prompt_template = prompt_template
+        self.modelo = modelo
+        self.temperatura = temperatura
+        self.concorrencia = max(1, concorrencia)
+        # Limite real de requisições em voo: os blocos de um arquivo rodam dentro do pool de
+        # processar_lote e o motor é compartilhado entre trabalhos, então os pools sozinhos não bastam
+        self._em_voo = threading.Semaphore(self.concorrencia)
+        self.balde_requisicoes = BaldeTokens(requisicoes_por_minuto)
+        self.balde_tokens = BaldeTokens(tokens_por_minuto)
+        self.tentativas = tentativas
+        self.espera_base = espera_base
+        self.espera_maxima = espera_maxima
+        self.cache = cache
+        self.tokens_por_bloco = tokens_por_bloco
+        self.sobreposicao = sobreposicao
+        self.prompt_consolidacao = prompt_consolidacao
+
+    def _chamar(self, mensagens, ao_token=None):
+        """Faz a chamada com limitador de taxa e backoff exponencial com jitter
+
+        Retorna (texto, usage, instante do primeiro token). Com `ao_token`, a
+        resposta vem em stream e cada trecho é repassado assim que chega; só
+        se tenta de novo se nada tiver sido entregue ainda.
+        """
+        prompt = "".join(m["content"] for m in mensagens)
+        # Reserva o prompt e uma resposta de tamanho parecido; ajusta depois pelo usage
+        estimativa = contar_tokens(prompt, self.modelo) * 2
+
+        for tentativa in range(self.tentativas):
+            self.balde_requisicoes.consumir(1)
+            reservado = self.balde_tokens.consumir(estimativa)
+            try:
+                with self._em_voo:
+                    if ao_token is None:
+                        response = self.client.chat.completions.create(
+                            model=self.modelo,
+                            messages=mensagens,
+                            temperature=self.temperatura
+                        )
+                        texto, usage, primeiro_token = response.choices[0].message.content, response.usage, None
+                    else:
+                        texto, usage, primeiro_token = self._receber_fluxo(mensagens, ao_token)
+            except Exception as e:
+                # A reserva é refeita na próxima tentativa; sem isso cada falha gastaria uma estimativa
+                self.balde_tokens.devolver(reservado)
+                if not _erro_temporario(e) or tentativa == self.tentativas - 1:
+                    raise
+                espera = _espera_sugerida(e)
+                if espera is None:
+                    espera = random.uniform(0, min(self.espera_maxima, self.espera_base * 2 ** tentativa))
+                time.sleep(espera)
+                continue
+
+            # Só volta o que foi de fato reservado (o balde limita pedidos maiores que ele)
+            if usage is not None and usage.total_tokens < reservado:
+                self.balde_tokens.devolver(reservado - usage.total_tokens)
+            return texto, usage, primeiro_token
+
+    def _receber_fluxo(self, mensagens, ao_token):
+        fluxo = self.client.chat.completions.create(
+            model=self.modelo,
+            messages=mensagens,
+            temperature=self.temperatura,
+            stream=True,
+            # O último pedaço traz o usage, que o limitador de tokens precisa
+            stream_options={"include_usage": True}
+        )
+        trechos = []
+        usage = None
+        primeiro_token = None
+        try:
+            for pedaco in fluxo:
+                if pedaco.usage is not None:
+                    usage = pedaco.usage
+                if not pedaco.choices or not pedaco.choices[0].delta.content:
+                    continue
+                if primeiro_token is None:
+                    primeiro_token = time.perf_counter()
+                trechos.append(pedaco.choices[0].delta.content)
+                ao_token(pedaco.choices[0].delta.content)
+        except Exception as e:
+            if trechos:
+                raise FluxoInterrompido(f"resposta interrompida após {len(trechos)} trecho(s): {e}") from e
+            raise
+        return "".join(trechos), usage, primeiro_token
+
+    def _completar(self, prompt: str, etapa: str, ao_token=None):
+        """Uma chamada ao modelo, devolvendo o texto e o relatório da chamada"""
+        inicio = time.perf_counter()
+        with medir("chamada_gpt", modelo=self.modelo, parte=etapa, fluxo=ao_token is not None) as campos:
+            texto, usage, primeiro_token = self._chamar([{"role": "user", "content": prompt}], ao_token)
+            campos["tokens_entrada"] = usage.prompt_tokens if usage else 0
+            campos["tokens_saida"] = usage.completion_tokens if usage else 0
+        # Tempo até o primeiro token contando a espera no limitador: é o que o usuário sente
+        primeiro_token = primeiro_token - inicio if primeiro_token is not None else None
+        if primeiro_token is not None:
+            registrar("primeiro_token", primeiro_token, modelo=self.modelo, parte=etapa)
+        relatorio = {
+            "etapa": etapa,
+            "tempo": time.perf_counter() - inicio,
+            "primeiro_token": primeiro_token,
+            "tokens_entrada": campos["tokens_entrada"],
+            "tokens_saida": campos["tokens_saida"],
+        }
+        return texto, relatorio
+
+    def chave_cache(self, conteudo: str, em_blocos: bool):
+        """Chave do cache: a transcrição, o prompt (e a divisão em blocos), o modelo e a temperatura"""
+        prompt = self.prompt_template
+        if em_blocos:
+            prompt += f"|{self.prompt_consolidacao}|{self.tokens_por_bloco}|{self.sobreposicao}"
+        return self.cache.chave_transliteracao(conteudo, prompt, self.modelo, self.temperatura)
+
+    def _usa_blocos(self, conteudo: str):
+        return bool(self.tokens_por_bloco) and contar_tokens(conteudo, self.modelo) > self.tokens_por_bloco
+
+    def _transliterar_em_blocos(self, conteudo: str, ao_token=None):
+        """Map-reduce: translitera os blocos em paralelo e consolida as partes (só a consolidação em stream)"""
+        blocos = dividir_em_blocos(conteudo, self.tokens_por_bloco, self.sobreposicao, self.modelo)
+        with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+            parciais = list(executor.map(
+                lambda par: self._completar(self.prompt_template.format(par[1]), f"bloco {par[0]}/{len(blocos)}"),
+                enumerate(blocos, 1)
+            ))
+
+        partes = "\n\n".join(f"--- Parte {i} ---\n{texto}" for i, (texto, _) in enumerate(parciais, 1))
+        texto, consolidacao = self._completar(self.prompt_consolidacao.format(partes), "consolidação", ao_token)
+        return texto, [relatorio for _, relatorio in parciais] + [consolidacao]
+
+    def transliterar_com_relatorio(self, conteudo: str, ao_token=None):
+        """Translitera uma transcrição e retorna (texto, relatório por chamada)
+
+        Transcrições maiores que `tokens_por_bloco` são divididas em blocos,
+        transliteradas em paralelo e consolidadas numa chamada final. Com
+        `ao_token`, o texto final é repassado em trechos conforme é gerado
+        (de uma vez só quando vem do cache).
+        """
+        em_blocos = self._usa_blocos(conteudo)
+        chave = None
+        if self.cache is not None:
+            chave = self.chave_cache(conteudo, em_blocos)
+            resultado = self.cache.obter(TIPO_TRANSLITERACAO, chave)
+            if resultado is not None:
+                if ao_token is not None:
+                    ao_token(resultado)
+                return resultado, []
+
+        if em_blocos:
+            resultado, relatorio = self._transliterar_em_blocos(conteudo, ao_token)
+        else:
+            resultado, chamada = self._completar(self.prompt_template.format(conteudo), "documento", ao_token)
+            relatorio = [chamada]
+
+        if self.cache is not None:
+            tokens = sum(r["tokens_entrada"] + r["tokens_saida"] for r in relatorio)
+            self.cache.guardar(TIPO_TRANSLITERACAO, chave, resultado, tokens)
+        return resultado, relatorio
+
+    def transliterar(self, conteudo: str):
+        """Translitera uma transcrição, reaproveitando o cache quando houver"""
+        return self.transliterar_com_relatorio(conteudo)[0]
+
+    def _processar_arquivo(self, caminho_origem: str, caminho_destino: str):
+        inicio = time.perf_counter()
+        try:
+            with open(caminho_origem, "r", encoding="utf-8") as f:
+                conteudo = f.read()
+            with perfilar(caminho_destino), ArquivoParcial(caminho_destino) as arquivo:
+                _, relatorio = self.transliterar_com_relatorio(conteudo, arquivo.escrever)
+            erro = None
+        except Exception as e:
+            relatorio = []
+            erro = str(e)
+        return {
+            "origem": caminho_origem,
+            "destino": caminho_destino,
+            "tempo": time.perf_counter() - inicio,
+            "chamadas": relatorio,
+            "erro": erro,
+        }
+
+    def processar_lote(self, tarefas):
+        """Translitera pares (origem, destino) em paralelo, gerando os resultados conforme terminam
+
+        Uma falha em um arquivo é devolvida no campo "erro" e não interrompe os demais.
+        """
+        with ThreadPoolExecutor(max_workers=self.concorrencia) as executor:
+            futuros = [executor.submit(self._processar_arquivo, origem, destino) for origem, destino in tarefas]
+            for futuro in as_completed(futuros):
+                yield futuro.result()
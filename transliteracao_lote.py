@@ -0,0 +1,507 @@
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+from cache_resultados import TIPO_TRANSLITERACAO
+from registro_tarefas import (
+    obter_registro, ETAPA_TRANSCRICAO, ETAPA_TRANSLITERACAO, STATUS_EM_ANDAMENTO, STATUS_CONCLUIDA
+)
+from indice_documentos import obter_indice
+from transliteracao import dividir_em_blocos
+from metricas import registrar
+
+# =========================
+# TRANSLITERAÇÃO PELA BATCH API
+# =========================
+# Para um canal inteiro a latência não importa. A Batch API da OpenAI recebe
+# um JSONL com todas as requisições e devolve os resultados em até 24 h, pela
+# metade do preço e sem disputar o limite de taxa das chamadas síncronas.
+#
+# O andamento fica em .lote-openai.json na pasta de transcritos, gravado com
+# troca atômica. Se o app ou o cron reiniciar no meio, executar() retoma:
+# envia os lotes que faltam, consulta os que estão rodando e ingere o que já
+# chegou. A ingestão é idempotente, porque cada item concluído fica marcado
+# no estado e no registro de tarefas.
+#
+# Cada rodada (e o cancelamento) relê o estado com a trava .lote-openai.lock
+# segura: o app, os trabalhos em segundo plano e o cron podem mexer no mesmo
+# lote, e sem a trava o último a gravar apagaria o que o outro fez.
+#
+# Transcrições maiores que tokens_por_bloco viram uma requisição por bloco;
+# a consolidação vai num segundo lote, depois que todos os blocos voltarem.
+
+ARQUIVO_ESTADO = ".lote-openai.json"
+ARQUIVO_TRAVA = ".lote-openai.lock"
+PASTA_LOTES = ".lote-openai"
+ENDPOINT = "/v1/chat/completions"
+JANELA_CONCLUSAO = "24h"
+
+# Limites de um arquivo de entrada da Batch API (com folga no tamanho)
+MAXIMO_REQUISICOES = 50000
+MAXIMO_BYTES = 190 * 1024 * 1024
+
+STATUS_FINAIS = ("completed", "failed", "expired", "cancelled")
+TRABALHADOR = "batch-api"
+
+FASE_DOCUMENTOS = "documentos"
+FASE_CONSOLIDACAO = "consolidacao"
+
+ITEM_AGUARDANDO = "aguardando"
+ITEM_CONCLUIDO = "concluido"
+ITEM_FALHOU = "falhou"
+
+
+def _identificador(tipo: str, indice: int, item: str):
+    # O item fica por último porque o nome do vídeo pode ter ":"
+    return f"{tipo}:{indice}:{item}"
+
+
+@contextmanager
+def _travar(caminho: str):
+    """Trava exclusiva entre processos e threads (cada abertura do arquivo é uma trava à parte)"""
+    with open(caminho, "a+b") as arquivo:
+        if os.name == "nt":
+            import msvcrt
+            arquivo.seek(0)
+            while True:
+                try:
+                    # LK_LOCK desiste depois de ~10 s; continua esperando
+                    msvcrt.locking(arquivo.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:
+                    continue
+        else:
+            import fcntl
+            fcntl.flock(arquivo.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if os.name == "nt":
+                arquivo.seek(0)
+                msvcrt.locking(arquivo.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(arquivo.fileno(), fcntl.LOCK_UN)
+
+
+def _resumir(estado):
+    if estado is None:
+        return None
+    itens = {}
+    for dados in estado["itens"].values():
+        itens[dados["status"]] = itens.get(dados["status"], 0) + 1
+    return {
+        "fase": estado["fase"],
+        "criado_em": estado["criado_em"],
+        "itens": itens,
+        "lotes": [
+            {chave: lote.get(chave) for chave in ("id", "fase", "status", "concluidas", "falhas", "total")}
+            for lote in estado["lotes"]
+        ],
+    }
+
+
+def resumo_lote(pasta_transcritos: str):
+    """Fase, lotes e itens por status do lote em andamento (None se não há), sem criar cliente"""
+    caminho = os.path.join(pasta_transcritos, ARQUIVO_ESTADO)
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, "r", encoding="utf-8") as f:
+        return _resumir(json.load(f))
+
+
+class LoteTransliteracao:
+    """Transliteração assíncrona e retomável pela Batch API"""
+
+    def __init__(self, motor, pasta_transcritos: str, pasta_transliterados: str, intervalo: float = 30.0):
+        self.motor = motor
+        # O motor desliga as novas tentativas do cliente; aqui elas ajudam
+        self.client = motor.client.with_options(max_retries=3)
+        self.pasta_transcritos = pasta_transcritos
+        self.pasta_transliterados = pasta_transliterados
+        self.intervalo = intervalo
+        self.caminho_estado = os.path.join(pasta_transcritos, ARQUIVO_ESTADO)
+        self.caminho_trava = os.path.join(pasta_transcritos, ARQUIVO_TRAVA)
+        self.pasta_lotes = os.path.join(pasta_transcritos, PASTA_LOTES)
+        self.registro_tarefas = obter_registro(pasta_transcritos)
+        self.estado = self._carregar()
+        self.imediatos = []
+
+    # ----- estado -----
+
+    def _carregar(self):
+        if not os.path.exists(self.caminho_estado):
+            return None
+        with open(self.caminho_estado, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _travado(self):
+        return _travar(self.caminho_trava)
+
+    def _salvar(self):
+        temporario = f"{self.caminho_estado}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            json.dump(self.estado, f, ensure_ascii=False)
+        os.replace(temporario, self.caminho_estado)
+
+    def em_andamento(self):
+        return self.estado is not None
+
+    def resumo(self):
+        return _resumir(self.estado)
+
+    # ----- preparação -----
+
+    def _requisicao(self, identificador: str, prompt: str):
+        return {
+            "custom_id": identificador,
+            "method": "POST",
+            "url": ENDPOINT,
+            "body": {
+                "model": self.motor.modelo,
+                "messages": [{"role": "user", "content": prompt}],
+                "temperature": self.motor.temperatura,
+            },
+        }
+
+    def _preparar(self):
+        """Reivindica as transcrições pendentes e grava o JSONL da primeira fase
+
+        Gera os eventos "pulado"; os resultados imediatos (acertos no cache,
+        transcrição ilegível) ficam em self.imediatos para sair depois do "inicio".
+        """
+        itens = {}
+        requisicoes = []
+        reivindicados = []
+        salvo = False
+        try:
+            for item, origem in self.registro_tarefas.prontos_para(ETAPA_TRANSLITERACAO, ETAPA_TRANSCRICAO):
+                destino = os.path.join(self.pasta_transliterados, f"{item}-Transliterado.txt")
+                if not self.registro_tarefas.precisa_processar(item, ETAPA_TRANSLITERACAO, destino):
+                    yield {"tipo": "pulado", "arquivo": item, "motivo": "já transliterado ou sem tentativas restantes"}
+                    continue
+                if not self.registro_tarefas.reivindicar(
+                    item, ETAPA_TRANSLITERACAO, self.motor.modelo, origem, destino, TRABALHADOR
+                ):
+                    yield {"tipo": "pulado", "arquivo": item, "motivo": "em andamento em outro trabalhador"}
+                    continue
+                reivindicados.append(item)
+
+                dados = {"origem": origem, "destino": destino, "blocos": 0, "partes": {}, "chamadas": [],
+                         "status": ITEM_AGUARDANDO, "inicio": time.time()}
+                try:
+                    with open(origem, "r", encoding="utf-8") as f:
+                        conteudo = f.read()
+                except OSError as e:
+                    self.imediatos.append(self._falhar(item, dados, str(e)))
+                    continue
+
+                em_blocos = self.motor._usa_blocos(conteudo)
+                if self.motor.cache is not None:
+                    texto = self.motor.cache.obter(TIPO_TRANSLITERACAO, self.motor.chave_cache(conteudo, em_blocos))
+                    if texto is not None:
+                        self.imediatos.append(self._concluir(item, dados, texto, guardar_cache=False))
+                        continue
+
+                if em_blocos:
+                    blocos = dividir_em_blocos(conteudo, self.motor.tokens_por_bloco, self.motor.sobreposicao, self.motor.modelo)
+                    dados["blocos"] = len(blocos)
+                    requisicoes += [
+                        self._requisicao(_identificador("bloco", i, item), self.motor.prompt_template.format(bloco))
+                        for i, bloco in enumerate(blocos)
+                    ]
+                else:
+                    requisicoes.append(
+                        self._requisicao(_identificador("documento", 0, item), self.motor.prompt_template.format(conteudo))
+                    )
+                itens[item] = dados
+
+            if not itens:
+                return
+            self.estado = {"criado_em": time.time(), "fase": FASE_DOCUMENTOS, "itens": itens, "lotes": []}
+            self.estado["lotes"] = self._gravar_lotes(requisicoes, FASE_DOCUMENTOS)
+            self._salvar()
+            salvo = True
+        finally:
+            if not salvo:
+                # Quem consome parou no meio (ou deu erro): sem estado gravado, ninguém retomaria
+                # esses itens, e a reivindicação os prenderia até expirar
+                self.estado = None
+                for item in reivindicados:
+                    self.registro_tarefas.liberar(item, ETAPA_TRANSLITERACAO, TRABALHADOR)
+
+    def _gravar_lotes(self, requisicoes, fase: str):
+        """Divide as requisições em arquivos JSONL dentro dos limites da Batch API"""
+        os.makedirs(self.pasta_lotes, exist_ok=True)
+        lotes = []
+        atual, tamanho = [], 0
+        for requisicao in requisicoes:
+            linha = json.dumps(requisicao, ensure_ascii=False) + "\n"
+            if atual and (len(atual) >= MAXIMO_REQUISICOES or tamanho + len(linha.encode("utf-8")) > MAXIMO_BYTES):
+                lotes.append(self._gravar_lote(atual, fase))
+                atual, tamanho = [], 0
+            atual.append((requisicao["custom_id"], linha))
+            tamanho += len(linha.encode("utf-8"))
+        if atual:
+            lotes.append(self._gravar_lote(atual, fase))
+        return lotes
+
+    def _gravar_lote(self, linhas, fase: str):
+        # O token vai nos metadados do lote para reencontrá-lo se o processo cair logo após criá-lo
+        token = uuid.uuid4().hex
+        caminho = os.path.join(self.pasta_lotes, f"{fase}-{token}.jsonl")
+        with open(caminho, "w", encoding="utf-8") as f:
+            f.writelines(linha for _, linha in linhas)
+        return {"token": token, "fase": fase, "arquivo": caminho, "requisicoes": [i for i, _ in linhas],
+                "id": None, "status": None, "ingerido": False}
+
+    # ----- envio e acompanhamento -----
+
+    def _procurar_lote(self, token: str):
+        for lote in self.client.batches.list(limit=100).data:
+            if (lote.metadata or {}).get("lote") == token:
+                return lote
+        return None
+
+    def _submeter(self):
+        for lote in self.estado["lotes"]:
+            if lote["id"] is not None:
+                continue
+            existente = self._procurar_lote(lote["token"])
+            if existente is None:
+                with open(lote["arquivo"], "rb") as f:
+                    arquivo = self.client.files.create(file=f, purpose="batch")
+                existente = self.client.batches.create(
+                    input_file_id=arquivo.id, endpoint=ENDPOINT, completion_window=JANELA_CONCLUSAO,
+                    metadata={"lote": lote["token"], "fase": lote["fase"]}
+                )
+            lote["id"] = existente.id
+            lote["status"] = existente.status
+            lote["criado_em"] = time.time()
+            self._salvar()
+
+    def _consultar(self):
+        for lote in self.estado["lotes"]:
+            if lote["id"] is None or lote["status"] in STATUS_FINAIS:
+                continue
+            atual = self.client.batches.retrieve(lote["id"])
+            contagem = atual.request_counts
+            novo = {
+                "status": atual.status,
+                "concluidas": contagem.completed if contagem else 0,
+                "falhas": contagem.failed if contagem else 0,
+                "total": contagem.total if contagem else len(lote["requisicoes"]),
+                "arquivo_saida": atual.output_file_id,
+                "arquivo_erros": atual.error_file_id,
+            }
+            if any(lote.get(chave) != valor for chave, valor in novo.items()):
+                lote.update(novo)
+                self._salvar()
+                yield {"tipo": "lote", "id": lote["id"], "fase": lote["fase"], "status": lote["status"],
+                       "concluidas": lote["concluidas"], "total": lote["total"]}
+
+        # Um lote pode levar até 24 h; a tarefa não pode expirar no registro enquanto isso
+        for item, dados in self.estado["itens"].items():
+            if dados["status"] == ITEM_AGUARDANDO:
+                self.registro_tarefas.renovar(item, ETAPA_TRANSLITERACAO)
+
+    # ----- ingestão -----
+
+    def _baixar(self, id_arquivo: str):
+        """Conteúdo de um arquivo de saída, guardado em disco para reingerir sem baixar de novo"""
+        caminho = os.path.join(self.pasta_lotes, f"{id_arquivo}.jsonl")
+        if not os.path.exists(caminho):
+            conteudo = self.client.files.content(id_arquivo).read()
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            with open(temporario, "wb") as f:
+                f.write(conteudo)
+            os.replace(temporario, caminho)
+        with open(caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                if linha.strip():
+                    yield json.loads(linha)
+
+    def _ingerir(self):
+        for lote in self.estado["lotes"]:
+            if lote["ingerido"] or lote["status"] not in STATUS_FINAIS:
+                continue
+            respondidos = set()
+            for chave in ("arquivo_saida", "arquivo_erros"):
+                if lote.get(chave):
+                    for linha in self._baixar(lote[chave]):
+                        respondidos.add(linha["custom_id"])
+                        evento = self._processar_linha(linha, lote)
+                        if evento is not None:
+                            yield evento
+
+            # Lote expirado, cancelado ou que falhou: o que não voltou fica como falha
+            for identificador in lote["requisicoes"]:
+                item = identificador.split(":", 2)[2]
+                dados = self.estado["itens"][item]
+                if identificador not in respondidos and dados["status"] == ITEM_AGUARDANDO:
+                    yield self._falhar(item, dados, f"lote {lote['id']} terminou como {lote['status']} sem esta resposta")
+
+            lote["ingerido"] = True
+            self._salvar()
+
+    def _processar_linha(self, linha: dict, lote: dict):
+        tipo, indice, item = linha["custom_id"].split(":", 2)
+        dados = self.estado["itens"].get(item)
+        if dados is None or dados["status"] != ITEM_AGUARDANDO:
+            return None
+        # Estado de antes de uma queda no meio da ingestão: o registro já sabe o que foi gravado
+        tarefa = self.registro_tarefas.obter(item, ETAPA_TRANSLITERACAO)
+        if tarefa is None or tarefa["status"] != STATUS_EM_ANDAMENTO or tarefa["trabalhador"] != TRABALHADOR:
+            dados["status"] = ITEM_CONCLUIDO if tarefa is not None and tarefa["status"] == STATUS_CONCLUIDA else ITEM_FALHOU
+            return None
+
+        resposta = linha.get("response") or {}
+        if linha.get("error") or resposta.get("status_code") != 200:
+            erro = linha.get("error") or (resposta.get("body") or {}).get("error") or {}
+            mensagem = erro.get("message") if isinstance(erro, dict) else str(erro)
+            return self._falhar(item, dados, mensagem or f"HTTP {resposta.get('status_code')}")
+
+        corpo = resposta["body"]
+        texto = corpo["choices"][0]["message"]["content"]
+        usage = corpo.get("usage") or {}
+        etapa = {"documento": "documento", "bloco": f"bloco {int(indice) + 1}/{dados['blocos']}",
+                 "consolidacao": "consolidação"}[tipo]
+        chamada = {
+            "etapa": etapa,
+            # Sem tempo por requisição: vale o tempo de espera do lote
+            "tempo": time.time() - lote.get("criado_em", dados["inicio"]),
+            "tokens_entrada": usage.get("prompt_tokens", 0),
+            "tokens_saida": usage.get("completion_tokens", 0),
+        }
+        registrar("chamada_gpt_lote", chamada["tempo"], modelo=self.motor.modelo, parte=etapa,
+                  tokens_entrada=chamada["tokens_entrada"], tokens_saida=chamada["tokens_saida"])
+        dados["chamadas"].append(chamada)
+
+        if tipo == "bloco":
+            dados["partes"][indice] = texto
+            return None
+        return self._concluir(item, dados, texto)
+
+    def _concluir(self, item: str, dados: dict, texto: str, guardar_cache: bool = True):
+        # Grava num temporário e troca, para nunca deixar um documento pela metade
+        temporario = f"{dados['destino']}.{os.getpid()}.tmp"
+        with open(temporario, "w", encoding="utf-8") as f:
+            f.write(texto)
+        os.replace(temporario, dados["destino"])
+
+        duracao = time.time() - dados["inicio"]
+        self.registro_tarefas.concluir(item, ETAPA_TRANSLITERACAO, duracao=duracao, trabalhador=TRABALHADOR)
+        obter_indice(self.pasta_transliterados).registrar(dados["destino"])
+        if guardar_cache and self.motor.cache is not None:
+            with open(dados["origem"], "r", encoding="utf-8") as f:
+                chave = self.motor.chave_cache(f.read(), dados["blocos"] > 0)
+            tokens = sum(c["tokens_entrada"] + c["tokens_saida"] for c in dados["chamadas"])
+            self.motor.cache.guardar(TIPO_TRANSLITERACAO, chave, texto, tokens)
+        dados["status"] = ITEM_CONCLUIDO
+        return {"tipo": "resultado", "origem": dados["origem"], "destino": dados["destino"], "tempo": duracao,
+                "chamadas": dados["chamadas"], "erro": None}
+
+    def _falhar(self, item: str, dados: dict, erro: str):
+        self.registro_tarefas.falhar(item, ETAPA_TRANSLITERACAO, erro, TRABALHADOR)
+        dados["status"] = ITEM_FALHOU
+        return {"tipo": "resultado", "origem": dados["origem"], "destino": dados["destino"],
+                "tempo": time.time() - dados["inicio"], "chamadas": dados["chamadas"], "erro": erro}
+
+    # ----- fases -----
+
+    def _fase_concluida(self):
+        return all(lote["ingerido"] for lote in self.estado["lotes"] if lote["fase"] == self.estado["fase"])
+
+    def _avancar_fase(self):
+        """Depois dos blocos, monta o lote de consolidação; retorna False se não há mais nada a enviar"""
+        if self.estado["fase"] != FASE_DOCUMENTOS:
+            return False
+        requisicoes = []
+        for item, dados in self.estado["itens"].items():
+            if dados["status"] != ITEM_AGUARDANDO or not dados["blocos"]:
+                continue
+            partes = "\n\n".join(
+                f"--- Parte {i} ---\n{dados['partes'][str(indice)]}"
+                for i, indice in enumerate(range(dados["blocos"]), 1)
+            )
+            requisicoes.append(
+                self._requisicao(_identificador("consolidacao", 0, item), self.motor.prompt_consolidacao.format(partes))
+            )
+        if not requisicoes:
+            return False
+        self.estado["fase"] = FASE_CONSOLIDACAO
+        self.estado["lotes"] += self._gravar_lotes(requisicoes, FASE_CONSOLIDACAO)
+        self._salvar()
+        return True
+
+    def _finalizar(self):
+        for lote in self.estado["lotes"]:
+            for caminho in [lote["arquivo"]] + [
+                os.path.join(self.pasta_lotes, f"{lote[chave]}.jsonl")
+                for chave in ("arquivo_saida", "arquivo_erros") if lote.get(chave)
+            ]:
+                if os.path.exists(caminho):
+                    os.remove(caminho)
+        os.remove(self.caminho_estado)
+        self.estado = None
+
+    # ----- execução -----
+
+    def executar(self, esperar: bool = True):
+        """Prepara (ou retoma) o lote e gera os eventos até terminar
+
+        Gera os eventos de transliterar_pendentes ("pulado", "inicio", "resultado")
+        e {"tipo": "lote", "id", "fase", "status", "concluidas", "total"} quando um
+        lote muda. Com esperar=False faz uma única rodada (enviar, consultar,
+        ingerir) e retorna; a próxima chamada continua de onde parou.
+        """
+        with self._travado():
+            self.estado = self._carregar()
+            retomado = self.estado is not None
+            if not retomado:
+                yield from self._preparar()
+        pendentes = 0 if self.estado is None else sum(
+            1 for dados in self.estado["itens"].values() if dados["status"] == ITEM_AGUARDANDO
+        )
+        if self.estado is None and not self.imediatos:
+            return
+        lotes = 0 if self.estado is None else len(self.estado["lotes"])
+        yield {"tipo": "inicio", "total": pendentes + len(self.imediatos), "trabalhadores": lotes, "lote": True,
+               "retomado": retomado}
+        yield from self.imediatos
+        self.imediatos = []
+        if self.estado is None:
+            return
+
+        while True:
+            with self._travado():
+                # Outro processo pode ter cancelado ou terminado o lote enquanto esperávamos
+                self.estado = self._carregar()
+                if self.estado is None:
+                    return
+                self._submeter()
+                yield from self._consultar()
+                yield from self._ingerir()
+                if self._fase_concluida():
+                    if self._avancar_fase():
+                        continue
+                    self._finalizar()
+                    return
+            if not esperar:
+                return
+            time.sleep(self.intervalo)
+
+    def cancelar(self):
+        """Cancela os lotes em andamento e devolve os itens ao registro como falha"""
+        with self._travado():
+            self.estado = self._carregar()
+            if self.estado is None:
+                return
+            for lote in self.estado["lotes"]:
+                if lote["id"] is not None and lote["status"] not in STATUS_FINAIS:
+                    self.client.batches.cancel(lote["id"])
+            for item, dados in self.estado["itens"].items():
+                if dados["status"] == ITEM_AGUARDANDO:
+                    self._falhar(item, dados, "lote cancelado")
+            self._finalizar()
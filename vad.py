@@ -0,0 +1,131 @@
+import time
+
+from audio import TAXA_AMOSTRAGEM
+
+# =========================
+# DETECÇÃO DE FALA (VAD)
+# =========================
+# Pré-passo em NumPy, sem rede: cada quadro de 30 ms é marcado como fala se
+# a energia estiver bem acima do ruído de fundo do arquivo e o espectro não
+# for "plano" demais (ruído e muitos trechos de música têm planicidade alta).
+# Só as regiões de fala vão para o Whisper, e os tempos são remapeados para
+# a linha do tempo original.
+
+QUADRO_SEGUNDOS = 0.03
+QUADROS_POR_BLOCO = 4096
+
+
+def _caracteristicas(audio, tamanho_quadro: int):
+    """Energia (dB) e planicidade espectral de cada quadro, calculadas em blocos"""
+    import numpy as np
+
+    quantidade = len(audio) // tamanho_quadro
+    energia = np.empty(quantidade, dtype=np.float32)
+    planicidade = np.empty(quantidade, dtype=np.float32)
+    janela = np.hanning(tamanho_quadro).astype(np.float32)
+
+    for inicio in range(0, quantidade, QUADROS_POR_BLOCO):
+        fim = min(inicio + QUADROS_POR_BLOCO, quantidade)
+        quadros = np.asarray(audio[inicio * tamanho_quadro:fim * tamanho_quadro], dtype=np.float32)
+        quadros = quadros.reshape(fim - inicio, tamanho_quadro)
+
+        energia[inicio:fim] = 10 * np.log10(np.mean(quadros ** 2, axis=1) + 1e-10)
+
+        espectro = np.abs(np.fft.rfft(quadros * janela, axis=1)) ** 2 + 1e-10
+        planicidade[inicio:fim] = np.exp(np.mean(np.log(espectro), axis=1)) / np.mean(espectro, axis=1)
+
+    return energia, planicidade
+
+
+def detectar_fala(audio, taxa: int = TAXA_AMOSTRAGEM, margem_db: float = 12.0, limite_planicidade: float = 0.45,
+                  folga: float = 0.3, intervalo_minimo: float = 0.5, duracao_minima: float = 0.25):
+    """Retorna as regiões de fala [(inicio, fim), ...] em segundos"""
+    import numpy as np
+
+    tamanho_quadro = int(taxa * QUADRO_SEGUNDOS)
+    if len(audio) < tamanho_quadro:
+        return []
+
+    energia, planicidade = _caracteristicas(audio, tamanho_quadro)
+    ruido_de_fundo = np.percentile(energia, 10)
+    limiar = max(ruido_de_fundo + margem_db, -55.0)
+    fala = (energia > limiar) & (planicidade < limite_planicidade)
+
+    # Quadros consecutivos de fala viram regiões
+    bordas = np.flatnonzero(np.diff(np.concatenate(([0], fala.astype(np.int8), [0]))))
+    duracao_total = len(audio) / taxa
+    regioes = []
+    for inicio_quadro, fim_quadro in zip(bordas[::2], bordas[1::2]):
+        inicio = max(0.0, inicio_quadro * QUADRO_SEGUNDOS - folga)
+        fim = min(duracao_total, fim_quadro * QUADRO_SEGUNDOS + folga)
+        if regioes and inicio - regioes[-1][1] < intervalo_minimo:
+            regioes[-1] = (regioes[-1][0], fim)
+        else:
+            regioes.append((inicio, fim))
+
+    return [(inicio, fim) for inicio, fim in regioes if fim - inicio >= duracao_minima]
+
+
+def concatenar_regioes(audio, regioes, taxa: int = TAXA_AMOSTRAGEM):
+    """Junta as regiões num só array e devolve o mapa (inicio_concatenado, inicio_original, duracao)"""
+    import numpy as np
+
+    trechos = []
+    mapa = []
+    posicao = 0.0
+    for inicio, fim in regioes:
+        trecho = audio[int(inicio * taxa):int(fim * taxa)]
+        trechos.append(trecho)
+        duracao = len(trecho) / taxa
+        mapa.append((posicao, inicio, duracao))
+        posicao += duracao
+
+    if not trechos:
+        return np.zeros(0, dtype=np.float32), mapa
+    return np.ascontiguousarray(np.concatenate(trechos), dtype=np.float32), mapa
+
+
+def mapear_tempo(tempo: float, mapa):
+    """Converte um tempo do áudio concatenado para a linha do tempo original"""
+    for inicio_concatenado, inicio_original, duracao in reversed(mapa):
+        if tempo >= inicio_concatenado:
+            return inicio_original + min(tempo - inicio_concatenado, duracao)
+    return mapa[0][1] if mapa else tempo
+
+
+def transcrever_fala(model, audio, opcoes_modelo: dict = None, taxa: int = TAXA_AMOSTRAGEM):
+    """Roda o Whisper só nas regiões de fala e devolve (result, estatísticas)
+
+    Os segmentos do result já vêm com "start"/"end" na linha do tempo original.
+    """
+    opcoes_modelo = opcoes_modelo or {}
+    duracao_total = len(audio) / taxa
+
+    inicio_vad = time.perf_counter()
+    regioes = detectar_fala(audio, taxa)
+    audio_fala, mapa = concatenar_regioes(audio, regioes, taxa)
+    tempo_vad = time.perf_counter() - inicio_vad
+    duracao_fala = len(audio_fala) / taxa
+
+    if duracao_fala > 0:
+        inicio = time.perf_counter()
+        result = model.transcribe(audio_fala, **opcoes_modelo)
+        tempo_inferencia = time.perf_counter() - inicio
+        for segmento in result["segments"]:
+            segmento["start"] = mapear_tempo(segmento["start"], mapa)
+            segmento["end"] = mapear_tempo(segmento["end"], mapa)
+    else:
+        result = {"text": "", "segments": []}
+        tempo_inferencia = 0.0
+
+    estatisticas = {
+        "duracao_total": duracao_total,
+        "duracao_fala": duracao_fala,
+        "regioes": len(regioes),
+        "percentual_pulado": 100.0 * (1 - duracao_fala / duracao_total) if duracao_total else 0.0,
+        # O custo do Whisper cresce com a duração processada
+        "aceleracao": duracao_total / duracao_fala if duracao_fala else float("inf"),
+        "tempo_vad": tempo_vad,
+        "tempo_inferencia": tempo_inferencia,
+    }
+    return result, estatisticas
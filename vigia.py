@@ -0,0 +1,148 @@
+import os
+import queue
+import threading
+import time
+
+# =========================
+# VIGIA DE PASTA
+# =========================
+# Recebe eventos do sistema de arquivos (watchdog) em vez de varrer a pasta.
+# Gravadores costumam escrever o vídeo aos poucos, então um arquivo só é
+# entregue depois que tamanho e mtime ficam parados por `estabilidade`
+# segundos e ele pode ser aberto para leitura.
+
+EXTENSOES_VIDEO = ('.mp4', '.avi', '.mov', '.mkv', '.flv', '.wmv', '.webm', '.m4v', '.3gp')
+
+ESTABILIDADE_SEGUNDOS = 2.0
+INTERVALO_VERIFICACAO = 0.5
+
+
+class _Manipulador:
+    """Repassa ao vigia os caminhos de arquivos criados, alterados, movidos ou fechados"""
+
+    def __init__(self, vigia):
+        self.vigia = vigia
+
+    def dispatch(self, evento):
+        if evento.is_directory:
+            return
+        if evento.event_type == "moved":
+            self.vigia.marcar(evento.dest_path)
+        elif evento.event_type in ("created", "modified", "closed"):
+            self.vigia.marcar(evento.src_path)
+
+
+class VigiaPasta:
+    """Observa uma pasta e entrega (caminho, detectado_em, pronto_em) dos vídeos que terminaram de ser gravados"""
+
+    def __init__(self, pasta: str, extensoes=EXTENSOES_VIDEO, estabilidade: float = ESTABILIDADE_SEGUNDOS,
+                 incluir_existentes: bool = True, usar_polling: bool = False):
+        self.pasta = pasta
+        self.extensoes = tuple(e.lower() for e in extensoes)
+        self.estabilidade = estabilidade
+        self.incluir_existentes = incluir_existentes
+        # Compartilhamentos de rede (SMB/NFS) não geram eventos nativos
+        self.usar_polling = usar_polling
+        self.prontos = queue.Queue()
+        self.entregues = 0
+        self._pendentes = {}
+        self._entregues = {}
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._observador = None
+        self._verificador = None
+
+    def marcar(self, caminho: str):
+        """Registra atividade em um arquivo; ele volta a contar o tempo de estabilidade"""
+        if not caminho.lower().endswith(self.extensoes):
+            return
+        with self._lock:
+            pendente = self._pendentes.get(caminho)
+            if pendente is None:
+                self._pendentes[caminho] = {
+                    "detectado_em": time.time(), "assinatura": None, "mudou_em": time.monotonic()
+                }
+            else:
+                pendente["mudou_em"] = time.monotonic()
+
+    def _verificar(self):
+        while not self._parar.wait(INTERVALO_VERIFICACAO):
+            agora = time.monotonic()
+            with self._lock:
+                candidatos = list(self._pendentes.items())
+
+            for caminho, pendente in candidatos:
+                try:
+                    info = os.stat(caminho)
+                except FileNotFoundError:
+                    with self._lock:
+                        self._pendentes.pop(caminho, None)
+                    continue
+
+                assinatura = (info.st_size, info.st_mtime)
+                # marcar() mexe no mesmo dicionário pela thread do watchdog
+                with self._lock:
+                    if assinatura != pendente["assinatura"]:
+                        pendente["assinatura"] = assinatura
+                        pendente["mudou_em"] = agora
+                        continue
+                    if info.st_size == 0 or agora - pendente["mudou_em"] < self.estabilidade:
+                        continue
+                try:
+                    # No Windows um arquivo ainda aberto pelo gravador não pode ser lido
+                    with open(caminho, "rb"):
+                        pass
+                except OSError:
+                    continue
+
+                with self._lock:
+                    # Atividade registrada durante a abertura: ainda não está estável
+                    if agora - pendente["mudou_em"] < self.estabilidade:
+                        continue
+                    self._pendentes.pop(caminho, None)
+                    # Um "modified" tardio (metadados, antivírus) não reenvia o mesmo arquivo
+                    if self._entregues.get(caminho) == assinatura:
+                        continue
+                    self._entregues[caminho] = assinatura
+                self.entregues += 1
+                self.prontos.put((caminho, pendente["detectado_em"], time.time()))
+
+    def iniciar(self):
+        if self.usar_polling:
+            from watchdog.observers.polling import PollingObserver as Observador
+        else:
+            from watchdog.observers import Observer as Observador
+
+        self._observador = Observador()
+        self._observador.schedule(_Manipulador(self), self.pasta, recursive=False)
+        self._observador.start()
+
+        if self.incluir_existentes:
+            for entrada in os.scandir(self.pasta):
+                if entrada.is_file():
+                    self.marcar(entrada.path)
+
+        self._verificador = threading.Thread(target=self._verificar, name="vigia-verificador", daemon=True)
+        self._verificador.start()
+
+    def parar(self):
+        self._parar.set()
+        if self._observador is not None:
+            self._observador.stop()
+            self._observador.join(timeout=5)
+
+    def ativo(self):
+        return not self._parar.is_set()
+
+    def pendentes(self):
+        """Arquivos detectados que ainda estão sendo gravados"""
+        with self._lock:
+            return sorted(self._pendentes)
+
+    def itens(self):
+        """Gera os arquivos prontos até o vigia ser parado (para alimentar a esteira)"""
+        while not self._parar.is_set():
+            try:
+                yield self.prontos.get(timeout=INTERVALO_VERIFICACAO)
+            except queue.Empty:
+                continue